@@ -1,3 +1,5 @@
+import os
+
 import numpy as np
 
 class Config:
@@ -6,6 +8,8 @@ class Config:
     TRACK_EXEMPLAR_SIZE      = 127
     TRACK_INSTANCE_SIZE      = 255
     TRACK_OUTPUT_SIZE        = 16
+    # template backbone 출력(zf) shape (C, H, W)
+    TRACK_TEMPLATE_FEATURE   = (48, 8, 8)
 
     TRACK_PENALTY_K          = 0.16
     TRACK_WINDOW_INFLUENCE   = 0.46
@@ -13,4 +17,154 @@ class Config:
 
     POINT_STRIDE             = 8
 
-config = Config
\ No newline at end of file
+    # crop을 engine 입력 buffer에 바로 써넣는 fused 경로 사용 여부 (False면 기존 get_subwindow)
+    TRACK_FUSED_CROP         = True
+
+    # VOT 평가 (supervised) : failure 후 재초기화까지 건너뛸 frame 수, accuracy에서 제외할 burn-in frame 수
+    VOT_SKIP_FRAMES          = 5
+    VOT_BURNIN_FRAMES        = 10
+    VOT_EAO_INTERVAL         = (100, 356)
+
+    # 입력 해상도 preset
+    RESOLUTION_PRESET        = {
+        "UHD": (3840, 2160),
+        "QHD": (2560, 1440),
+        "FHD": (1920, 1080),
+        "HD":  (1280, 720),
+        "VGA": (640, 480)
+    }
+
+    # 추론 backend : 'trt'(TensorRT), 'onnx'(ONNX Runtime CPU), 'stub'(GPU 없이 테스트용)
+    ENGINE_BACKEND           = os.environ.get('NANOTRACK_BACKEND', 'trt')
+
+    # backend별 기본 (exam backbone, temp backbone, head) 경로
+    ENGINE_PATHS             = {
+        'trt':  ("engine/nanotrack_backbone_exam.engine",
+                 "engine/nanotrack_backbone_temp.engine",
+                 "engine/nanotrack_head.engine"),
+        'onnx': ("onnx/nanotrack_backbone_exampler.onnx",
+                 "onnx/nanotrack_backbone_template.onnx",
+                 "onnx/nanotrack_head.onnx"),
+        'stub': ("", "", ""),
+    }
+
+    # fused 모드 Model (tools.fuse_head) : exam backbone + head를 합친 engine 하나로 track하고 zf는 바뀔 때만 올려둠
+    MODEL_FUSED              = False
+    FUSED_ENGINE_PATHS       = {
+        'trt':  "engine/nanotrack_exam_head.engine",
+        'onnx': "onnx/nanotrack_exam_head.onnx",
+        'stub': "",
+    }
+
+    # TensorRT 8.5+면 named tensor API 엔진(engine.named) 사용, 출력을 항상 복사할지 (False면 다음 호출 전까지 유효한 view)
+    # Model, Tracker는 다음 호출 전에 출력을 쓰거나 복사하므로 False로 둬도 됨. 엔진을 직접 호출하고 출력을 보관하는 코드면 True
+    TRT_NAMED_TENSORS        = True
+    TRT_COPY_OUTPUTS         = False
+
+    # engine registry (engine.registry) : 같은 engine 파일은 process에서 한번만 로딩하고 Model마다 context, buffer만 새로 만들지,
+    # trt engine 파일을 mmap으로 읽을지, 파일을 병렬로 읽을 thread 수, 처음 로딩한 engine으로 미리 돌려볼 횟수(0이면 안 함)
+    ENGINE_SHARED            = True
+    ENGINE_REGISTRY_MMAP     = True
+    ENGINE_LOAD_WORKERS      = 3
+    ENGINE_WARMUP_ITERS      = 2
+
+    # engine 빌드 (tools.build_engines) : precision('fp32', 'fp16', 'int8'), (min, opt, max) batch profile,
+    # builder('trtexec', 'stub'), 동시에 빌드할 수, trtexec 경로
+    ENGINE_PRECISION         = 'fp32'
+    ENGINE_BATCH_PROFILE     = (1, 1, 1)
+    ENGINE_BUILDER           = 'trtexec'
+    ENGINE_BUILD_WORKERS     = 3
+    TRTEXEC_PATH             = "/usr/src/tensorrt/bin/trtexec"
+
+    # ONNX Runtime intra-op thread 수 (0이면 ORT 기본값)
+    ORT_NUM_THREADS          = 0
+
+    # INT8 양자화 (tools.quantize) : calibration crop을 저장할 frame 간격, 최대 crop 수, 범위 계산 방법('minmax', 'entropy', 'percentile'),
+    # held-out 평가에서 FP32 대비 허용할 accuracy(평균 IoU) 하락, robustness(100 frame당 failure) 증가. 넘으면 모델을 내보내지 않음
+    # QUANT_MAX_SLOWDOWN : FP32 대비 허용할 실행 시간 증가 비율 (모델별 실행 시간, held-out 평균 latency 모두). 넘으면 내보내지 않음
+    QUANT_FRAME_STRIDE       = 5
+    QUANT_MAX_SAMPLES        = 200
+    QUANT_CALIBRATE_METHOD   = 'minmax'
+    QUANT_MAX_ACCURACY_DROP  = 0.02
+    QUANT_MAX_ROBUSTNESS_RISE = 0.5
+    QUANT_MAX_SLOWDOWN       = 0.0
+
+    # batch 차원이 고정되지 않은 엔진(dynamic onnx, stub)에서 한번에 넣을 최대 batch
+    ENGINE_MAX_BATCH_SIZE    = 64
+
+    # pipeline 모드 Model의 입력 buffer 벌 수 (2면 double buffering)
+    MODEL_PIPELINE_DEPTH     = 2
+
+    # frame skipping (AdaptiveTracker) : 마지막 best_score 하한, frame당 예측 이동량 상한(target 크기 대비),
+    # 연속으로 건너뛸 수 있는 frame 수, init 후 반드시 추론할 frame 수
+    SKIP_MIN_SCORE           = 0.9
+    SKIP_MAX_MOTION          = 0.05
+    SKIP_MAX_CONSECUTIVE     = 2
+    SKIP_WARMUP              = 5
+
+    # target ID별 template bank에 보관할 최대 target 수
+    TEMPLATE_BANK_SIZE       = 256
+
+    # dynamic batching scheduler : 최대 batch 크기, 요청이 들어온 뒤 batch를 기다릴 수 있는 최대 시간(ms)
+    SCHEDULER_MAX_BATCH_SIZE = 8
+    SCHEDULER_DEADLINE_MS    = 2.0
+
+    # tracking service : session당 밀려있을 수 있는 최대 요청 수, 초과 시 동작('drop'이면 거절, 'block'이면 읽기를 멈춤)
+    SERVICE_QUEUE_SIZE       = 4
+    SERVICE_BACKPRESSURE     = 'drop'
+    # frame decode, crop, 후처리를 수행할 thread 수 (engine 호출은 Model worker thread 하나에서 수행)
+    SERVICE_WORKERS          = 4
+    # 한 message의 최대 크기 (byte)
+    SERVICE_MAX_MESSAGE      = 64 * 1024 * 1024
+
+    # multi camera (service.camera_pool) : camera별 shared memory ring slot 수, tracker worker 수(0이면 camera 수, cpu 수 중 작은 값),
+    # camera 배정 정책('least_loaded', 'round_robin'), 새 frame이 이 시간(초) 동안 없으면 stalled
+    MULTICAM_RING_SLOTS      = 4
+    MULTICAM_WORKERS         = 0
+    MULTICAM_POLICY          = 'least_loaded'
+    MULTICAM_STALL_SEC       = 2.0
+
+config = Config
+
+
+class TrackConfig(object):
+    """ Tracker 인스턴스마다 따로 가지는 추적 parameter\n
+    config(전역)는 모든 Tracker가 공유하므로, tracker마다(혹은 sweep에서 조합마다) 다른 값을 쓸 땐 이걸 넘김 """
+
+    # 이름 -> 기본값을 가져올 Config 속성
+    FIELDS = {
+        'penalty_k':        'TRACK_PENALTY_K',
+        'window_influence': 'TRACK_WINDOW_INFLUENCE',
+        'lr':               'TRACK_LR',
+        'context_amount':   'TRACK_CONTEXT_AMOUNT',
+    }
+
+    def __init__(self, **kwargs):
+        """
+        args:
+            penalty_k(float): scale/ratio 변화 penalty (config.TRACK_PENALTY_K)
+            window_influence(float): cosine window 가중치 (config.TRACK_WINDOW_INFLUENCE)
+            lr(float): bbox 크기 갱신 비율 (config.TRACK_LR)
+            context_amount(float): crop할 때 target 주변을 포함하는 비율 (config.TRACK_CONTEXT_AMOUNT)
+            없거나 None인 값은 생성 시점의 config 값
+        """
+        unknown = set(kwargs) - set(self.FIELDS)
+        if unknown:
+            raise KeyError("unknown track parameter : {} (가능 : {})".format(sorted(unknown), tuple(self.FIELDS)))
+
+        for name, attr in self.FIELDS.items():
+            value = kwargs.get(name)
+            setattr(self, name, float(getattr(config, attr) if value is None else value))
+
+    def to_dict(self):
+        return { name: getattr(self, name) for name in self.FIELDS }
+
+    def replace(self, **kwargs):
+        """ 일부 값만 바꾼 새 TrackConfig """
+        return TrackConfig(**dict(self.to_dict(), **kwargs))
+
+    def __eq__(self, other):
+        return isinstance(other, TrackConfig) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "TrackConfig({})".format(", ".join("{}={:g}".format(k, v) for k, v in self.to_dict().items()))
@@ -1,5 +1,4 @@
 import numpy as np
-import torch
 
 class BackBoneProcessor(object):
     """ Tracker, BackBone 네트워크의 input과 output에 대해서 전후처리 해주는 클래스\n
@@ -11,10 +10,25 @@ class BackBoneProcessor(object):
         else:
             self.in_dtype = input_dtype
 
-        
+        # 입력이 uint8인 모델(tools.onnx_uint8)은 BGR crop을 NHWC uint8 그대로 받음 (cast, transpose는 graph 안에서)
+        self.nhwc = np.dtype(self.in_dtype) == np.uint8
+
+    def input_shape(self, size, batch=1):
+        """ crop 입력 shape : float32 모델은 NCHW, uint8 모델은 NHWC """
+        if self.nhwc:
+            return (batch, size, size, 3)
+        return (batch, 3, size, size)
+
+    def to_input(self, crop):
+        """ uint8 NHWC 모델에 float32 NCHW crop(get_subwindow 등)이 들어오면 NHWC uint8로 바꿈 (그 외에는 그대로) """
+        crop = np.asarray(crop)
+        if self.nhwc and crop.dtype != np.uint8:
+            return np.ascontiguousarray(np.moveaxis(crop, 1, -1), np.uint8)
+        return crop
+
     def pre(self, input):
-        # 현재는 일단 nd array를 1d array로 변경만 함
-        return np.ravel(input)
+        # nd array를 1d array로 변경 (uint8 모델이면 layout까지 맞춤)
+        return np.ravel(self.to_input(input))
         # return np.array(input, self.in_dtype)
 
     def post(self, output):
@@ -38,14 +52,134 @@ class HeadProcessor(object):
     def pre(self, input1, input2):
         return [input1, input2]
 
-    def post(self, output1, output2):
-        # 일단 torch.tensor로 변경
-        # output1(zf) -> 1 * 2 * 16 * 16 -> cls
-        # output2(xf) -> 1 * 4 * 16 * 16 -> loc
-        output1 = torch.from_numpy(output1)
-        output2 = torch.from_numpy(output2)
+    def post(self, output1, output2, batch=1):
+        # 1d array -> ndarray view (복사 없음)
+        # output1(zf) -> batch * 2 * 16 * 16 -> cls
+        # output2(xf) -> batch * 4 * 16 * 16 -> loc
+        output1 = np.reshape(output1, [batch,2,16,16])
+        output2 = np.reshape(output2, [batch,4,16,16])
+
+        return output1, output2
+
+
+class TrackProcessor(object):
+    """ Tracker, Head 출력(cls, loc)을 bbox로 바꿔주는 후처리 클래스\n
+    score/bbox decoding, scale/ratio penalty, window blending을 batch 단위 float32 numpy로 처리함\n
+    points, window, softmax layout은 생성 시 한번만 계산해 둠 """
+
+    def __init__(self, score_size, stride, cls_out_channels=2):
+        self.score_size = score_size
+        self.cls_out_channels = cls_out_channels
+
+        # anchor point (2 * size^2) : score map의 각 위치가 search 영역 중심에서 떨어진 거리
+        ori = - (score_size // 2) * stride
+        x, y = np.meshgrid(ori + stride * np.arange(score_size),
+                           ori + stride * np.arange(score_size))
+        self.points = np.stack([x.ravel(), y.ravel()]).astype(np.float32)
+
+        # cosine window (size^2)
+        hanning = np.hanning(score_size)
+        self.window = np.outer(hanning, hanning).ravel().astype(np.float32)
+
+    def convert_score(self, cls):
+        """ cls map -> foreground score
+        args:
+            cls(np.ndarray): batch * cls_out_channels * size * size
+        return:
+            score(np.ndarray): batch * size^2
+        """
+        cls = np.reshape(cls, (len(cls), self.cls_out_channels, -1)).astype(np.float32, copy=False)
+        if self.cls_out_channels == 1:
+            return 1 / (1 + np.exp(-cls[:, 0]))
+
+        # 2 channel softmax의 foreground 확률 = sigmoid(c1 - c0)
+        return 1 / (1 + np.exp(cls[:, 0] - cls[:, 1]))
+
+    def convert_bbox(self, loc):
+        """ loc map(각 point에서 left, top, right, bottom까지 거리) -> bbox
+        args:
+            loc(np.ndarray): batch * 4 * size * size
+        return:
+            bbox(np.ndarray): batch * 4(cx, cy, w, h) * size^2
+        """
+        loc = np.reshape(loc, (len(loc), 4, -1)).astype(np.float32, copy=False)
+        px, py = self.points
+
+        x1 = px - loc[:, 0]
+        y1 = py - loc[:, 1]
+        x2 = px + loc[:, 2]
+        y2 = py + loc[:, 3]
+
+        # corner -> center
+        bbox = np.empty_like(loc)
+        bbox[:, 0] = (x1 + x2) * 0.5
+        bbox[:, 1] = (y1 + y2) * 0.5
+        bbox[:, 2] = x2 - x1
+        bbox[:, 3] = y2 - y1
+        return bbox
+
+    def select(self, score, bbox, center_pos, size, scale_z, boundary,
+               penalty_k, window_influence, lr):
+        """ penalty를 적용해 target마다 최적 위치를 고르고, 다음 state를 계산
+        args:
+            score(np.ndarray): batch * size^2
+            bbox(np.ndarray): batch * 4 * size^2
+            center_pos, size(np.ndarray): batch * 2, 현재 state
+            scale_z(np.ndarray): batch, 원본 -> exemplar 비율
+            boundary(tuple): img.shape[:2]
+            penalty_k, window_influence, lr(float): tracking hyper parameter
+        return:
+            center_pos(batch * 2), size(batch * 2), bbox(batch * 4, [x, y, w, h]), best_score(batch)
+        """
+        def change(r):
+            return np.maximum(r, 1. / r)
+
+        def sz(w, h):
+            pad = (w + h) * 0.5
+            return np.sqrt((w + pad) * (h + pad))
+
+        # state(center_pos, size)는 float64로 유지하고, size^2개 위치에 대한 계산만 float32로 함
+        batch = len(score)
+        scale_z = np.asarray(scale_z, np.float64).reshape(batch, 1)
+        size = np.asarray(size, np.float64).reshape(batch, 2)
+        center_pos = np.asarray(center_pos, np.float64).reshape(batch, 2)
+        target = (size * scale_z).astype(np.float32)
+        ratio = (size[:, 0:1] / size[:, 1:2]).astype(np.float32)
+
+        # scale penalty
+        s_c = change(sz(bbox[:, 2], bbox[:, 3]) / sz(target[:, 0:1], target[:, 1:2]))
+
+        # aspect ratio penalty
+        r_c = change(ratio / (bbox[:, 2] / bbox[:, 3]))
+
+        penalty = np.exp(-(r_c * s_c - 1) * np.float32(penalty_k))
+
+        # score, window penalty
+        pscore = penalty * score * np.float32(1 - window_influence) + \
+            self.window * np.float32(window_influence)
+
+        best_idx = np.argmax(pscore, axis=1)
+        rows = np.arange(batch)
+
+        best_bbox = bbox[rows, :, best_idx] / scale_z
+        best_score = score[rows, best_idx]
+        rate = penalty[rows, best_idx] * best_score * lr
+
+        cx = best_bbox[:, 0] + center_pos[:, 0]
+        cy = best_bbox[:, 1] + center_pos[:, 1]
+
+        # smooth bbox
+        width  = size[:, 0] * (1 - rate) + best_bbox[:, 2] * rate
+        height = size[:, 1] * (1 - rate) + best_bbox[:, 3] * rate
+
+        # clip boundary
+        cx     = np.maximum(0, np.minimum(cx, boundary[1]))
+        cy     = np.maximum(0, np.minimum(cy, boundary[0]))
+        width  = np.maximum(10, np.minimum(width, boundary[1]))
+        height = np.maximum(10, np.minimum(height, boundary[0]))
 
-        output1 = torch.reshape(output1, [1,2,16,16])
-        output2 = torch.reshape(output2, [1,4,16,16])
+        center_pos = np.stack([cx, cy], axis=1)
+        size = np.stack([width, height], axis=1)
+        bbox = np.stack([cx - width / 2, cy - height / 2, width, height], axis=1)
 
-        return output1, output2
\ No newline at end of file
+        return center_pos, size, bbox, best_score
@@ -0,0 +1,79 @@
+import numpy as np
+
+class BaseEngine(object):
+    """ 추론 엔진에 대한 Interface 클래스\n
+    TRT, ONNX Runtime, Stub 등 모든 backend가 이 형태를 따름\n
+    입력은 1d array(혹은 head의 경우 2개짜리 list), 출력은 항상 1d array의 list\n
+    batch로 넣을 땐 batch 순서대로 이어붙인 1d array를 넣고, 출력도 같은 순서로 이어붙여져 나옴 """
+
+    # 한번의 호출로 처리할 수 있는 최대 batch 크기
+    max_batch_size = 1
+
+    def __call__(self, data):
+        """
+        args:
+            data(np.ndarray or list): 1d array, head일 땐 [zf, xf]
+        return:
+            outputs(list): 1d array의 list
+        """
+        raise NotImplementedError
+
+    def get_input_buffer(self, shape, index=0):
+        """ 입력 데이터를 직접 써넣을 수 있는 buffer를 반환\n
+        여기에 써넣은 array를 그대로 호출에 넘기면 추가 복사가 일어나지 않음\n
+        buffer는 엔진마다 하나씩 재사용되므로, 다음 호출 전까지만 유효함
+        args:
+            shape(tuple): buffer shape (e.g. (1, 3, 255, 255))
+            index(int): 몇번째 입력인지
+        return:
+            buffer(np.ndarray): float32 buffer
+        """
+        if not hasattr(self, '_input_buffers'):
+            self._input_buffers = {}
+
+        key = (index, tuple(shape))
+        if key not in self._input_buffers:
+            self._input_buffers[key] = np.empty(shape, self.get_input_dtype()[index])
+        return self._input_buffers[key]
+
+    def allocate_host_buffer(self, shape, index=0):
+        """ engine과 별개로 쓸 수 있는 입력용 host buffer를 새로 할당\n
+        pipeline에서 buffer를 여러 벌 두고 번갈아 쓸 때 사용 (TRT는 page-locked라 H2D 시 복사가 생략됨)
+        args:
+            shape(tuple): buffer shape
+            index(int): 몇번째 입력인지
+        return:
+            buffer(np.ndarray)
+        """
+        return np.empty(shape, self.get_input_dtype()[index])
+
+    def set_resident(self, index, data):
+        """ 호출마다 바뀌지 않는 입력(fused 모델의 zf)을 engine에 올려둠\n
+        이후 호출에서 그 입력 자리에 None을 넘기면 올려둔 값을 씀 (TRT는 device buffer에 둔 채로 H2D를 생략)
+        args:
+            index(int): 몇번째 입력인지
+            data(np.ndarray): 입력 (CPU backend는 복사해서 보관)
+        """
+        if not hasattr(self, '_resident'):
+            self._resident = {}
+        self._resident[index] = np.array(data)
+
+    def _with_resident(self, data):
+        """ None인 입력을 set_resident로 올려둔 값으로 채움 (CPU backend용) """
+        resident = getattr(self, '_resident', {})
+        for index, d in enumerate(data):
+            if d is None and index not in resident:
+                raise ValueError("input {} is not resident".format(index))
+        return [ resident[index] if d is None else d for index, d in enumerate(data) ]
+
+    def attach_thread(self):
+        """ 현재 thread에서 engine을 호출할 수 있도록 준비 (worker thread 시작 시 호출됨)\n
+        CPU backend는 할 일이 없음 """
+        pass
+
+    def get_input_dtype(self):
+        """
+        return:
+            dtypes(list): input에 대한 dtype
+        """
+        raise NotImplementedError
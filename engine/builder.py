@@ -0,0 +1,407 @@
+import os
+import json
+import time
+import hashlib
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from core.config import config
+
+# ONNX -> engine 빌드 관리
+# engine 파일 옆에 metadata(<engine>.json)를 같이 저장하고, 아래 key가 바뀐 engine만 다시 빌드함
+#   key : ONNX 파일 내용 hash(sha256) + precision + batch profile(min, opt, max) + builder fingerprint(이름, 버전, GPU)
+#         + (int8) calibration cache 내용 hash
+# int8은 ONNX에 QuantizeLinear/DequantizeLinear가 있거나(tools.quantize --quant-format qdq) calibration cache를 줘야만 빌드함
+# builder는 교체 가능 (BUILDERS), TensorRT가 없는 환경에서는 'stub' builder로 cache/무효화 로직만 확인할 수 있음
+# 사용법 :
+#   manager = EngineBuildManager(TrtexecBuilder(), workers=3)
+#   manager.build_all(default_specs(precision='fp16'))
+
+PRECISIONS = ('fp32', 'fp16', 'int8')
+
+# metadata 형식 버전 (형식이 바뀌면 기존 engine은 모두 stale)
+METADATA_VERSION = 2
+
+# 이 node가 있으면 scale이 ONNX에 들어있는 explicit quantization 모델
+QDQ_OPS = ('QuantizeLinear', 'DequantizeLinear')
+
+# 상태
+FRESH   = 'fresh'
+MISSING = 'missing'
+STALE   = 'stale'
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """ 파일 내용의 sha256 """
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def has_qdq(onnx_path):
+    """ ONNX에 QuantizeLinear/DequantizeLinear node가 있는지 (subgraph는 보지 않음) """
+    import onnx
+    model = onnx.load(onnx_path, load_external_data=False)
+    return any(node.op_type in QDQ_OPS for node in model.graph.node)
+
+
+def metadata_path(engine_path):
+    """ engine 옆에 저장하는 metadata 경로 """
+    return engine_path + '.json'
+
+
+def read_metadata(engine_path):
+    """ engine의 metadata, 없거나 깨졌으면 None """
+    try:
+        with open(metadata_path(engine_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class BuildSpec(object):
+    """ engine 하나의 빌드 조건 """
+
+    def __init__(self, onnx_path, engine_path, precision=None, batch_profile=None, calib=None):
+        """
+        args:
+            onnx_path(str): 입력 ONNX 경로
+            engine_path(str): 저장할 engine 경로
+            precision(str): 'fp32', 'fp16', 'int8'. None이면 config.ENGINE_PRECISION
+            batch_profile(tuple): (min, opt, max) batch. None이면 config.ENGINE_BATCH_PROFILE
+            calib(str): int8 calibration cache 경로 (trtexec --calib). QDQ ONNX면 없어도 됨
+        """
+        precision = precision or config.ENGINE_PRECISION
+        batch_profile = tuple(batch_profile or config.ENGINE_BATCH_PROFILE)
+
+        if precision not in PRECISIONS:
+            raise ValueError("지원하지 않는 precision입니다 : {} (가능 : {})".format(precision, PRECISIONS))
+        if len(batch_profile) != 3 or not 1 <= batch_profile[0] <= batch_profile[1] <= batch_profile[2]:
+            raise ValueError("batch profile은 1 <= min <= opt <= max 이어야 합니다 : {}".format(batch_profile))
+
+        self.onnx_path = onnx_path
+        self.engine_path = engine_path
+        self.precision = precision
+        self.batch_profile = batch_profile
+        self.calib = calib
+
+    def check_int8(self):
+        """ int8인데 scale을 알 수 없으면(QDQ node도, calibration cache도 없으면) ValueError\n
+        trtexec는 calibration 없이 --int8을 주면 임의의 scale로 빌드하므로 정확도를 보장할 수 없음 """
+        if self.precision != 'int8':
+            return
+        if self.calib:
+            if not os.path.exists(self.calib):
+                raise FileNotFoundError('Calibration cache {} is not found'.format(self.calib))
+        elif not has_qdq(self.onnx_path):
+            raise ValueError("int8 빌드에는 QDQ ONNX(tools.quantize)나 calibration cache(--calib)가 필요합니다 : {}"
+                             .format(self.onnx_path))
+
+    def __repr__(self):
+        return "BuildSpec({} -> {}, {}, batch={})".format(self.onnx_path, self.engine_path,
+                                                          self.precision, self.batch_profile)
+
+
+def default_specs(precision=None, batch_profile=None, calibs=(None, None, None)):
+    """ config.ENGINE_PATHS의 onnx -> trt 경로 쌍으로 (exam, temp, head) BuildSpec을 만듦 """
+    return [BuildSpec(onnx_path, engine_path, precision, batch_profile, calib)
+            for onnx_path, engine_path, calib in zip(config.ENGINE_PATHS['onnx'], config.ENGINE_PATHS['trt'], calibs)]
+
+
+class BaseBuilder(object):
+    """ ONNX -> engine 변환기 Interface 클래스 """
+
+    name = 'base'
+
+    def fingerprint(self):
+        """ 빌드 결과에 영향을 주는 builder 정보 (이름, 버전 등). 바뀌면 기존 engine은 stale
+        return:
+            fingerprint(str)
+        """
+        raise NotImplementedError
+
+    def build(self, spec, output_path):
+        """ spec대로 빌드해서 output_path에 engine을 씀 (실패하면 예외)
+        args:
+            spec(BuildSpec)
+            output_path(str): 임시 경로, 성공하면 manager가 spec.engine_path로 옮김
+        """
+        raise NotImplementedError
+
+
+class TrtexecBuilder(BaseBuilder):
+    """ trtexec로 빌드 (create_trt_engine.sh와 같은 방식) """
+
+    name = 'trtexec'
+
+    def __init__(self, trtexec_path=None, verbose=False, extra_args=()):
+        """
+        args:
+            trtexec_path(str): trtexec 경로. None이면 config.TRTEXEC_PATH
+            verbose(bool): --verbose
+            extra_args(list): trtexec에 그대로 넘길 인자 (e.g. ['--workspace=1024'])
+        """
+        self.trtexec_path = trtexec_path or config.TRTEXEC_PATH
+        self.verbose = verbose
+        self.extra_args = list(extra_args)
+        self._fingerprint = None
+
+    def fingerprint(self):
+        # TensorRT engine은 TensorRT 버전, GPU가 바뀌면 재사용할 수 없음
+        if self._fingerprint is None:
+            try:
+                import tensorrt as trt
+                version = trt.__version__
+            except ImportError:
+                version = 'unknown'
+            self._fingerprint = "{}-{}-{}".format(self.name, version, _gpu_name())
+        return self._fingerprint
+
+    def build(self, spec, output_path):
+        if not os.path.exists(self.trtexec_path):
+            raise FileNotFoundError('trtexec {} is not found'.format(self.trtexec_path))
+
+        spec.check_int8()
+
+        cmd = [self.trtexec_path, "--onnx=" + spec.onnx_path, "--saveEngine=" + output_path]
+        if spec.precision == 'fp16':
+            cmd.append("--fp16")
+        elif spec.precision == 'int8':
+            # QDQ ONNX면 scale은 ONNX에, 아니면 calibration cache에서 읽음 (양자화하지 않은 layer는 fp16)
+            cmd += ["--int8", "--fp16"]
+            if spec.calib:
+                cmd.append("--calib=" + spec.calib)
+        cmd += _shape_args(spec)
+        if self.verbose:
+            cmd.append("--verbose")
+        cmd += self.extra_args
+
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        if result.returncode != 0:
+            tail = result.stdout.decode('utf-8', 'replace')[-2000:]
+            raise RuntimeError("trtexec failed ({}) : {}\n{}".format(result.returncode, spec, tail))
+
+
+class StubBuilder(BaseBuilder):
+    """ TensorRT 없이 cache/무효화 로직을 확인하기 위한 가짜 builder\n
+    engine 대신 빌드 조건을 적은 작은 파일을 씀 """
+
+    name = 'stub'
+
+    def __init__(self, version='1', delay=0.0):
+        """
+        args:
+            version(str): builder 버전 (바꾸면 모든 engine이 stale)
+            delay(float): 빌드 한번에 걸리는 시간(초), 병렬 빌드 확인용
+        """
+        self.version = version
+        self.delay = delay
+        self.num_builds = 0
+
+    def fingerprint(self):
+        return "{}-{}".format(self.name, self.version)
+
+    def build(self, spec, output_path):
+        spec.check_int8()
+        if self.delay:
+            time.sleep(self.delay)
+        with open(output_path, 'w') as f:
+            json.dump({'onnx': spec.onnx_path, 'precision': spec.precision,
+                       'batch_profile': spec.batch_profile, 'calib': spec.calib}, f)
+        self.num_builds += 1
+
+
+# 이름 -> builder 클래스
+BUILDERS = {
+    'trtexec': TrtexecBuilder,
+    'stub': StubBuilder,
+}
+
+
+def create_builder(name, **kwargs):
+    """ 이름에 맞는 builder를 생성 """
+    if name not in BUILDERS:
+        raise ValueError("지원하지 않는 builder입니다 : {} (가능 : {})".format(name, tuple(BUILDERS)))
+    return BUILDERS[name](**kwargs)
+
+
+class EngineBuildManager(object):
+    """ engine 빌드 cache 관리\n
+    metadata의 key가 지금 조건과 같으면 그대로 두고, 다르거나 없으면 빌드함 """
+
+    def __init__(self, builder=None, workers=None):
+        """
+        args:
+            builder(BaseBuilder): None이면 config.ENGINE_BUILDER
+            workers(int): 동시에 빌드할 수. None이면 config.ENGINE_BUILD_WORKERS
+        """
+        self.builder = builder or create_builder(config.ENGINE_BUILDER)
+        self.workers = workers or config.ENGINE_BUILD_WORKERS
+
+    def make_key(self, spec, onnx_sha256=None):
+        """ 빌드 결과를 결정하는 값들의 hash
+        return:
+            key(str), fields(dict): key를 만든 값들
+        """
+        fields = {
+            'metadata_version': METADATA_VERSION,
+            'onnx_sha256': onnx_sha256 or file_sha256(spec.onnx_path),
+            'precision': spec.precision,
+            'batch_profile': list(spec.batch_profile),
+            'builder': self.builder.fingerprint(),
+            # cache가 바뀌면 scale이 바뀌므로 다시 빌드 (int8이 아니면 cache는 쓰지 않음)
+            'calib_sha256': file_sha256(spec.calib) if spec.precision == 'int8' and spec.calib and os.path.exists(spec.calib)
+                            else None,
+        }
+        key = hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()
+        return key, fields
+
+    def status(self, spec):
+        """ engine이 지금 조건으로 빌드된 것인지 확인
+        return:
+            state(str): 'fresh', 'missing', 'stale'
+            reason(str): stale인 이유 (fresh면 None)
+        """
+        if not os.path.exists(spec.onnx_path):
+            raise FileNotFoundError('ONNX file {} is not found'.format(spec.onnx_path))
+
+        if not os.path.exists(spec.engine_path):
+            return MISSING, "no engine"
+
+        meta = read_metadata(spec.engine_path)
+        if meta is None:
+            return STALE, "no metadata"
+
+        key, fields = self.make_key(spec)
+        if meta.get('key') == key:
+            return FRESH, None
+
+        # 무엇이 바뀌었는지
+        changed = [name for name, value in fields.items() if meta.get(name) != value]
+        return STALE, "changed : " + ", ".join(changed or ['key'])
+
+    def build(self, spec, force=False):
+        """ spec 하나를 필요하면 빌드
+        return:
+            result(dict): {'spec', 'state': 빌드 전 상태, 'built': 빌드했는지, 'reason', 'seconds'}
+        """
+        state, reason = self.status(spec)
+        if state == FRESH and not force:
+            return {'spec': spec, 'state': state, 'built': False, 'reason': None, 'seconds': 0.0}
+
+        key, fields = self.make_key(spec)
+
+        engine_dir = os.path.dirname(spec.engine_path)
+        if engine_dir:
+            os.makedirs(engine_dir, exist_ok=True)
+
+        # 빌드 도중 죽어도 기존 engine이 깨지지 않도록 임시 파일에 빌드 후 교체
+        tmp_path = "{}.tmp{}".format(spec.engine_path, os.getpid())
+        start = time.perf_counter()
+        try:
+            self.builder.build(spec, tmp_path)
+            os.replace(tmp_path, spec.engine_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        seconds = time.perf_counter() - start
+
+        meta = dict(fields, key=key,
+                    onnx_path=spec.onnx_path,
+                    engine_sha256=file_sha256(spec.engine_path),
+                    build_seconds=round(seconds, 3),
+                    built_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        _write_json(metadata_path(spec.engine_path), meta)
+
+        return {'spec': spec, 'state': state, 'built': True, 'reason': reason or 'forced', 'seconds': seconds}
+
+    def build_all(self, specs, force=False):
+        """ 여러 engine을 병렬로 빌드 (fresh한 것은 건너뜀)
+        args:
+            specs(list): BuildSpec 목록
+            force(bool): fresh해도 다시 빌드
+        return:
+            results(list): spec 순서대로 build()의 결과, 실패한 것은 'error'에 예외
+        """
+        engine_paths = [spec.engine_path for spec in specs]
+        if len(set(engine_paths)) != len(engine_paths):
+            raise ValueError("같은 engine 경로가 여러번 있습니다 : {}".format(engine_paths))
+
+        def run(spec):
+            try:
+                return self.build(spec, force)
+            except Exception as e:
+                return {'spec': spec, 'state': None, 'built': False, 'reason': None, 'seconds': 0.0, 'error': e}
+
+        with ThreadPoolExecutor(max(1, min(self.workers, len(specs)))) as executor:
+            return list(executor.map(run, specs))
+
+
+def check_engine(engine_path):
+    """ engine이 metadata에 기록된 ONNX와 지금의 ONNX 파일에서 빌드된 것인지 확인\n
+    metadata가 없으면 (예전 방식으로 만든 engine) 확인하지 않음
+    return:
+        reason(str): 맞지 않는 이유, 맞거나 확인할 수 없으면 None
+    """
+    meta = read_metadata(engine_path)
+    if meta is None:
+        return None
+
+    onnx_path = meta.get('onnx_path')
+    if onnx_path and os.path.exists(onnx_path) and file_sha256(onnx_path) != meta.get('onnx_sha256'):
+        return "{} has changed since the engine was built".format(onnx_path)
+    if os.path.exists(engine_path) and file_sha256(engine_path) != meta.get('engine_sha256'):
+        return "engine file does not match its metadata"
+    return None
+
+
+def _write_json(path, data):
+    tmp_path = "{}.tmp{}".format(path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _shape_args(spec):
+    """ batch profile이 1이 아니면 trtexec의 --minShapes/--optShapes/--maxShapes 인자를 만듦\n
+    ONNX 입력 이름, shape이 필요해서 onnx가 있어야 함 (batch 차원이 dynamic인 ONNX만 가능, tools.build_engines는 고정된 ONNX를
+    engine.surgery.to_dynamic_batch로 바꿔서 넘김) """
+    if spec.batch_profile == (1, 1, 1):
+        return []
+
+    import onnx
+    model = onnx.load(spec.onnx_path, load_external_data=False)
+    initializers = { init.name for init in model.graph.initializer }
+
+    args = []
+    for flag, batch in zip(('--minShapes=', '--optShapes=', '--maxShapes='), spec.batch_profile):
+        shapes = []
+        for inp in model.graph.input:
+            if inp.name in initializers:
+                continue
+            dims = [d.dim_value for d in inp.type.tensor_type.shape.dim][1:]
+            shapes.append("{}:{}".format(inp.name, "x".join(str(d) for d in [batch] + dims)))
+        args.append(flag + ",".join(shapes))
+    return args
+
+
+def _gpu_name():
+    """ 빌드하는 GPU 이름 (알 수 없으면 'unknown') """
+    if shutil.which('nvidia-smi'):
+        try:
+            out = subprocess.run(['nvidia-smi', '--query-gpu=name', '--format=csv,noheader'],
+                                 stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=10)
+            name = out.stdout.decode('utf-8', 'replace').strip().splitlines()
+            if name:
+                return name[0].strip()
+        except (OSError, subprocess.SubprocessError):
+            pass
+    # Jetson은 nvidia-smi가 없으므로 board 이름 사용
+    try:
+        with open('/proc/device-tree/model') as f:
+            return f.read().strip('\x00\n ')
+    except OSError:
+        return 'unknown'
@@ -1,29 +1,59 @@
 import os
+import threading
+import numpy as np
 import tensorrt as trt
 import pycuda.driver as cuda
 import pycuda.autoinit # 없으면, "invalid device context - no currently active context?" 에러 뜸
 
+from engine.base import BaseEngine
 from utils.timer import timer
+from utils.profiler import profiler
 
 TRT_LOGGER = trt.Logger()
 
-class TRTEngine(object):
+# thread별 CUDA context push 여부
+_thread_state = threading.local()
+
+class CUDAEngine(BaseEngine):
+    """ pycuda로 TensorRT 엔진을 돌리는 엔진(TRTEngine, TRTNamedEngine)의 공통 부분\n
+    CUDA context, event는 엔진 API(binding, named tensor)와 상관없이 같으므로 여기서 관리함 """
+
+    def attach_thread(self):
+        """ pycuda.autoinit의 context는 만든 thread에서만 current이므로,
+        다른 thread에서 호출하려면 그 thread에 context를 push해야 함 (thread당 한번) """
+        if not getattr(_thread_state, 'attached', False):
+            pycuda.autoinit.context.push()
+            _thread_state.attached = True
+
+
+    def _events(self):
+        """ 단계별 시간 측정용 CUDA event (처음 필요할 때 한번만 생성) """
+        if not hasattr(self, '_cuda_events'):
+            self._cuda_events = [ cuda.Event() for _ in range(4) ]
+        return self._cuda_events
+
+
+class TRTEngine(CUDAEngine):
     """ TensorRT 엔진 랩퍼 클래스\n
     마치 torch의 nn.Module처럼 callable한 클래스\n
     단, forward는 지원하지만 backward는 안됨\n
     그리고 general하게 만들어두진 않았음!"""
     
-    def __init__(self, engine_file_path=""):
-        """ TRT Engine을 가져와서, 직렬화하여 로딩 """
-
-        if (os.path.exists(engine_file_path)):
-            print("Loading engine from path {}".format(engine_file_path))
-            with open(engine_file_path, "rb") as f, trt.Runtime(TRT_LOGGER) as runtime:
-                self.engine = runtime.deserialize_cuda_engine(f.read())
-                self.context = self.engine.create_execution_context()
-                self._allocate() # 데이터 할당
-        else:
-            raise FileNotFoundError('Engine file {} is not found'.format(engine_file_path))
+    def __init__(self, engine_file_path="", engine=None):
+        """ TRT Engine을 가져와서, 직렬화하여 로딩
+        args:
+            engine_file_path(str): engine 파일 경로
+            engine(trt.ICudaEngine): 이미 deserialize된 engine (engine.registry). 주어지면 파일을 읽지 않고
+                                     이 engine에 execution context, stream, buffer만 새로 만듦
+        """
+        if engine is None:
+            engine = deserialize_engine(engine_file_path)
+
+        # profiler span 이름에 사용
+        self.name = os.path.splitext(os.path.basename(engine_file_path))[0]
+        self.engine = engine
+        self.context = self.engine.create_execution_context()
+        self._allocate() # 데이터 할당
 
 
     def __call__(self, data):
@@ -44,21 +74,12 @@ class TRTEngine(object):
             # output[0]    -> 1 * 2 * 16 * 16  = 512
             # output[1]    -> 1 * 4 * 16 * 16  = 1024
 
-            # 처리할 데이터를 입력 host에 저장
-            self.inputs[0].host = data[0]
-            self.inputs[1].host = data[1]
-
-            # input 데이터를 GPU로 보낸다
-            [cuda.memcpy_htod_async(inp.device, inp.host, self.stream) for inp in self.inputs]
-
-            # 추론을 한다
-            self.context.execute_async_v2(bindings=self.bindings, stream_handle=self.stream.handle)
+            # 처리할 데이터를 입력 host(page-locked)에 저장 (None이면 set_resident로 device에 올려둔 입력)
+            self._set_input(0, data[0])
+            self._set_input(1, data[1])
 
-            # 처리된 데이터를 host로 가져온다
-            [cuda.memcpy_dtoh_async(out.host, out.device, self.stream) for out in self.outputs]
-
-            # 동기화한다
-            self.stream.synchronize()
+            # H2D, 추론, D2H, 동기화
+            self._run()
 
             # 결과를 반환한다
             return [out.host for out in self.outputs]
@@ -69,25 +90,107 @@ class TRTEngine(object):
             # exampler image일 때
             # data[0] (x) ->   1 * 3 * 255 * 255 = 195,075
             
-            # 처리할 데이터를 입력 host에 저장
-            self.inputs[0].host = data
-
-            # input 데이터를 GPU로 보낸다
-            [cuda.memcpy_htod_async(inp.device, inp.host, self.stream) for inp in self.inputs]
-
-            # 추론을 한다
-            self.context.execute_async_v2(bindings=self.bindings, stream_handle=self.stream.handle)
+            # 처리할 데이터를 입력 host(page-locked)에 저장
+            self._set_input(0, data)
 
-            # 처리된 데이터를 host로 가져온다
-            [cuda.memcpy_dtoh_async(out.host, out.device, self.stream) for out in self.outputs]
-
-            # 동기화한다
-            self.stream.synchronize()
+            # H2D, 추론, D2H, 동기화
+            self._run()
 
             # 결과를 반환한다
             return [out.host for out in self.outputs]
         
 
+    def _run(self):
+        """ H2D -> 추론 -> D2H를 stream에 넣고 동기화\n
+        profiler가 켜져 있으면 CUDA event로 단계별 GPU 시간을 기록함 """
+        events = self._events() if profiler.enabled else None
+        if events:
+            events[0].record(self.stream)
+
+        # input 데이터를 GPU로 보낸다 (_set_input에서 정한 source에서 바로, device에 올려둔 입력은 건너뜀)
+        [cuda.memcpy_htod_async(inp.device, src, self.stream) for inp, src in zip(self.inputs, self.sources)
+         if src is not None]
+        if events:
+            events[1].record(self.stream)
+
+        # 추론을 한다
+        self.context.execute_async_v2(bindings=self.bindings, stream_handle=self.stream.handle)
+        if events:
+            events[2].record(self.stream)
+
+        # 처리된 데이터를 host로 가져온다
+        [cuda.memcpy_dtoh_async(out.host, out.device, self.stream) for out in self.outputs]
+        if events:
+            events[3].record(self.stream)
+
+        # 동기화한다
+        self.stream.synchronize()
+
+        if events:
+            # time_since는 ms 단위
+            profiler.record(self.name + '.h2d', events[1].time_since(events[0]) / 1000)
+            profiler.record(self.name + '.execute', events[2].time_since(events[1]) / 1000)
+            profiler.record(self.name + '.d2h', events[3].time_since(events[2]) / 1000)
+
+
+    def _set_input(self, index, data):
+        """ H2D에 쓸 입력 source를 정함\n
+        get_input_buffer로 받은 buffer에 직접 써넣은 경우엔 이미 들어있으므로 복사하지 않고,
+        allocate_host_buffer로 받은 page-locked buffer면 거기서 바로 H2D 함\n
+        그 외에는 입력 page-locked host buffer에 복사\n
+        data가 None이면 set_resident로 device에 올려둔 값을 그대로 씀 (H2D 없음) """
+        if data is None:
+            if index not in self.resident:
+                raise ValueError("input {} is not resident".format(index))
+            self.sources[index] = None
+            return
+
+        host = self.inputs[index].host
+        if np.shares_memory(host, data):
+            self.sources[index] = host[:np.size(data)]
+        elif _is_pagelocked(data) and data.dtype == host.dtype and data.size <= host.size \
+                and data.flags.c_contiguous:
+            self.sources[index] = np.ravel(data)
+        else:
+            np.copyto(host[:np.size(data)], np.ravel(data), casting='unsafe')
+            self.sources[index] = host[:np.size(data)]
+
+
+    def set_resident(self, index, data):
+        """ index번째 입력을 device에 올려둠. 이후 호출에서 None을 넘기면 H2D 없이 그대로 씀
+        args:
+            index(int): 몇번째 입력인지
+            data(np.ndarray): 입력 (fused 모델의 zf)
+        """
+        self._set_input(index, data)
+        cuda.memcpy_htod_async(self.inputs[index].device, self.sources[index], self.stream)
+        self.stream.synchronize()
+        self.resident.add(index)
+
+
+    def get_input_buffer(self, shape, index=0):
+        """ 입력 page-locked host buffer를 shape에 맞춰 view로 반환\n
+        여기에 직접 써넣으면 H2D 전 host 복사가 생략됨. 다음 호출 전까지만 유효함
+        args:
+            shape(tuple): buffer shape (e.g. (1, 3, 255, 255))
+            index(int): 몇번째 입력인지
+        return:
+            buffer(np.ndarray): page-locked buffer의 view
+        """
+        return self.inputs[index].host[:trt.volume(shape)].reshape(shape)
+
+
+    def allocate_host_buffer(self, shape, index=0):
+        """ page-locked host buffer를 새로 할당 (여기서 바로 H2D 하므로 입력 buffer로 복사하지 않음)
+        args:
+            shape(tuple): buffer shape
+            index(int): 몇번째 입력인지
+        return:
+            buffer(np.ndarray): page-locked buffer
+        """
+        return cuda.pagelocked_empty(shape, self.inputs[index].dtype)
+
+
     def _allocate(self):
         """ TRT Engine에 필요한 데이터를 할당\n
         데이터를 cpu, gpu에 각각 올리기 위한 함수 """
@@ -96,6 +199,9 @@ class TRTEngine(object):
         self.bindings = []
         self.stream = cuda.Stream()
 
+        # onnx로 만든 explicit batch 엔진은 shape에 batch가 박혀있으므로 1로 취급
+        self.max_batch_size = 1
+
         for binding in self.engine:
             size = trt.volume(self.engine.get_binding_shape(binding)) * self.engine.max_batch_size
             dtype = trt.nptype(self.engine.get_binding_dtype(binding))
@@ -110,6 +216,11 @@ class TRTEngine(object):
             else:
                 self.outputs.append(HostDeviceMem(host_mem, device_mem, dtype))
 
+        # 입력별 H2D source (기본은 입력 host buffer)
+        self.sources = [ inp.host for inp in self.inputs ]
+        # set_resident로 device에 올려둔 입력 번호
+        self.resident = set()
+
 
     def get_input_dtype(self):
         """ input에 대한 dtype을 반환하는 함수\n
@@ -121,6 +232,36 @@ class TRTEngine(object):
         return [ inp.dtype for inp in self.inputs ]
 
 
+def deserialize_engine(engine_file_path, data=None):
+    """ engine 파일을 deserialize (TRTEngine, TRTNamedEngine 공용)
+    args:
+        engine_file_path(str): engine 파일 경로
+        data(bytes or mmap): 이미 읽어둔 파일 내용. None이면 파일을 읽음
+    return:
+        engine(trt.ICudaEngine)
+    """
+    if data is None:
+        if not os.path.exists(engine_file_path):
+            raise FileNotFoundError('Engine file {} is not found'.format(engine_file_path))
+        with open(engine_file_path, "rb") as f:
+            data = f.read()
+
+    print("Loading engine from path {}".format(engine_file_path))
+    with trt.Runtime(TRT_LOGGER) as runtime:
+        engine = runtime.deserialize_cuda_engine(data)
+    if engine is None:
+        raise ValueError("engine deserialize failed : {}".format(engine_file_path))
+    return engine
+
+
+def _is_pagelocked(data):
+    """ data가 pycuda page-locked 메모리(혹은 그 view)인지 확인 """
+    base = data
+    while isinstance(base, np.ndarray) and base.base is not None:
+        base = base.base
+    return isinstance(base, cuda.HostPointer)
+
+
 class HostDeviceMem(object):
     """ 데이터 3개(host mem, device mem, dtype)을 담기위한 보조 클래스 """
     def __init__(self, host_mem, device_mem, dtype):
@@ -0,0 +1,104 @@
+from core.config import config
+
+# 지원하는 backend 목록
+# tensorrt, pycuda, onnxruntime은 무거운 의존성이라, 실제로 쓰는 backend만 import 함
+BACKENDS = ('trt', 'onnx', 'stub')
+
+
+def load_engine(engine_file_path="", backend=None, data=None):
+    """ 같은 파일로 만든 엔진 객체들이 같이 쓰는 무거운 부분을 로딩 (engine.registry에서 파일마다 한번)
+    args:
+        engine_file_path(str): engine(or onnx) 파일 경로
+        backend(str): 'trt', 'onnx', 'stub' 중 하나. None이면 config.ENGINE_BACKEND
+        data(bytes or mmap): trt일 때 이미 읽어둔 파일 내용
+    return:
+        shared: trt면 deserialize된 ICudaEngine, onnx면 InferenceSession, stub이면 출력 패턴 cache(dict)
+    """
+    if backend is None:
+        backend = config.ENGINE_BACKEND
+
+    if backend == 'trt':
+        _check_stale(engine_file_path)
+        from engine.engine import deserialize_engine
+        return deserialize_engine(engine_file_path, data)
+    elif backend == 'onnx':
+        from engine.ort import create_session
+        return create_session(engine_file_path, config.ORT_NUM_THREADS)
+    elif backend == 'stub':
+        return {}
+
+    raise ValueError("지원하지 않는 backend입니다 : {} (가능 : {})".format(backend, BACKENDS))
+
+
+def create_engine(engine_file_path="", backend=None, shared=None):
+    """ backend 이름에 맞는 추론 엔진을 생성하는 함수
+    args:
+        engine_file_path(str): engine(or onnx) 파일 경로
+        backend(str): 'trt', 'onnx', 'stub' 중 하나. None이면 config.ENGINE_BACKEND
+        shared: load_engine으로 로딩해둔 것. 주어지면 파일을 다시 읽지 않고 context, buffer만 새로 만듦
+    return:
+        engine(BaseEngine)
+    """
+    if backend is None:
+        backend = config.ENGINE_BACKEND
+
+    if backend == 'trt':
+        if shared is None:
+            _check_stale(engine_file_path)
+
+        # TensorRT 8.5+ : 이름, shape, dtype으로 입출력을 다루고 dynamic batch profile을 지원하는 엔진
+        if config.TRT_NAMED_TENSORS:
+            from engine import named
+            if named.is_supported():
+                return named.TRTNamedEngine(engine_file_path, config.TRT_COPY_OUTPUTS, engine=shared)
+
+        from engine.engine import TRTEngine
+        return TRTEngine(engine_file_path, engine=shared)
+    elif backend == 'onnx':
+        from engine.ort import ORTEngine
+        return ORTEngine(engine_file_path, config.ORT_NUM_THREADS, config.ENGINE_MAX_BATCH_SIZE, session=shared)
+    elif backend == 'stub':
+        from engine.stub import StubEngine
+        return StubEngine(engine_file_path, max_batch_size=config.ENGINE_MAX_BATCH_SIZE, patterns=shared)
+
+    raise ValueError("지원하지 않는 backend입니다 : {} (가능 : {})".format(backend, BACKENDS))
+
+
+def _check_stale(engine_file_path):
+    """ build manager로 만든 engine이면 ONNX가 바뀌었는지 확인 (tools.build_engines로 다시 빌드) """
+    from engine.builder import check_engine
+    reason = check_engine(engine_file_path)
+    if reason is not None:
+        print("Warning: stale engine {} ({})".format(engine_file_path, reason))
+
+
+def get_engine_paths(backend=None):
+    """ backend별 기본 (exam backbone, temp backbone, head) 경로를 반환
+    args:
+        backend(str): None이면 config.ENGINE_BACKEND
+    return:
+        paths(tuple): (exam, temp, head)
+    """
+    if backend is None:
+        backend = config.ENGINE_BACKEND
+
+    if backend not in config.ENGINE_PATHS:
+        raise ValueError("지원하지 않는 backend입니다 : {} (가능 : {})".format(backend, BACKENDS))
+
+    return config.ENGINE_PATHS[backend]
+
+
+def get_fused_engine_path(backend=None):
+    """ backend별 기본 fused (exam backbone + head) engine 경로 (tools.fuse_head)
+    args:
+        backend(str): None이면 config.ENGINE_BACKEND
+    return:
+        path(str)
+    """
+    if backend is None:
+        backend = config.ENGINE_BACKEND
+
+    if backend not in config.FUSED_ENGINE_PATHS:
+        raise ValueError("지원하지 않는 backend입니다 : {} (가능 : {})".format(backend, BACKENDS))
+
+    return config.FUSED_ENGINE_PATHS[backend]
@@ -0,0 +1,301 @@
+import os
+import numpy as np
+import tensorrt as trt
+import pycuda.driver as cuda
+import pycuda.autoinit # 없으면, "invalid device context - no currently active context?" 에러 뜸
+
+from engine.engine import CUDAEngine
+from engine.engine import _is_pagelocked
+from engine.engine import deserialize_engine
+from utils.profiler import profiler
+
+# TensorRT 8.5+ named tensor API(num_io_tensors, set_input_shape, set_tensor_address, execute_async_v3)를 쓰는 엔진
+# TRTEngine(binding index, get_binding_shape * max_batch_size)과 달리
+#   - 입출력을 이름, shape, dtype으로 구분하고, batch 차원이 dynamic이면 optimization profile의 최대 shape으로 buffer를 잡음
+#   - 입력은 항상 page-locked buffer를 거쳐 H2D (혹은 page-locked 입력이면 거기서 바로), 실제 batch 크기만큼만 복사
+#   - 출력은 page-locked buffer의 view로 반환 (복사 없음)
+# 출력 view의 수명 : 같은 엔진의 다음 호출 전까지만 유효함 (다음 호출이 같은 buffer에 덮어씀)
+#   보관하려면 copy=True(혹은 생성 시 copy_outputs=True)로 호출하거나 호출하는 쪽에서 복사해야 함
+#   (Model은 다음 호출 전에 다 쓰거나 복사함. pipeline 모드면 worker thread에서 post로 처리, Model.track_async 참고)
+# GPU 없이 확인 : python -m tools.check_trt_named (fake tensorrt, pycuda)
+
+def is_supported():
+    """ 설치된 TensorRT가 named tensor API(8.5+)를 지원하는지 """
+    return hasattr(trt.ICudaEngine, 'num_io_tensors')
+
+
+class TensorInfo(object):
+    """ 입출력 tensor 하나의 이름, shape, dtype과 host/device buffer """
+
+    def __init__(self, name, is_input, shape, max_shape, dtype):
+        """
+        args:
+            name(str): tensor 이름
+            is_input(bool): 입력인지
+            shape(tuple): engine에 기록된 shape (dynamic 차원은 -1)
+            max_shape(tuple): buffer를 잡을 최대 shape
+            dtype(np.dtype)
+        """
+        self.name = name
+        self.is_input = is_input
+        self.shape = tuple(shape)
+        self.max_shape = tuple(max_shape)
+        self.dtype = np.dtype(dtype)
+
+        self.host = cuda.pagelocked_empty(trt.volume(self.max_shape), self.dtype)
+        self.device = cuda.mem_alloc(self.host.nbytes)
+        # 이번 호출의 shape
+        self.current_shape = self.max_shape
+
+    @property
+    def sample_shape(self):
+        """ batch 차원을 뺀 shape """
+        return self.max_shape[1:]
+
+    def view(self, shape=None):
+        """ host buffer를 shape(기본 이번 호출의 shape)에 맞춘 view """
+        shape = self.current_shape if shape is None else tuple(shape)
+        return self.host[:trt.volume(shape)].reshape(shape)
+
+    def __repr__(self):
+        return "TensorInfo({}, {}, shape={}, max={}, {})".format(self.name, 'input' if self.is_input else 'output',
+                                                                 self.shape, self.max_shape, self.dtype)
+
+
+class TRTNamedEngine(CUDAEngine):
+    """ named tensor API로 TensorRT 엔진을 실행하는 랩퍼 클래스\n
+    BaseEngine과 같이 callable하고 (입력은 engine 입력 순서의 list, 출력은 1d array의 list),
+    infer()로 이름 -> array dict를 주고받을 수도 있음 """
+
+    def __init__(self, engine_file_path="", copy_outputs=False, profile=0, engine=None):
+        """
+        args:
+            engine_file_path(str): engine 파일 경로
+            copy_outputs(bool): True면 출력을 항상 복사해서 반환 (view의 수명을 신경쓰지 않아도 됨)
+            profile(int): 사용할 optimization profile 번호
+            engine(trt.ICudaEngine): 이미 deserialize된 engine (engine.registry). 주어지면 파일을 읽지 않고
+                                     이 engine에 execution context, stream, buffer만 새로 만듦
+        """
+        if engine is None:
+            engine = deserialize_engine(engine_file_path)
+
+        # profiler span 이름에 사용
+        self.name = os.path.splitext(os.path.basename(engine_file_path))[0]
+        self.copy_outputs = copy_outputs
+        self.profile = profile
+        self.engine = engine
+
+        self.context = self.engine.create_execution_context()
+        self.stream = cuda.Stream()
+        if profile:
+            self.context.set_optimization_profile_async(profile, self.stream.handle)
+        self._allocate()
+
+
+    def _allocate(self):
+        """ tensor 이름별로 최대 shape만큼 page-locked host, device buffer를 잡고 주소를 context에 등록 """
+        self.tensors = {}
+        self.input_names = []
+        self.output_names = []
+
+        # 입력 : dynamic 차원은 profile의 최대 shape
+        for i in range(self.engine.num_io_tensors):
+            name = self.engine.get_tensor_name(i)
+            if self.engine.get_tensor_mode(name) != trt.TensorIOMode.INPUT:
+                continue
+            shape = tuple(self.engine.get_tensor_shape(name))
+            max_shape = shape
+            if -1 in shape:
+                max_shape = tuple(self.engine.get_tensor_profile_shape(name, self.profile)[2])
+                self.context.set_input_shape(name, max_shape)
+            self.tensors[name] = TensorInfo(name, True, shape, max_shape,
+                                            trt.nptype(self.engine.get_tensor_dtype(name)))
+            self.input_names.append(name)
+
+        # 출력 : 입력이 최대 shape일 때의 shape
+        for i in range(self.engine.num_io_tensors):
+            name = self.engine.get_tensor_name(i)
+            if self.engine.get_tensor_mode(name) != trt.TensorIOMode.OUTPUT:
+                continue
+            shape = tuple(self.engine.get_tensor_shape(name))
+            max_shape = tuple(self.context.get_tensor_shape(name))
+            if -1 in max_shape:
+                raise ValueError("output {} shape is not resolved by the input shapes : {}".format(name, max_shape))
+            self.tensors[name] = TensorInfo(name, False, shape, max_shape,
+                                            trt.nptype(self.engine.get_tensor_dtype(name)))
+            self.output_names.append(name)
+
+        for tensor in self.tensors.values():
+            self.context.set_tensor_address(tensor.name, int(tensor.device))
+
+        self.inputs = [ self.tensors[name] for name in self.input_names ]
+        self.outputs = [ self.tensors[name] for name in self.output_names ]
+
+        # batch 차원이 dynamic이면 profile의 최대 batch, 고정이면 engine shape의 batch
+        self.max_batch_size = min(tensor.max_shape[0] for tensor in self.inputs)
+        self.dynamic_batch = any(tensor.shape[0] == -1 for tensor in self.inputs)
+
+        # 입력별 H2D source (기본은 입력 host buffer)
+        self.sources = { name: self.tensors[name].host for name in self.input_names }
+        # set_resident로 device에 올려둔 입력 이름 (feeds에 없으면 H2D 없이 그대로 씀)
+        self.resident = set()
+
+
+    def __call__(self, data):
+        """ 인스턴스를 callable하게 만드는 함수\n
+        결과가 항상 list에 담긴다는 것에 유의할 것\n
+        batch 차원은 입력 크기로 결정되며, 출력은 실제 batch 크기만큼의 1d view (다음 호출 전까지 유효)
+        args:
+            data(np.ndarray or list): 1d array, 입력이 여러개면 engine 입력 순서의 list (head : [zf, xf])
+                                      None인 입력은 set_resident로 올려둔 값
+        return:
+            outputs(list): engine 출력 순서의 1d array
+        """
+        if not isinstance(data, list):
+            data = [data]
+        if len(data) != len(self.input_names):
+            raise ValueError("입력은 {}개입니다 : {}".format(len(self.input_names), self.input_names))
+
+        outputs = self.infer({ name: d for name, d in zip(self.input_names, data) if d is not None })
+        return [ np.ravel(outputs[name]) for name in self.output_names ]
+
+
+    def infer(self, feeds, copy=None):
+        """ 이름으로 입력을 넣고 출력을 받음
+        args:
+            feeds(dict): {입력 이름: array}, array는 tensor shape이거나 batch 단위로 이어붙인 1d array\n
+                         set_resident로 올려둔 입력은 빼도 됨 (넘기면 새 값으로 바뀜)
+            copy(bool): 출력을 복사할지. None이면 생성 시 copy_outputs
+        return:
+            outputs(dict): {출력 이름: 이번 호출의 shape인 array}\n
+                           copy가 아니면 page-locked buffer의 view이므로 이 엔진의 다음 호출 전까지만 유효함
+        """
+        missing = set(self.input_names) - set(feeds) - self.resident
+        if missing:
+            raise KeyError("missing inputs : {}".format(sorted(missing)))
+
+        uploads = [ name for name in self.input_names if name in feeds ]
+        for name in uploads:
+            self._set_input(name, feeds[name])
+
+        self._run(uploads)
+
+        copy = self.copy_outputs if copy is None else copy
+        outputs = {}
+        for tensor in self.outputs:
+            view = tensor.view()
+            outputs[tensor.name] = np.array(view) if copy else view
+        return outputs
+
+
+    def _set_input(self, name, data):
+        """ 입력 shape을 정하고 H2D에 쓸 source를 정함\n
+        get_input_buffer로 받은 buffer에 써넣었으면 복사하지 않고, page-locked buffer(allocate_host_buffer)면 거기서 바로 H2D,
+        그 외에는 입력 page-locked buffer에 복사 """
+        tensor = self.tensors[name]
+        data = np.asarray(data)
+
+        sample = trt.volume(tensor.sample_shape)
+        if data.size == 0 or data.size % sample:
+            raise ValueError("input {} size {} is not a multiple of {}".format(name, data.size, tensor.sample_shape))
+        batch = data.size // sample
+        if batch > tensor.max_shape[0]:
+            raise ValueError("input {} batch {} exceeds the profile max {}".format(name, batch, tensor.max_shape[0]))
+        if not self.dynamic_batch and batch != tensor.max_shape[0]:
+            raise ValueError("input {} batch {} does not match the fixed batch {}".format(name, batch,
+                                                                                        tensor.max_shape[0]))
+
+        shape = (batch,) + tensor.sample_shape
+        if shape != tensor.current_shape:
+            if tensor.shape[0] == -1:
+                self.context.set_input_shape(name, shape)
+            tensor.current_shape = shape
+
+        size = data.size
+        if np.shares_memory(tensor.host, data):
+            self.sources[name] = tensor.host[:size]
+        elif _is_pagelocked(data) and data.dtype == tensor.dtype and data.flags.c_contiguous:
+            self.sources[name] = np.ravel(data)
+        else:
+            np.copyto(tensor.host[:size], np.ravel(data), casting='unsafe')
+            self.sources[name] = tensor.host[:size]
+
+
+    def _run(self, uploads=None):
+        """ H2D -> 추론 -> D2H를 stream에 넣고 동기화 (실제 shape 크기만큼만 복사)\n
+        uploads : H2D할 입력 이름 (None이면 전부, device에 올려둔 입력은 빠짐)\n
+        profiler가 켜져 있으면 CUDA event로 단계별 GPU 시간을 기록함 """
+        events = self._events() if profiler.enabled else None
+        if events:
+            events[0].record(self.stream)
+
+        for name in (self.input_names if uploads is None else uploads):
+            cuda.memcpy_htod_async(self.tensors[name].device, self.sources[name], self.stream)
+        if events:
+            events[1].record(self.stream)
+
+        if not self.context.execute_async_v3(stream_handle=self.stream.handle):
+            raise RuntimeError("TensorRT execution failed : {}".format(self.name))
+        if events:
+            events[2].record(self.stream)
+
+        for tensor in self.outputs:
+            # 입력 shape에 따라 바뀐 출력 shape
+            if self.dynamic_batch:
+                tensor.current_shape = tuple(self.context.get_tensor_shape(tensor.name))
+            cuda.memcpy_dtoh_async(tensor.host[:trt.volume(tensor.current_shape)], tensor.device, self.stream)
+        if events:
+            events[3].record(self.stream)
+
+        self.stream.synchronize()
+
+        if events:
+            # time_since는 ms 단위
+            profiler.record(self.name + '.h2d', events[1].time_since(events[0]) / 1000)
+            profiler.record(self.name + '.execute', events[2].time_since(events[1]) / 1000)
+            profiler.record(self.name + '.d2h', events[3].time_since(events[2]) / 1000)
+
+
+    def set_resident(self, index, data):
+        """ index번째 입력을 device에 올려둠. 이후 호출에서 빼면(None) H2D 없이 그대로 씀
+        args:
+            index(int): 몇번째 입력인지
+            data(np.ndarray): 입력 (fused 모델의 zf)
+        """
+        name = self.input_names[index]
+        self._set_input(name, data)
+        cuda.memcpy_htod_async(self.tensors[name].device, self.sources[name], self.stream)
+        self.stream.synchronize()
+        self.resident.add(name)
+
+
+    def get_input_buffer(self, shape, index=0):
+        """ 입력 page-locked host buffer를 shape에 맞춰 view로 반환\n
+        여기에 직접 써넣으면 H2D 전 host 복사가 생략됨. 다음 호출 전까지만 유효함
+        args:
+            shape(tuple): buffer shape (e.g. (1, 3, 255, 255))
+            index(int): 몇번째 입력인지
+        return:
+            buffer(np.ndarray): page-locked buffer의 view
+        """
+        return self.inputs[index].view(shape)
+
+
+    def allocate_host_buffer(self, shape, index=0):
+        """ page-locked host buffer를 새로 할당 (여기서 바로 H2D 하므로 입력 buffer로 복사하지 않음) """
+        return cuda.pagelocked_empty(shape, self.inputs[index].dtype)
+
+
+    def get_input_dtype(self):
+        """
+        return:
+            dtypes(list): engine 입력 순서의 dtype
+        """
+        return [ tensor.dtype for tensor in self.inputs ]
+
+
+    def get_tensor_info(self, name):
+        """ 이름으로 tensor 정보(TensorInfo : shape, max_shape, dtype)를 반환 """
+        if name not in self.tensors:
+            raise KeyError("unknown tensor : {} (가능 : {})".format(name, list(self.tensors)))
+        return self.tensors[name]
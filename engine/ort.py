@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+
+from engine.base import BaseEngine
+
+# onnx tensor type -> numpy dtype
+ORT_DTYPES = {
+    'tensor(float)':   np.float32,
+    'tensor(float16)': np.float16,
+    'tensor(double)':  np.float64,
+    'tensor(uint8)':   np.uint8,
+    'tensor(int8)':    np.int8,
+    'tensor(int32)':   np.int32,
+    'tensor(int64)':   np.int64,
+}
+
+class ORTEngine(BaseEngine):
+    """ ONNX Runtime(CPU) 엔진 랩퍼 클래스\n
+    TRTEngine과 동일하게 callable하며, onnx/nanotrack_*.onnx를 그대로 실행함\n
+    GPU가 없는 노드나 CI에서 전체 파이프라인을 돌리기 위한 용도 """
+
+    def __init__(self, model_file_path="", num_threads=0, max_batch_size=64, session=None):
+        """ onnx 파일을 읽어서 InferenceSession 생성
+        args:
+            session(ort.InferenceSession): 이미 만든 session (engine.registry). 주어지면 파일을 읽지 않고 같이 씀
+                                           (InferenceSession.run은 여러 thread에서 동시에 호출해도 됨)
+        """
+        if session is None:
+            session = create_session(model_file_path, num_threads)
+        self.session = session
+
+        self.input_names  = [ inp.name for inp in self.session.get_inputs() ]
+        self.input_shapes = [ tuple(inp.shape) for inp in self.session.get_inputs() ]
+        self.input_dtypes = [ ORT_DTYPES[inp.type] for inp in self.session.get_inputs() ]
+        self.output_names = [ out.name for out in self.session.get_outputs() ]
+
+        # batch 차원이 숫자로 고정돼 있으면 그 크기까지만, dynamic이면 max_batch_size까지 받음
+        batch_dim = self.input_shapes[0][0]
+        self.max_batch_size = batch_dim if isinstance(batch_dim, int) else max_batch_size
+
+
+    def __call__(self, data):
+        """ 인스턴스를 callable하게 만드는 함수\n
+        결과가 항상 list에 담긴다는 것에 유의할 것 """
+        if not isinstance(data, list):
+            data = [data]
+        data = self._with_resident(data)
+
+        if len(data) != len(self.input_names):
+            raise ValueError("입력은 {}개입니다".format(len(self.input_names)))
+
+        # 1d array로 들어오므로 onnx 입력 shape으로 복원 (batch 차원은 입력 크기로 결정)
+        feed = { name: np.asarray(d, dtype).reshape((-1,) + shape[1:])
+                 for name, shape, dtype, d in zip(self.input_names, self.input_shapes, self.input_dtypes, data) }
+
+        outputs = self.session.run(self.output_names, feed)
+
+        # TRTEngine과 동일하게 1d array로 반환
+        return [ np.ravel(out) for out in outputs ]
+
+
+    def get_input_dtype(self):
+        """ input에 대한 dtype을 반환하는 함수\n
+        args:
+            void
+        return:
+            dtypes(list)
+        """
+        return list(self.input_dtypes)
+
+
+def create_session(model_file_path, num_threads=0):
+    """ onnx 파일로 CPU InferenceSession을 만듦 (ORTEngine 여러 개가 같이 쓸 수 있음)
+    args:
+        model_file_path(str): onnx 파일 경로
+        num_threads(int): intra-op thread 수 (0이면 ORT 기본값)
+    return:
+        session(ort.InferenceSession)
+    """
+    import onnxruntime as ort
+
+    if not os.path.exists(model_file_path):
+        raise FileNotFoundError('Onnx file {} is not found'.format(model_file_path))
+
+    print("Loading onnx from path {}".format(model_file_path))
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = num_threads
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    return ort.InferenceSession(model_file_path, sess_options=options, providers=['CPUExecutionProvider'])
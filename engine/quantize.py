@@ -0,0 +1,266 @@
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from core.config import config
+
+# ONNX Runtime(CPU)용 INT8 정적 양자화 (tools.quantize)
+# calibration은 random 입력이 아니라 실제 sequence의 crop으로 함
+#   FP32 Tracker로 sequence를 따라가면서(failure면 gt로 재초기화) frame_stride마다
+#   x crop : 현재 추적 state 기준 search crop (Tracker.get_subwindow, 실제 추론 때와 같은 분포)
+#   z crop : 그 frame gt 기준 template crop
+#   head 입력 [zf, xf] : 위 crop을 FP32 backbone에 넣은 출력
+# weight는 INT8(채널별 scale), activation은 calibration 범위로 UINT8 (기본 QDQ 형식, ORT가 QLinear* 커널로 바꿔 실행)
+# 양자화 모델은 원래 모델 옆에 <이름>_int8.onnx (입출력 이름, shape, dtype은 그대로라 --engines로 바로 씀)
+
+# 양자화 모델 파일 이름에 붙이는 접미사 (onnx/nanotrack_head_int8.onnx)
+INT8_SUFFIX = '_int8'
+
+# 모델 이름 -> (exam, temp, head) 경로 tuple에서의 index
+MODELS = {
+    'exam': 0,
+    'temp': 1,
+    'head': 2,
+}
+
+
+def int8_path(path):
+    """ 원래 onnx 경로 -> 양자화 모델 경로 """
+    root, ext = os.path.splitext(path)
+    return root + INT8_SUFFIX + ext
+
+
+class CalibrationReader(object):
+    """ onnxruntime.quantization의 CalibrationDataReader와 같은 interface (get_next가 feed dict를 하나씩, 끝나면 None) """
+
+    def __init__(self, input_names, samples):
+        """
+        args:
+            input_names(list): 모델 입력 이름
+            samples(list): 입력 tuple(입력 이름 순서의 np.ndarray) list
+        """
+        self.input_names = list(input_names)
+        self.samples = samples
+        self.index = 0
+
+    def get_next(self):
+        if self.index >= len(self.samples):
+            return None
+        sample = self.samples[self.index]
+        self.index += 1
+        return dict(zip(self.input_names, sample))
+
+    def rewind(self):
+        self.index = 0
+
+    def __len__(self):
+        return len(self.samples)
+
+
+def collect_crops(sequences, engine_paths=("", "", ""), frame_stride=config.QUANT_FRAME_STRIDE,
+                  max_samples=config.QUANT_MAX_SAMPLES):
+    """ FP32 Tracker(onnx)로 sequence를 따라가면서 calibration crop을 모음
+    args:
+        sequences(list): (name, frame 경로 list, gt N * 4), evaluation.runner.load_sequences 결과
+        engine_paths(tuple): FP32 (exam, temp, head) onnx 경로, 비어있으면 config.ENGINE_PATHS['onnx']
+        frame_stride(int): crop을 저장할 frame 간격
+        max_samples(int): 모을 최대 crop 수 (sequence마다 고르게 나눔)
+    return:
+        crops(dict): {'z': 1 * 3 * 127 * 127 list, 'x': 1 * 3 * 255 * 255 list} (float32, 같은 index는 같은 frame)
+    """
+    from evaluation import metrics
+    from loader.source import ImageSequenceSource
+    from tracker.tracker import Tracker
+
+    sequences = list(sequences)
+    if not sequences:
+        raise ValueError("no calibration sequence")
+
+    tracker = Tracker(*engine_paths, backend='onnx')
+    per_sequence = int(np.ceil(max_samples / len(sequences)))
+    crops = {'z': [], 'x': []}
+
+    for _, frames, gt in sequences:
+        valid_gt = np.all(np.isfinite(gt), axis=1) & (gt[:, 2] > 0) & (gt[:, 3] > 0)
+        count, initialized = 0, False
+
+        for j, (img, _) in enumerate(ImageSequenceSource(frames)):
+            if count >= per_sequence or len(crops['x']) >= max_samples:
+                break
+
+            # 처음, 혹은 failure 뒤에는 gt로 다시 초기화
+            if not initialized:
+                if valid_gt[j]:
+                    tracker.init(img, gt[j])
+                    initialized = True
+                continue
+
+            if j % frame_stride == 0 and valid_gt[j]:
+                # search crop은 추적 중인 state 기준 (Tracker.track과 같은 crop)
+                _, _, s_x = tracker._search_scale(tracker.size)
+                crops['x'].append(tracker.get_subwindow(img, tracker.center_pos, config.TRACK_INSTANCE_SIZE,
+                                                        round(s_x), tracker.channel_average))
+
+                # template crop은 이 frame의 gt 기준 (Tracker.init과 같은 crop)
+                center = np.array([gt[j][0] + (gt[j][2] - 1) / 2, gt[j][1] + (gt[j][3] - 1) / 2])
+                s_z, _, _ = tracker._search_scale(np.array(gt[j][2:4]))
+                crops['z'].append(tracker.get_subwindow(img, center, config.TRACK_EXEMPLAR_SIZE,
+                                                        s_z, np.mean(img, axis=(0, 1))))
+                count += 1
+
+            bbox = tracker.track(img)['bbox']
+            if valid_gt[j] and metrics.iou(np.asarray(bbox), gt[j])[0] <= 0:
+                initialized = False
+
+    tracker.model.close()
+    return { key: [ np.asarray(crop, np.float32) for crop in value ] for key, value in crops.items() }
+
+
+def calibration_samples(crops, engine_paths=("", "", ""), num_threads=0):
+    """ 모델별 calibration 입력 (head 입력은 FP32 backbone 출력)
+    args:
+        crops(dict): collect_crops 결과
+        engine_paths(tuple): FP32 (exam, temp, head) onnx 경로
+    return:
+        samples(dict): {'exam': [(x,)], 'temp': [(z,)], 'head': [(zf, xf)]}
+    """
+    from engine.ort import create_session
+
+    exam, temp, _ = _onnx_paths(engine_paths)
+    exam_session = create_session(exam, num_threads)
+    temp_session = create_session(temp, num_threads)
+
+    def run(session, crop):
+        return session.run(None, {session.get_inputs()[0].name: crop})[0]
+
+    return {
+            'exam': [ (x,) for x in crops['x'] ],
+            'temp': [ (z,) for z in crops['z'] ],
+            'head': [ (run(temp_session, z), run(exam_session, x)) for z, x in zip(crops['z'], crops['x']) ],
+           }
+
+
+def quantize_model(src, dst, samples, quant_format='qdq', calibrate_method=config.QUANT_CALIBRATE_METHOD,
+                   per_channel=True):
+    """ src onnx를 samples로 calibration해서 INT8 모델을 dst에 저장
+    args:
+        src(str): FP32 onnx 경로
+        dst(str): 저장할 경로
+        samples(list): calibration 입력 tuple list (calibration_samples 결과 중 하나)
+        quant_format(str): 'qdq'(QuantizeLinear/DequantizeLinear 쌍), 'qoperator'(QLinearConv 등으로 바로)
+        calibrate_method(str): 'minmax', 'entropy', 'percentile'
+        per_channel(bool): weight scale을 output channel마다 따로 둘지
+    return:
+        dst(str)
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod
+    from onnxruntime.quantization import QuantFormat
+    from onnxruntime.quantization import QuantType
+    from onnxruntime.quantization import quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    formats = {'qdq': QuantFormat.QDQ, 'qoperator': QuantFormat.QOperator}
+    methods = {'minmax': CalibrationMethod.MinMax, 'entropy': CalibrationMethod.Entropy,
+               'percentile': CalibrationMethod.Percentile}
+    if quant_format not in formats:
+        raise KeyError("unknown quant format : {} (가능 : {})".format(quant_format, tuple(formats)))
+    if calibrate_method not in methods:
+        raise KeyError("unknown calibrate method : {} (가능 : {})".format(calibrate_method, tuple(methods)))
+    if not os.path.exists(src):
+        raise FileNotFoundError('Onnx file {} is not found'.format(src))
+    if not samples:
+        raise ValueError("no calibration sample for {}".format(src))
+
+    graph = onnx.load(src).graph
+    initializers = { init.name for init in graph.initializer }
+    input_names = [ inp.name for inp in graph.input if inp.name not in initializers ]
+    work_dir = tempfile.mkdtemp(prefix='quantize-')
+    try:
+        # shape 추론, constant folding을 먼저 해두면 양자화할 수 있는 node가 늘어남
+        prepared = os.path.join(work_dir, 'prepared.onnx')
+        quant_pre_process(src, prepared)
+        quantize_static(prepared, dst, CalibrationReader(input_names, samples),
+                        quant_format=formats[quant_format], per_channel=per_channel,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                        calibrate_method=methods[calibrate_method],
+                        extra_options={'CalibTensorRangeSymmetric': False})
+    finally:
+        # calibration 중간 파일(augmented model)도 여기에 생김
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return dst
+
+
+def benchmark_model(path, samples, iters=50, num_threads=0):
+    """ ONNX Runtime(CPU)에서 모델 한번 실행 시간(ms, 평균) """
+    from engine.ort import create_session
+
+    session = create_session(path, num_threads)
+    input_names = [ inp.name for inp in session.get_inputs() ]
+    feeds = [ dict(zip(input_names, sample)) for sample in samples[:max(1, min(len(samples), iters))] ]
+
+    session.run(None, feeds[0])
+    start = time.perf_counter()
+    for i in range(iters):
+        session.run(None, feeds[i % len(feeds)])
+    return (time.perf_counter() - start) / iters * 1000
+
+
+def select_faster(speeds, max_slowdown=None):
+    """ 모델별 실행 시간(benchmark_model)이 FP32보다 느려진 모델을 뺌
+    args:
+        speeds(dict): {모델 이름: {'fp32_ms', 'int8_ms', ...}}
+        max_slowdown(float): 허용할 실행 시간 증가 비율. None이면 config.QUANT_MAX_SLOWDOWN
+    return:
+        names(list): 남은 모델 이름 (speeds 순서), reasons(list): 뺀 이유
+    """
+    if max_slowdown is None:
+        max_slowdown = config.QUANT_MAX_SLOWDOWN
+
+    names, reasons = [], []
+    for name, speed in speeds.items():
+        if speed['int8_ms'] > speed['fp32_ms'] * (1 + max_slowdown):
+            reasons.append("{} int8 {:.2f} ms > fp32 {:.2f} ms".format(name, speed['int8_ms'], speed['fp32_ms']))
+        else:
+            names.append(name)
+    return names, reasons
+
+
+def check_gate(reference, candidate, max_accuracy_drop=None, max_robustness_rise=None, max_slowdown=None):
+    """ held-out 평가 요약(evaluation.runner.summarize)을 FP32와 비교해서 양자화 모델을 내보내도 되는지 판단
+    args:
+        reference(dict): FP32 요약
+        candidate(dict): INT8 요약
+        max_accuracy_drop(float): 허용할 accuracy(평균 IoU) 하락. None이면 config.QUANT_MAX_ACCURACY_DROP
+        max_robustness_rise(float): 허용할 robustness(100 frame당 failure) 증가. None이면 config.QUANT_MAX_ROBUSTNESS_RISE
+        max_slowdown(float): 허용할 평균 latency 증가 비율 (Tracker 전체). None이면 config.QUANT_MAX_SLOWDOWN
+    return:
+        passed(bool), reasons(list): 통과 못한 이유
+    """
+    if max_accuracy_drop is None:
+        max_accuracy_drop = config.QUANT_MAX_ACCURACY_DROP
+    if max_robustness_rise is None:
+        max_robustness_rise = config.QUANT_MAX_ROBUSTNESS_RISE
+    if max_slowdown is None:
+        max_slowdown = config.QUANT_MAX_SLOWDOWN
+
+    reasons = []
+    accuracy_drop = reference['accuracy'] - candidate['accuracy']
+    if accuracy_drop > max_accuracy_drop:
+        reasons.append("accuracy drop {:.4f} > {:.4f}".format(accuracy_drop, max_accuracy_drop))
+    robustness_rise = candidate['robustness'] - reference['robustness']
+    if robustness_rise > max_robustness_rise:
+        reasons.append("robustness rise {:.3f} > {:.3f}".format(robustness_rise, max_robustness_rise))
+    reference_ms = reference['latency_ms'].get('mean', 0.)
+    candidate_ms = candidate['latency_ms'].get('mean', 0.)
+    if candidate_ms > reference_ms * (1 + max_slowdown):
+        reasons.append("mean latency {:.2f} ms > fp32 {:.2f} ms".format(candidate_ms, reference_ms))
+    return not reasons, reasons
+
+
+def _onnx_paths(engine_paths):
+    """ 비어있는 경로는 config.ENGINE_PATHS['onnx'] 기본값으로 """
+    return tuple(path or default for path, default in zip(engine_paths, config.ENGINE_PATHS['onnx']))
@@ -0,0 +1,197 @@
+import mmap
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from core.config import config
+
+from engine.factory import create_engine
+from engine.factory import load_engine
+
+# process 안에서 engine 파일마다 deserialize(ONNX는 session 생성)를 한번만 하고, 그 위에 가벼운 엔진 객체를 나눠주는 registry
+#   무거운 부분(공유) : TRT는 deserialize된 ICudaEngine(weight), ONNX는 InferenceSession, stub은 출력 패턴
+#   가벼운 부분(Model마다) : TRT는 execution context, stream, 입출력 buffer / ONNX는 입력 buffer
+# 그래서 같은 파일을 쓰는 Tracker가 여러 개여도 시작 시간, 메모리는 파일 수만큼만 늘어남
+# 아직 로딩하지 않은 파일은 한번에 모아서 읽음
+#   trt  : mmap으로 열고 readahead를 미리 걸어둔 뒤(혹은 thread pool로 read) deserialize는 호출한 thread에서 (CUDA context)
+#   onnx : session 생성을 thread pool에서 병렬로
+# 사용법 :
+#   engines = registry.create_engines((exam, temp, head), backend='trt')   # 호출할 때마다 새 context
+#   registry.get_stats()
+
+
+class EngineEntry(object):
+    """ registry에 로딩된 engine 파일 하나 """
+
+    def __init__(self, key, path, backend, shared, size, read_ms, load_ms):
+        self.key = key
+        self.path = path
+        self.backend = backend
+        # load_engine의 반환값 (ICudaEngine, InferenceSession, dict)
+        self.shared = shared
+        self.size = size
+        self.read_ms = read_ms
+        self.load_ms = load_ms
+        # 이 entry로 만든 엔진 객체(context) 수
+        self.contexts = 0
+        self.warmed = False
+
+    def to_dict(self):
+        return {
+                'path': self.path,
+                'backend': self.backend,
+                'size': self.size,
+                'read_ms': self.read_ms,
+                'load_ms': self.load_ms,
+                'contexts': self.contexts,
+                'warmed': self.warmed,
+               }
+
+
+class EngineRegistry(object):
+    """ engine 파일 경로(+ 수정 시각, 크기)별로 로딩한 것을 보관하는 객체 (thread-safe) """
+
+    def __init__(self, use_mmap=None, workers=None):
+        """
+        args:
+            use_mmap(bool): trt engine 파일을 mmap으로 읽을지. None이면 config.ENGINE_REGISTRY_MMAP
+            workers(int): 파일을 병렬로 읽을(onnx는 session을 만들) thread 수. None이면 config.ENGINE_LOAD_WORKERS
+        """
+        self.use_mmap = use_mmap
+        self.workers = workers
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def make_key(self, path, backend):
+        """ 파일이 바뀌면(다시 빌드) key도 바뀌도록 실제 경로, 수정 시각, 크기를 씀 (stub은 파일이 없으므로 경로만) """
+        if backend == 'stub':
+            return (backend, path)
+        if not os.path.exists(path):
+            raise FileNotFoundError('Engine file {} is not found'.format(path))
+        stat = os.stat(path)
+        return (backend, os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+
+    def load(self, paths, backend=None):
+        """ 아직 로딩하지 않은 파일을 모아서 로딩
+        args:
+            paths(list): engine(or onnx) 파일 경로
+            backend(str): 'trt', 'onnx', 'stub'. None이면 config.ENGINE_BACKEND
+        return:
+            entries(list): paths 순서의 EngineEntry
+        """
+        if backend is None:
+            backend = config.ENGINE_BACKEND
+
+        keys = [ self.make_key(path, backend) for path in paths ]
+        with self._lock:
+            missing = {}
+            for key, path in zip(keys, paths):
+                if key not in self._entries:
+                    missing.setdefault(key, path)
+            if missing:
+                self._load(missing, backend)
+            return [ self._entries[key] for key in keys ]
+
+    def _load(self, missing, backend):
+        """ lock 안에서 호출 """
+        items = list(missing.items())
+        workers = self.workers if self.workers is not None else config.ENGINE_LOAD_WORKERS
+        use_mmap = self.use_mmap if self.use_mmap is not None else config.ENGINE_REGISTRY_MMAP
+
+        with ThreadPoolExecutor(max(1, min(workers, len(items))), thread_name_prefix='engine-load') as pool:
+            if backend == 'trt':
+                # 읽기만 병렬로 하고, deserialize는 CUDA context가 current인 이 thread에서
+                reads = list(pool.map(lambda item: _read(item[1], use_mmap), items))
+                entries = [ self._create_entry(key, path, backend, data, read_ms)
+                            for (key, path), (data, read_ms) in zip(items, reads) ]
+            else:
+                entries = list(pool.map(lambda item: self._create_entry(item[0], item[1], backend), items))
+
+        for entry in entries:
+            # 다시 빌드돼서 key가 바뀐 같은 파일의 이전 entry는 버림 (이미 만든 엔진 객체는 계속 씀)
+            for key in [ key for key in self._entries if key[:2] == entry.key[:2] ]:
+                del self._entries[key]
+            self._entries[entry.key] = entry
+
+    def _create_entry(self, key, path, backend, data=None, read_ms=0.0):
+        start = time.perf_counter()
+        try:
+            shared = load_engine(path, backend, data)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+        load_ms = (time.perf_counter() - start) * 1000
+        size = os.path.getsize(path) if backend != 'stub' else 0
+        return EngineEntry(key, path, backend, shared, size, read_ms, load_ms)
+
+    def create_engines(self, paths, backend=None):
+        """ 파일별로 로딩해둔 것 위에 엔진 객체를 새로 만듦 (Model마다 호출, 로딩 안 된 파일은 이때 로딩)
+        args:
+            paths(list): engine(or onnx) 파일 경로
+            backend(str): None이면 config.ENGINE_BACKEND
+        return:
+            engines(list): paths 순서의 BaseEngine (context, buffer는 각자 가짐)
+        """
+        entries = self.load(paths, backend)
+        engines = [ create_engine(entry.path, entry.backend, entry.shared) for entry in entries ]
+        with self._lock:
+            for entry in entries:
+                entry.contexts += 1
+        return engines
+
+    def create_engine(self, path, backend=None):
+        return self.create_engines([path], backend)[0]
+
+    def claim_warmup(self, paths, backend=None):
+        """ paths 중 아직 warmup하지 않은 파일이 있으면 warmup한 것으로 표시하고 True를 반환 (warmup은 호출한 쪽에서) """
+        entries = self.load(paths, backend)
+        with self._lock:
+            cold = [ entry for entry in entries if not entry.warmed ]
+            for entry in cold:
+                entry.warmed = True
+        return bool(cold)
+
+    def get_stats(self):
+        """
+        return:
+            stats(dict): 로딩된 파일 수, 만든 엔진 객체 수, 파일별 정보(크기, 읽기/로딩 시간, context 수)
+        """
+        with self._lock:
+            entries = [ entry.to_dict() for entry in self._entries.values() ]
+        return {
+                'engines': len(entries),
+                'contexts': sum(entry['contexts'] for entry in entries),
+                'load_ms': sum(entry['read_ms'] + entry['load_ms'] for entry in entries),
+                'entries': entries,
+               }
+
+    def clear(self):
+        """ 로딩해둔 것을 모두 버림 (이미 만든 엔진 객체는 계속 씀) """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _read(path, use_mmap):
+    """ 파일 내용을 읽음
+    return:
+        data(mmap or bytes), read_ms(float)\n
+        mmap이면 복사 없이 page cache를 그대로 쓰고 readahead만 걸어둠 (실제 읽기는 kernel이 파일들을 동시에)
+    """
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        if use_mmap:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(data, 'madvise'):
+                data.madvise(mmap.MADV_WILLNEED)
+        else:
+            data = f.read()
+    return data, (time.perf_counter() - start) * 1000
+
+
+# process 전역 registry (Model이 기본으로 사용, config.ENGINE_SHARED)
+registry = EngineRegistry()
@@ -0,0 +1,86 @@
+import numpy as np
+
+from engine.base import BaseEngine
+
+# batch 1개당 입력 크기(원소 수) -> batch 1개당 출력 shape 목록
+# template backbone : 3 * 127 * 127 -> zf 48 * 8 * 8
+# exampler backbone : 3 * 255 * 255 -> xf 48 * 16 * 16
+# head              : (zf, xf)      -> cls 2 * 16 * 16, loc 4 * 16 * 16
+# fused exam + head : (zf, x)       -> cls 2 * 16 * 16, loc 4 * 16 * 16
+STUB_SPECS = {
+    (3 * 127 * 127,):               [(48, 8, 8)],
+    (3 * 255 * 255,):               [(48, 16, 16)],
+    (48 * 8 * 8, 48 * 16 * 16):     [(2, 16, 16), (4, 16, 16)],
+    (48 * 8 * 8, 3 * 255 * 255):    [(2, 16, 16), (4, 16, 16)],
+}
+
+class StubEngine(BaseEngine):
+    """ 엔진 파일 없이 결정적인(deterministic) 출력을 내는 가짜 엔진\n
+    같은 입력엔 항상 같은 출력을 내므로, GPU 없이 파이프라인 전체를 테스트/벤치마크 할 때 사용 """
+
+    def __init__(self, engine_file_path="", seed=0, max_batch_size=64, patterns=None):
+        # 파일은 사용하지 않음. 다른 backend와 인터페이스만 맞춤
+        self.engine_file_path = engine_file_path
+        self.max_batch_size = max_batch_size
+        self.seed = seed
+        # 출력 패턴 cache. engine.registry에서는 같은 경로의 StubEngine끼리 같이 씀
+        self.patterns = patterns if patterns is not None else {}
+
+
+    def _pattern(self, shape, index):
+        """ 출력 shape마다 고정된 패턴을 만들어서 재사용
+
+        호출 순서와 상관없이 (seed, shape, index)로만 결정됨 """
+        key = (shape, index)
+        if key not in self.patterns:
+            rng = np.random.RandomState((self.seed * 1000003 + int(np.prod(shape)) * 31 + index) % (2 ** 32))
+            self.patterns[key] = rng.standard_normal(shape).astype(np.float32)
+        return self.patterns[key]
+
+
+    def __call__(self, data):
+        """ 인스턴스를 callable하게 만드는 함수\n
+        결과가 항상 list에 담긴다는 것에 유의할 것 """
+        if not isinstance(data, list):
+            data = [data]
+        data = self._with_resident(data)
+
+        sizes = tuple(np.size(d) for d in data)
+        spec, batch = self._find_spec(sizes)
+
+        # batch별 입력 평균값만큼 출력을 흔들어서, 입력이 바뀌면 출력도 바뀌게 함
+        offset = sum(np.reshape(d, (batch, -1)).mean(axis=1, dtype=np.float64) for d in data)
+        offset = (offset / len(data) * 1e-3).astype(np.float32)
+
+        outputs = []
+        for i, shape in enumerate(STUB_SPECS[spec]):
+            out = self._pattern(shape, i)[np.newaxis] + offset.reshape((batch,) + (1,) * len(shape))
+            # loc(4 * 16 * 16)은 거리값이라 양수여야 bbox가 만들어짐
+            if shape[0] == 4:
+                out = 16 + 4 * np.abs(out)
+            outputs.append(np.ravel(out))
+
+        return outputs
+
+
+    def _find_spec(self, sizes):
+        """ 입력 크기로 어떤 네트워크인지, batch가 몇인지 찾음 """
+        for spec in STUB_SPECS:
+            if len(spec) != len(sizes) or any(s % unit for s, unit in zip(sizes, spec)):
+                continue
+            batches = set(s // unit for s, unit in zip(sizes, spec))
+            if len(batches) == 1:
+                return spec, batches.pop()
+
+        raise ValueError("stub engine이 지원하지 않는 입력 크기입니다 : {}".format(sizes))
+
+
+    def get_input_dtype(self):
+        """ input에 대한 dtype을 반환하는 함수\n
+        args:
+            void
+        return:
+            dtypes(list)
+        """
+        # 어떤 네트워크인지는 호출할 때 입력 크기로 정해지므로, 입력이 가장 많은 경우(head, fused : 2개)에 맞춤
+        return [ np.float32, np.float32 ]
@@ -0,0 +1,360 @@
+import os
+import time
+
+import numpy as np
+
+# backbone onnx 앞에 전처리(uint8 -> float32 cast, NHWC -> NCHW transpose)를 붙이는 graph surgery
+# 원래 모델 입력은 float32 NCHW라서 crop마다 CPU에서 transpose, float 변환을 하고 4배 크기(255 crop : 780KB)를 넘겨야 함
+# 바꾼 모델은 get_subwindow_into가 만든 BGR HWC uint8 crop(195KB)을 그대로 받고, transpose, cast는 graph 안에서 수행
+#   input(uint8, N * H * W * 3) -> Transpose(0, 3, 1, 2) -> Cast(float) -> 원래 첫 layer
+# 입력 이름은 그대로 두므로 engine 쪽은 입력 dtype(uint8)만 보고 layout을 정함 (core.process.BackBoneProcessor)
+
+# exam backbone + head 합치기 (fuse_exam_head) : backbone 출력(xf)을 head의 두번째 입력에 바로 연결
+#   입력 [zf(N * 48 * 8 * 8), x(backbone 입력)] -> 출력 [cls(N * 2 * 16 * 16), loc(N * 4 * 16 * 16)]
+#   xf가 host를 거치지 않고, zf는 template할 때 한번 올려두면 됨 (Model fused 모드)
+
+# batch 차원을 dynamic으로 (to_dynamic_batch) : 배포된 onnx는 batch 1로 export돼서 입출력 shape과 Reshape의 shape 상수가 1로 고정됨
+#   입출력 첫 차원 1 -> 'batch', Reshape shape 상수의 첫 값 1 -> 0 (입력의 batch 차원을 그대로 씀)
+#   그러면 ORT는 config.ENGINE_MAX_BATCH_SIZE까지, TensorRT는 batch profile(tools.build_engines --batch)까지 한번에 받음
+#   (MultiTracker, BatchScheduler가 target마다 나눠서 호출하지 않음)
+
+# fused 모델 입출력 이름
+FUSED_INPUTS = ('zf', 'x')
+FUSED_OUTPUTS = ('cls', 'loc')
+
+# 바꾼 모델 파일 이름에 붙이는 접미사 (onnx/nanotrack_backbone_exampler_u8.onnx)
+UINT8_SUFFIX = '_u8'
+# onnx/nanotrack_backbone_exampler_dyn.onnx
+DYNAMIC_SUFFIX = '_dyn'
+
+# dynamic batch 차원 이름
+BATCH_DIM = 'batch'
+
+
+def dynamic_path(path):
+    """ 원래 onnx 경로 -> batch dynamic 모델 경로 """
+    root, ext = os.path.splitext(path)
+    return root + DYNAMIC_SUFFIX + ext
+
+
+def uint8_path(path):
+    """ 원래 onnx 경로 -> uint8 입력 모델 경로 """
+    root, ext = os.path.splitext(path)
+    return root + UINT8_SUFFIX + ext
+
+
+def to_uint8_nhwc(model, input_name=None):
+    """ float32 NCHW 입력 모델을 uint8 NHWC 입력 모델로 바꿈 (원래 model은 건드리지 않음)
+    args:
+        model(onnx.ModelProto): 원래 모델
+        input_name(str): 바꿀 입력 이름. None이면 첫번째 입력
+    return:
+        model(onnx.ModelProto): 바꾼 모델 (onnx.checker 통과)
+    """
+    import onnx
+    from onnx import helper
+    from onnx import TensorProto
+
+    fused = onnx.ModelProto()
+    fused.CopyFrom(model)
+    graph = fused.graph
+
+    inputs = { inp.name: inp for inp in graph.input }
+    if input_name is None:
+        input_name = graph.input[0].name
+    if input_name not in inputs:
+        raise KeyError("unknown input : {} (가능 : {})".format(input_name, list(inputs)))
+
+    inp = inputs[input_name]
+    tensor_type = inp.type.tensor_type
+    dims = [ d.dim_param if d.dim_param else d.dim_value for d in tensor_type.shape.dim ]
+    if tensor_type.elem_type != TensorProto.FLOAT or len(dims) != 4 or dims[1] != 3:
+        raise ValueError("input {} is not a float32 N * 3 * H * W tensor : {} {}".format(
+                         input_name, TensorProto.DataType.Name(tensor_type.elem_type), dims))
+
+    # 원래 입력을 쓰던 node는 cast 결과를 쓰도록
+    nchw_name = input_name + '_nchw_uint8'
+    float_name = input_name + '_nchw_float'
+    for node in graph.node:
+        for i, name in enumerate(node.input):
+            if name == input_name:
+                node.input[i] = float_name
+
+    transpose = helper.make_node('Transpose', [input_name], [nchw_name], name='preprocess_transpose',
+                                 perm=[0, 3, 1, 2])
+    cast = helper.make_node('Cast', [nchw_name], [float_name], name='preprocess_cast', to=TensorProto.FLOAT)
+    graph.node.insert(0, cast)
+    graph.node.insert(0, transpose)
+
+    # 입력 : N * H * W * 3 uint8 (batch 차원이 dynamic이면 그대로)
+    new_input = helper.make_tensor_value_info(input_name, TensorProto.UINT8, [dims[0], dims[2], dims[3], dims[1]])
+    index = list(graph.input).index(inp)
+    graph.input.remove(inp)
+    graph.input.insert(index, new_input)
+
+    onnx.checker.check_model(fused)
+    return fused
+
+
+def write_uint8_variant(src, dst=None):
+    """ src onnx의 uint8 NHWC 입력 모델을 dst(기본 uint8_path(src))에 저장
+    return:
+        dst(str)
+    """
+    import onnx
+
+    if not os.path.exists(src):
+        raise FileNotFoundError('Onnx file {} is not found'.format(src))
+    dst = dst or uint8_path(src)
+    onnx.save(to_uint8_nhwc(onnx.load(src)), dst)
+    return dst
+
+
+def check_uint8_variant(src, dst, samples=8, seed=0, num_threads=0):
+    """ ONNX Runtime(CPU)으로 원래 모델(float32 NCHW)과 uint8 모델(uint8 NHWC)에 같은 crop을 넣고 출력을 비교
+    args:
+        src(str): 원래 onnx 경로
+        dst(str): uint8 입력 onnx 경로
+        samples(int): 비교할 random crop 수
+        seed(int): random seed
+        num_threads(int): ORT intra-op thread 수
+    return:
+        result(dict): 출력 최대/평균 차이, 입력 크기(byte), 호출당 시간(ms, 원래 모델은 crop 변환 포함)
+    """
+    from engine.ort import create_session
+
+    original = create_session(src, num_threads)
+    variant = create_session(dst, num_threads)
+
+    inp = variant.get_inputs()[0]
+    if inp.type != 'tensor(uint8)':
+        raise ValueError("{} input is not uint8 : {}".format(dst, inp.type))
+    shape = [ d if isinstance(d, int) else 1 for d in inp.shape ]
+
+    rng = np.random.RandomState(seed)
+    diffs, float_time, uint8_time = [], 0.0, 0.0
+    for _ in range(samples):
+        crop = rng.randint(0, 256, shape).astype(np.uint8)
+
+        # 원래 경로 : crop마다 HWC -> CHW, float32 변환 후 추론
+        start = time.perf_counter()
+        x = crop.transpose(0, 3, 1, 2).astype(np.float32)
+        expected = original.run(None, {original.get_inputs()[0].name: x})
+        float_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        outputs = variant.run(None, {inp.name: crop})
+        uint8_time += time.perf_counter() - start
+
+        diffs += [ np.abs(np.asarray(a, np.float64) - b) for a, b in zip(expected, outputs) ]
+
+    return {
+            'max_abs_diff': float(max(np.max(d) for d in diffs)),
+            'mean_abs_diff': float(np.mean([ np.mean(d) for d in diffs ])),
+            'float_input_bytes': int(np.prod(shape)) * 4,
+            'uint8_input_bytes': int(np.prod(shape)),
+            'float_ms': float_time / samples * 1000,
+            'uint8_ms': uint8_time / samples * 1000,
+           }
+
+
+def has_dynamic_batch(model):
+    """ 입력 첫 차원이 모두 숫자로 고정되지 않았는지 (이미 dynamic이면 to_dynamic_batch가 필요 없음) """
+    initializers = { init.name for init in model.graph.initializer }
+    inputs = [ inp for inp in model.graph.input if inp.name not in initializers ]
+    return all(not inp.type.tensor_type.shape.dim[0].HasField('dim_value') for inp in inputs)
+
+
+def to_dynamic_batch(model, batch_name=BATCH_DIM):
+    """ batch 1로 고정된 모델의 batch 차원을 dynamic으로 바꿈 (원래 model은 건드리지 않음)\n
+    Reshape의 shape 상수(initializer, Constant, Identity로 이어진 것)가 1로 시작하면 0(입력 차원 그대로)으로 바꾼 복사본을 씀
+    args:
+        model(onnx.ModelProto): 원래 모델 (입출력 첫 차원이 batch)
+        batch_name(str): batch 차원 이름
+    return:
+        model(onnx.ModelProto): 바꾼 모델 (onnx.checker, shape 추론 통과)
+    """
+    import onnx
+    from onnx import numpy_helper
+
+    dynamic = onnx.ModelProto()
+    dynamic.CopyFrom(model)
+    graph = dynamic.graph
+
+    initializers = { init.name: init for init in graph.initializer }
+    producers = { name: node for node in graph.node for name in node.output }
+
+    def constant(name):
+        """ name tensor의 상수 값 (Identity는 따라감), 상수가 아니면 None """
+        while name not in initializers:
+            node = producers.get(name)
+            if node is None:
+                return None
+            if node.op_type == 'Constant':
+                values = [ attr.t for attr in node.attribute if attr.name == 'value' ]
+                return numpy_helper.to_array(values[0]) if values else None
+            if node.op_type != 'Identity':
+                return None
+            name = node.input[0]
+        return numpy_helper.to_array(initializers[name])
+
+    # Reshape shape 상수 : 같은 상수를 다른 node가 쓸 수 있으므로 Reshape마다 새 initializer를 만들어 연결
+    for node in graph.node:
+        if node.op_type != 'Reshape':
+            continue
+        shape = constant(node.input[1])
+        if shape is None:
+            raise ValueError("Reshape {} has a non-constant shape : {}".format(node.name, node.input[1]))
+        if shape.ndim != 1 or len(shape) < 2 or shape[0] != 1:
+            continue
+        shape = shape.copy()
+        shape[0] = 0
+        name = '{}_{}_shape'.format(node.name or node.output[0], batch_name)
+        graph.initializer.append(numpy_helper.from_array(shape, name))
+        node.input[1] = name
+
+    # 입출력 첫 차원
+    for value in list(graph.input) + list(graph.output):
+        if value.name in initializers:
+            continue
+        dim = value.type.tensor_type.shape.dim[0]
+        if dim.HasField('dim_value') and dim.dim_value != 1:
+            raise ValueError("{} batch dimension is {}, not 1".format(value.name, dim.dim_value))
+        dim.dim_param = batch_name
+
+    # 중간 tensor shape은 batch 1 기준이므로 지우고 다시 추론
+    del graph.value_info[:]
+    _remove_unused_initializers(graph)
+
+    onnx.checker.check_model(dynamic)
+    return onnx.shape_inference.infer_shapes(dynamic, strict_mode=True)
+
+
+def write_dynamic_variant(src, dst=None):
+    """ src onnx의 batch dynamic 모델을 dst(기본 dynamic_path(src))에 저장 (이미 dynamic이면 그대로 복사)
+    return:
+        dst(str)
+    """
+    import onnx
+
+    if not os.path.exists(src):
+        raise FileNotFoundError('Onnx file {} is not found'.format(src))
+    dst = dst or dynamic_path(src)
+    model = onnx.load(src)
+    onnx.save(model if has_dynamic_batch(model) else to_dynamic_batch(model), dst)
+    return dst
+
+
+def check_dynamic_variant(src, dst, batch=8, iters=20, seed=0, num_threads=0):
+    """ ONNX Runtime(CPU)으로 원래 모델에 하나씩 넣은 출력과 dynamic 모델에 batch로 넣은 출력을 비교
+    args:
+        src(str): 원래 onnx 경로 (batch 1)
+        dst(str): batch dynamic onnx 경로
+        batch(int): 한번에 넣을 batch
+        iters(int): 시간 측정 반복 횟수
+        seed(int): random seed
+        num_threads(int): ORT intra-op thread 수
+    return:
+        result(dict): 출력 최대 차이, batch 하나 처리 시간(ms, 하나씩 / 한번에), 배수
+    """
+    from engine.ort import create_session
+
+    original = create_session(src, num_threads)
+    variant = create_session(dst, num_threads)
+
+    rng = np.random.RandomState(seed)
+    dtypes = {'tensor(float)': np.float32, 'tensor(uint8)': np.uint8}
+    feeds = []
+    for inp in variant.get_inputs():
+        shape = [batch] + [ d if isinstance(d, int) else 1 for d in inp.shape[1:] ]
+        if dtypes[inp.type] == np.uint8:
+            feeds.append(rng.randint(0, 256, shape).astype(np.uint8))
+        else:
+            feeds.append(rng.standard_normal(shape).astype(np.float32))
+    names = [ inp.name for inp in variant.get_inputs() ]
+    batched = dict(zip(names, feeds))
+    singles = [ { name: feed[i:i + 1] for name, feed in zip(names, feeds) } for i in range(batch) ]
+
+    expected = [ np.concatenate(outputs) for outputs in zip(*[ original.run(None, feed) for feed in singles ]) ]
+    outputs = variant.run(None, batched)
+    diff = max(float(np.max(np.abs(a - b))) for a, b in zip(expected, outputs))
+
+    start = time.perf_counter()
+    for _ in range(iters):
+        for feed in singles:
+            original.run(None, feed)
+    single_ms = (time.perf_counter() - start) / iters * 1000
+
+    start = time.perf_counter()
+    for _ in range(iters):
+        variant.run(None, batched)
+    batch_ms = (time.perf_counter() - start) / iters * 1000
+
+    return {
+            'max_abs_diff': diff,
+            'single_ms': single_ms,
+            'batch_ms': batch_ms,
+            'speedup': single_ms / max(batch_ms, 1e-9),
+           }
+
+
+def _remove_unused_initializers(graph):
+    """ 어떤 node도 쓰지 않는 initializer 제거 (바꾸기 전 shape 상수) """
+    used = { name for node in graph.node for name in node.input } | { out.name for out in graph.output }
+    unused = [ init for init in graph.initializer if init.name not in used ]
+    for init in unused:
+        graph.initializer.remove(init)
+
+
+def fuse_exam_head(backbone, head):
+    """ exam backbone과 head를 한 graph로 합침 (원래 model들은 건드리지 않음)
+    args:
+        backbone(onnx.ModelProto): exam backbone (float32 NCHW 혹은 uint8 NHWC 입력)
+        head(onnx.ModelProto): head (입력 [zf, xf], 출력 [cls, loc])
+    return:
+        model(onnx.ModelProto): 입력 [zf, x], 출력 [cls, loc]인 모델 (onnx.checker 통과)
+    """
+    import onnx
+    from onnx import compose
+
+    if len(backbone.graph.output) != 1 or len(head.graph.input) != 2 or len(head.graph.output) != 2:
+        raise ValueError("expected a backbone with 1 output and a head with 2 inputs, 2 outputs")
+
+    # 두 graph의 tensor, node 이름이 겹치지 않도록 prefix를 붙여서 합침
+    xf_name = head.graph.input[1].name
+    fused = compose.merge_models(backbone, head, io_map=[(backbone.graph.output[0].name, xf_name)],
+                                 prefix1='exam/', prefix2='head/')
+    graph = fused.graph
+
+    renames = {
+               'head/' + head.graph.input[0].name: FUSED_INPUTS[0],
+               'exam/' + backbone.graph.input[0].name: FUSED_INPUTS[1],
+              }
+    renames.update({ 'head/' + out.name: name for out, name in zip(head.graph.output, FUSED_OUTPUTS) })
+    for node in graph.node:
+        node.input[:] = [ renames.get(name, name) for name in node.input ]
+        node.output[:] = [ renames.get(name, name) for name in node.output ]
+    for value in list(graph.input) + list(graph.output):
+        value.name = renames.get(value.name, value.name)
+
+    # 입력 순서는 head와 같이 [zf, x]
+    inputs = []
+    for value in sorted(graph.input, key=lambda value: FUSED_INPUTS.index(value.name)):
+        inputs.append(onnx.ValueInfoProto())
+        inputs[-1].CopyFrom(value)
+    del graph.input[:]
+    graph.input.extend(inputs)
+
+    onnx.checker.check_model(fused)
+    return fused
+
+
+def write_fused_exam_head(backbone_path, head_path, dst):
+    """ backbone_path, head_path를 합친 모델을 dst에 저장 """
+    import onnx
+
+    for path in (backbone_path, head_path):
+        if not os.path.exists(path):
+            raise FileNotFoundError('Onnx file {} is not found'.format(path))
+    onnx.save(fuse_exam_head(onnx.load(backbone_path), onnx.load(head_path)), dst)
+    return dst
@@ -0,0 +1,127 @@
+import numpy as np
+
+# VOT 평가 지표 (accuracy, robustness, EAO)
+# 모든 bbox는 [x, y, w, h], 모든 계산은 frame 축으로 vectorize 되어있음
+
+
+def iou(pred, gt):
+    """ frame별 IoU
+    args:
+        pred(np.ndarray): N * 4 [x, y, w, h]
+        gt(np.ndarray): N * 4 [x, y, w, h]
+    return:
+        iou(np.ndarray): N
+    """
+    pred = np.asarray(pred, np.float64).reshape(-1, 4)
+    gt = np.asarray(gt, np.float64).reshape(-1, 4)
+
+    x1 = np.maximum(pred[:, 0], gt[:, 0])
+    y1 = np.maximum(pred[:, 1], gt[:, 1])
+    x2 = np.minimum(pred[:, 0] + pred[:, 2], gt[:, 0] + gt[:, 2])
+    y2 = np.minimum(pred[:, 1] + pred[:, 3], gt[:, 1] + gt[:, 3])
+
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = pred[:, 2] * pred[:, 3] + gt[:, 2] * gt[:, 3] - inter
+
+    return np.where(union > 0, inter / np.maximum(union, 1e-12), 0.)
+
+
+def accuracy(overlaps):
+    """ 평가 대상 frame(NaN이 아닌 frame)의 평균 IoU
+    args:
+        overlaps(np.ndarray): N, init/skip/burn-in frame은 NaN
+    return:
+        accuracy(float)
+    """
+    overlaps = np.asarray(overlaps, np.float64)
+    valid = ~np.isnan(overlaps)
+    return float(overlaps[valid].mean()) if valid.any() else 0.
+
+
+def robustness(num_failures, num_frames, scale=100.):
+    """ scale frame당 failure 수 (낮을수록 좋음) """
+    return float(num_failures) / max(num_frames, 1) * scale
+
+
+def eao(fragments, interval):
+    """ Expected Average Overlap
+    args:
+        fragments(np.ndarray): F * L, 한 번의 init부터 다음 init 전까지의 frame별 IoU\n
+                               failure로 끝난 fragment는 L까지 0으로, 아니면 NaN으로 채워져 있음\n
+                               (첫 column은 init frame이라 평균에서 제외)
+        interval(tuple): (low, high), 평균을 낼 sequence 길이 구간
+    return:
+        eao(float), curve(np.ndarray): 길이별 expected overlap
+    """
+    fragments = np.asarray(fragments, np.float64)
+    if fragments.size == 0:
+        return 0., np.zeros(0)
+
+    values = fragments[:, 1:]
+    valid = ~np.isnan(values)
+
+    # 길이 i까지의 fragment별 평균 overlap을 누적합으로 한번에 계산
+    sums = np.cumsum(np.where(valid, values, 0.), axis=1)
+    counts = np.cumsum(valid, axis=1)
+    means = sums / np.maximum(counts, 1)
+
+    # 길이 i에 해당 frame이 존재하는 fragment만 평균
+    num = np.sum(np.where(valid, means, 0.), axis=0)
+    den = np.sum(valid, axis=0)
+    curve = np.concatenate([[0.], np.where(den > 0, num / np.maximum(den, 1), 0.)])
+
+    low, high = interval
+    high = min(high, len(curve) - 1)
+    if low > high:
+        return 0., curve
+    return float(curve[low:high + 1].mean()), curve
+
+
+def build_fragments(overlaps, inits, failures, length):
+    """ 한 sequence의 결과를 EAO용 fragment로 나눔
+    args:
+        overlaps(np.ndarray): N, frame별 IoU (NaN 포함 가능, 평가용으로 0/값만 사용)
+        inits(list): init한 frame 번호
+        failures(list): failure가 난 frame 번호
+        length(int): fragment 길이 L (interval의 high보다 커야 함)
+    return:
+        fragments(np.ndarray): len(inits) * L
+    """
+    overlaps = np.asarray(overlaps, np.float64)
+    fragments = np.full((len(inits), length), np.nan)
+    failures = np.asarray(failures, np.int64)
+
+    for i, start in enumerate(inits):
+        end = inits[i + 1] if i + 1 < len(inits) else len(overlaps)
+        fail = failures[(failures >= start) & (failures < end)]
+
+        if len(fail):
+            # failure까지만 값, 이후는 0 (tracker가 놓친 것으로 간주)
+            stop = fail[0] + 1
+            values = np.nan_to_num(overlaps[start:stop])
+            values = values[:length]
+            fragments[i, :len(values)] = values
+            fragments[i, len(values):] = 0.
+        else:
+            values = np.nan_to_num(overlaps[start:end])[:length]
+            fragments[i, :len(values)] = values
+
+    return fragments
+
+
+def latency_summary(latencies):
+    """ latency(ms) 분포 요약 """
+    latencies = np.asarray(latencies, np.float64)
+    if latencies.size == 0:
+        return {'count': 0}
+
+    p50, p90, p95, p99 = np.percentile(latencies, [50, 90, 95, 99])
+    return {
+            'count': int(latencies.size),
+            'mean': float(latencies.mean()),
+            'p50': float(p50),
+            'p90': float(p90),
+            'p95': float(p95),
+            'p99': float(p99),
+            'max': float(latencies.max()),
+           }
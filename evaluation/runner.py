@@ -0,0 +1,237 @@
+import json
+import multiprocessing
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+
+import numpy as np
+
+from core.config import config
+from core.config import TrackConfig
+from evaluation import metrics
+from loader.cache import FrameCache
+from loader.dataset import create_loader
+from loader.source import ImageSequenceSource
+
+# 화면 출력 없이 VOT(OTB, LaSOT) sequence를 돌려서 accuracy, robustness, EAO, latency를 계산하는 평가 엔진
+# sequence 단위로 worker process에 나눠서 돌리며, worker마다 Model(engine)을 따로 가짐
+
+_tracker = None # worker process마다 하나
+_cache   = None
+
+
+def load_sequences(path, format='vot', names=None):
+    """ dataset의 sequence를 평가용 형태로 하나씩 yield
+    args:
+        path(str): dataset 최상위 경로
+        format(str): 'vot', 'otb', 'lasot'
+        names(list): 평가할 sequence 이름 (None이면 전부)
+    return:
+        (name, frame 경로 list, gt N * 4 [x, y, w, h])
+        (frame cache는 worker에서 sequence별로 만들도록 여기선 경로만 넘김)
+    """
+    for seq in create_loader(format, path):
+        if names and seq.name not in names:
+            continue
+        num_frames = len(seq)
+        yield seq.name, seq.frames[:num_frames], seq.gt[:num_frames]
+
+
+def run_sequence(tracker, frames, gt,
+                 skip=config.VOT_SKIP_FRAMES, burnin=config.VOT_BURNIN_FRAMES):
+    """ sequence 하나를 supervised 방식으로 추적 (IoU가 0이 되면 failure, skip frame 뒤 gt로 재초기화)
+    args:
+        tracker(Tracker): 추적기
+        frames(list or np.ndarray): frame 경로, 혹은 decode된 frame 배열(FrameCache)
+        gt(np.ndarray): N * 4 [x, y, w, h]
+    return:
+        result(dict): frame별 결과(pred, overlaps, latency)와 요약
+    """
+    num_frames = len(gt)
+    valid_gt = np.all(np.isfinite(gt), axis=1) & (gt[:, 2] > 0) & (gt[:, 3] > 0)
+
+    pred      = np.full((num_frames, 4), np.nan)
+    latencies = np.full(num_frames, np.nan)
+    # 추론 없이 예측값을 쓴 frame (AdaptiveTracker)
+    skipped   = np.zeros(num_frames, bool)
+    inits, failures = [], []
+    next_init = 0
+
+    for j, (img, _) in enumerate(ImageSequenceSource(frames)):
+        if j < next_init:
+            continue
+
+        # 초기화 (gt가 없는 frame이면 다음 frame으로 미룸)
+        if j == next_init:
+            if not valid_gt[j]:
+                next_init += 1
+                continue
+            tracker.init(img, gt[j])
+            inits.append(j)
+            continue
+
+        start = time.perf_counter()
+        outputs = tracker.track(img)
+        latencies[j] = (time.perf_counter() - start) * 1000
+        pred[j] = outputs['bbox']
+        skipped[j] = outputs.get('skipped', False)
+
+        # failure 판정
+        if valid_gt[j] and metrics.iou(pred[j], gt[j])[0] <= 0:
+            failures.append(j)
+            next_init = j + skip
+
+    # frame별 IoU (추적한 frame만, init/skip frame은 NaN)
+    tracked = ~np.isnan(latencies) & valid_gt
+    overlaps = np.full(num_frames, np.nan)
+    overlaps[tracked] = metrics.iou(pred[tracked], gt[tracked])
+
+    # accuracy는 init 직후 burn-in frame을 제외
+    frame_ids = np.arange(num_frames)
+    burnin_mask = np.zeros(num_frames, bool)
+    for start in inits:
+        burnin_mask |= (frame_ids >= start) & (frame_ids < start + burnin)
+    acc_overlaps = np.where(burnin_mask, np.nan, overlaps)
+
+    return {
+            'pred': pred,
+            'overlaps': overlaps,
+            'latencies': latencies,
+            'skipped': skipped,
+            'inits': inits,
+            'failures': failures,
+            'summary': {
+                        'frames': int(num_frames),
+                        'accuracy': metrics.accuracy(acc_overlaps),
+                        'failures': len(failures),
+                        'robustness': metrics.robustness(len(failures), num_frames),
+                        'skip_ratio': float(skipped.sum() / max(np.sum(~np.isnan(latencies)), 1)),
+                        'latency_ms': metrics.latency_summary(latencies[~np.isnan(latencies)]),
+                       },
+           }
+
+
+def _init_worker(engine_paths, backend, cache_dir, adaptive=False):
+    """ worker process 초기화, process마다 Model을 하나씩 만듦 """
+    global _tracker, _cache
+    if adaptive:
+        from tracker.adaptive import AdaptiveTracker
+        kwargs = adaptive if isinstance(adaptive, dict) else {}
+        _tracker = AdaptiveTracker(*engine_paths, backend=backend, **kwargs)
+    else:
+        from tracker.tracker import Tracker
+        _tracker = Tracker(*engine_paths, backend=backend)
+    _cache = FrameCache(cache_dir) if cache_dir else None
+
+
+def _run_task(name, frames, gt, skip, burnin, track_config=None):
+    # memmap을 process 사이에 pickle하지 않도록 cache는 worker에서 연다
+    if _cache is not None:
+        frames = _cache.get(name, frames)
+    # worker의 Tracker는 task마다 재사용하므로 parameter를 매번 다시 정함 (None이면 config 값)
+    _tracker.track_config = track_config if track_config is not None else TrackConfig()
+    return name, run_sequence(_tracker, frames, gt, skip, burnin)
+
+
+def evaluate(sequences, engine_paths=("", "", ""), backend=None, num_workers=1,
+             skip=config.VOT_SKIP_FRAMES, burnin=config.VOT_BURNIN_FRAMES,
+             eao_interval=config.VOT_EAO_INTERVAL, cache_dir=None, adaptive=False, track_config=None):
+    """ 여러 sequence를 worker process pool에서 평가
+    args:
+        sequences(iterable): (name, frame 경로 list, gt N * 4), load_sequences 결과
+        engine_paths(tuple): (exam, temp, head) engine 경로, 비어있으면 backend 기본 경로
+        backend(str): 'trt', 'onnx', 'stub'
+        num_workers(int): worker process 수
+        cache_dir(str): 지정하면 decode된 frame을 FrameCache로 저장/재사용
+        adaptive(bool or dict): AdaptiveTracker(frame skipping)로 평가, dict면 AdaptiveTracker의 keyword (min_score 등)
+        track_config(TrackConfig): 추적 parameter. None이면 config 값
+    return:
+        results(dict): {'sequences': {name: result}, 'summary': 전체 요약}
+    """
+    start = time.perf_counter()
+    results = {}
+
+    # engine(CUDA context)을 fork로 물려받지 않도록 spawn 사용
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=context,
+                             initializer=_init_worker, initargs=(engine_paths, backend, cache_dir, adaptive)) as pool:
+        # sequence는 하나씩 읽으면서 바로 넘김
+        futures = []
+        for name, frames, gt in sequences:
+            futures.append(pool.submit(_run_task, name, frames, gt, skip, burnin, track_config))
+        for future in as_completed(futures):
+            name, result = future.result()
+            results[name] = result
+            summary = result['summary']
+            print("{:<20} acc {:.3f}  fail {:>3d}  p50 {:.2f} ms".format(
+                  name, summary['accuracy'], summary['failures'], summary['latency_ms'].get('p50', 0.)))
+
+    elapsed = time.perf_counter() - start
+    return {
+            'sequences': { name: results[name] for name in sorted(results) },
+            'summary': summarize(results, eao_interval, elapsed),
+           }
+
+
+def summarize(results, eao_interval=config.VOT_EAO_INTERVAL, elapsed=None):
+    """ sequence별 결과를 전체 지표로 합침 """
+    if not results:
+        return {}
+
+    num_frames = sum(r['summary']['frames'] for r in results.values())
+    num_failures = sum(r['summary']['failures'] for r in results.values())
+
+    # accuracy는 frame 수 가중 평균
+    acc_frames = np.array([ r['summary']['frames'] for r in results.values() ], np.float64)
+    acc_values = np.array([ r['summary']['accuracy'] for r in results.values() ], np.float64)
+
+    # EAO는 모든 sequence의 fragment를 모아서 계산
+    length = max(eao_interval[1] + 1, max(len(r['overlaps']) for r in results.values()))
+    fragments = [ metrics.build_fragments(r['overlaps'], r['inits'], r['failures'], length)
+                  for r in results.values() if r['inits'] ]
+    # init한 sequence가 하나도 없으면 fragment도 없음 (EAO 0)
+    fragments = np.concatenate(fragments) if fragments else np.empty((0, length))
+    eao, _ = metrics.eao(fragments, eao_interval)
+
+    latencies = np.concatenate([ r['latencies'][~np.isnan(r['latencies'])] for r in results.values() ])
+    num_skipped = sum(int(np.sum(r['skipped'])) for r in results.values())
+
+    summary = {
+               'sequences': len(results),
+               'frames': int(num_frames),
+               'accuracy': float(np.sum(acc_frames * acc_values) / max(acc_frames.sum(), 1)),
+               'failures': int(num_failures),
+               'robustness': metrics.robustness(num_failures, num_frames),
+               'eao': eao,
+               'skip_ratio': num_skipped / max(len(latencies), 1),
+               'latency_ms': metrics.latency_summary(latencies),
+              }
+    if elapsed is not None:
+        summary['wall_time_s'] = elapsed
+        summary['throughput_fps'] = num_frames / elapsed if elapsed > 0 else 0.
+    return summary
+
+
+def write_results(results, out_dir):
+    """ 결과 저장
+    out_dir/summary.json : 전체 및 sequence별 요약
+    out_dir/frames.npz   : sequence별 frame 단위 결과 ({name}/pred, overlaps, latencies, skipped)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    summary = {
+               'summary': results['summary'],
+               'sequences': { name: r['summary'] for name, r in results['sequences'].items() },
+              }
+    with open(os.path.join(out_dir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    arrays = {}
+    for name, r in results['sequences'].items():
+        for key in ('pred', 'overlaps', 'latencies', 'skipped'):
+            arrays['{}/{}'.format(name, key)] = r[key]
+        arrays['{}/failures'.format(name)] = np.asarray(r['failures'], np.int64)
+        arrays['{}/inits'.format(name)] = np.asarray(r['inits'], np.int64)
+    np.savez_compressed(os.path.join(out_dir, 'frames.npz'), **arrays)
@@ -0,0 +1,263 @@
+import itertools
+import json
+import multiprocessing
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+
+import numpy as np
+
+from core.config import config
+from core.config import TrackConfig
+from evaluation.runner import _init_worker
+from evaluation.runner import _run_task
+from evaluation.runner import summarize
+
+# 추적 parameter(TrackConfig : penalty_k, window_influence, lr, context_amount) sweep
+# (조합, sequence) 단위로 worker process pool에 나눠서 돌림. worker마다 Tracker(engine)는 하나이고 task마다 track_config만 바꿈
+# 끝난 (조합, sequence)는 checkpoint(json lines)에 바로 써두고, 다시 실행하면 남은 것만 돌림
+# 사용법 :
+#   trials = grid_search({'penalty_k': [0.1, 0.16], 'lr': [0.3, 0.4]})
+#   rows = run_sweep(list(load_sequences(path)), trials, backend='onnx', num_workers=4, checkpoint='sweep.jsonl')
+#   print(format_table(rows))
+
+SORT_KEYS = ('eao', 'accuracy', 'robustness')
+
+
+def grid_search(space):
+    """ 모든 조합
+    args:
+        space(dict): {parameter 이름: 값 list}
+    return:
+        trials(list): {parameter 이름: 값} list
+    """
+    _check_names(space)
+    names = sorted(space)
+    return [ dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names)) ]
+
+
+def random_search(space, num_trials, seed=0):
+    """ 범위 안에서 균등하게 뽑은 조합
+    args:
+        space(dict): {parameter 이름: (low, high)}
+        num_trials(int): 조합 수
+        seed(int): 같은 seed면 같은 조합 (resume할 때 같아야 함)
+    return:
+        trials(list): {parameter 이름: 값} list
+    """
+    _check_names(space)
+    rng = np.random.RandomState(seed)
+    names = sorted(space)
+    return [ { name: round(float(rng.uniform(*space[name])), 4) for name in names } for _ in range(num_trials) ]
+
+
+def trial_key(params):
+    """ 조합을 구분하는 문자열 (checkpoint key) """
+    return json.dumps({ name: float(value) for name, value in params.items() }, sort_keys=True)
+
+
+class SweepCheckpoint(object):
+    """ 끝난 (조합, sequence) 결과를 한 줄씩 이어 쓰는 json lines 파일\n
+    첫 줄은 sweep 조건(meta), 조건이 다른 sweep으로는 이어서 돌릴 수 없음 """
+
+    def __init__(self, path, meta):
+        """
+        args:
+            path(str): checkpoint 경로 (있으면 이어서 씀)
+            meta(dict): sweep 조건 (backend, engine, dataset 등)
+        """
+        self.path = path
+        self.done = {}
+
+        meta = json.loads(json.dumps(meta))
+        if os.path.exists(path):
+            self._load(meta)
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(json.dumps({'meta': meta}) + '\n')
+
+        self._file = open(path, 'a')
+
+    def _load(self, meta):
+        with open(self.path) as f:
+            lines = f.read().splitlines()
+
+        if not lines or json.loads(lines[0]).get('meta') != meta:
+            raise ValueError("checkpoint {} was written by a different sweep (다른 경로를 쓰거나 지우고 다시 실행)"
+                             .format(self.path))
+
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 쓰다가 죽은 마지막 줄
+                continue
+            self.done[(record['trial'], record['sequence'])] = _decode_result(record['result'])
+
+    def append(self, key, name, result):
+        self._file.write(json.dumps({'trial': key, 'sequence': name, 'result': _encode_result(result)}) + '\n')
+        self._file.flush()
+        self.done[(key, name)] = _decode_result(_encode_result(result))
+
+    def close(self):
+        self._file.close()
+
+
+def run_sweep(sequences, trials, engine_paths=("", "", ""), backend=None, num_workers=1,
+              checkpoint=None, cache_dir=None, skip=config.VOT_SKIP_FRAMES, burnin=config.VOT_BURNIN_FRAMES,
+              eao_interval=config.VOT_EAO_INTERVAL, sort='eao', meta=None):
+    """ 조합마다 모든 sequence를 평가하고 순위를 매김
+    args:
+        sequences(list): (name, frame 경로 list, gt N * 4), load_sequences 결과 (조합마다 다시 쓰므로 list)
+        trials(list): {parameter 이름: 값} list, grid_search / random_search 결과
+        engine_paths, backend, num_workers, cache_dir, skip, burnin, eao_interval: evaluation.runner.evaluate와 같음
+        checkpoint(str): checkpoint 경로. None이면 저장하지 않음
+        sort(str): 순위 기준 'eao', 'accuracy', 'robustness'
+        meta(dict): checkpoint에 같이 기록할 sweep 조건 (dataset 경로 등)
+    return:
+        rows(list): 순위 순서대로 {'rank', 'params', 'summary', 'pareto'}
+    """
+    sequences = list(sequences)
+    keys = [ trial_key(params) for params in trials ]
+
+    ckpt = None
+    if checkpoint:
+        ckpt = SweepCheckpoint(checkpoint, dict(meta or {}, backend=backend, engine_paths=list(engine_paths),
+                                                skip=skip, burnin=burnin,
+                                                sequences=[name for name, _, _ in sequences]))
+    done = ckpt.done if ckpt is not None else {}
+
+    tasks = [ (key, params, seq) for key, params in zip(keys, trials) for seq in sequences
+              if (key, seq[0]) not in done ]
+    print("sweep : {} trials * {} sequences, {} done, {} to run".format(
+          len(trials), len(sequences), len(trials) * len(sequences) - len(tasks), len(tasks)))
+
+    results = { key: {} for key in keys }
+    for (key, name), result in done.items():
+        if key in results:
+            results[key][name] = result
+
+    try:
+        if tasks:
+            start = time.perf_counter()
+            # engine(CUDA context)을 fork로 물려받지 않도록 spawn 사용
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=num_workers, mp_context=context, initializer=_init_worker,
+                                     initargs=(engine_paths, backend, cache_dir)) as pool:
+                futures = { pool.submit(_run_task, name, frames, gt, skip, burnin, TrackConfig(**params)): key
+                            for key, params, (name, frames, gt) in tasks }
+                for i, future in enumerate(as_completed(futures), 1):
+                    key = futures[future]
+                    name, result = future.result()
+                    results[key][name] = result
+                    if ckpt is not None:
+                        ckpt.append(key, name, result)
+                    if i % max(len(tasks) // 20, 1) == 0 or i == len(tasks):
+                        print("[{}/{}] {:.0f}s".format(i, len(tasks), time.perf_counter() - start))
+    finally:
+        if ckpt is not None:
+            ckpt.close()
+
+    rows = [ {'params': params, 'summary': summarize(results[key], eao_interval)}
+             for key, params in zip(keys, trials) ]
+    return rank(rows, sort)
+
+
+def rank(rows, sort='eao'):
+    """ 순위를 매기고, accuracy(높을수록) - robustness(낮을수록) Pareto front에 있는지 표시
+    args:
+        rows(list): {'params', 'summary'}
+        sort(str): 'eao', 'accuracy', 'robustness'
+    return:
+        rows(list): 순위 순서대로, 'rank', 'pareto' 추가
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError("unknown sort key : {} (가능 : {})".format(sort, SORT_KEYS))
+
+    for row in rows:
+        acc, rob = row['summary']['accuracy'], row['summary']['robustness']
+        row['pareto'] = not any(other['summary']['accuracy'] >= acc and other['summary']['robustness'] <= rob and
+                                (other['summary']['accuracy'] > acc or other['summary']['robustness'] < rob)
+                                for other in rows)
+
+    # 나머지 지표로 동점 처리
+    if sort == 'robustness':
+        order = lambda row: (row['summary']['robustness'], -row['summary']['eao'], -row['summary']['accuracy'])
+    elif sort == 'accuracy':
+        order = lambda row: (-row['summary']['accuracy'], row['summary']['robustness'], -row['summary']['eao'])
+    else:
+        order = lambda row: (-row['summary']['eao'], row['summary']['robustness'], -row['summary']['accuracy'])
+
+    rows = sorted(rows, key=order)
+    for i, row in enumerate(rows, 1):
+        row['rank'] = i
+    return rows
+
+
+def format_table(rows, top=None):
+    """ 순위 표 (Pareto front는 '*') """
+    if not rows:
+        return ""
+
+    names = sorted(rows[0]['params'])
+    lines = ["{:>4} {} | {:>8} {:>10} {:>8} {:>6}".format(
+             "rank", " ".join("{:>16}".format(name) for name in names), "acc", "robustness", "EAO", "fail")]
+    for row in rows[:top]:
+        summary = row['summary']
+        lines.append("{:>3}{} {} | {:>8.3f} {:>10.3f} {:>8.3f} {:>6d}".format(
+                     row['rank'], '*' if row['pareto'] else ' ',
+                     " ".join("{:>16.4g}".format(row['params'][name]) for name in names),
+                     summary['accuracy'], summary['robustness'], summary['eao'], summary['failures']))
+    return "\n".join(lines)
+
+
+def write_sweep(rows, out_dir):
+    """ 결과 저장
+    out_dir/sweep.json : 순위 순서대로 조합, 요약
+    out_dir/sweep.csv  : 표 (rank, parameter, accuracy, robustness, eao, failures, pareto)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, 'sweep.json'), 'w') as f:
+        json.dump(rows, f, indent=2)
+
+    if not rows:
+        return
+    names = sorted(rows[0]['params'])
+    with open(os.path.join(out_dir, 'sweep.csv'), 'w') as f:
+        f.write(",".join(['rank'] + names + ['accuracy', 'robustness', 'eao', 'failures', 'pareto']) + '\n')
+        for row in rows:
+            summary = row['summary']
+            f.write(",".join(str(v) for v in [row['rank']] + [row['params'][name] for name in names] +
+                             [summary['accuracy'], summary['robustness'], summary['eao'], summary['failures'],
+                              int(row['pareto'])]) + '\n')
+
+
+def _check_names(space):
+    unknown = set(space) - set(TrackConfig.FIELDS)
+    if unknown:
+        raise KeyError("unknown track parameter : {} (가능 : {})".format(sorted(unknown), tuple(TrackConfig.FIELDS)))
+
+
+# summarize에 필요한 것만 checkpoint에 저장 (pred는 저장하지 않음)
+_ARRAY_KEYS = ('overlaps', 'latencies', 'skipped')
+
+
+def _encode_result(result):
+    encoded = { key: np.asarray(result[key], np.float64).tolist() for key in _ARRAY_KEYS }
+    encoded['inits'] = [ int(i) for i in result['inits'] ]
+    encoded['failures'] = [ int(i) for i in result['failures'] ]
+    encoded['summary'] = result['summary']
+    return encoded
+
+
+def _decode_result(encoded):
+    result = dict(encoded)
+    for key in _ARRAY_KEYS:
+        result[key] = np.asarray(encoded[key], np.float64)
+    result['skipped'] = result['skipped'].astype(bool)
+    return result
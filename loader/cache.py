@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+# decode된 frame을 sequence별로 디스크에 memmap(uint8, N * H * W * 3)으로 저장해 두는 cache
+# 다음 실행부터는 JPEG decode 없이 memmap의 view를 바로 넘겨줌
+# 원본 파일의 mtime, size가 바뀌면 다시 만듦
+
+CACHE_VERSION = 1
+
+
+class FrameCache(object):
+    """ sequence 단위 decoded frame cache\n
+    {cache_dir}/{key}.npy(memmap) + {key}.json(index) 형태로 저장 """
+
+    def __init__(self, cache_dir, num_workers=4):
+        """
+        args:
+            cache_dir(str): cache 저장 경로
+            num_workers(int): cache 생성 시 decode thread 수
+        """
+        self.cache_dir = cache_dir
+        self.num_workers = num_workers
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _key(self, name, frame_paths):
+        """ sequence 이름 + 파일 목록으로 cache 파일 이름 결정 """
+        digest = hashlib.sha1('\n'.join(os.path.abspath(p) for p in frame_paths).encode()).hexdigest()[:12]
+        return '{}-{}'.format(name, digest)
+
+    def _stat(self, frame_paths):
+        """ 파일별 [mtime_ns, size] """
+        stats = []
+        for path in frame_paths:
+            st = os.stat(path)
+            stats.append([st.st_mtime_ns, st.st_size])
+        return stats
+
+    def get(self, name, frame_paths):
+        """ sequence의 frame을 memmap으로 반환 (없거나 오래됐으면 만듦)
+        args:
+            name(str): sequence 이름
+            frame_paths(list): frame 경로 (순서대로)
+        return:
+            frames(np.memmap): N * H * W * 3 uint8, 읽기 전용
+        """
+        frame_paths = list(frame_paths)
+        key = self._key(name, frame_paths)
+        data_path = os.path.join(self.cache_dir, key + '.npy')
+        index_path = os.path.join(self.cache_dir, key + '.json')
+
+        stats = self._stat(frame_paths)
+        if not self._is_valid(data_path, index_path, stats):
+            self._build(frame_paths, stats, data_path, index_path)
+
+        return np.load(data_path, mmap_mode='r')
+
+    def _is_valid(self, data_path, index_path, stats):
+        if not (os.path.exists(data_path) and os.path.exists(index_path)):
+            return False
+
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+
+        return index.get('version') == CACHE_VERSION and index.get('files') == stats
+
+    def _build(self, frame_paths, stats, data_path, index_path):
+        """ frame을 decode해서 memmap 파일로 저장 (임시 파일에 쓰고 rename) """
+        first = cv2.imread(frame_paths[0])
+        if first is None:
+            raise FileNotFoundError('Image file {} is not found'.format(frame_paths[0]))
+
+        shape = (len(frame_paths),) + first.shape
+        tmp_path = data_path + '.tmp'
+        frames = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=shape)
+
+        def decode(i):
+            img = cv2.imread(frame_paths[i])
+            if img is None:
+                raise FileNotFoundError('Image file {} is not found'.format(frame_paths[i]))
+            if img.shape != first.shape:
+                raise ValueError("sequence 안의 frame 크기가 다릅니다 : {}".format(frame_paths[i]))
+            frames[i] = img
+
+        # cv2.imread는 GIL을 풀어주므로 thread pool로 decode
+        with ThreadPoolExecutor(max_workers=self.num_workers) as pool:
+            list(pool.map(decode, range(len(frame_paths))))
+
+        frames.flush()
+        del frames
+        os.replace(tmp_path, data_path)
+
+        # index는 data를 다 쓴 다음에 기록 (중간에 죽으면 다음 실행에서 다시 만듦)
+        with open(index_path, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'shape': list(shape), 'files': stats}, f)
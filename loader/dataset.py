@@ -0,0 +1,171 @@
+import glob
+import os
+import re
+
+import numpy as np
+
+from loader.cache import FrameCache
+
+# tracking dataset loader 공통 부분
+# sequence는 필요할 때 하나씩 만들어서 넘겨주고 (lazy),
+# frame 목록과 ground truth는 sequence가 실제로 쓰일 때 읽음
+# ground truth는 파일 전체를 한번에 numpy로 읽어서 N * 4 [x, y, w, h] 배열로 변환함
+
+_SEPARATOR = re.compile(r'[\s,]+')
+
+
+def load_gt(gt_file):
+    """ ground truth 파일을 한번에 읽어서 N * C 배열로 반환 (구분자 ',', tab, space 모두 허용)
+    args:
+        gt_file(str): ground truth 파일 경로
+    return:
+        gt(np.ndarray): N * C float64 (NaN 표기 허용)
+    """
+    with open(gt_file, 'r') as f:
+        lines = f.read().strip().splitlines()
+
+    if not lines:
+        return np.zeros((0, 4))
+
+    num_cols = len(_SEPARATOR.split(lines[0].strip()))
+    values = np.array(_SEPARATOR.split(' '.join(lines).strip()), dtype=np.float64)
+    return values.reshape(-1, num_cols)
+
+
+def polygon_to_xywh(polygon, offset=1.):
+    """ 다각형(ax, ay, bx, by, ...) -> 외접 사각형 [x, y, w, h]
+    args:
+        polygon(np.ndarray): N * 2K
+        offset(float): 좌표계 보정 (1-based -> 0-based)
+    """
+    xs = polygon[:, 0::2]
+    ys = polygon[:, 1::2]
+    x1 = xs.min(axis=1) - offset
+    y1 = ys.min(axis=1) - offset
+    x2 = xs.max(axis=1) - offset
+    y2 = ys.max(axis=1) - offset
+    return np.stack([x1, y1, x2 - x1, y2 - y1], axis=1)
+
+
+def rect_to_xywh(rect, offset=1.):
+    """ [x, y, w, h](1-based) -> [x, y, w, h](0-based) """
+    xywh = np.array(rect[:, :4], dtype=np.float64)
+    xywh[:, :2] -= offset
+    return xywh
+
+
+class Sequence(object):
+    """ sequence 하나. frames와 gt는 처음 접근할 때 읽음 """
+
+    def __init__(self, loader, name, path):
+        self.loader = loader
+        self.name = name
+        self.path = path
+        self._frames = None
+        self._gt = None
+
+    @property
+    def frames(self):
+        """ frame 경로 list (cache를 쓰면 N * H * W * 3 uint8 memmap) """
+        if self._frames is None:
+            self._frames = self.loader._load_frames(self)
+        return self._frames
+
+    @property
+    def gt(self):
+        """ ground truth, N * 4 [x, y, w, h] (0-based) """
+        if self._gt is None:
+            self._gt = self.loader._load_gt(self)
+        return self._gt
+
+    def __len__(self):
+        return min(len(self.frames), len(self.gt))
+
+    def __repr__(self):
+        return "Sequence({})".format(self.name)
+
+
+class DatasetLoader(object):
+    """ tracking dataset loader Interface 클래스\n
+    for seq in loader: 형태로 sequence를 하나씩 넘겨줌 (전체를 미리 읽지 않음) """
+
+    frame_pattern = "*.jpg"
+
+    def __init__(self, path, cache_dir=None):
+        """
+        args:
+            path(str): dataset 최상위 경로
+            cache_dir(str): 지정하면 decode된 frame을 memmap cache로 저장해두고,
+                            frame 경로 대신 cache의 view(N * H * W * 3 uint8)를 반환함
+        """
+        self.path = path
+        self.cache = FrameCache(cache_dir) if cache_dir else None
+
+        if not os.path.isdir(self.path):
+            raise ValueError("디렉토리가 아닙니다~")
+
+    def _sequence_dirs(self):
+        """ (이름, 경로)를 하나씩 yield (상속해서 구현) """
+        raise NotImplementedError
+
+    def _frame_dir(self, seq):
+        return seq.path
+
+    def _gt_file(self, seq):
+        raise NotImplementedError
+
+    def _convert_gt(self, gt):
+        """ 파일에서 읽은 N * C 배열 -> N * 4 [x, y, w, h] (상속해서 구현) """
+        raise NotImplementedError
+
+    def _load_frames(self, seq):
+        frames = sorted(glob.glob(os.path.join(self._frame_dir(seq), self.frame_pattern)))
+        if self.cache is not None and frames:
+            return self.cache.get(seq.name, frames)
+        return frames
+
+    def _load_gt(self, seq):
+        return self._convert_gt(load_gt(self._gt_file(seq)))
+
+    def __iter__(self):
+        for name, path in self._sequence_dirs():
+            yield Sequence(self, name, path)
+
+    def names(self):
+        return [ name for name, _ in self._sequence_dirs() ]
+
+    def get(self, name):
+        """ 이름으로 sequence 하나를 가져옴 """
+        for seq_name, path in self._sequence_dirs():
+            if seq_name == name:
+                return Sequence(self, seq_name, path)
+        raise KeyError(name)
+
+    def _subdirs(self, path):
+        """ path 예하의 디렉토리를 이름순으로 """
+        return sorted(entry.name for entry in os.scandir(path) if entry.is_dir())
+
+
+# dataset 형식 이름 -> (module, class)
+FORMATS = {
+    'vot':   ('loader.vot', 'VotLoader'),
+    'otb':   ('loader.otb', 'OtbLoader'),
+    'lasot': ('loader.lasot', 'LasotLoader'),
+}
+
+
+def create_loader(format, path, cache_dir=None):
+    """ 형식 이름에 맞는 DatasetLoader를 생성
+    args:
+        format(str): 'vot', 'otb', 'lasot'
+        path(str): dataset 최상위 경로
+        cache_dir(str): FrameCache 경로 (선택)
+    return:
+        loader(DatasetLoader)
+    """
+    if format not in FORMATS:
+        raise ValueError("지원하지 않는 dataset 형식입니다 : {} (가능 : {})".format(format, tuple(FORMATS)))
+
+    import importlib
+    module, name = FORMATS[format]
+    return getattr(importlib.import_module(module), name)(path, cache_dir)
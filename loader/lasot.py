@@ -0,0 +1,26 @@
+import os
+
+from loader.dataset import DatasetLoader
+from loader.dataset import rect_to_xywh
+
+class LasotLoader(DatasetLoader):
+    """ LaSOT 데이터 로딩해주는 클래스\n
+    {최상위 경로}/{airplane,bear...}/{airplane-1,...}/{img/*.jpg,groundtruth.txt}의 형태로 배치되어있어야함\n
+    groundtruth.txt는 x, y, w, h (1-based)
+    """
+
+    def _sequence_dirs(self):
+        # category -> sequence 2단 구조, 하나씩 훑으면서 yield
+        for category in self._subdirs(self.path):
+            category_path = os.path.join(self.path, category)
+            for name in self._subdirs(category_path):
+                yield name, os.path.join(category_path, name)
+
+    def _frame_dir(self, seq):
+        return os.path.join(seq.path, 'img')
+
+    def _gt_file(self, seq):
+        return os.path.join(seq.path, 'groundtruth.txt')
+
+    def _convert_gt(self, gt):
+        return rect_to_xywh(gt)
@@ -0,0 +1,32 @@
+import glob
+import os
+
+from loader.dataset import DatasetLoader
+from loader.dataset import rect_to_xywh
+
+class OtbLoader(DatasetLoader):
+    """ OTB 데이터 로딩해주는 클래스\n
+    {최상위 경로}/{Basketball,Bolt...}/{img/*.jpg,groundtruth_rect.txt}의 형태로 배치되어있어야함\n
+    groundtruth_rect.txt는 x, y, w, h (1-based, 구분자는 ',', tab, space)
+    """
+
+    def _sequence_dirs(self):
+        for name in self._subdirs(self.path):
+            yield name, os.path.join(self.path, name)
+
+    def _frame_dir(self, seq):
+        return os.path.join(seq.path, 'img')
+
+    def _gt_file(self, seq):
+        gt_file = os.path.join(seq.path, 'groundtruth_rect.txt')
+        if os.path.exists(gt_file):
+            return gt_file
+
+        # Jogging, Skating2 처럼 target이 여럿이면 첫번째 target 사용
+        candidates = sorted(glob.glob(os.path.join(seq.path, 'groundtruth_rect*.txt')))
+        if not candidates:
+            raise FileNotFoundError('Groundtruth file in {} is not found'.format(seq.path))
+        return candidates[0]
+
+    def _convert_gt(self, gt):
+        return rect_to_xywh(gt)
@@ -0,0 +1,255 @@
+import queue
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from core.config import config
+
+# 추론 thread와 decode를 분리하기 위한 frame source
+# decode는 background thread에서 수행해서 bounded queue에 쌓고, 추론 쪽은 꺼내 쓰기만 함
+#  - live camera : latest-only (queue가 차면 가장 오래된 frame을 버림)
+#  - video/image : lossless (queue가 차면 decode thread가 기다림)
+
+_END = object() # stream 끝을 알리는 sentinel
+
+
+class FrameStats(object):
+    """ FrameSource별 decode 통계 """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.decoded = 0
+        self.dropped = 0
+        self.decode_time = 0.0
+        self.decode_time_max = 0.0
+
+    def add_decode(self, elapsed):
+        with self.lock:
+            self.decoded += 1
+            self.decode_time += elapsed
+            self.decode_time_max = max(self.decode_time_max, elapsed)
+
+    def add_drop(self):
+        with self.lock:
+            self.dropped += 1
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                    'decoded': self.decoded,
+                    'dropped': self.dropped,
+                    'decode_ms_mean': self.decode_time / self.decoded * 1000 if self.decoded else 0.0,
+                    'decode_ms_max': self.decode_time_max * 1000,
+                   }
+
+
+class FrameSource(object):
+    """ background thread에서 frame을 decode해서 bounded queue로 넘겨주는 Interface 클래스\n
+    for frame, timer in source: 형태로 사용 (main.get_frames와 동일한 형태)\n
+    timer는 frame을 꺼내간 시점의 cv2.getTickCount() """
+
+    def __init__(self, queue_size=4, drop_oldest=False):
+        """
+        args:
+            queue_size(int): decode해서 쌓아둘 최대 frame 수
+            drop_oldest(bool): True면 queue가 찼을 때 가장 오래된 frame을 버림 (live용),
+                               False면 decode thread가 기다림 (lossless, file용)
+        """
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.drop_oldest = drop_oldest
+        self.stats = FrameStats()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _decode(self):
+        """ frame을 하나씩 decode해서 yield하는 generator (상속해서 구현)\n
+        decode 시간은 구현에서 self.stats.add_decode로 기록 """
+        raise NotImplementedError
+
+    def _close(self):
+        """ 자원 해제 (상속해서 필요 시 구현) """
+        pass
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            # 기다리고 있는 put이 빠져나오도록 queue를 비움
+            while self.thread.is_alive():
+                self._drain()
+                self.thread.join(timeout=0.05)
+            self.thread = None
+        self._close()
+
+    def _drain(self):
+        try:
+            while True:
+                self.queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _put(self, item):
+        """ 정책에 맞게 queue에 넣음. stop되면 False 반환 """
+        while not self.stop_event.is_set():
+            if self.drop_oldest:
+                try:
+                    self.queue.put_nowait(item)
+                    return True
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait()
+                        self.stats.add_drop()
+                    except queue.Empty:
+                        pass
+            else:
+                try:
+                    self.queue.put(item, timeout=0.05)
+                    return True
+                except queue.Full:
+                    pass
+        return False
+
+    def _run(self):
+        try:
+            for frame in self._decode():
+                if not self._put(frame):
+                    return
+        except Exception as e:
+            # decode thread의 에러는 소비하는 쪽에서 다시 raise
+            self._put(e)
+            return
+        self._put(_END)
+
+    def __iter__(self):
+        self.start()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item, cv2.getTickCount()
+        finally:
+            self.stop()
+
+    def qsize(self):
+        return self.queue.qsize()
+
+    def get_stats(self):
+        stats = self.stats.to_dict()
+        stats['queue_depth'] = self.qsize()
+        return stats
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class CaptureSource(FrameSource):
+    """ cv2.VideoCapture(webcam, video file) 기반 FrameSource """
+
+    def __init__(self, target, queue_size=4, drop_oldest=False):
+        super().__init__(queue_size, drop_oldest)
+        self.cap = cv2.VideoCapture(target)
+
+    @property
+    def fps(self):
+        return self.cap.get(cv2.CAP_PROP_FPS)
+
+    @property
+    def frame_size(self):
+        """ (width, height) """
+        return (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def _decode(self):
+        while True:
+            start = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            self.stats.add_decode(time.perf_counter() - start)
+            yield frame
+
+    def _close(self):
+        self.cap.release()
+
+
+class CameraSource(CaptureSource):
+    """ webcam FrameSource, 기본은 latest-only (추론이 느리면 오래된 frame을 버림) """
+
+    def __init__(self, index=0, resolution="FHD", queue_size=1, drop_oldest=True, warmup=5):
+        super().__init__(index, queue_size, drop_oldest)
+
+        width, height = config.RESOLUTION_PRESET[resolution]
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+        # warm up
+        for i in range(warmup):
+            self.cap.read()
+
+
+class VideoFileSource(CaptureSource):
+    """ video file FrameSource, 기본은 lossless """
+
+    def __init__(self, path, queue_size=8, drop_oldest=False):
+        super().__init__(path, queue_size, drop_oldest)
+        if not self.cap.isOpened():
+            raise FileNotFoundError('Video file {} is not found'.format(path))
+
+
+class ImageSequenceSource(FrameSource):
+    """ image 경로 목록 FrameSource, 항상 lossless\n
+    cv2.imread는 GIL을 풀어주므로 thread pool로 여러 장을 동시에 decode하고, 순서대로 넘겨줌\n
+    이미 decode된 frame 배열(FrameCache의 memmap 등)을 넣으면 decode 없이 view를 그대로 넘겨줌 """
+
+    def __init__(self, paths, queue_size=8, num_workers=4):
+        super().__init__(queue_size, drop_oldest=False)
+        self.decoded = isinstance(paths, np.ndarray)
+        self.paths = paths if self.decoded else list(paths)
+        self.num_workers = num_workers
+
+    def _imread(self, path):
+        start = time.perf_counter()
+        img = cv2.imread(path)
+        if img is None:
+            raise FileNotFoundError('Image file {} is not found'.format(path))
+        self.stats.add_decode(time.perf_counter() - start)
+        return img
+
+    def _decode(self):
+        if self.decoded:
+            for frame in self.paths:
+                yield frame
+            return
+
+        # queue에 쌓인 것 + worker 수 만큼만 미리 decode (메모리 제한)
+        in_flight = self.queue.maxsize + self.num_workers
+        with ThreadPoolExecutor(max_workers=self.num_workers) as pool:
+            futures = []
+            for path in self.paths:
+                futures.append(pool.submit(self._imread, path))
+                if len(futures) >= in_flight:
+                    yield futures.pop(0).result()
+                if self.stop_event.is_set():
+                    break
+            for future in futures:
+                if self.stop_event.is_set():
+                    future.cancel()
+                    continue
+                yield future.result()
+
+    def __len__(self):
+        return len(self.paths)
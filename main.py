@@ -2,161 +2,336 @@
 # 기존의 구조를 그대로 가져가고 싶음. 단, trt engine 따로, image 처리 등을 위한 객체 따로...
 # trt를 실행시키는 방법부터 고민해보자.
 
+import argparse
+import contextlib
+import glob
+import json
+import os
+import sys
+import time
+
 import cv2
+import numpy as np
 
+from core.config import config
 from tracker.tracker import Tracker
-from loader.vot import VotLoader
+from tracker.adaptive import AdaptiveTracker
+from loader.dataset import create_loader
+from loader.dataset import load_gt
+from loader.dataset import polygon_to_xywh
+from loader.source import CameraSource
+from loader.source import VideoFileSource
+from loader.source import ImageSequenceSource
+from evaluation import metrics
+from utils.profiler import profiler
+from utils.output import OutputStage
 
 def get_frames(video_name, resolution="FHD"):
-    preset = {
-        "UHD": (3840, 2160),
-        "QHD": (2560, 1440),
-        "FHD": (1920, 1080),
-        "HD":  (1280, 720),
-        "VGA": (640, 480)
-    }
-
+    """ webcam frame을 background thread에서 decode해서 넘겨줌 (latest-only, 밀린 frame은 버림) """
     if isinstance(video_name, int):
-        cap = cv2.VideoCapture(video_name)
+        index = video_name
     elif video_name == 'webcam':
-        cap = cv2.VideoCapture(0)
-
-    width, height = preset[resolution]
-
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-
-    # warm up
-    for i in range(5):
-        cap.read()
-    
-    while True:
-        ret, frame = cap.read()
-        timer = cv2.getTickCount()
-        if ret:
-            yield frame, timer
-        else:
-            break
-
-
-def trackLive(tracker):
-    video_name = 0
+        index = 0
+
+    return CameraSource(index, resolution)
+
+
+def select_roi(frame):
+    """ 화면에서 init bbox를 선택 (headless에서는 --bbox, --bbox-file로 넘겨야 함) """
+    try:
+        init_bbox = cv2.selectROI('Select ROI', frame, False, False)
+        cv2.destroyAllWindows()
+    except:
+        exit()
+    return init_bbox
+
+
+def load_bbox(text=None, path=None):
+    """ init bbox를 인자('x,y,w,h') 혹은 파일(첫 줄, x,y,w,h 혹은 VOT 다각형)에서 읽음
+    return:
+        bbox(list): [x, y, w, h], 둘 다 없으면 None
+    """
+    if text:
+        values = [ float(v) for v in text.replace(' ', '').split(',') ]
+        if len(values) != 4:
+            raise ValueError("bbox는 x,y,w,h 입니다 : {}".format(text))
+        return values
+    if path:
+        if not os.path.exists(path):
+            raise FileNotFoundError('bbox file {} is not found'.format(path))
+        gt = load_gt(path)
+        if len(gt) == 0:
+            raise ValueError("bbox file {} is empty".format(path))
+        if gt.shape[1] == 4:
+            return [ float(v) for v in gt[0] ]
+        if gt.shape[1] >= 6 and gt.shape[1] % 2 == 0:
+            return [ float(v) for v in polygon_to_xywh(gt[:1])[0] ]
+        raise ValueError("bbox file {} must have 4 values (x,y,w,h) or a polygon".format(path))
+    return None
+
+
+class JsonLinesWriter(object):
+    """ frame별 결과를 한 줄에 json 하나씩 씀 (batch pipeline용, 매 줄 flush) """
+
+    def __init__(self, path='-'):
+        """
+        args:
+            path(str): 저장 경로, '-'면 stdout
+        """
+        self.file = sys.stdout if path == '-' else open(path, 'w')
+
+    def write(self, record):
+        self.file.write(json.dumps(record, default=_to_builtin) + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout and self.file is not sys.__stdout__:
+            self.file.close()
+
+
+def _to_builtin(value):
+    """ numpy 값을 json으로 쓸 수 있게 변환 """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError("{} is not JSON serializable".format(type(value)))
+
+
+def _frame_record(frame_idx, outputs, timings):
+    return {
+            'frame': frame_idx,
+            'bbox': [ round(float(v), 3) for v in outputs['bbox'] ],
+            'best_score': round(float(outputs['best_score']), 5),
+            'skipped': bool(outputs.get('skipped', False)),
+            'timings': { name: round(value, 3) for name, value in timings.items() },
+           }
+
+
+def draw(frame, bbox, timer, color=(0, 255, 0)):
+    """ 추적 결과와 FPS를 frame에 그림 """
+    with profiler.span('draw'):
+        bbox = list(map(int, bbox))
+        cv2.rectangle(frame, (bbox[0], bbox[1]),
+                             (bbox[0] + bbox[2], bbox[1] + bbox[3]),
+                             color, 3)
+        fps = cv2.getTickFrequency() / (cv2.getTickCount() - timer)
+        cv2.putText(frame, "FPS : " + str(int(fps)), (100, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.75, (255, 0, 0), 2)
+
+
+def trackLive(tracker, camera=0, resolution="FHD", init_bbox=None, show=True, writer=None, max_frames=None):
+    """
+    args:
+        tracker(Tracker): 추적기
+        camera(int): webcam 번호
+        resolution(str): 해상도 preset
+        init_bbox(list): 첫 frame의 [x, y, w, h]. None이면 화면에서 선택
+        show(bool): 화면에 보여줄지 (False면 그리지도 않음)
+        writer(JsonLinesWriter): frame별 결과, timing을 기록
+        max_frames(int): 이만큼 처리하고 종료 (None이면 계속)
+    """
     first = True
 
-    for frame, timer in get_frames(video_name):
+    for frame_idx, (frame, timer) in enumerate(get_frames(camera, resolution)):
         # init
         if first: 
-            try:
-                init_bbox = cv2.selectROI('Select ROI', frame, False, False)
-                cv2.destroyAllWindows()
-            except:
-                exit()
-            
+            if init_bbox is None:
+                init_bbox = select_roi(frame)
+
             tracker.init(frame, init_bbox)
             first = False
+            if writer is not None:
+                writer.write({'frame': frame_idx, 'init': [ float(v) for v in init_bbox ]})
         # track
         else:
+            start = time.perf_counter()
             outputs = tracker.track(frame)
 
-            bbox = list(map(int, outputs['bbox']))
-            cv2.rectangle(frame, (bbox[0], bbox[1]),
-                                 (bbox[0] + bbox[2], bbox[1] + bbox[3]),
-                                 (0, 255, 0), 3)
-            fps = cv2.getTickFrequency() / (cv2.getTickCount() - timer)
-            cv2.putText(frame, "FPS : " + str(int(fps)), (100, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.75, (255, 0, 0), 2)
-        # show
-        cv2.imshow('Tracking', frame)
-        cv2.waitKey(1)
+            if writer is not None:
+                timings = {'track': (time.perf_counter() - start) * 1000,
+                           'latency': (cv2.getTickCount() - timer) / cv2.getTickFrequency() * 1000}
+                writer.write(_frame_record(frame_idx, outputs, timings))
 
+            if show:
+                draw(frame, outputs['bbox'], timer)
+        # show
+        if show:
+            with profiler.span('show'):
+                cv2.imshow('Tracking', frame)
+                cv2.waitKey(1)
 
-def trackVideo(tracker, video_path, save_video=False):
-    cap = cv2.VideoCapture(video_path)
-    first = True
-
-    if save_video:
-        print('Save Video Path : ', './out.mp4')
-        outVideo = cv2.VideoWriter('./out.mp4',
-                                   cv2.VideoWriter_fourcc(*'mp4v'),
-                                   int(cap.get(cv2.CAP_PROP_FPS)),
-                                   (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))))
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
+        if max_frames is not None and frame_idx + 1 >= max_frames:
             break
 
-        timer = cv2.getTickCount()
 
+# 결과 log(trackVideo의 result_path)에 frame별로 기록할 timing (ms)
+# track : track_async부터 결과까지, latency : decode부터 결과까지
+# 나머지는 profiler가 켜져 있을 때 그 frame의 Future(future.timings)에 모인 값 (건너뛴 frame 등 없는 구간은 비움)
+# 추론은 분리 모드면 infer.backbone_exam, infer.head, --fused면 infer.exam_head에 남음
+RESULT_STAGES = ['track', 'latency', 'crop', 'infer.backbone_exam', 'infer.head', 'infer.exam_head', 'post']
+
+
+def trackVideo(tracker, video_path, save_video=False, result_path=None, show=True, init_bbox=None,
+               writer=None, max_frames=None):
+    """
+    args:
+        tracker(Tracker): 추적기
+        video_path(str): video 경로
+        save_video(bool or str): 저장할 경로, True면 ./out.mp4
+        result_path(str): frame별 결과 log(utils.result_log.ResultLog) 경로
+        show(bool): 화면에 보여줄지. False면 저장할 video의 overlay만 output thread에서 그림
+        init_bbox(list): 첫 frame의 [x, y, w, h]. None이면 화면에서 선택
+        writer(JsonLinesWriter): frame별 결과, timing을 기록
+        max_frames(int): 이만큼 처리하고 종료 (None이면 끝까지)
+    """
+    source = VideoFileSource(video_path)
+    _trackSource(tracker, source, source.fps or 30, save_video, result_path, show, init_bbox, writer, max_frames)
+
+
+def trackSequence(tracker, path, save_video=False, result_path=None, show=True, init_bbox=None,
+                  writer=None, max_frames=None, fps=30):
+    """ image 디렉토리(이름 순서)를 추적, 인자는 trackVideo와 같음
+    args:
+        path(str): image(jpg, png) 디렉토리
+        fps(float): 저장할 video fps
+    """
+    paths = sorted(glob.glob(os.path.join(path, '*.jpg')) + glob.glob(os.path.join(path, '*.png')))
+    if not paths:
+        raise FileNotFoundError('No images in {}'.format(path))
+    if max_frames is not None:
+        paths = paths[:max_frames]
+    _trackSource(tracker, ImageSequenceSource(paths), fps, save_video, result_path, show, init_bbox, writer,
+                 max_frames)
+
+
+def _trackSource(tracker, source, fps, save_video, result_path, show, init_bbox, writer, max_frames):
+    """ FrameSource의 frame을 pipeline으로 추적 (trackVideo, trackSequence) """
+    first = True
+
+    # video encoding, 결과 기록(화면에 안 보여줄 땐 그리기까지)은 output thread에서 수행
+    video_out = ('./out.mp4' if save_video is True else save_video) or None
+    if video_out:
+        print('Save Video Path : ', video_out)
+    # 저장할 video가 없으면 (headless) 그리지 않음
+    output = OutputStage(video_out, fps, result_path, RESULT_STAGES, draw=not show and bool(video_out))
+
+    def submit(frame):
+        """ frame의 추론을 걸어두고 (future, 시작 시각) 반환 """
+        start = time.perf_counter()
+        return tracker.track_async(frame), start
+
+    def finish(frame, frame_idx, timer, future, start):
+        outputs = future.result()
+        # 구간 시간은 이 frame을 처리하면서 기록된 값 (다음 frame의 기록과 섞이지 않음)
+        timings = { name: future.timings[name] * 1000 for name in RESULT_STAGES[2:] if name in future.timings }
+        timings['track'] = (time.perf_counter() - start) * 1000
+        timings['latency'] = (cv2.getTickCount() - timer) / cv2.getTickFrequency() * 1000
+
+        if show:
+            draw(frame, outputs['bbox'], timer)
+            with profiler.span('show'):
+                cv2.imshow('Tracking', frame)
+                cv2.waitKey(1)
+
+        if writer is not None:
+            writer.write(_frame_record(frame_idx, outputs, timings))
+
+        # 그리기가 끝난 frame은 output thread로 넘김 (이후 건드리지 않음)
+        output.submit(frame, frame_idx, outputs, timings, timer)
+
+    # 추론 중인 frame
+    # frame N의 추론을 걸어두고 그동안 frame N-1을 그리고 보여주고 넘김 (Tracker가 pipeline 모드일 때 겹쳐서 수행됨)
+    pending = None
+
+    for frame_idx, (frame, timer) in enumerate(source):
         if first:
-            try:
-                init_bbox = cv2.selectROI('Select ROI', frame, False, False)
-                cv2.destroyAllWindows()
-            except:
-                exit()
+            if init_bbox is None:
+                init_bbox = select_roi(frame)
             
             tracker.init(frame, init_bbox)
             first = False
+            if writer is not None:
+                writer.write({'frame': frame_idx, 'init': [ float(v) for v in init_bbox ]})
+            output.submit(frame, frame_idx, None, None, timer)
         else:
-            outputs = tracker.track(frame)
+            submitted = submit(frame)
 
-            bbox = list(map(int, outputs['bbox']))
-            cv2.rectangle(frame, (bbox[0], bbox[1]),
-                                 (bbox[0] + bbox[2], bbox[1] + bbox[3]),
-                                 (0, 255, 0), 3)
-            fps = cv2.getTickFrequency() / (cv2.getTickCount() - timer)
-            cv2.putText(frame, "FPS : " + str(int(fps)), (100, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.75, (255, 0, 0), 2)
-        # show
-        cv2.imshow('Tracking', frame)
-        cv2.waitKey(1)
+            if pending is not None:
+                finish(*pending)
+            pending = (frame, frame_idx, timer) + submitted
 
-        # save
-        if save_video:
-            outVideo.write(frame)
+        if max_frames is not None and frame_idx + 1 >= max_frames:
+            break
+
+    if pending is not None:
+        finish(*pending)
 
-    if save_video:
-        outVideo.release()
+    output.close()
 
+    print('Decode stats : ', source.get_stats())
+    print('Output stats : ', output.get_stats())
 
-def benchmarkVOT(tracker, path):
 
-    vot = VotLoader(path)
-    videos = vot.get_videos()
-    keys = list(videos.keys())
+def benchmarkVOT(tracker, path, cache_dir=None, show=True, writer=None, format='vot', names=None):
+    """
+    args:
+        tracker(Tracker): 추적기
+        path(str): dataset 최상위 경로
+        cache_dir(str): decode된 frame cache 경로
+        show(bool): 화면에 보여줄지 (False면 그리지도 않음)
+        writer(JsonLinesWriter): frame별 결과(gt, IoU 포함), sequence별 요약을 기록
+        format(str): 'vot', 'otb', 'lasot'
+        names(list): 돌릴 sequence 이름 (None이면 전부)
+    """
 
-    for i in range(0, len(videos)):
-        video_frames = videos[keys[i]][0]
-        annot_frames = videos[keys[i]][1]
+    # sequence는 하나씩 읽어옴
+    for seq in create_loader(format, path, cache_dir):
+        if names and seq.name not in names:
+            continue
+        num_frames = len(seq)
 
-        num_frames = min(len(video_frames), len(annot_frames))
+        # frame decode는 background thread pool에서 미리 해둠
+        source = iter(ImageSequenceSource(seq.frames[:num_frames]))
 
-        frames_0 = video_frames[0]
-        bbox_0   = annot_frames[0]
-        img = cv2.imread(frames_0)
+        # gt : N * 4 [x, y, w, h]
+        img, _ = next(source)
 
         # init
-        # convert x1, y1, x2, y2 -> x, y, w, h
-        tracker.init(img, [bbox_0.x1, bbox_0.y1, bbox_0.x2 - bbox_0.x1, bbox_0.y2 - bbox_0.y1])
+        tracker.init(img, seq.gt[0])
+
+        ious, track_time = [], 0.0
+        for j, (img, timer) in enumerate(source, 1):
+            x, y, w, h = seq.gt[j]
 
-        for j in range(1, num_frames):
-            frame = video_frames[j]
-            bbox  = annot_frames[j]
+            # track
+            start = time.perf_counter()
+            outputs = tracker.track(img)
+            elapsed = (time.perf_counter() - start) * 1000
+            track_time += elapsed
+
+            iou = float(metrics.iou(outputs['bbox'], seq.gt[j])[0]) if np.all(np.isfinite(seq.gt[j])) else None
+            if iou is not None:
+                ious.append(iou)
+
+            if writer is not None:
+                record = _frame_record(j, outputs, {'track': elapsed})
+                record.update({'sequence': seq.name, 'gt': [ float(v) for v in seq.gt[j] ], 'iou': iou})
+                writer.write(record)
+
+            if not show:
+                continue
 
-            img = cv2.imread(frame)
             imgCopy = img.copy()
-            timer = cv2.getTickCount()
 
             # draw ground truth
-            cv2.rectangle(imgCopy, (int(bbox.x1), int(bbox.y1)), (int(bbox.x2), int(bbox.y2)), (255, 255, 255), 2)
-            
-            # track
-            outputs = tracker.track(img)
+            cv2.rectangle(imgCopy, (int(x), int(y)), (int(x + w), int(y + h)), (255, 255, 255), 2)
 
             pred_bbox = list(map(int, outputs['bbox']))
 
-            # draw predicted
+            # draw predicted (추론을 건너뛰고 예측한 bbox는 노란색)
             cv2.rectangle(imgCopy, (pred_bbox[0], pred_bbox[1]),
                                    (pred_bbox[0] + pred_bbox[2], pred_bbox[1] + pred_bbox[3]),
-                                   (255, 0, 0), 2)
+                                   (0, 255, 255) if outputs.get('skipped') else (255, 0, 0), 2)
 
             # calculate fps
             fps = cv2.getTickFrequency() / (cv2.getTickCount() - timer)
@@ -166,27 +341,145 @@ def benchmarkVOT(tracker, path):
             cv2.imshow('VOT Benchmark', imgCopy)
             cv2.waitKey(30)
 
-
-def main():
-    """ TensorRT 엔진을 로딩하고, 추론하는 메인 함수 """
-    back_exam_engine_path = "engine/nanotrack_backbone_exam.engine"
-    back_temp_engine_path = "engine/nanotrack_backbone_temp.engine"
-    head_engine_path = "engine/nanotrack_head.engine"
-
-    tracker = Tracker(back_exam_engine_path, back_temp_engine_path, head_engine_path)
-
-    # webcam 트래킹 시작
-    # trackLive(tracker)
-
-
-    # video 트래킹 시작
-    video_path = "/home/rgblab/crop2.mp4"
-    trackVideo(tracker, video_path, save_video=False)
-
-
-    # benchmark 시작
-    # vot_path = "/home/rgblab/tracking/dataset/VOT"
-    # benchmarkVOT(tracker, vot_path)
+        summary = {
+                   'frames': num_frames - 1,
+                   'mean_iou': float(np.mean(ious)) if ious else None,
+                   'track_ms_mean': track_time / max(num_frames - 1, 1),
+                  }
+
+        # AdaptiveTracker면 skip 비율
+        if hasattr(tracker, 'get_stats'):
+            summary['tracker'] = tracker.get_stats()
+            tracker.reset_stats()
+
+        if writer is not None:
+            writer.write({'sequence': seq.name, 'summary': summary})
+        print(seq.name, summary)
+
+
+def profile_prefix(prefix=None, output=None):
+    """ profile을 저장할 경로 prefix (확장자 제외)
+    args:
+        prefix(str): --profile에 준 경로. 비어있으면 output 기준
+        output(str): --output 경로 ('-'면 stdout이므로 쓰지 않음)
+    return:
+        prefix(str): prefix 그대로, 없으면 <output 이름>.profile, 그것도 없으면 'profile'
+    """
+    if prefix:
+        return prefix
+    if output and output != '-':
+        return os.path.splitext(output)[0] + '.profile'
+    return 'profile'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="NanoTrack 추적 (webcam, video, image sequence, VOT benchmark)")
+
+    # 모든 subcommand 공통
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--backend', default=None, help="'trt', 'onnx', 'stub' (기본 config.ENGINE_BACKEND)")
+    common.add_argument('--engines', nargs=3, default=("", "", ""), metavar=('EXAM', 'TEMP', 'HEAD'),
+                        help="engine 경로 (기본 backend별 경로)")
+    common.add_argument('--headless', action='store_true',
+                        help="화면 출력, 그리기 없이 실행 (결과는 --output, 기본 stdout)")
+    common.add_argument('--output', '-o', default=None,
+                        help="frame별 결과, timing을 json lines로 저장 ('-'면 stdout, headless 기본값)")
+    common.add_argument('--no-pipeline', action='store_true', help="추론을 worker thread에서 돌리지 않음")
+    common.add_argument('--fused', action='store_true',
+                        help="exam backbone + head를 합친 engine 사용 (tools.fuse_head, config.FUSED_ENGINE_PATHS)")
+    common.add_argument('--adaptive', action='store_true',
+                        help="frame skipping (AdaptiveTracker) : 신뢰도가 높고 움직임이 작으면 추론 없이 예측 bbox 사용")
+    common.add_argument('--profile', nargs='?', const='', default=None, metavar='PATH_PREFIX',
+                        help="단계별 latency 기록, PATH_PREFIX.json, PATH_PREFIX.prom으로 저장 "
+                             "(경로를 안 주면 --output 파일 옆 <이름>.profile.*, 그것도 없으면 ./profile.*)")
+
+    # init bbox
+    init = argparse.ArgumentParser(add_help=False)
+    init.add_argument('--bbox', default=None, help="첫 frame의 x,y,w,h (없으면 화면에서 선택)")
+    init.add_argument('--bbox-file', default=None, help="첫 줄이 x,y,w,h(혹은 VOT 다각형)인 파일")
+    init.add_argument('--max-frames', type=int, default=None, help="이만큼 처리하고 종료")
+
+    # 저장
+    save = argparse.ArgumentParser(add_help=False)
+    save.add_argument('--save-video', nargs='?', const='./out.mp4', default=None,
+                      help="overlay를 그린 video 저장 경로 (기본 ./out.mp4)")
+    save.add_argument('--result-log', default=None, help="frame별 결과 binary log(ResultLog) 경로")
+
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    live = sub.add_parser('live', parents=[common, init], help="webcam 추적")
+    live.add_argument('--camera', type=int, default=0, help="webcam 번호")
+    live.add_argument('--resolution', default="FHD", help="해상도 preset (UHD, QHD, FHD, HD, VGA)")
+
+    video = sub.add_parser('video', parents=[common, init, save], help="video 파일 추적")
+    video.add_argument('path', help="video 경로")
+
+    sequence = sub.add_parser('sequence', parents=[common, init, save], help="image 디렉토리 추적 (이름 순서)")
+    sequence.add_argument('path', help="image 디렉토리")
+    sequence.add_argument('--fps', type=float, default=30, help="저장할 video fps")
+
+    benchmark = sub.add_parser('benchmark', parents=[common], help="dataset의 sequence를 gt로 init해서 추적")
+    benchmark.add_argument('path', help="dataset 최상위 경로")
+    benchmark.add_argument('--format', default='vot', choices=['vot', 'otb', 'lasot'], help="dataset 형식")
+    benchmark.add_argument('--sequences', nargs='*', default=None, help="돌릴 sequence 이름")
+    benchmark.add_argument('--cache-dir', default=None, help="decode된 frame cache 경로")
+
+    args = parser.parse_args(argv)
+
+    if args.headless and args.output is None:
+        args.output = '-'
+    if args.command != 'benchmark':
+        try:
+            args.init_bbox = load_bbox(args.bbox, args.bbox_file)
+        except (ValueError, FileNotFoundError) as e:
+            parser.error(str(e))
+        if args.headless and args.init_bbox is None:
+            parser.error("headless 모드에서는 --bbox 혹은 --bbox-file이 필요합니다")
+    return args
+
+
+def main(argv=None):
+    """ 추론 엔진을 로딩하고, subcommand에 맞게 추적하는 메인 함수 """
+    args = parse_args(argv)
+    show = not args.headless
+
+    if args.profile is not None:
+        profiler.enable()
+    if args.fused:
+        config.MODEL_FUSED = True
+
+    # 결과를 stdout으로 내보낼 땐 나머지 출력(엔진 로딩, 통계 등)은 stderr로 보냄
+    writer = JsonLinesWriter(args.output) if args.output else None
+    redirect = contextlib.redirect_stdout(sys.stderr) if args.output == '-' else contextlib.nullcontext()
+
+    with redirect:
+        # pipeline : 추론을 worker thread에서 돌려서 그리기, 저장과 겹치게 함 (trackVideo)
+        tracker_class = AdaptiveTracker if args.adaptive else Tracker
+        tracker = tracker_class(*args.engines, backend=args.backend, pipeline=not args.no_pipeline)
+
+        try:
+            if args.command == 'live':
+                trackLive(tracker, args.camera, args.resolution, args.init_bbox, show, writer, args.max_frames)
+            elif args.command == 'video':
+                trackVideo(tracker, args.path, args.save_video, args.result_log, show, args.init_bbox,
+                           writer, args.max_frames)
+            elif args.command == 'sequence':
+                trackSequence(tracker, args.path, args.save_video, args.result_log, show, args.init_bbox,
+                              writer, args.max_frames, args.fps)
+            elif args.command == 'benchmark':
+                benchmarkVOT(tracker, args.path, args.cache_dir, show, writer, args.format, args.sequences)
+        finally:
+            tracker.model.close()
+            if writer is not None:
+                writer.close()
+
+        # 단계별 latency (NANOTRACK_PROFILE=1 혹은 --profile 일 때)
+        if profiler.enabled:
+            print(profiler.summary())
+            prefix = profile_prefix(args.profile, args.output)
+            profiler.export(prefix + '.json')
+            profiler.export(prefix + '.prom')
+            print('Profile : {}.json, {}.prom'.format(prefix, prefix))
 
 
 if __name__ == '__main__':
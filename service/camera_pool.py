@@ -0,0 +1,362 @@
+import glob
+import multiprocessing
+import os
+import queue
+import time
+
+import numpy as np
+
+from core.config import config
+from utils.shm_ring import FrameRing
+
+# 여러 camera를 process 단위로 나눠서 추적하는 runner
+#   capture process (camera마다 하나) : main.get_frames(webcam), VideoFileSource, ImageSequenceSource로 decode해서
+#                                       camera별 shared memory ring(FrameRing)에 씀
+#   tracker worker process (N개)      : 맡은 camera들의 ring에서 frame을 복사 없이 꺼내 Tracker로 추적,
+#                                       결과(bbox, score, latency)만 queue로 부모에게 넘김
+# camera는 worker에 load balancing 정책('least_loaded' : 예상 fps 합이 가장 작은 worker, 'round_robin')으로 배정
+# 사용법 :
+#   pool = CameraPool([{'name': 'cam0', 'source': 0, 'bbox': [x, y, w, h]},
+#                      {'name': 'cam1', 'source': 'videos/cam1.mp4', 'bbox': [...], 'fps': 15}], backend='onnx')
+#   with pool:
+#       for result in pool.results():   # {'camera', 'seq', 'bbox', 'best_score', 'latency_ms', 'age_ms'}
+#           ...
+#   print(pool.get_stats())
+
+POLICIES = ('least_loaded', 'round_robin')
+
+# worker -> 부모 message 종류
+_RESULT, _ERROR, _DONE = 'result', 'error', 'done'
+
+
+def assign_cameras(cameras, num_workers, policy=None):
+    """ camera를 worker에 배정
+    args:
+        cameras(list): camera spec (dict), 'fps'가 있으면 부하로 사용 (없으면 30)
+        num_workers(int): worker 수
+        policy(str): 'least_loaded'(부하가 큰 camera부터 부하 합이 가장 작은 worker에), 'round_robin'.
+                     None이면 config.MULTICAM_POLICY
+    return:
+        assignment(list): worker마다 camera index list
+    """
+    policy = policy or config.MULTICAM_POLICY
+    if policy not in POLICIES:
+        raise ValueError("unknown policy : {} (가능 : {})".format(policy, POLICIES))
+
+    assignment = [ [] for _ in range(num_workers) ]
+    if policy == 'round_robin':
+        for i in range(len(cameras)):
+            assignment[i % num_workers].append(i)
+        return assignment
+
+    loads = np.zeros(num_workers)
+    order = sorted(range(len(cameras)), key=lambda i: -_camera_load(cameras[i]))
+    for i in order:
+        worker = int(np.argmin(loads))
+        assignment[worker].append(i)
+        loads[worker] += _camera_load(cameras[i])
+    return assignment
+
+
+def _camera_load(camera):
+    return float(camera.get('fps') or 30)
+
+
+def open_source(source, resolution="FHD"):
+    """ camera source를 FrameSource로 엶
+    args:
+        source(int or str): webcam 번호('webcam'), image 디렉토리, video 파일
+    return:
+        source(FrameSource): for frame, timer in source 형태
+    """
+    if isinstance(source, int) or source == 'webcam' or (isinstance(source, str) and source.isdigit()):
+        from main import get_frames
+        return get_frames(int(source) if str(source).isdigit() else source, resolution)
+
+    if os.path.isdir(source):
+        from loader.source import ImageSequenceSource
+        paths = sorted(glob.glob(os.path.join(source, '*.jpg')) + glob.glob(os.path.join(source, '*.png')))
+        if not paths:
+            raise FileNotFoundError('No images in {}'.format(source))
+        return ImageSequenceSource(paths)
+
+    from loader.source import VideoFileSource
+    return VideoFileSource(source)
+
+
+def is_live(source):
+    """ live camera면 latest-only, 파일이면 lossless """
+    return isinstance(source, int) or source == 'webcam' or (isinstance(source, str) and source.isdigit())
+
+
+def _capture_main(source, resolution, ring_spec, stop_event):
+    """ capture process : source를 decode해서 ring에 씀 """
+    ring = FrameRing.attach(ring_spec)
+    try:
+        for frame, _ in open_source(source, resolution):
+            while ring.write(frame, timeout=0.1) is None:
+                # lossless에서 자리가 없으면 기다림 (멈추라고 하면 종료)
+                if stop_event.is_set():
+                    return
+            if stop_event.is_set():
+                return
+    finally:
+        ring.close_writer()
+        ring.close()
+
+
+def _worker_main(worker_id, cameras, ring_specs, engine_paths, backend, results, stop_event):
+    """ tracker worker process : 맡은 camera들의 ring을 돌아가며 frame을 꺼내 추적 """
+    from tracker.model import Model
+    from tracker.tracker import Tracker
+
+    rings, trackers = {}, {}
+    try:
+        # worker 안의 Tracker들은 Model(engine) 하나를 같이 씀
+        model = Model(*engine_paths, backend=backend)
+        for camera in cameras:
+            rings[camera['name']] = FrameRing.attach(ring_specs[camera['name']])
+            trackers[camera['name']] = Tracker(model=model)
+        initialized = set()
+        finished = set()
+
+        while not stop_event.is_set() and len(finished) < len(cameras):
+            idle = True
+            for camera in cameras:
+                name = camera['name']
+                if name in finished:
+                    continue
+
+                ring = rings[name]
+                frame, info = ring.acquire(timeout=0)
+                if frame is None:
+                    if info is not None and info.get('closed'):
+                        finished.add(name)
+                    continue
+
+                idle = False
+                try:
+                    start = time.perf_counter()
+                    if name not in initialized:
+                        trackers[name].init(frame, camera['bbox'])
+                        initialized.add(name)
+                        outputs = {'bbox': list(camera['bbox']), 'best_score': 1.0}
+                    else:
+                        outputs = trackers[name].track(frame)
+                    latency = (time.perf_counter() - start) * 1000
+                except Exception as e:
+                    results.put((_ERROR, worker_id, {'camera': name, 'error': repr(e)}))
+                    finished.add(name)
+                    continue
+                finally:
+                    # frame view를 놓고 slot 반납
+                    frame = None
+                    ring.release()
+
+                results.put((_RESULT, worker_id, {
+                                                   'camera': name,
+                                                   'seq': info['seq'],
+                                                   'bbox': [float(v) for v in outputs['bbox']],
+                                                   'best_score': float(outputs['best_score']),
+                                                   'latency_ms': latency,
+                                                   'age_ms': (time.time() - info['time']) * 1000,
+                                                 }))
+            if idle:
+                time.sleep(0.001)
+    except Exception as e:
+        results.put((_ERROR, worker_id, {'camera': None, 'error': repr(e)}))
+    finally:
+        for ring in rings.values():
+            ring.close()
+        results.put((_DONE, worker_id, None))
+
+
+class CameraStats(object):
+    """ camera별 추적 통계 (부모 process에서 worker 결과로 집계) """
+
+    def __init__(self, window=256):
+        self.tracked = 0
+        self.errors = []
+        self.start_time = None
+        self.last_result = None
+        # 최근 window개 frame의 latency, 결과 시각
+        self.latencies = np.zeros(window)
+        self.times = np.zeros(window)
+
+    def add(self, result):
+        now = time.time()
+        if self.start_time is None:
+            self.start_time = now
+        index = self.tracked % len(self.latencies)
+        self.latencies[index] = result['latency_ms']
+        self.times[index] = now
+        self.tracked += 1
+        self.last_result = result
+
+    def to_dict(self):
+        count = min(self.tracked, len(self.latencies))
+        latencies = self.latencies[:count]
+        times = self.times[:count]
+        span = times.max() - times.min() if count > 1 else 0.
+        return {
+                'tracked': self.tracked,
+                'fps': (count - 1) / span if span > 0 else 0.,
+                'latency_ms_mean': float(latencies.mean()) if count else 0.,
+                'latency_ms_p95': float(np.percentile(latencies, 95)) if count else 0.,
+                'age_ms': self.last_result['age_ms'] if self.last_result else None,
+                'errors': list(self.errors),
+               }
+
+
+class CameraPool(object):
+    """ camera마다 capture process + shared memory ring, N개의 tracker worker process로 추적 """
+
+    def __init__(self, cameras, num_workers=None, policy=None, engine_paths=("", "", ""), backend=None,
+                 ring_slots=None, resolution="FHD"):
+        """
+        args:
+            cameras(list): camera spec dict list
+                           {'name': 이름, 'source': webcam 번호 | video 파일 | image 디렉토리, 'bbox': [x, y, w, h],
+                            'fps': 예상 fps(배정 부하, 선택), 'max_shape': (h, w, 3) frame 최대 크기(선택)}
+            num_workers(int): tracker worker 수. None이면 config.MULTICAM_WORKERS (0이면 min(camera 수, cpu 수))
+            policy(str): camera 배정 정책 'least_loaded', 'round_robin'. None이면 config.MULTICAM_POLICY
+            engine_paths(tuple): (exam, temp, head) engine 경로
+            backend(str): 'trt', 'onnx', 'stub'
+            ring_slots(int): camera별 ring slot 수. None이면 config.MULTICAM_RING_SLOTS
+            resolution(str): webcam 해상도 preset, max_shape가 없을 때 slot 크기도 이 preset
+        """
+        names = [ camera['name'] for camera in cameras ]
+        if len(set(names)) != len(names):
+            raise ValueError("camera names must be unique : {}".format(names))
+        for camera in cameras:
+            if 'bbox' not in camera:
+                raise KeyError("camera {} has no init bbox".format(camera['name']))
+
+        self.cameras = [ dict(camera) for camera in cameras ]
+        num_workers = num_workers if num_workers is not None else config.MULTICAM_WORKERS
+        num_workers = num_workers or min(len(cameras), os.cpu_count() or 1)
+        self.num_workers = max(1, min(num_workers, len(cameras)))
+        self.assignment = assign_cameras(self.cameras, self.num_workers, policy)
+        self.engine_paths = engine_paths
+        self.backend = backend
+        self.ring_slots = ring_slots or config.MULTICAM_RING_SLOTS
+        self.resolution = resolution
+
+        # engine(CUDA context)을 fork로 물려받지 않도록 spawn 사용
+        self.context = multiprocessing.get_context('spawn')
+        self.stop_event = self.context.Event()
+        self.results_queue = self.context.Queue()
+
+        self.rings = {}
+        self.captures = {}
+        self.workers = []
+        self.stats = { name: CameraStats() for name in names }
+        self.worker_of = {}
+        self._done = set()
+        self.started = False
+
+    def start(self):
+        if self.started:
+            return self
+        self.started = True
+
+        width, height = config.RESOLUTION_PRESET[self.resolution]
+        for camera in self.cameras:
+            max_shape = tuple(camera.get('max_shape') or (height, width, 3))
+            ring = FrameRing.create(self.ring_slots, max_shape, self.context.Condition(),
+                                    drop_oldest=is_live(camera['source']))
+            self.rings[camera['name']] = ring
+
+        ring_specs = { name: ring.spec for name, ring in self.rings.items() }
+        for worker_id, indices in enumerate(self.assignment):
+            cameras = [ self.cameras[i] for i in indices ]
+            for camera in cameras:
+                self.worker_of[camera['name']] = worker_id
+            process = self.context.Process(target=_worker_main, daemon=True,
+                                           args=(worker_id, cameras, ring_specs, self.engine_paths, self.backend,
+                                                 self.results_queue, self.stop_event))
+            process.start()
+            self.workers.append(process)
+
+        for camera in self.cameras:
+            process = self.context.Process(target=_capture_main, daemon=True,
+                                           args=(camera['source'], self.resolution, ring_specs[camera['name']],
+                                                 self.stop_event))
+            process.start()
+            self.captures[camera['name']] = process
+        return self
+
+    def results(self, timeout=None):
+        """ 추적 결과를 도착 순서대로 yield (모든 worker가 끝나거나 timeout(초) 동안 결과가 없으면 종료)
+        return:
+            result(dict): {'camera', 'seq', 'bbox', 'best_score', 'latency_ms', 'age_ms'(capture부터 결과까지)}
+        """
+        self.start()
+        while len(self._done) < len(self.workers):
+            try:
+                kind, worker_id, payload = self.results_queue.get(timeout=timeout if timeout is not None else 1.0)
+            except queue.Empty:
+                if timeout is not None:
+                    return
+                # worker가 죽었으면 (DONE을 못 보냈으면) 끝난 것으로 봄
+                for worker_id, process in enumerate(self.workers):
+                    if not process.is_alive() and process.exitcode not in (0, None):
+                        self._done.add(worker_id)
+                continue
+
+            if kind == _RESULT:
+                self.stats[payload['camera']].add(payload)
+                yield payload
+            elif kind == _ERROR:
+                names = [payload['camera']] if payload['camera'] else \
+                        [ self.cameras[i]['name'] for i in self.assignment[worker_id] ]
+                for name in names:
+                    self.stats[name].errors.append(payload['error'])
+            elif kind == _DONE:
+                self._done.add(worker_id)
+
+    def get_stats(self):
+        """
+        return:
+            stats(dict): {camera 이름: {'worker', 'health', 'capture': ring 통계, 'tracked', 'fps', 'latency_ms_*', ...}}
+            health : 'ok', 'stalled'(config.MULTICAM_STALL_SEC 동안 새 frame 없음), 'ended'(source 끝), 'error'
+        """
+        now = time.time()
+        stats = {}
+        for camera in self.cameras:
+            name = camera['name']
+            entry = self.stats[name].to_dict()
+            ring = self.rings.get(name)
+            capture = ring.get_stats() if ring is not None and ring.header is not None else {}
+            process = self.captures.get(name)
+
+            if entry['errors'] or (process is not None and process.exitcode not in (0, None)):
+                health = 'error'
+            elif capture.get('closed'):
+                health = 'ended'
+            elif capture.get('last_write') is None or now - capture['last_write'] > config.MULTICAM_STALL_SEC:
+                health = 'stalled'
+            else:
+                health = 'ok'
+
+            entry.update({'worker': self.worker_of.get(name), 'health': health, 'capture': capture})
+            stats[name] = entry
+        return stats
+
+    def close(self):
+        """ 모든 process를 멈추고 shared memory를 정리 """
+        self.stop_event.set()
+        for process in list(self.captures.values()) + self.workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        for ring in self.rings.values():
+            if ring.header is not None:
+                ring.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,135 @@
+import asyncio
+import itertools
+
+from core.config import config
+
+from service.protocol import read_message
+from service.protocol import write_message
+from service.protocol import encode_frame
+
+# tracking service asyncio client
+# 응답은 요청 번호('id')로 짝을 맞추므로, 한 연결에서 여러 session의 요청을 동시에 보내도 됨
+# 사용법 :
+#   client = await TrackingClient.connect(unix_path='/tmp/nanotrack.sock')
+#   session = await client.create()
+#   await client.init(session, frame, [x, y, w, h])
+#   result = await client.track(session, frame)   # {'bbox', 'best_score', 'latency_ms'}
+
+
+class ServiceError(Exception):
+    """ 서버가 ok=False로 응답한 경우 (reply에 응답 header가 들어있음) """
+
+    def __init__(self, reply):
+        super(ServiceError, self).__init__(reply.get('error'))
+        self.reply = reply
+
+
+class TrackingClient(object):
+    """ tracking service에 연결하는 client """
+
+    def __init__(self, reader, writer, encoding='jpg', quality=90):
+        """
+        args:
+            reader, writer: asyncio stream
+            encoding(str): frame 전송 형식 ('jpg', 'png', 'raw')
+            quality(int): jpg 품질
+        """
+        self.reader = reader
+        self.writer = writer
+        self.encoding = encoding
+        self.quality = quality
+
+        self._ids = itertools.count()
+        self._waiters = {}
+        self._reader_task = asyncio.get_running_loop().create_task(self._read_replies())
+
+
+    @classmethod
+    async def connect(cls, unix_path=None, host='127.0.0.1', port=7700, **kwargs):
+        """ unix_path가 있으면 Unix socket, 없으면 TCP로 연결 """
+        if unix_path:
+            reader, writer = await asyncio.open_unix_connection(unix_path, limit=config.SERVICE_MAX_MESSAGE)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=config.SERVICE_MAX_MESSAGE)
+        return cls(reader, writer, **kwargs)
+
+
+    async def request(self, header, payload=b""):
+        """ 요청을 보내고 응답을 기다림
+        return:
+            reply(dict): 응답 header (ok=False면 ServiceError)
+        """
+        request_id = next(self._ids)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[request_id] = waiter
+
+        write_message(self.writer, dict(header, id=request_id), payload)
+        await self.writer.drain()
+
+        reply = await waiter
+        if not reply.get('ok'):
+            raise ServiceError(reply)
+        return reply
+
+
+    async def create(self, session=None):
+        """
+        return:
+            session(str): session id
+        """
+        reply = await self.request({'op': 'create', 'session': session})
+        return reply['session']
+
+
+    async def init(self, session, frame, bbox, target=None):
+        """ target(target ID)을 주면 서버의 template bank에 있는 target은 template backbone 없이 초기화됨 """
+        fields, payload = encode_frame(frame, self.encoding, self.quality)
+        return await self.request(dict(fields, op='init', session=session, target=target,
+                                       bbox=[ float(v) for v in bbox ]), payload)
+
+
+    async def track(self, session, frame):
+        """
+        return:
+            reply(dict): {'bbox': [x, y, w, h], 'best_score', 'latency_ms', ...}
+        """
+        fields, payload = encode_frame(frame, self.encoding, self.quality)
+        return await self.request(dict(fields, op='track', session=session), payload)
+
+
+    async def close_session(self, session):
+        return await self.request({'op': 'close', 'session': session})
+
+
+    async def stats(self):
+        return await self.request({'op': 'stats'})
+
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        self._reader_task.cancel()
+
+
+    async def _read_replies(self):
+        """ 응답을 읽어서 요청 번호에 맞는 waiter에 넘겨줌 """
+        error = ConnectionError("connection closed")
+        try:
+            while True:
+                message = await read_message(self.reader)
+                if message is None:
+                    break
+                reply, _ = message
+                waiter = self._waiters.pop(reply.get('id'), None)
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(reply)
+        except Exception as e:
+            error = e
+        finally:
+            for waiter in self._waiters.values():
+                if not waiter.done():
+                    waiter.set_exception(error)
+            self._waiters.clear()
@@ -0,0 +1,111 @@
+import json
+import struct
+import asyncio
+
+import cv2
+import numpy as np
+
+from core.config import config
+
+# tracking service의 message 형식
+# [header 길이(4 byte), payload 길이(4 byte), big endian] + header(json, utf-8) + payload(frame)
+#
+# 요청 header
+#   {'id': 요청 번호, 'op': 'create' | 'init' | 'track' | 'close' | 'stats', 'session': session id, ...}
+#   init  : 'bbox': [x, y, w, h], 'target': target ID(선택, template bank 사용) + frame
+#   track : frame
+#   frame이 있으면 'encoding': 'jpg' | 'png' | 'raw', raw일 땐 'shape': [h, w, 3] (uint8 BGR)
+# 응답 header
+#   {'id': 요청 번호, 'ok': True | False, 'error': 실패 이유, ...결과}
+
+HEADER = struct.Struct('!II')
+
+ENCODINGS = ('jpg', 'png', 'raw')
+
+
+async def read_message(reader, max_size=None):
+    """ stream에서 message 하나를 읽음
+    args:
+        reader(asyncio.StreamReader)
+        max_size(int): header + payload 최대 크기. None이면 config.SERVICE_MAX_MESSAGE
+    return:
+        (header(dict), payload(bytes)), 연결이 끊겼으면 None
+    """
+    max_size = max_size or config.SERVICE_MAX_MESSAGE
+
+    try:
+        data = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+
+    header_len, payload_len = HEADER.unpack(data)
+    if header_len + payload_len > max_size:
+        raise ValueError("message too large : {} bytes".format(header_len + payload_len))
+
+    header = json.loads(await reader.readexactly(header_len))
+    payload = await reader.readexactly(payload_len) if payload_len else b""
+    return header, payload
+
+
+def write_message(writer, header, payload=b""):
+    """ message 하나를 stream에 씀 (drain은 호출하는 쪽에서)
+    args:
+        writer(asyncio.StreamWriter)
+        header(dict): json으로 변환 가능한 dict
+        payload(bytes or memoryview)
+    """
+    data = json.dumps(header).encode('utf-8')
+    writer.write(HEADER.pack(len(data), len(payload)) + data)
+    if len(payload):
+        writer.write(payload)
+
+
+def encode_frame(frame, encoding='jpg', quality=90):
+    """ frame을 전송용으로 변환
+    args:
+        frame(np.ndarray): BGR image (uint8)
+        encoding(str): 'jpg', 'png', 'raw'
+        quality(int): jpg 품질
+    return:
+        fields(dict): header에 넣을 필드, payload(bytes or memoryview)
+    """
+    if encoding == 'raw':
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        return {'encoding': 'raw', 'shape': list(frame.shape)}, memoryview(frame).cast('B')
+
+    if encoding not in ENCODINGS:
+        raise ValueError("unknown encoding : {}".format(encoding))
+
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality] if encoding == 'jpg' else []
+    ok, buf = cv2.imencode('.' + encoding, frame, params)
+    if not ok:
+        raise ValueError("frame encoding failed : {}".format(encoding))
+    return {'encoding': encoding}, buf.tobytes()
+
+
+def decode_frame(header, payload):
+    """ 전송받은 frame을 BGR image로 변환 (raw는 복사 없이 payload를 그대로 사용)
+    args:
+        header(dict): 'encoding', raw일 땐 'shape'
+        payload(bytes)
+    return:
+        frame(np.ndarray): BGR image (uint8)
+    """
+    encoding = header.get('encoding', 'jpg')
+    data = np.frombuffer(payload, np.uint8)
+
+    if encoding == 'raw':
+        shape = tuple(header['shape'])
+        if data.size != np.prod(shape):
+            raise ValueError("raw frame size mismatch : {} != {}".format(data.size, shape))
+        return data.reshape(shape)
+
+    if encoding not in ENCODINGS:
+        raise ValueError("unknown encoding : {}".format(encoding))
+
+    frame = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("frame decoding failed : {}".format(encoding))
+    return frame
@@ -0,0 +1,336 @@
+# 여러 video stream을 한 process에서 추적하는 asyncio tracking service
+# engine(Model)은 하나만 두고 모든 session이 같이 씀 (camera마다 process를 띄우면 engine도 그만큼 올라감)
+# 사용법 : python -m service.server --unix /tmp/nanotrack.sock [--backend onnx]
+#          python -m service.server --port 7700
+#
+# 요청 처리 흐름
+#   connection마다 message를 읽어서 session별 queue에 넣음 (queue가 차면 거절하거나 읽기를 멈춤, backpressure)
+#   session마다 task 하나가 queue를 순서대로 처리함 (frame N+1은 frame N의 결과가 있어야 crop할 수 있음)
+#   decode, crop, 후처리는 thread pool에서, engine 호출은 Model worker thread에서 수행
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+
+from core.config import config
+from tracker.model import Model
+from tracker.scheduler import BatchScheduler
+from tracker.tracker import Tracker
+from tracker.bank import TemplateBank
+from utils.profiler import Histogram
+
+from service.protocol import read_message
+from service.protocol import write_message
+from service.protocol import decode_frame
+
+
+class Session(object):
+    """ tracking session 하나 (Tracker와 요청 queue, 통계) """
+
+    def __init__(self, session_id, tracker, queue_size):
+        self.id = session_id
+        self.tracker = tracker
+        self.queue = asyncio.Queue(queue_size)
+        self.task = None
+        self.initialized = False
+
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def get_stats(self):
+        return {
+                'queue_depth': self.queue.qsize(),
+                'processed': self.processed,
+                'dropped': self.dropped,
+                'errors': self.errors,
+               }
+
+
+class Connection(object):
+    """ client 연결 하나. 응답 쓰기를 직렬화하고, 이 연결에서 만든 session을 가짐 """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.sessions = {}
+        self.lock = asyncio.Lock()
+
+    async def send(self, header):
+        async with self.lock:
+            write_message(self.writer, header)
+            await self.writer.drain()
+
+
+class TrackingServer(object):
+    """ Model 하나를 여러 session이 공유하는 asyncio tracking 서버 """
+
+    def __init__(self, model=None, backend=None, engine_paths=("", "", ""),
+                 queue_size=None, backpressure=None, num_workers=None, bank=None):
+        """
+        args:
+            model(Model): 공유할 Model (혹은 BatchScheduler). None이면 pipeline 모드로 새로 생성
+            backend(str): model이 None일 때 사용할 backend
+            engine_paths(tuple): model이 None일 때 사용할 (exam backbone, temp backbone, head) 경로
+            queue_size(int): session당 최대 대기 요청 수. None이면 config.SERVICE_QUEUE_SIZE
+            backpressure(str): 'drop'(queue가 차면 거절) 혹은 'block'(빌 때까지 연결의 읽기를 멈춤)
+            num_workers(int): decode, crop, 후처리 thread 수. None이면 config.SERVICE_WORKERS
+            bank(TemplateBank): 모든 session이 같이 쓸 template bank. None이면 새로 만듦
+        """
+        if model is None:
+            model = Model(*engine_paths, backend=backend, pipeline=True)
+        self.model = model
+
+        # init에 'target'이 있으면 같은 target은 session이 달라도 template backbone 없이 초기화됨
+        self.bank = bank if bank is not None else TemplateBank()
+
+        self.queue_size   = queue_size or config.SERVICE_QUEUE_SIZE
+        self.backpressure = backpressure or config.SERVICE_BACKPRESSURE
+        if self.backpressure not in ('drop', 'block'):
+            raise ValueError("unknown backpressure : {}".format(self.backpressure))
+
+        self._pool = ThreadPoolExecutor(num_workers or config.SERVICE_WORKERS, thread_name_prefix='service')
+        self._server = None
+
+        self.sessions = {}
+        self.num_connections = 0
+        self.num_requests = 0
+        self.num_dropped = 0
+        self.queue_depth_max = 0
+
+        # 요청을 받은 시점부터 응답까지, 그 중 queue에서 기다린 시간 (초)
+        self.latency = Histogram()
+        self.queue_delay = Histogram()
+
+
+    async def start(self, unix_path=None, host='127.0.0.1', port=0):
+        """ unix_path가 있으면 Unix socket, 없으면 TCP로 listen
+        return:
+            address: unix_path 혹은 (host, port)
+        """
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            self._server = await asyncio.start_unix_server(self._handle, unix_path,
+                                                           limit=config.SERVICE_MAX_MESSAGE)
+            return unix_path
+
+        self._server = await asyncio.start_server(self._handle, host, port,
+                                                  limit=config.SERVICE_MAX_MESSAGE)
+        return self._server.sockets[0].getsockname()[:2]
+
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+
+    async def close(self):
+        """ listen을 멈추고 남은 session을 정리 """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for session in list(self.sessions.values()):
+            await self._close_session(session)
+        self._pool.shutdown(wait=True)
+
+
+    def get_stats(self):
+        """
+        return:
+            stats(dict): 전체 요청, 거절 수, 현재/최대 queue depth, latency와 queue delay의 percentile(ms), session별 통계,
+                         BatchScheduler를 쓰면 scheduler 통계
+        """
+        depths = [ session.queue.qsize() for session in self.sessions.values() ]
+        stats = {
+                'connections': self.num_connections,
+                'sessions': len(self.sessions),
+                'requests': self.num_requests,
+                'dropped': self.num_dropped,
+                'queue_depth': sum(depths),
+                'queue_depth_max_session': max(depths) if depths else 0,
+                'queue_depth_max': self.queue_depth_max,
+                'latency': self.latency.to_dict(),
+                'queue_delay': self.queue_delay.to_dict(),
+                'per_session': { sid: session.get_stats() for sid, session in self.sessions.items() },
+                'template_bank': self.bank.get_stats(),
+               }
+        # BatchScheduler면 실제 batch 크기, queue delay
+        if isinstance(self.model, BatchScheduler):
+            stats['scheduler'] = self.model.get_stats()
+        return stats
+
+
+    async def _handle(self, reader, writer):
+        """ 연결 하나를 처리. 끊기면 이 연결에서 만든 session도 닫음 """
+        conn = Connection(writer)
+        self.num_connections += 1
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                await self._dispatch(conn, *message)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for session in list(conn.sessions.values()):
+                await self._close_session(session)
+            self.num_connections -= 1
+            writer.close()
+
+
+    async def _dispatch(self, conn, header, payload):
+        """ 요청 하나를 처리하거나 session queue에 넣음 """
+        self.num_requests += 1
+        op = header.get('op')
+        reply = {'id': header.get('id'), 'ok': True}
+
+        if op == 'stats':
+            reply.update(self.get_stats())
+            await conn.send(reply)
+            return
+
+        if op == 'create':
+            session_id = header.get('session') or uuid.uuid4().hex[:12]
+            if session_id in self.sessions:
+                await conn.send(dict(reply, ok=False, error="session already exists : {}".format(session_id)))
+                return
+            session = Session(session_id, Tracker(model=self.model, bank=self.bank), self.queue_size)
+            session.task = asyncio.get_running_loop().create_task(self._run_session(conn, session))
+            self.sessions[session_id] = conn.sessions[session_id] = session
+            await conn.send(dict(reply, session=session_id))
+            return
+
+        session = conn.sessions.get(header.get('session'))
+        if session is None:
+            await conn.send(dict(reply, ok=False, error="unknown session : {}".format(header.get('session'))))
+            return
+
+        if op == 'close':
+            conn.sessions.pop(session.id, None)
+            await self._close_session(session)
+            await conn.send(dict(reply, session=session.id, **session.get_stats()))
+            return
+
+        if op not in ('init', 'track'):
+            await conn.send(dict(reply, ok=False, error="unknown op : {}".format(op)))
+            return
+
+        # session별 backpressure
+        item = (header, payload, time.perf_counter())
+        if self.backpressure == 'drop':
+            try:
+                session.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                session.dropped += 1
+                self.num_dropped += 1
+                await conn.send(dict(reply, ok=False, error="busy", dropped=True))
+                return
+        else:
+            await session.queue.put(item)
+
+        self.queue_depth_max = max(self.queue_depth_max, session.queue.qsize())
+
+
+    async def _run_session(self, conn, session):
+        """ session의 요청을 순서대로 처리하고 응답함 """
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await session.queue.get()
+            if item is None:
+                break
+
+            header, payload, received = item
+            self.queue_delay.record(time.perf_counter() - received)
+            reply = {'id': header.get('id'), 'ok': True}
+            try:
+                reply.update(await loop.run_in_executor(self._pool, self._process, session, header, payload))
+                session.processed += 1
+            except Exception as e:
+                session.errors += 1
+                reply.update(ok=False, error=str(e))
+
+            latency = time.perf_counter() - received
+            self.latency.record(latency)
+            reply['latency_ms'] = latency * 1000
+
+            try:
+                await conn.send(reply)
+            except ConnectionError:
+                break
+
+
+    def _process(self, session, header, payload):
+        """ thread pool에서 수행 : frame decode, init 혹은 track """
+        frame = decode_frame(header, payload)
+
+        if header['op'] == 'init':
+            session.tracker.init(frame, header['bbox'], header.get('target'))
+            session.initialized = True
+            return {}
+
+        if not session.initialized:
+            raise ValueError("session is not initialized : {}".format(session.id))
+
+        outputs = session.tracker.track(frame)
+        return {
+                'bbox': [ float(v) for v in outputs['bbox'] ],
+                'best_score': float(outputs['best_score']),
+               }
+
+
+    async def _close_session(self, session):
+        """ 이미 받은 요청까지 처리하고 session을 닫음 """
+        if self.sessions.pop(session.id, None) is None:
+            return
+        if not session.task.done():
+            await session.queue.put(None)
+        await session.task
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NanoTrack tracking service")
+    parser.add_argument('--unix', default="", help="Unix socket 경로 (없으면 TCP)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7700)
+    parser.add_argument('--backend', default=None, choices=['trt', 'onnx', 'stub'])
+    parser.add_argument('--engines', nargs=3, default=["", "", ""],
+                        metavar=('EXAM', 'TEMP', 'HEAD'), help="engine 경로 (기본은 backend별 경로)")
+    parser.add_argument('--queue-size', type=int, default=None)
+    parser.add_argument('--backpressure', default=None, choices=['drop', 'block'])
+    parser.add_argument('--workers', type=int, default=None,
+                        help="decode, crop thread 수 (--batch면 batch 크기 이상이어야 batch가 참)")
+    parser.add_argument('--batch', action='store_true', help="session들의 요청을 BatchScheduler로 모아서 추론")
+    parser.add_argument('--max-batch-size', type=int, default=None)
+    parser.add_argument('--deadline-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    model = Model(*args.engines, backend=args.backend, pipeline=True)
+    if args.batch:
+        model = BatchScheduler(model, args.max_batch_size, args.deadline_ms)
+
+    async def run():
+        server = TrackingServer(model,
+                                queue_size=args.queue_size, backpressure=args.backpressure,
+                                num_workers=args.workers)
+        address = await server.start(args.unix, args.host, args.port)
+        print("Listening on {}".format(address))
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+            if args.batch:
+                print(model.get_stats())
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
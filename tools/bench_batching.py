@@ -0,0 +1,77 @@
+# dynamic batching scheduler 벤치마크
+# 사용법 : python -m tools.bench_batching [--backend stub] [--sessions 16] [--frames 100] [--deadline-ms 2]
+# Model 하나를 여러 Tracker(session)가 같이 쓸 때, batch 1로 하나씩 추론(pipeline Model)하는 경우와
+# BatchScheduler로 모아서 추론하는 경우의 처리량, latency, 실제 batch 크기를 비교함
+# session마다 thread 하나가 frame을 순서대로 track함 (service의 thread pool과 같은 형태)
+
+import argparse
+import threading
+import time
+
+from core.config import config
+from tracker.model import Model
+from tracker.scheduler import BatchScheduler
+from tracker.tracker import Tracker
+from utils.profiler import Histogram
+
+from tools.loadgen import make_frames
+
+
+def run(model, clips, num_frames):
+    """ session마다 thread를 띄워 num_frames씩 track하고, (경과 시간, latency histogram) 반환 """
+    latency = Histogram()
+    trackers = [ Tracker(model=model) for _ in clips ]
+    for tracker, (frames, bbox) in zip(trackers, clips):
+        tracker.init(frames[0], bbox)
+
+    def worker(tracker, frames):
+        for i in range(1, num_frames + 1):
+            start = time.perf_counter()
+            tracker.track(frames[i % len(frames)])
+            latency.record(time.perf_counter() - start)
+
+    threads = [ threading.Thread(target=worker, args=(tracker, frames))
+                for tracker, (frames, _) in zip(trackers, clips) ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dynamic batching scheduler 벤치마크")
+    parser.add_argument('--backend', default='stub', choices=['trt', 'onnx', 'stub'])
+    parser.add_argument('--sessions', type=int, default=16)
+    parser.add_argument('--frames', type=int, default=100, help="session당 frame 수")
+    parser.add_argument('--resolution', default='VGA')
+    parser.add_argument('--max-batch-size', type=int, default=config.SCHEDULER_MAX_BATCH_SIZE)
+    parser.add_argument('--deadline-ms', type=float, default=config.SCHEDULER_DEADLINE_MS)
+    args = parser.parse_args()
+
+    clips = [ make_frames(30, args.resolution, seed) for seed in range(args.sessions) ]
+    total = args.sessions * args.frames
+
+    model = Model(backend=args.backend, pipeline=True)
+    base_sec, base_latency = run(model, clips, args.frames)
+
+    scheduler = BatchScheduler(model, args.max_batch_size, args.deadline_ms)
+    batch_sec, batch_latency = run(scheduler, clips, args.frames)
+    scheduler.close()
+    model.close()
+
+    stats = scheduler.get_stats()['track']
+    print("engine max batch : {}".format(model.max_batch_size))
+    print("{:>10} | {:>8} {:>10} {:>10} {:>10}".format("mode", "FPS", "p50 ms", "p99 ms", "batch"))
+    for name, sec, latency, batch in [("batch 1", base_sec, base_latency, 1.0),
+                                      ("scheduler", batch_sec, batch_latency, stats['mean_batch_size'])]:
+        summary = latency.to_dict()
+        print("{:>10} | {:>8.1f} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+              name, total / sec, summary['p50_ms'], summary['p99_ms'], batch))
+    print("batch sizes : {}".format(stats['batch_sizes']))
+    print("queue delay : {}".format(scheduler.get_stats()['queue_delay']))
+
+
+if __name__ == '__main__':
+    main()
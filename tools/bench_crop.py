@@ -0,0 +1,79 @@
+# get_subwindow(기존) vs get_subwindow_into(fused) crop 벤치마크
+# 사용법 : python -m tools.bench_crop [--repeat 200]
+# 해상도별로 중앙/가장자리(padding 발생) crop의 평균 시간과 호출당 할당량을 비교함
+# uint8 열은 uint8 NHWC 입력 모델(tools.onnx_uint8)용 crop (transpose, float 변환 없음)
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from core.config import config
+from tracker.base import SiameseTracker
+
+
+def measure(func, repeat):
+    """ func을 repeat번 실행한 평균 시간(ms)과 호출 1번의 최대 할당량(KB)을 반환 """
+    func() # warm up
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="crop 경로 벤치마크")
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--crop', type=int, default=400, help="원본에서 잘라낼 크기(original_sz)")
+    args = parser.parse_args()
+
+    tracker = SiameseTracker()
+    model_sz = config.TRACK_INSTANCE_SIZE
+    # engine 입력 buffer 역할 (실제로는 page-locked buffer가 들어감)
+    out = np.empty(3 * model_sz * model_sz, np.float32)
+    out_uint8 = np.empty(3 * model_sz * model_sz, np.uint8)
+
+    print("{:>4} {:>7} | {:>12} {:>12} | {:>12} {:>12} | {:>8} {:>9} | {:>9}".format(
+          "res", "pos", "old ms", "old KB", "fused ms", "fused KB", "speedup", "max diff", "uint8 ms"))
+
+    for name in ["VGA", "HD", "FHD", "QHD", "UHD"]:
+        width, height = config.RESOLUTION_PRESET[name]
+        img = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+        avg_chans = np.mean(img, axis=(0, 1))
+
+        positions = {
+            "center": np.array([width / 2, height / 2]),
+            "border": np.array([args.crop / 4, args.crop / 4]), # crop이 frame 밖으로 나가서 padding 발생
+        }
+
+        for pos_name, pos in positions.items():
+            def old():
+                return np.ravel(tracker.get_subwindow(img, pos, model_sz, args.crop, avg_chans))
+
+            def fused():
+                return tracker.get_subwindow_into(img, pos, model_sz, args.crop, avg_chans, out)
+
+            def uint8():
+                return tracker.get_subwindow_into(img, pos, model_sz, args.crop, avg_chans, out_uint8)
+
+            old_ms, old_kb = measure(old, args.repeat)
+            fused_ms, fused_kb = measure(fused, args.repeat)
+            uint8_ms, _ = measure(uint8, args.repeat)
+            diff = np.abs(old().reshape(1, 3, model_sz, model_sz) - fused()).max()
+            diff = max(diff, np.abs(fused() - uint8().transpose(0, 3, 1, 2)).max())
+
+            print("{:>4} {:>7} | {:>12.3f} {:>12.1f} | {:>12.3f} {:>12.1f} | {:>7.2f}x {:>9.1f} | {:>9.3f}".format(
+                  name, pos_name, old_ms, old_kb, fused_ms, fused_kb, old_ms / fused_ms, diff, uint8_ms))
+
+
+if __name__ == '__main__':
+    main()
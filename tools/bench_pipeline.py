@@ -0,0 +1,87 @@
+# 동기(track) vs pipeline(track_async) tracking loop 벤치마크
+# 사용법 : python -m tools.bench_pipeline [--backend onnx] [--frames 200] [--host-ms 5]
+# frame마다 그리기, 저장 등 host 작업(--host-ms)이 있다고 보고, 추론과 겹쳐서 수행됐을 때의 FPS를 비교함
+
+import argparse
+import time
+
+import numpy as np
+
+from core.config import config
+from tracker.tracker import Tracker
+
+
+def make_frames(num_frames, resolution):
+    """ 원이 조금씩 움직이는 합성 frame """
+    width, height = config.RESOLUTION_PRESET[resolution]
+    base = np.random.RandomState(0).randint(0, 256, (height, width, 3)).astype(np.uint8)
+    frames = []
+    for i in range(num_frames):
+        frame = base.copy()
+        cx, cy = width // 2 + 2 * i % 100, height // 2
+        frame[cy - 40:cy + 40, cx - 40:cx + 40] = (0, 0, 255)
+        frames.append(frame)
+    return frames, [width // 2 - 40, height // 2 - 40, 80, 80]
+
+
+def host_work(ms):
+    """ 그리기, imshow, 저장 등을 흉내냄 (GIL을 놓는 작업) """
+    if ms > 0:
+        time.sleep(ms / 1000)
+
+
+def run_sync(tracker, frames, bbox, host_ms):
+    tracker.init(frames[0], bbox)
+    results = []
+    start = time.perf_counter()
+    for frame in frames[1:]:
+        results.append(tracker.track(frame))
+        host_work(host_ms)
+    return time.perf_counter() - start, results
+
+
+def run_pipeline(tracker, frames, bbox, host_ms):
+    tracker.init(frames[0], bbox)
+    results = []
+    pending = None
+    start = time.perf_counter()
+    for frame in frames[1:]:
+        future = tracker.track_async(frame)
+        # frame N이 추론되는 동안 frame N-1의 host 작업
+        if pending is not None:
+            results.append(pending.result())
+            host_work(host_ms)
+        pending = future
+    results.append(pending.result())
+    host_work(host_ms)
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pipeline tracking loop 벤치마크")
+    parser.add_argument('--backend', default='onnx', choices=['trt', 'onnx', 'stub'])
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--resolution', default='HD')
+    parser.add_argument('--host-ms', type=float, default=5.0, help="frame당 host 작업 시간(ms)")
+    args = parser.parse_args()
+
+    frames, bbox = make_frames(args.frames, args.resolution)
+
+    sync_tracker = Tracker(backend=args.backend)
+    pipe_tracker = Tracker(backend=args.backend, pipeline=True)
+
+    sync_sec, sync_results = run_sync(sync_tracker, frames, bbox, args.host_ms)
+    pipe_sec, pipe_results = run_pipeline(pipe_tracker, frames, bbox, args.host_ms)
+    pipe_tracker.model.close()
+
+    num = len(frames) - 1
+    diff = max(np.abs(np.subtract(a['bbox'], b['bbox'])).max() for a, b in zip(sync_results, pipe_results))
+
+    print("{:>10} | {:>10} {:>8}".format("mode", "ms/frame", "FPS"))
+    print("{:>10} | {:>10.3f} {:>8.1f}".format("sync", sync_sec / num * 1000, num / sync_sec))
+    print("{:>10} | {:>10.3f} {:>8.1f}".format("pipeline", pipe_sec / num * 1000, num / pipe_sec))
+    print("speedup {:.2f}x, max bbox diff {:.2e}".format(sync_sec / pipe_sec, diff))
+
+
+if __name__ == '__main__':
+    main()
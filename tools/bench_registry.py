@@ -0,0 +1,90 @@
+# engine registry 벤치마크
+# 사용법 : python -m tools.bench_registry [--backend onnx] [--trackers 12] [--warmup 2]
+# Tracker N개를 만들 때 engine 파일을 Tracker마다 로딩하는 경우(separate)와 registry로 한번만 로딩하는 경우(shared)의
+# 생성 시간, 늘어난 메모리(RSS), 첫 track latency를 비교함. mode마다 새 process에서 실행함
+
+import argparse
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from core.config import config
+
+from tools.bench_pipeline import make_frames
+
+
+def rss_mb():
+    """ 현재 process의 resident memory (MB) """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(mode, backend, num_trackers, warmup, use_mmap):
+    """ 새 process에서 실행됨 """
+    config.ENGINE_SHARED = mode == 'shared'
+    config.ENGINE_WARMUP_ITERS = warmup
+    config.ENGINE_REGISTRY_MMAP = use_mmap
+
+    from engine.registry import registry
+    from tracker.tracker import Tracker
+
+    frames, bbox = make_frames(2, 'VGA')
+    base = rss_mb()
+
+    start = time.perf_counter()
+    trackers = [ Tracker(backend=backend) for _ in range(num_trackers) ]
+    startup = time.perf_counter() - start
+    memory = rss_mb() - base
+
+    first, second = [], []
+    for tracker in trackers:
+        tracker.init(frames[0], bbox)
+        start = time.perf_counter()
+        tracker.track(frames[1])
+        first.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        tracker.track(frames[0])
+        second.append(time.perf_counter() - start)
+
+    return {
+            'mode': mode,
+            'startup_ms': startup * 1000,
+            'rss_mb': memory,
+            'first_track_ms': float(np.mean(first)) * 1000,
+            'second_track_ms': float(np.mean(second)) * 1000,
+            'engines': registry.get_stats()['engines'],
+           }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="engine registry(공유 로딩) 벤치마크")
+    parser.add_argument('--backend', default='onnx', help="'trt', 'onnx', 'stub'")
+    parser.add_argument('--trackers', type=int, default=12, help="만들 Tracker 수")
+    parser.add_argument('--warmup', type=int, default=config.ENGINE_WARMUP_ITERS, help="warmup 횟수 (0이면 안 함)")
+    parser.add_argument('--no-mmap', action='store_true', help="trt engine 파일을 mmap 대신 read로 읽음")
+    args = parser.parse_args()
+
+    # mode마다 깨끗한 process에서 (import, page cache 외에는 공유하는 것이 없게)
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for mode in ('separate', 'shared'):
+        with ctx.Pool(1) as pool:
+            results.append(pool.apply(run, (mode, args.backend, args.trackers, args.warmup, not args.no_mmap)))
+
+    print("trackers : {}, backend : {}, warmup : {}".format(args.trackers, args.backend, args.warmup))
+    print("{:<10} {:>12} {:>10} {:>14} {:>15} {:>8}".format(
+          "mode", "startup ms", "rss MB", "1st track ms", "2nd track ms", "engines"))
+    for result in results:
+        print("{:<10} {:>12.1f} {:>10.1f} {:>14.2f} {:>15.2f} {:>8}".format(
+              result['mode'], result['startup_ms'], result['rss_mb'], result['first_track_ms'],
+              result['second_track_ms'], result['engines']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# ONNX -> TensorRT engine 빌드 (create_trt_engine.sh 대체)
+# 사용법 : python -m tools.build_engines [--precision fp16] [--batch 1 4 8] [--workers 3] [--force] [--check]
+#            [--precision int8 --calib exam.cache temp.cache head.cache]
+# 기본으로 config.ENGINE_PATHS의 onnx -> trt 경로 3쌍을 빌드하고, ONNX 내용, precision, batch profile,
+# builder(TensorRT 버전, GPU)가 그대로인 engine은 건너뜀. engine 옆에 <engine>.json metadata를 저장함
+# --builder stub이면 TensorRT 없이 cache/무효화 동작만 확인할 수 있음
+# int8은 QDQ ONNX(tools.quantize)이거나 --calib로 calibration cache를 준 engine만 빌드함 (cache 내용도 key에 들어감)
+# --batch의 최대가 1보다 크면 batch가 1로 고정된 ONNX는 batch를 dynamic으로 바꾼 <이름>_dyn.onnx(engine.surgery)로 빌드함
+
+import argparse
+import os
+import sys
+
+from core.config import config
+from engine.builder import BuildSpec
+from engine.builder import BUILDERS
+from engine.builder import EngineBuildManager
+from engine.builder import PRECISIONS
+from engine.builder import FRESH
+from engine.builder import create_builder
+from engine.builder import default_specs
+from engine.surgery import dynamic_path
+from engine.surgery import has_dynamic_batch
+from engine.surgery import write_dynamic_variant
+
+
+def prepare_dynamic(specs):
+    """ batch profile 최대가 1보다 큰데 ONNX의 batch가 고정돼 있으면 dynamic으로 바꾼 모델로 빌드하도록 spec을 바꿈\n
+    변환 모델은 원래 ONNX 옆 <이름>_dyn.onnx, 원래 ONNX보다 오래됐을 때만 다시 씀 (내용이 같으면 engine key도 같음) """
+    import onnx
+
+    for spec in specs:
+        if spec.batch_profile[2] == 1 or not os.path.exists(spec.onnx_path):
+            continue
+        if has_dynamic_batch(onnx.load(spec.onnx_path, load_external_data=False)):
+            continue
+        dst = dynamic_path(spec.onnx_path)
+        if not os.path.exists(dst) or os.path.getmtime(dst) < os.path.getmtime(spec.onnx_path):
+            write_dynamic_variant(spec.onnx_path, dst)
+            print(" dynamic {} -> {}".format(spec.onnx_path, dst))
+        spec.onnx_path = dst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX -> TensorRT engine 빌드")
+    parser.add_argument('--precision', default=None, choices=PRECISIONS,
+                        help="기본 config.ENGINE_PRECISION")
+    parser.add_argument('--batch', type=int, nargs=3, default=None, metavar=('MIN', 'OPT', 'MAX'),
+                        help="batch profile (batch가 dynamic인 ONNX만), 기본 config.ENGINE_BATCH_PROFILE")
+    parser.add_argument('--builder', default=None, choices=tuple(BUILDERS), help="기본 config.ENGINE_BUILDER")
+    parser.add_argument('--trtexec', default=None, help="trtexec 경로 (기본 config.TRTEXEC_PATH)")
+    parser.add_argument('--workers', type=int, default=None, help="동시에 빌드할 수")
+    parser.add_argument('--onnx', nargs='*', default=None, help="빌드할 ONNX 목록 (--engine과 같은 순서)")
+    parser.add_argument('--engine', nargs='*', default=None, help="저장할 engine 경로 목록")
+    parser.add_argument('--calib', nargs='*', default=None,
+                        help="int8 calibration cache 목록 (빌드할 engine과 같은 순서, QDQ ONNX는 필요 없음)")
+    parser.add_argument('--force', action='store_true', help="fresh해도 다시 빌드")
+    parser.add_argument('--check', action='store_true', help="빌드하지 않고 상태만 출력")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if args.onnx or args.engine:
+        if not args.onnx or not args.engine or len(args.onnx) != len(args.engine):
+            parser.error("--onnx와 --engine은 같은 개수로 지정해야 합니다")
+        calibs = args.calib or [None] * len(args.onnx)
+        if len(calibs) != len(args.onnx):
+            parser.error("--calib은 --onnx와 같은 개수로 지정해야 합니다")
+        specs = [BuildSpec(onnx_path, engine_path, args.precision, args.batch, calib)
+                 for onnx_path, engine_path, calib in zip(args.onnx, args.engine, calibs)]
+    else:
+        calibs = args.calib or [None] * 3
+        if len(calibs) != 3:
+            parser.error("--calib은 exam, temp, head 3개를 지정해야 합니다")
+        specs = default_specs(args.precision, args.batch, calibs)
+    prepare_dynamic(specs)
+
+    name = args.builder or config.ENGINE_BUILDER
+    kwargs = {'trtexec_path': args.trtexec, 'verbose': args.verbose} if name == 'trtexec' else {}
+    manager = EngineBuildManager(create_builder(name, **kwargs), args.workers)
+
+    if args.check:
+        stale = 0
+        for spec in specs:
+            state, reason = manager.status(spec)
+            stale += state != FRESH
+            print("{:>8} {} {}".format(state, spec.engine_path, "({})".format(reason) if reason else ""))
+        sys.exit(1 if stale else 0)
+
+    failed = 0
+    for result in manager.build_all(specs, args.force):
+        spec = result['spec']
+        if 'error' in result:
+            failed += 1
+            print("  failed {} : {}".format(spec.engine_path, result['error']))
+        elif result['built']:
+            print("   built {} ({}, {:.1f}s)".format(spec.engine_path, result['reason'], result['seconds']))
+        else:
+            print("   fresh {}".format(spec.engine_path))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+# Model 자리에 들어가는 객체들(Model, BatchScheduler, ReplayModel)이 같은 interface로 동작하는지, template bank 저장이 되는지 확인 (stub backend, engine 없이)
+# 사용법 : python -m tools.check_models [--frames 20]
+# 확인 항목 (하나라도 틀리면 exit code 1)
+#   signature : track_async가 Model.track_async의 인자(x, zf, post, timings)를 모두 받음
+#   track, track_async : Tracker, AdaptiveTracker(force)로 추적한 bbox가 Model(stub, batch 1 동기)과 같음
+#   timings : profiler가 켜져 있으면 track_async의 Future에 그 frame의 crop, post 구간이 남음
+#   template bank : 빈 bank, target이 있는 bank, clear한 bank가 save/load 후 ID, zf가 그대로
+# 새로 Model 자리에 들어가는 객체를 만들면 make_models에 추가할 것
+
+import argparse
+import inspect
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from tools.check_trt_named import Checker
+
+
+def make_models(directory):
+    """ 이름 -> Model 자리에 넣을 객체를 만드는 함수 (ReplayModel은 기준 추적을 기록한 파일로) """
+    from tracker.model import Model
+    from tracker.replay import ReplayModel
+    from tracker.scheduler import BatchScheduler
+
+    return {
+            'Model': lambda: Model(backend='stub'),
+            'Model(pipeline)': lambda: Model(backend='stub', pipeline=True),
+            'BatchScheduler': lambda: BatchScheduler(Model(backend='stub'), deadline_ms=0),
+            'ReplayModel': lambda: ReplayModel(os.path.join(directory, 'reference.rec')),
+           }
+
+
+def reference_track(directory, frames, bbox):
+    """ Model(stub)로 동기 추적한 bbox (ReplayModel용으로 head 출력도 기록) """
+    from tracker.replay import OutputRecorder
+    from tracker.tracker import Tracker
+
+    recorder = OutputRecorder(os.path.join(directory, 'reference.rec'))
+    tracker = Tracker(backend='stub', recorder=recorder)
+    tracker.init(frames[0], bbox)
+    bboxes = [ tracker.track(frame)['bbox'] for frame in frames[1:] ]
+    recorder.close()
+    return np.asarray(bboxes, np.float64)
+
+
+def run(tracker_class, model, frames, bbox, mode):
+    """ mode('track', 'track_async')로 추적한 bbox와 track_async Future들의 timings """
+    tracker = tracker_class(model=model)
+    tracker.init(frames[0], bbox)
+    kwargs = {'force': True} if hasattr(tracker, 'get_stats') else {}
+
+    bboxes, timings = [], []
+    for frame in frames[1:]:
+        if mode == 'track':
+            bboxes.append(tracker.track(frame, **kwargs)['bbox'])
+        else:
+            future = tracker.track_async(frame, **kwargs)
+            bboxes.append(future.result()['bbox'])
+            timings.append(future.timings)
+    tracker.wait()
+    return np.asarray(bboxes, np.float64), timings
+
+
+def check_signatures(checker, models):
+    from tracker.model import Model
+
+    expected = list(inspect.signature(Model.track_async).parameters)
+    for name, create in models.items():
+        model = create()
+        params = list(inspect.signature(model.track_async).parameters)
+        missing = [ param for param in expected if param != 'self' and param not in params ]
+        checker.check("{} track_async accepts {}".format(name, ", ".join(expected[1:])), not missing,
+                      "missing {}".format(missing))
+        model.close()
+
+
+def check_tracking(checker, models, frames, bbox, reference):
+    from tracker.adaptive import AdaptiveTracker
+    from tracker.tracker import Tracker
+
+    for name, create in models.items():
+        for tracker_class in (Tracker, AdaptiveTracker):
+            for mode in ('track', 'track_async'):
+                model = create()
+                label = "{} {}.{}".format(name, tracker_class.__name__, mode)
+                try:
+                    bboxes, timings = run(tracker_class, model, frames, bbox, mode)
+                except Exception as e:
+                    checker.check(label, False, "raised {!r}".format(e))
+                    continue
+                finally:
+                    model.close()
+
+                diff = float(np.max(np.abs(bboxes - reference)))
+                checker.check(label + " matches Model", diff < 1e-6, "bbox diff {:.3g}".format(diff))
+                if mode == 'track_async':
+                    missing = [ i for i, t in enumerate(timings) if 'crop' not in t or 'post' not in t ]
+                    checker.check(label + " future.timings has crop, post", not missing,
+                                  "frames {}".format(missing[:5]))
+
+
+def check_bank(checker, directory):
+    from tracker.bank import TemplateBank
+
+    rng = np.random.RandomState(0)
+    bank = TemplateBank()
+    cases = [('empty', lambda: None),
+             ('filled', lambda: [ bank.put(target_id, rng.standard_normal(48 * 8 * 8).astype(np.float32),
+                                           [10, 20, 30, 40], [100., 110., 120.]) for target_id in (1, 'car') ]),
+             ('cleared', bank.clear)]
+    for name, prepare in cases:
+        prepare()
+        path = os.path.join(directory, 'bank_{}.npz'.format(name))
+        try:
+            bank.save(path)
+            loaded = TemplateBank.load(path)
+        except Exception as e:
+            checker.check("{} template bank save/load".format(name), False, "raised {!r}".format(e))
+            continue
+        same = list(loaded._entries) == list(bank._entries) and all(
+               np.array_equal(loaded._entries[key].zf, entry.zf) for key, entry in bank._entries.items())
+        checker.check("{} template bank save/load".format(name), same,
+                      "ids {} -> {}".format(list(bank._entries), list(loaded._entries)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model interface 객체(Model, BatchScheduler, ReplayModel) 동작 확인")
+    parser.add_argument('--frames', type=int, default=20, help="추적할 frame 수")
+    args = parser.parse_args()
+
+    from core.config import config
+    from tools.loadgen import make_frames
+    from utils.profiler import profiler
+
+    config.ENGINE_WARMUP_ITERS = 0
+    profiler.enable()
+
+    checker = Checker()
+    frames, bbox = make_frames(args.frames + 1, 'VGA', 0)
+    with tempfile.TemporaryDirectory(prefix='check-models-') as directory:
+        reference = reference_track(directory, frames, bbox)
+        models = make_models(directory)
+        check_signatures(checker, models)
+        check_tracking(checker, models, frames, bbox, reference)
+        check_bank(checker, directory)
+
+    print()
+    if checker.failed:
+        print("{} failed : {}".format(len(checker.failed), ", ".join(checker.failed)))
+        sys.exit(1)
+    print("all passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,440 @@
+# GPU, TensorRT 없이 TensorRT 엔진 랩퍼(engine.named.TRTNamedEngine, engine.engine.TRTEngine)의 buffer 처리 확인
+# 사용법 : python -m tools.check_trt_named [--threads 4] [--frames 30]
+# tensorrt, pycuda 대신 host 메모리로 흉내낸 fake module을 sys.modules에 넣고 실행함 (설치돼 있어도 항상 fake)
+#   engine 파일은 입출력 spec(json), device memory는 numpy buffer, 추론은 numpy로 계산하는 nanotrack 모양의 가짜 연산
+# 확인 항목 (하나라도 틀리면 exit code 1)
+#   dynamic batch : profile 최대 batch가 max_batch_size, batch별 출력이 numpy 기준과 같음, shape이 바뀔 때만 set_input_shape
+#   profile 한계  : profile 최대 batch 초과, 고정 batch engine에 다른 batch, batch 단위가 아닌 입력은 ValueError
+#   view / copy   : 기본 출력은 page-locked buffer의 view(다음 호출이 덮어씀), copy=True / copy_outputs=True면 복사본
+#   page-locked 입력 : get_input_buffer에 쓰면 host 복사 없음, allocate_host_buffer면 그 buffer에서 바로 H2D, 그 외엔 복사
+#   resident 입력 : set_resident 뒤 None 입력은 H2D 없이 올려둔 값을 씀
+#   TRTEngine     : 예전 binding API 엔진의 출력, resident 입력
+#   pipeline Model 공유 : 여러 thread의 Tracker가 pipeline Model 하나를 같이 쓸 때 결과가 thread마다 따로 돌린 것과 같음
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import types
+
+import numpy as np
+
+# fake device memory : 주소 -> uint8 buffer
+_device = {}
+# fake에서 일어난 일 (확인용)
+counters = {'htod': 0, 'dtoh': 0, 'set_input_shape': 0}
+
+
+# nanotrack 모양의 가짜 연산 (입력 dict -> 출력 dict, batch 차원 포함)
+def _backbone(x):
+    # N * 3 * H * W -> 16 간격으로 뽑아서 48 channel로 (255 -> 16, 127 -> 8)
+    sampled = x[:, :, ::16, ::16] / 255.
+    return np.repeat(sampled, 16, axis=1) * np.linspace(0.5, 1.5, 48, dtype=np.float32)[None, :, None, None]
+
+def _head(zf, xf):
+    # template 평균과 search feature의 곱 -> cls(2), loc(4, 항상 양수)
+    response = xf.mean(axis=1) * zf.mean(axis=(1, 2, 3))[:, None, None]
+    cls = np.stack([-response, response], axis=1)
+    loc = np.stack([np.abs(response) * k + 4. for k in (8., 9., 10., 11.)], axis=1)
+    return cls, loc
+
+OPS = {
+    'exam':      lambda inputs: {'xf': _backbone(inputs['x'])},
+    'temp':      lambda inputs: {'zf': _backbone(inputs['z'])},
+    'head':      lambda inputs: dict(zip(('cls', 'loc'), _head(inputs['zf'], inputs['xf']))),
+    'exam_head': lambda inputs: dict(zip(('cls', 'loc'), _head(inputs['zf'], _backbone(inputs['x'])))),
+}
+
+# engine spec : op, 입력 [(이름, shape(batch -1이면 dynamic), profile (min, opt, max) batch)], 출력 [(이름, batch 뺀 shape)]
+SPECS = {
+    'exam':      {'inputs': [('x', (-1, 3, 255, 255))], 'outputs': [('xf', (48, 16, 16))]},
+    'temp':      {'inputs': [('z', (-1, 3, 127, 127))], 'outputs': [('zf', (48, 8, 8))]},
+    'head':      {'inputs': [('zf', (-1, 48, 8, 8)), ('xf', (-1, 48, 16, 16))],
+                  'outputs': [('cls', (2, 16, 16)), ('loc', (4, 16, 16))]},
+    'exam_head': {'inputs': [('zf', (-1, 48, 8, 8)), ('x', (-1, 3, 255, 255))],
+                  'outputs': [('cls', (2, 16, 16)), ('loc', (4, 16, 16))]},
+}
+
+
+class FakeEngine(object):
+    """ trt.ICudaEngine 흉내 (named tensor API + 예전 binding API) """
+    num_io_tensors = 0
+
+    def __init__(self, spec):
+        self.op = spec['op']
+        self.profile = tuple(spec['profile'])
+        self.inputs = [ (name, tuple(shape)) for name, shape in spec['inputs'] ]
+        self.outputs = [ (name, tuple(shape)) for name, shape in spec['outputs'] ]
+        self.names = [ name for name, _ in self.inputs + self.outputs ]
+        self.num_io_tensors = len(self.names)
+        self.max_batch_size = 1
+
+    def _input_shape(self, name):
+        return dict(self.inputs)[name]
+
+    def get_tensor_name(self, index):
+        return self.names[index]
+
+    def get_tensor_mode(self, name):
+        return TensorIOMode.INPUT if name in dict(self.inputs) else TensorIOMode.OUTPUT
+
+    def get_tensor_shape(self, name):
+        if name in dict(self.inputs):
+            return self._input_shape(name)
+        batch = self.inputs[0][1][0]
+        return (batch,) + dict(self.outputs)[name]
+
+    def get_tensor_dtype(self, name):
+        return np.float32
+
+    def get_tensor_profile_shape(self, name, profile):
+        return [ (batch,) + self._input_shape(name)[1:] for batch in self.profile ]
+
+    def create_execution_context(self):
+        return FakeContext(self)
+
+    # 예전 binding API (TRTEngine) : batch 고정 engine만
+    def __iter__(self):
+        return iter(self.names)
+
+    def get_binding_shape(self, name):
+        return tuple(max(d, 1) for d in self.get_tensor_shape(name))
+
+    def get_binding_dtype(self, name):
+        return np.float32
+
+    def binding_is_input(self, name):
+        return name in dict(self.inputs)
+
+
+class FakeContext(object):
+    """ trt.IExecutionContext 흉내 : 주소로 device buffer를 찾아서 numpy로 계산 """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.shapes = { name: shape for name, shape in engine.inputs }
+        self.addresses = {}
+
+    def set_optimization_profile_async(self, profile, stream_handle):
+        pass
+
+    def set_input_shape(self, name, shape):
+        counters['set_input_shape'] += 1
+        batch = shape[0]
+        if not self.engine.profile[0] <= batch <= self.engine.profile[2]:
+            raise ValueError("batch {} is outside the profile {}".format(batch, self.engine.profile))
+        self.shapes[name] = tuple(shape)
+
+    def get_tensor_shape(self, name):
+        if name in self.shapes:
+            return self.shapes[name]
+        return (self.shapes[self.engine.inputs[0][0]][0],) + dict(self.engine.outputs)[name]
+
+    def set_tensor_address(self, name, address):
+        self.addresses[name] = address
+
+    def _execute(self, addresses):
+        inputs = {}
+        for name, _ in self.engine.inputs:
+            shape = tuple(max(d, 1) for d in self.get_tensor_shape(name))
+            inputs[name] = _device[addresses[name]].view(np.float32)[:int(np.prod(shape))].reshape(shape)
+        for name, value in OPS[self.engine.op](inputs).items():
+            out = _device[addresses[name]].view(np.float32)
+            out[:value.size] = np.ravel(value)
+        return True
+
+    def execute_async_v3(self, stream_handle):
+        return self._execute(self.addresses)
+
+    def execute_async_v2(self, bindings, stream_handle):
+        return self._execute(dict(zip(self.engine.names, bindings)))
+
+
+class TensorIOMode(object):
+    INPUT = 0
+    OUTPUT = 1
+
+
+class Runtime(object):
+    def __init__(self, logger):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def deserialize_cuda_engine(self, data):
+        return FakeEngine(json.loads(bytes(data).decode()))
+
+
+class HostPointer(bytearray):
+    """ pycuda page-locked memory 흉내 """
+
+
+class DeviceAllocation(object):
+    def __init__(self, nbytes):
+        self.buf = np.zeros(nbytes, np.uint8)
+        _device[id(self)] = self.buf
+
+    def __int__(self):
+        return id(self)
+
+
+class Stream(object):
+    handle = 0
+
+    def synchronize(self):
+        pass
+
+
+class Event(object):
+    def record(self, stream=None):
+        pass
+
+    def time_since(self, other):
+        return 0.
+
+
+def pagelocked_empty(shape, dtype):
+    # pycuda와 같이 array의 base가 page-locked memory 객체 (engine._is_pagelocked가 base를 따라가서 확인)
+    dtype = np.dtype(dtype)
+    return np.ndarray(shape, dtype, buffer=HostPointer(int(np.prod(shape)) * dtype.itemsize))
+
+def memcpy_htod_async(device, src, stream=None):
+    counters['htod'] += 1
+    data = np.ascontiguousarray(src).view(np.uint8).ravel()
+    device.buf[:data.size] = data
+
+def memcpy_dtoh_async(host, device, stream=None):
+    counters['dtoh'] += 1
+    view = host.view(np.uint8)
+    view[:] = device.buf[:view.size]
+
+
+def install():
+    """ fake tensorrt, pycuda module을 sys.modules에 넣음 (engine.named, engine.engine을 import하기 전에) """
+    trt = types.ModuleType('tensorrt')
+    trt.__version__ = '10.0-fake'
+    trt.volume = lambda shape: int(np.prod(shape))
+    trt.nptype = lambda dtype: dtype
+    trt.Logger = lambda *args: None
+    trt.Runtime = Runtime
+    trt.ICudaEngine = FakeEngine
+    trt.TensorIOMode = TensorIOMode
+
+    driver = types.ModuleType('pycuda.driver')
+    for obj in (HostPointer, Stream, Event, pagelocked_empty, memcpy_htod_async, memcpy_dtoh_async):
+        setattr(driver, obj.__name__, obj)
+    driver.mem_alloc = DeviceAllocation
+
+    autoinit = types.ModuleType('pycuda.autoinit')
+    autoinit.context = types.SimpleNamespace(push=lambda: None)
+
+    pycuda = types.ModuleType('pycuda')
+    pycuda.driver, pycuda.autoinit = driver, autoinit
+    sys.modules.update({'tensorrt': trt, 'pycuda': pycuda, 'pycuda.driver': driver, 'pycuda.autoinit': autoinit})
+
+
+def write_engine(directory, op, profile=(1, 1, 1), fixed_batch=None):
+    """ fake engine 파일(spec json)을 쓰고 경로를 반환 (fixed_batch면 batch 차원이 고정된 engine) """
+    spec = dict(SPECS[op], op=op, profile=profile)
+    if fixed_batch is not None:
+        spec['inputs'] = [ (name, (fixed_batch,) + tuple(shape[1:])) for name, shape in spec['inputs'] ]
+        spec['profile'] = (fixed_batch,) * 3
+    path = os.path.join(directory, "{}_{}.engine".format(op, 'b{}'.format(fixed_batch) if fixed_batch else
+                                                          'dyn{}'.format(profile[2])))
+    with open(path, 'w') as f:
+        json.dump(spec, f)
+    return path
+
+
+class Checker(object):
+    """ 항목별 결과 모음 """
+
+    def __init__(self):
+        self.failed = []
+
+    def check(self, name, ok, detail=""):
+        print("{:<4} {}{}".format('ok' if ok else 'FAIL', name, " : " + detail if detail and not ok else ""))
+        if not ok:
+            self.failed.append(name)
+
+    def raises(self, name, func, error=ValueError):
+        try:
+            func()
+        except error:
+            self.check(name, True)
+            return
+        except Exception as e:
+            self.check(name, False, "raised {!r}".format(e))
+            return
+        self.check(name, False, "no {}".format(error.__name__))
+
+
+def check_named(checker, directory, rng):
+    from engine.named import TRTNamedEngine
+    from engine.named import is_supported
+
+    checker.check("named tensor API detected", is_supported())
+
+    # dynamic batch : batch 1 ~ max의 출력이 numpy 기준과 같은지
+    engine = TRTNamedEngine(write_engine(directory, 'head', profile=(1, 4, 8)))
+    checker.check("dynamic batch max_batch_size = profile max", engine.max_batch_size == 8 and engine.dynamic_batch)
+    diff = 0.
+    for batch in (1, 3, 8, 2):
+        zf = rng.rand(batch, 48, 8, 8).astype(np.float32)
+        xf = rng.rand(batch, 48, 16, 16).astype(np.float32)
+        cls, loc = engine([np.ravel(zf), np.ravel(xf)])
+        expected = _head(zf, xf)
+        checker.check("dynamic batch {} output size".format(batch), cls.size == batch * 512 and loc.size == batch * 1024)
+        diff = max(diff, float(np.abs(cls - np.ravel(expected[0])).max()), float(np.abs(loc - np.ravel(expected[1])).max()))
+    checker.check("dynamic batch outputs match", diff < 1e-5, "max diff {:.3g}".format(diff))
+
+    # shape이 같으면 set_input_shape를 다시 부르지 않음
+    zf, xf = rng.rand(2, 48, 8, 8).astype(np.float32), rng.rand(2, 48, 16, 16).astype(np.float32)
+    engine([np.ravel(zf), np.ravel(xf)])
+    before = counters['set_input_shape']
+    engine([np.ravel(zf), np.ravel(xf)])
+    checker.check("same shape skips set_input_shape", counters['set_input_shape'] == before)
+
+    # profile 한계
+    checker.raises("batch above profile max rejected",
+                   lambda: engine([rng.rand(9 * 3072).astype(np.float32), rng.rand(9 * 12288).astype(np.float32)]))
+    checker.raises("partial sample rejected",
+                   lambda: engine([rng.rand(3000).astype(np.float32), rng.rand(12288).astype(np.float32)]))
+    fixed = TRTNamedEngine(write_engine(directory, 'head', fixed_batch=1))
+    checker.check("fixed batch max_batch_size = 1", fixed.max_batch_size == 1 and not fixed.dynamic_batch)
+    checker.raises("fixed batch engine rejects batch 2",
+                   lambda: fixed([rng.rand(2 * 3072).astype(np.float32), rng.rand(2 * 12288).astype(np.float32)]))
+
+    # view / copy
+    inputs = [ [rng.rand(3072).astype(np.float32), rng.rand(12288).astype(np.float32)] for _ in range(2) ]
+    first = fixed(inputs[0])[0]
+    kept = np.array(first)
+    checker.check("outputs are page-locked views", np.shares_memory(first, fixed.outputs[0].host))
+    fixed(inputs[1])
+    checker.check("next call overwrites a view", not np.array_equal(first, kept))
+    copied = fixed.infer(dict(zip(fixed.input_names, inputs[0])), copy=True)['cls']
+    fixed(inputs[1])
+    checker.check("infer(copy=True) keeps its values", np.array_equal(np.ravel(copied), kept)
+                  and not np.shares_memory(copied, fixed.outputs[0].host))
+    copying = TRTNamedEngine(write_engine(directory, 'head', fixed_batch=1), copy_outputs=True)
+    first = copying(inputs[0])[0]
+    copying(inputs[1])
+    checker.check("copy_outputs=True keeps its values", np.array_equal(first, kept))
+
+    # page-locked 입력
+    exam = TRTNamedEngine(write_engine(directory, 'exam', profile=(1, 1, 4)))
+    x = rng.randint(0, 256, (1, 3, 255, 255)).astype(np.float32)
+    buf = exam.get_input_buffer((1, 3, 255, 255))
+    buf[:] = x
+    expected = np.ravel(_backbone(x))
+    out = exam(buf)[0]
+    checker.check("input buffer used without host copy", np.shares_memory(exam.sources['x'], exam.inputs[0].host)
+                  and np.allclose(out, expected))
+    pinned = exam.allocate_host_buffer((2, 3, 255, 255))
+    pinned[:] = rng.randint(0, 256, pinned.shape)
+    out = exam(pinned)[0]
+    checker.check("page-locked input uploaded in place", np.shares_memory(exam.sources['x'], pinned)
+                  and not np.shares_memory(exam.sources['x'], exam.inputs[0].host)
+                  and np.allclose(out, np.ravel(_backbone(pinned))))
+    pageable = rng.randint(0, 256, (1, 3, 255, 255)).astype(np.float32)
+    out = exam(pageable)[0]
+    checker.check("pageable input copied to the input buffer", np.shares_memory(exam.sources['x'], exam.inputs[0].host)
+                  and np.allclose(out, np.ravel(_backbone(pageable))))
+
+    # resident 입력 (fused 모델의 zf)
+    fused = TRTNamedEngine(write_engine(directory, 'exam_head', profile=(1, 1, 1)))
+    zf = rng.rand(1, 48, 8, 8).astype(np.float32)
+    fused.set_resident(0, zf)
+    before = counters['htod']
+    cls, loc = fused([None, np.ravel(x)])
+    expected = _head(zf, _backbone(x))
+    checker.check("resident input skips H2D", counters['htod'] - before == 1)
+    checker.check("resident input is used", np.allclose(cls, np.ravel(expected[0])) and np.allclose(loc, np.ravel(expected[1])))
+    checker.raises("missing non-resident input rejected", lambda: exam([None]), KeyError)
+
+
+def check_legacy(checker, directory, rng):
+    from engine.engine import TRTEngine
+
+    engine = TRTEngine(write_engine(directory, 'head', fixed_batch=1))
+    zf, xf = rng.rand(1, 48, 8, 8).astype(np.float32), rng.rand(1, 48, 16, 16).astype(np.float32)
+    cls, loc = engine([np.ravel(zf), np.ravel(xf)])
+    expected = _head(zf, xf)
+    checker.check("TRTEngine outputs match", np.allclose(cls, np.ravel(expected[0])) and np.allclose(loc, np.ravel(expected[1])))
+
+    engine.set_resident(0, zf)
+    before = counters['htod']
+    cls, _ = engine([None, np.ravel(xf)])
+    checker.check("TRTEngine resident input skips H2D", counters['htod'] - before == 1 and np.allclose(cls, np.ravel(expected[0])))
+
+
+def check_shared_model(checker, directory, num_threads, num_frames):
+    """ pipeline Model 하나를 여러 thread의 Tracker가 같이 쓸 때, thread마다 따로 돌린 결과와 같은지 """
+    from tools.bench_pipeline import make_frames
+    from tracker.model import Model
+    from tracker.tracker import Tracker
+
+    paths = [ write_engine(directory, op, fixed_batch=1) for op in ('exam', 'temp', 'head') ]
+    frames, bbox = make_frames(num_frames, 'VGA')
+    # thread마다 다른 target (출력이 서로 달라야 섞였을 때 드러남)
+    bboxes = [ [bbox[0] - 60 * i, bbox[1] - 30 * i, bbox[2] + 10 * i, bbox[3]] for i in range(num_threads) ]
+
+    def run(tracker, bbox, results):
+        tracker.init(frames[0], bbox)
+        for frame in frames[1:]:
+            results.append(tracker.track(frame)['bbox'])
+
+    expected = []
+    for bbox in bboxes:
+        results = []
+        run(Tracker(*paths, backend='trt'), bbox, results)
+        expected.append(results)
+
+    model = Model(*paths, backend='trt', pipeline=True)
+    actual = [ [] for _ in bboxes ]
+    threads = [ threading.Thread(target=run, args=(Tracker(model=model), bbox, results))
+                for bbox, results in zip(bboxes, actual) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    model.close()
+
+    diff = max(float(np.abs(np.asarray(a) - np.asarray(e)).max()) for a, e in zip(actual, expected))
+    checker.check("shared pipeline Model matches per-thread runs ({} threads)".format(num_threads), diff == 0,
+                  "max bbox diff {:.3g}".format(diff))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fake tensorrt, pycuda로 TensorRT 엔진 랩퍼 buffer 처리 확인")
+    parser.add_argument('--threads', type=int, default=4, help="pipeline Model을 같이 쓸 thread 수")
+    parser.add_argument('--frames', type=int, default=30, help="thread마다 추적할 frame 수")
+    args = parser.parse_args()
+
+    install()
+    from core.config import config
+    config.ENGINE_WARMUP_ITERS = 0
+
+    checker = Checker()
+    rng = np.random.RandomState(0)
+    with tempfile.TemporaryDirectory(prefix='fake-trt-') as directory:
+        check_named(checker, directory, rng)
+        check_legacy(checker, directory, rng)
+        config.TRT_NAMED_TENSORS = True
+        check_shared_model(checker, directory, args.threads, args.frames)
+
+    print()
+    if checker.failed:
+        print("{} failed : {}".format(len(checker.failed), ", ".join(checker.failed)))
+        sys.exit(1)
+    print("all passed")
+
+
+if __name__ == '__main__':
+    main()
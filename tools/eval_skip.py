@@ -0,0 +1,55 @@
+# frame skipping(AdaptiveTracker)의 skip 비율과 정확도 영향 측정
+# 사용법 : python -m tools.eval_skip --vot-path /path/to/VOT --backend onnx [--workers 4]
+# 같은 sequence를 Tracker(매 frame 추론)와 AdaptiveTracker로 평가해서 accuracy, failure, EAO, skip 비율을 비교함
+# skip 조건은 config.SKIP_* 값을 사용 (--min-score 등으로 바꿀 수 있음)
+
+import argparse
+import json
+
+from evaluation.runner import evaluate
+from evaluation.runner import load_sequences
+
+
+def main():
+    parser = argparse.ArgumentParser(description="frame skipping 정확도 영향 평가")
+    parser.add_argument('--vot-path', required=True, help="dataset 최상위 경로")
+    parser.add_argument('--format', default='vot', choices=['vot', 'otb', 'lasot'], help="dataset 형식")
+    parser.add_argument('--backend', default=None, help="'trt', 'onnx', 'stub' (기본 config.ENGINE_BACKEND)")
+    parser.add_argument('--engines', nargs=3, default=("", "", ""), metavar=('EXAM', 'TEMP', 'HEAD'))
+    parser.add_argument('--workers', type=int, default=1, help="worker process 수")
+    parser.add_argument('--sequences', nargs='*', default=None, help="평가할 sequence 이름")
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--min-score', type=float, default=None)
+    parser.add_argument('--max-motion', type=float, default=None)
+    parser.add_argument('--max-skips', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help="표 대신 json 출력")
+    args = parser.parse_args()
+
+    # worker process에서 AdaptiveTracker를 만들 때 넘길 skip 조건 (None이면 config 값)
+    skip_kwargs = {'min_score': args.min_score, 'max_motion': args.max_motion, 'max_skips': args.max_skips}
+
+    results = {}
+    for name, adaptive in (('every frame', False), ('adaptive', skip_kwargs)):
+        sequences = load_sequences(args.vot_path, args.format, args.sequences)
+        results[name] = evaluate(sequences, args.engines, args.backend, args.workers,
+                                 cache_dir=args.cache_dir, adaptive=adaptive)['summary']
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("{:>12} | {:>8} {:>8} {:>8} {:>8} {:>10} {:>10}".format(
+          "mode", "acc", "fail", "EAO", "skip", "mean ms", "fps"))
+    for name, summary in results.items():
+        print("{:>12} | {:>8.3f} {:>8d} {:>8.3f} {:>7.1f}% {:>10.2f} {:>10.1f}".format(
+              name, summary['accuracy'], summary['failures'], summary['eao'], summary['skip_ratio'] * 100,
+              summary['latency_ms'].get('mean', 0.), summary.get('throughput_fps', 0.)))
+
+    base, adaptive = results['every frame'], results['adaptive']
+    print("accuracy {:+.3f}, failures {:+d}, EAO {:+.3f}".format(
+          adaptive['accuracy'] - base['accuracy'], adaptive['failures'] - base['failures'],
+          adaptive['eao'] - base['eao']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+# 화면 출력 없이 VOT 평가 (accuracy, robustness, EAO, latency), OTB, LaSOT 형식도 지원
+# 사용법 : python -m tools.eval_vot --vot-path /path/to/VOT --backend onnx --workers 4 --out results/vot
+
+import argparse
+import json
+
+from evaluation.runner import evaluate
+from evaluation.runner import load_sequences
+from evaluation.runner import write_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="headless VOT 평가")
+    parser.add_argument('--vot-path', required=True, help="dataset 최상위 경로")
+    parser.add_argument('--format', default='vot', choices=['vot', 'otb', 'lasot'], help="dataset 형식")
+    parser.add_argument('--backend', default=None, help="'trt', 'onnx', 'stub' (기본 config.ENGINE_BACKEND)")
+    parser.add_argument('--engines', nargs=3, default=("", "", ""), metavar=('EXAM', 'TEMP', 'HEAD'),
+                        help="engine 경로 (기본 backend별 경로)")
+    parser.add_argument('--workers', type=int, default=1, help="worker process 수")
+    parser.add_argument('--sequences', nargs='*', default=None, help="평가할 sequence 이름")
+    parser.add_argument('--out', default='results/vot', help="결과 저장 경로")
+    parser.add_argument('--adaptive', action='store_true', help="AdaptiveTracker(frame skipping)로 평가")
+    parser.add_argument('--cache-dir', default=None, help="decode된 frame cache 경로 (지정 시 재실행부터 decode 생략)")
+    args = parser.parse_args()
+
+    sequences = load_sequences(args.vot_path, args.format, args.sequences)
+    results = evaluate(sequences, args.engines, args.backend, args.workers, cache_dir=args.cache_dir,
+                       adaptive=args.adaptive)
+    write_results(results, args.out)
+
+    print(json.dumps(results['summary'], indent=2))
+
+
+if __name__ == '__main__':
+    main()
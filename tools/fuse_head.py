@@ -0,0 +1,112 @@
+# exam backbone + head onnx를 한 graph로 합치고, fused 모드 Model이 기존 Model과 같은 출력을 내는지 확인
+# 사용법 : python -m tools.fuse_head [--exam onnx/nanotrack_backbone_exampler.onnx] [--head onnx/nanotrack_head.onnx]
+#            [--out onnx/nanotrack_exam_head.onnx | --out-dir build/onnx] [--samples 8] [--atol 1e-4] [--vot-path /path/to/VOT]
+# fused 모델 : 입력 [zf, x crop] -> 출력 [cls, loc]. xf가 host를 거치지 않고, zf는 template할 때 한번만 올려둠
+# 확인은 ONNX Runtime(CPU) backend로 : random crop의 head 출력(zf를 바꿔가며), batch 출력, (--vot-path) 추적 bbox
+# 사용 : Model(fused=True) 혹은 config.MODEL_FUSED = True, TensorRT는 tools.build_engines --onnx ... --engine ...로 빌드
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from core.config import config
+from engine.surgery import write_fused_exam_head
+from tracker.model import Model
+
+
+def check_outputs(original, fused, samples, seed=0):
+    """ 같은 crop을 넣은 두 Model의 template, track, track_batch 출력 최대 차이 """
+    rng = np.random.RandomState(seed)
+    temp_size = config.TRACK_EXEMPLAR_SIZE
+    exam_size = config.TRACK_INSTANCE_SIZE
+
+    def crops(model, size, batch=1):
+        processor = model.back_temp_processor if size == temp_size else model.back_exam_processor
+        return rng.randint(0, 256, processor.input_shape(size, batch)).astype(processor.in_dtype)
+
+    # template 2개를 번갈아 쓰면서 (fused는 zf가 바뀔 때마다 다시 올림)
+    zs = [ crops(original, temp_size) for _ in range(2) ]
+    zfs = [ (original.template(z), fused.template(z)) for z in zs ]
+    diffs = { 'zf': max(np.abs(a - b).max() for a, b in zfs), 'cls': 0.0, 'loc': 0.0 }
+
+    for i in range(samples):
+        x = crops(original, exam_size)
+        zf, fused_zf = zfs[i % 2]
+        expected = original.track(x, zf)
+        actual = fused.track(x, fused_zf)
+        for key in ('cls', 'loc'):
+            diffs[key] = max(diffs[key], float(np.abs(expected[key] - actual[key]).max()))
+
+    # batch (target마다 zf가 다름)
+    xs = crops(original, exam_size, 4)
+    batch_zfs = np.stack([ zfs[i % 2][0] for i in range(4) ])
+    expected = original.track_batch(xs, batch_zfs)
+    actual = fused.track_batch(xs, batch_zfs)
+    diffs['batch'] = max(float(np.abs(expected[key] - actual[key]).max()) for key in ('cls', 'loc'))
+    return diffs
+
+
+def compare_tracking(args, original, fused):
+    """ 두 Model로 같은 sequence를 추적하고 frame별 bbox 차이를 반환 """
+    from evaluation.runner import load_sequences
+    from evaluation.runner import run_sequence
+    from tracker.tracker import Tracker
+
+    results = {}
+    for name, frames, gt in load_sequences(args.vot_path, args.format, args.sequences):
+        expected = run_sequence(Tracker(model=original), frames, gt)
+        actual = run_sequence(Tracker(model=fused), frames, gt)
+        tracked = ~np.isnan(expected['pred'][:, 0]) & ~np.isnan(actual['pred'][:, 0])
+        diff = np.abs(expected['pred'][tracked] - actual['pred'][tracked])
+        results[name] = {
+                         'bbox_diff_max': float(diff.max()) if diff.size else 0.0,
+                         'accuracy': (expected['summary']['accuracy'], actual['summary']['accuracy']),
+                         'latency': (expected['summary']['latency_ms']['mean'], actual['summary']['latency_ms']['mean']),
+                        }
+    return results
+
+
+def main():
+    exam, temp, head = config.ENGINE_PATHS['onnx']
+    parser = argparse.ArgumentParser(description="exam backbone + head onnx 합치기, fused Model 동등성 확인")
+    parser.add_argument('--exam', default=exam, help="exam backbone onnx (uint8 입력 모델도 가능)")
+    parser.add_argument('--temp', default=temp, help="확인에 쓸 template backbone onnx")
+    parser.add_argument('--head', default=head, help="head onnx")
+    parser.add_argument('--out', default=config.FUSED_ENGINE_PATHS['onnx'], help="저장할 fused onnx")
+    parser.add_argument('--out-dir', default=None, help="주어지면 --out 파일 이름으로 이 폴더에 저장")
+    parser.add_argument('--samples', type=int, default=8, help="비교할 random crop 수")
+    parser.add_argument('--atol', type=float, default=1e-4, help="허용할 출력 최대 차이")
+    parser.add_argument('--vot-path', default=None, help="주어지면 추적 결과(bbox)도 비교")
+    parser.add_argument('--format', default='vot', choices=['vot', 'otb', 'lasot'], help="dataset 형식")
+    parser.add_argument('--sequences', nargs='*', default=None, help="비교할 sequence 이름")
+    args = parser.parse_args()
+
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+        args.out = os.path.join(args.out_dir, os.path.basename(args.out))
+    write_fused_exam_head(args.exam, args.head, args.out)
+    print("saved {}".format(args.out))
+
+    original = Model(args.exam, args.temp, args.head, backend='onnx')
+    fused = Model(temp_back_engine_path=args.temp, backend='onnx', fused=True, fused_engine_path=args.out)
+
+    diffs = check_outputs(original, fused, args.samples)
+    print("max diff : zf {zf:.3g}, cls {cls:.3g}, loc {loc:.3g}, batch {batch:.3g}".format(**diffs))
+    failed = max(diffs.values()) > args.atol
+
+    if args.vot_path:
+        print()
+        print("{:<20} {:>12} {:>17} {:>17}".format("sequence", "bbox diff", "accuracy", "latency ms"))
+        for name, result in compare_tracking(args, original, fused).items():
+            failed |= result['bbox_diff_max'] > args.atol
+            print("{:<20} {:>12.3g} {:>8.4f}/{:<8.4f} {:>8.2f}/{:<8.2f}".format(
+                  name, result['bbox_diff_max'], *result['accuracy'], *result['latency']))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# tracking service load generator
+# 사용법 : python -m tools.loadgen --unix /tmp/nanotrack.sock --sessions 100 --fps 30 --duration 10
+#          python -m tools.loadgen --spawn --backend stub --sessions 200   (같은 process에 서버를 띄워서 측정)
+# session마다 합성 frame(움직이는 사각형)을 fps 간격으로 보내고, 처리량과 latency percentile, 거절 수를 출력함
+# fps가 0이면 session마다 응답을 받자마자 다음 frame을 보냄 (최대 처리량 측정)
+
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from core.config import config
+from utils.profiler import Histogram
+
+from service.client import TrackingClient
+from service.client import ServiceError
+
+
+def make_frames(num_frames, resolution, seed):
+    """ 사각형이 조금씩 움직이는 합성 frame과 첫 frame의 bbox """
+    width, height = config.RESOLUTION_PRESET[resolution]
+    rng = np.random.RandomState(seed)
+    base = rng.randint(0, 256, (height, width, 3)).astype(np.uint8)
+    x, y = rng.randint(100, width - 200), rng.randint(100, height - 200)
+
+    frames = []
+    for i in range(num_frames):
+        frame = base.copy()
+        dx = int(20 * np.sin(i / 10))
+        frame[y:y + 80, x + dx:x + dx + 80] = (0, 0, 255)
+        frames.append(frame)
+    return frames, [x, y, 80, 80]
+
+
+async def run_session(client, frames, bbox, args, latency, counts, deadline):
+    """ session 하나를 만들어서 deadline까지 frame을 보냄 """
+    session = await client.create()
+    await client.init(session, frames[0], bbox)
+
+    interval = 1 / args.fps if args.fps > 0 else 0
+    i = 1
+    next_time = time.perf_counter()
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            await client.track(session, frames[i % len(frames)])
+            latency.record(time.perf_counter() - start)
+            counts['ok'] += 1
+        except ServiceError as e:
+            counts['dropped' if e.reply.get('dropped') else 'error'] += 1
+        i += 1
+
+        if interval:
+            next_time += interval
+            await asyncio.sleep(max(0, next_time - time.perf_counter()))
+
+    return await client.close_session(session)
+
+
+async def run(args):
+    server = None
+    unix_path = args.unix
+    if args.spawn:
+        from service.server import TrackingServer
+        server = TrackingServer(backend=args.backend)
+        unix_path = await server.start(args.unix or '/tmp/nanotrack_loadgen.sock')
+
+    # 연결 하나에 session 여러 개를 실음
+    clients = []
+    for _ in range(args.connections):
+        clients.append(await TrackingClient.connect(unix_path, args.host, args.port,
+                                                    encoding=args.encoding, quality=args.quality))
+
+    # frame은 미리 만들어두고 session끼리 나눠 씀 (encode 비용은 매 요청마다 듬)
+    clips = [ make_frames(args.clip_frames, args.resolution, seed) for seed in range(min(args.sessions, 8)) ]
+
+    latency = Histogram()
+    counts = {'ok': 0, 'dropped': 0, 'error': 0}
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*[ run_session(clients[i % len(clients)], *clips[i % len(clips)],
+                                        args, latency, counts, deadline)
+                            for i in range(args.sessions) ])
+    elapsed = time.perf_counter() - start
+
+    stats = await clients[0].stats()
+    for client in clients:
+        await client.close()
+    if server is not None:
+        await server.close()
+
+    result = {
+              'sessions': args.sessions,
+              'elapsed_sec': elapsed,
+              'throughput_fps': counts['ok'] / elapsed,
+              'counts': counts,
+              'client_latency': latency.to_dict(),
+              'server_latency': stats['latency'],
+              'server_queue_delay': stats['queue_delay'],
+              'server_queue_depth_max': stats['queue_depth_max'],
+             }
+    print(json.dumps(result, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="tracking service load generator")
+    parser.add_argument('--unix', default="", help="Unix socket 경로 (없으면 TCP)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7700)
+    parser.add_argument('--spawn', action='store_true', help="같은 process에서 서버를 띄움")
+    parser.add_argument('--backend', default=None, choices=['trt', 'onnx', 'stub'], help="--spawn일 때 backend")
+    parser.add_argument('--sessions', type=int, default=16)
+    parser.add_argument('--connections', type=int, default=4)
+    parser.add_argument('--fps', type=float, default=30, help="session당 요청 속도 (0이면 최대)")
+    parser.add_argument('--duration', type=float, default=10, help="측정 시간(초)")
+    parser.add_argument('--resolution', default='VGA')
+    parser.add_argument('--encoding', default='jpg', choices=['jpg', 'png', 'raw'])
+    parser.add_argument('--quality', type=int, default=90)
+    parser.add_argument('--clip-frames', type=int, default=60)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
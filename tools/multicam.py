@@ -0,0 +1,83 @@
+# 여러 camera를 capture process + shared memory ring + tracker worker process로 추적
+# 사용법 : python -m tools.multicam --camera cam0=0@100,80,40,30 --camera cam1=videos/a.mp4@10,20,50,50@15 \
+#            --backend onnx --workers 2 [--duration 60] [--stats-every 5] [--jsonl results.jsonl]
+# camera 형식 : 이름=source@x,y,w,h[@fps]  (source : webcam 번호, video 파일, image 디렉토리, fps는 배정 부하용)
+
+import argparse
+import json
+import time
+
+from service.camera_pool import CameraPool
+from service.camera_pool import POLICIES
+
+
+def parse_camera(text):
+    """ '이름=source@x,y,w,h[@fps]'를 camera spec으로 변환 """
+    name, _, rest = text.partition('=')
+    parts = rest.split('@')
+    if not name or len(parts) not in (2, 3):
+        raise ValueError("camera는 이름=source@x,y,w,h[@fps] 형식이어야 합니다 : {}".format(text))
+
+    camera = {'name': name, 'source': parts[0], 'bbox': [ float(v) for v in parts[1].split(',') ]}
+    if len(camera['bbox']) != 4:
+        raise ValueError("bbox는 x,y,w,h 입니다 : {}".format(parts[1]))
+    if len(parts) == 3:
+        camera['fps'] = float(parts[2])
+    return camera
+
+
+def print_stats(stats):
+    print("{:<12} {:>6} {:>8} | {:>8} {:>8} {:>8} | {:>8} {:>8} {:>9} {:>9}".format(
+          "camera", "worker", "health", "written", "dropped", "tracked", "fps", "mean ms", "p95 ms", "age ms"))
+    for name, entry in stats.items():
+        capture = entry['capture']
+        print("{:<12} {:>6} {:>8} | {:>8} {:>8} {:>8} | {:>8.1f} {:>8.2f} {:>9.2f} {:>9}".format(
+              name, entry['worker'], entry['health'], capture.get('written', 0), capture.get('dropped', 0),
+              entry['tracked'], entry['fps'], entry['latency_ms_mean'], entry['latency_ms_p95'],
+              "{:.1f}".format(entry['age_ms']) if entry['age_ms'] is not None else '-'))
+        for error in entry['errors']:
+            print("    error : {}".format(error))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="multi camera 추적")
+    parser.add_argument('--camera', action='append', required=True, type=parse_camera,
+                        help="이름=source@x,y,w,h[@fps] (여러번 지정)")
+    parser.add_argument('--backend', default=None, help="'trt', 'onnx', 'stub' (기본 config.ENGINE_BACKEND)")
+    parser.add_argument('--engines', nargs=3, default=("", "", ""), metavar=('EXAM', 'TEMP', 'HEAD'))
+    parser.add_argument('--workers', type=int, default=None, help="tracker worker 수 (기본 config.MULTICAM_WORKERS)")
+    parser.add_argument('--policy', default=None, choices=POLICIES, help="camera 배정 정책")
+    parser.add_argument('--slots', type=int, default=None, help="camera별 ring slot 수")
+    parser.add_argument('--resolution', default="FHD", help="webcam 해상도 preset (slot 크기)")
+    parser.add_argument('--duration', type=float, default=None, help="실행 시간(초), 없으면 모든 source가 끝날 때까지")
+    parser.add_argument('--stats-every', type=float, default=5.0, help="통계 출력 주기(초)")
+    parser.add_argument('--jsonl', default=None, help="결과를 json lines로 저장")
+    args = parser.parse_args()
+
+    out = open(args.jsonl, 'w') if args.jsonl else None
+    pool = CameraPool(args.camera, args.workers, args.policy, args.engines, args.backend, args.slots,
+                      args.resolution)
+    start = last_stats = time.monotonic()
+    try:
+        with pool:
+            for result in pool.results():
+                if out is not None:
+                    out.write(json.dumps(result) + '\n')
+                now = time.monotonic()
+                if now - last_stats >= args.stats_every:
+                    print_stats(pool.get_stats())
+                    last_stats = now
+                if args.duration is not None and now - start >= args.duration:
+                    break
+            stats = pool.get_stats()
+    except KeyboardInterrupt:
+        stats = pool.get_stats()
+    finally:
+        if out is not None:
+            out.close()
+
+    print_stats(stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# batch 1로 고정된 onnx의 batch 차원을 dynamic으로 변환 (입출력 첫 차원, Reshape shape 상수의 batch 1 -> 0)
+# 사용법 : python -m tools.onnx_dynamic [--onnx onnx/nanotrack_head.onnx ...] [--out-dir build/onnx] [--batch 2 4 8]
+#            [--iters 20] [--atol 1e-4] [--targets 8 --frames 30]
+# 기본으로 config.ENGINE_PATHS['onnx']의 3개 모델을 변환해서 옆에(--out-dir면 그 폴더에) <이름>_dyn.onnx로 저장하고,
+# ONNX Runtime(CPU)으로 원래 모델에 하나씩 넣은 출력과 batch로 한번에 넣은 출력이 같은지, 시간이 얼마나 줄었는지 확인함
+# (차이가 --atol을 넘으면 exit code 1)
+# --targets를 주면 MultiTracker로 target 여러 개를 원래 모델(target마다 호출), dynamic 모델(한 batch)로 각각 추적해서 비교함
+# TensorRT는 tools.build_engines --batch MIN OPT MAX로 빌드하면 batch가 고정된 onnx를 알아서 이 변환을 거쳐 빌드함
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from core.config import config
+from engine.surgery import check_dynamic_variant
+from engine.surgery import dynamic_path
+from engine.surgery import write_dynamic_variant
+
+
+def compare_multi_tracking(args, variants):
+    """ 같은 합성 clip의 target 여러 개를 원래 모델, dynamic 모델로 각각 추적하고 (frame당 ms, 최대 bbox 차이) 반환 """
+    from tools.loadgen import make_frames
+    from tracker.multi_tracker import MultiTracker
+
+    frames, bbox = make_frames(args.frames, args.resolution, 0)
+    x, y, w, h = bbox
+    # 같은 frame 안에서 target을 옆으로 조금씩 옮겨서 여러 개로
+    bboxes = [ [x + (i % 4) * w / 4, y + (i // 4) * h / 4, w, h] for i in range(args.targets) ]
+
+    results = {}
+    for name in ('original', 'dynamic'):
+        paths = list(variants) if name == 'original' else [ variants[src] for src in variants ]
+        tracker = MultiTracker(*paths, backend='onnx')
+        tracker.init(frames[0], bboxes)
+        tracked, start = [], time.perf_counter()
+        for frame in frames[1:]:
+            tracked.append([ output['bbox'] for output in tracker.track(frame) ])
+        results[name] = {
+                         'ms': (time.perf_counter() - start) / (len(frames) - 1) * 1000,
+                         'max_batch': tracker.model.max_batch_size,
+                         'bbox': np.asarray(tracked, np.float64),
+                        }
+        tracker.model.close()
+
+    diff = float(np.max(np.abs(results['original']['bbox'] - results['dynamic']['bbox'])))
+    return results, diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="onnx batch 차원 dynamic 변환, 동등성, batch 처리 시간 확인")
+    parser.add_argument('--onnx', nargs='*', default=None,
+                        help="변환할 onnx (기본 config.ENGINE_PATHS['onnx']의 exam, temp, head)")
+    parser.add_argument('--out-dir', default=None, help="변환한 모델을 저장할 폴더 (기본은 원래 모델 옆)")
+    parser.add_argument('--batch', type=int, nargs='+', default=[2, 4, 8], help="비교할 batch 크기")
+    parser.add_argument('--iters', type=int, default=20, help="시간 측정 반복 횟수")
+    parser.add_argument('--atol', type=float, default=1e-4, help="허용할 출력 최대 차이")
+    parser.add_argument('--targets', type=int, default=0, help="주어지면 MultiTracker로 이만큼의 target을 추적해서 비교")
+    parser.add_argument('--frames', type=int, default=30, help="MultiTracker 비교 frame 수")
+    parser.add_argument('--resolution', default='VGA', help="MultiTracker 비교 frame 해상도")
+    args = parser.parse_args()
+
+    sources = args.onnx or list(config.ENGINE_PATHS['onnx'])
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    variants, failed = {}, False
+    print("{:<48} {:>6} {:>12} {:>10} {:>10} {:>8}".format("model", "batch", "max diff", "single ms", "batch ms", "speedup"))
+    for src in sources:
+        dst = os.path.join(args.out_dir, os.path.basename(dynamic_path(src))) if args.out_dir else None
+        dst = write_dynamic_variant(src, dst)
+        variants[src] = dst
+        for batch in args.batch:
+            result = check_dynamic_variant(src, dst, batch, args.iters, num_threads=config.ORT_NUM_THREADS)
+            failed |= result['max_abs_diff'] > args.atol
+            print("{:<48} {:>6d} {:>12.3g} {:>10.2f} {:>10.2f} {:>7.2f}x".format(
+                  dst, batch, result['max_abs_diff'], result['single_ms'], result['batch_ms'], result['speedup']))
+
+    if args.targets:
+        if len(sources) != 3:
+            parser.error("--targets는 exam, temp, head 3개 모델을 변환할 때만 가능합니다")
+        results, diff = compare_multi_tracking(args, variants)
+        failed |= diff > args.atol
+        print()
+        print("{:<10} {:>10} {:>10} {:>12}".format("", "max batch", "frame ms", "bbox diff"))
+        for name, result in results.items():
+            print("{:<10} {:>10d} {:>10.2f} {:>12.3g}".format(name, result['max_batch'], result['ms'],
+                                                              diff if name == 'dynamic' else 0.))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# backbone onnx를 uint8 NHWC 입력 모델로 변환 (uint8 -> float32 cast, NHWC -> NCHW transpose를 graph 앞에 붙임)
+# 사용법 : python -m tools.onnx_uint8 [--onnx onnx/nanotrack_backbone_exampler.onnx ...] [--out-dir build/onnx]
+#            [--samples 8] [--atol 1e-4] [--vot-path /path/to/VOT --sequences ball]
+# 기본으로 config.ENGINE_PATHS['onnx']의 두 backbone을 변환해서 옆에(--out-dir면 그 폴더에) <이름>_u8.onnx로 저장하고,
+# ONNX Runtime(CPU)으로 원래 모델과 같은 crop을 넣어 출력이 같은지 확인함 (차이가 --atol을 넘으면 exit code 1)
+# --vot-path를 주면 원래 모델, uint8 모델로 각각 추적해서 bbox가 같은지도 확인함
+# 변환한 모델은 --engines로 넘기거나 TensorRT engine으로 빌드해서 사용 (입력이 uint8이면 crop이 NHWC uint8로 들어감)
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from core.config import config
+from engine.surgery import check_uint8_variant
+from engine.surgery import uint8_path
+from engine.surgery import write_uint8_variant
+
+
+def compare_tracking(args, variants):
+    """ 원래 모델, uint8 모델로 같은 sequence를 추적하고 frame별 bbox 차이를 반환 """
+    from evaluation.runner import load_sequences
+    from evaluation.runner import run_sequence
+    from tracker.tracker import Tracker
+
+    exam, temp, head = config.ENGINE_PATHS['onnx']
+    original = Tracker(exam, temp, head, backend='onnx')
+    fused = Tracker(variants.get(exam, exam), variants.get(temp, temp), head, backend='onnx')
+
+    results = {}
+    for name, frames, gt in load_sequences(args.vot_path, args.format, args.sequences):
+        expected = run_sequence(original, frames, gt)
+        actual = run_sequence(fused, frames, gt)
+        tracked = ~np.isnan(expected['pred'][:, 0]) & ~np.isnan(actual['pred'][:, 0])
+        diff = np.abs(expected['pred'][tracked] - actual['pred'][tracked])
+        results[name] = {
+                         'bbox_diff_max': float(diff.max()) if diff.size else 0.0,
+                         'accuracy': (expected['summary']['accuracy'], actual['summary']['accuracy']),
+                         'failures': (expected['summary']['failures'], actual['summary']['failures']),
+                        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="backbone onnx -> uint8 NHWC 입력 모델 변환, 동등성 확인")
+    parser.add_argument('--onnx', nargs='*', default=None,
+                        help="변환할 onnx (기본 config.ENGINE_PATHS['onnx']의 exam, temp backbone)")
+    parser.add_argument('--out-dir', default=None, help="변환한 모델을 저장할 폴더 (기본은 원래 모델 옆)")
+    parser.add_argument('--samples', type=int, default=8, help="비교할 random crop 수")
+    parser.add_argument('--atol', type=float, default=1e-4, help="허용할 출력 최대 차이")
+    parser.add_argument('--vot-path', default=None, help="주어지면 추적 결과(bbox)도 비교")
+    parser.add_argument('--format', default='vot', choices=['vot', 'otb', 'lasot'], help="dataset 형식")
+    parser.add_argument('--sequences', nargs='*', default=None, help="비교할 sequence 이름")
+    args = parser.parse_args()
+
+    sources = args.onnx or list(config.ENGINE_PATHS['onnx'][:2])
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    variants, failed = {}, False
+    print("{:<48} {:>12} {:>12} {:>10} {:>10} {:>10}".format(
+          "model", "max diff", "mean diff", "in KB", "float ms", "uint8 ms"))
+    for src in sources:
+        dst = os.path.join(args.out_dir, os.path.basename(uint8_path(src))) if args.out_dir else None
+        dst = write_uint8_variant(src, dst)
+        variants[src] = dst
+        result = check_uint8_variant(src, dst, args.samples, num_threads=config.ORT_NUM_THREADS)
+        failed |= result['max_abs_diff'] > args.atol
+        print("{:<48} {:>12.3g} {:>12.3g} {:>4.0f}->{:<5.0f} {:>10.2f} {:>10.2f}".format(
+              dst, result['max_abs_diff'], result['mean_abs_diff'], result['float_input_bytes'] / 1024,
+              result['uint8_input_bytes'] / 1024, result['float_ms'], result['uint8_ms']))
+
+    if args.vot_path:
+        print()
+        print("{:<20} {:>12} {:>17} {:>10}".format("sequence", "bbox diff", "accuracy", "failures"))
+        for name, result in compare_tracking(args, variants).items():
+            failed |= result['bbox_diff_max'] > args.atol
+            print("{:<20} {:>12.3g} {:>8.4f}/{:<8.4f} {:>4d}/{:<4d}".format(
+                  name, result['bbox_diff_max'], *result['accuracy'], *result['failures']))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
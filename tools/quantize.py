@@ -0,0 +1,194 @@
+# ONNX 모델 INT8 양자화 (ONNX Runtime CPU) : 실제 sequence crop으로 calibration하고, held-out sequence 정확도로 내보낼지 결정
+# 사용법 : python -m tools.quantize --vot-path /path/to/VOT [--format vot] [--calib-sequences ball fish] [--eval-sequences hand]
+#            [--models head] [--frame-stride 5] [--max-samples 200] [--method minmax] [--quant-format qdq]
+#            [--max-accuracy-drop 0.02] [--max-robustness-rise 0.5] [--max-slowdown 0.0] [--out-dir build/onnx]
+#            [--workers 1] [--report quantize.json]
+# 1. calibration sequence를 FP32 Tracker로 따라가면서 crop을 모음 (engine.quantize.collect_crops)
+# 2. --models(기본 head, backbone은 depthwise conv가 많아 CPU에서 INT8이 더 느림)를 양자화해서 임시 폴더에 저장
+# 3. 모델별 실행 시간을 재서 FP32보다 느려진 모델은 빼고 (engine.quantize.select_faster)
+# 4. calibration에 안 쓴 held-out sequence로 FP32, INT8 각각 평가 (evaluation.runner.evaluate)
+# 5. accuracy 하락, robustness 증가, 평균 latency 증가가 허용치 안이면 원래 모델 옆에(--out-dir면 그 폴더에) <이름>_int8.onnx로 내보내고,
+#    넘거나 남은 모델이 없으면 버리고 exit code 1
+# 사용 : python main.py --backend onnx --engines onnx/nanotrack_backbone_exampler_int8.onnx ... (양자화 안 한 모델은 원래 경로)
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from core.config import config
+from engine.quantize import MODELS
+from engine.quantize import benchmark_model
+from engine.quantize import calibration_samples
+from engine.quantize import check_gate
+from engine.quantize import collect_crops
+from engine.quantize import int8_path
+from engine.quantize import quantize_model
+from engine.quantize import select_faster
+from evaluation.runner import evaluate
+from evaluation.runner import load_sequences
+
+
+def split_sequences(args):
+    """ calibration, held-out sequence 이름 (지정하지 않으면 이름순으로 앞쪽은 calibration, 뒤쪽 --holdout 비율은 held-out) """
+    names = sorted(name for name, _, _ in load_sequences(args.vot_path, args.format))
+    calib = args.calib_sequences
+    held_out = args.eval_sequences
+    if calib is None and held_out is None:
+        num_eval = max(1, int(round(len(names) * args.holdout)))
+        calib, held_out = names[:-num_eval], names[-num_eval:]
+    elif calib is None:
+        calib = [ name for name in names if name not in held_out ]
+    elif held_out is None:
+        held_out = [ name for name in names if name not in calib ]
+
+    unknown = (set(calib) | set(held_out)) - set(names)
+    if unknown:
+        raise KeyError("unknown sequence : {}".format(sorted(unknown)))
+    if set(calib) & set(held_out):
+        raise ValueError("calibration and held-out sequences overlap : {}".format(sorted(set(calib) & set(held_out))))
+    if not calib or not held_out:
+        raise ValueError("need at least one calibration and one held-out sequence (sequences : {})".format(names))
+    return list(calib), list(held_out)
+
+
+def print_table(speeds, summaries):
+    print()
+    print("{:<6} {:>10} {:>10} {:>8} {:>9} {:>9}".format("model", "fp32 ms", "int8 ms", "speedup", "fp32 MB", "int8 MB"))
+    for name, speed in speeds.items():
+        print("{:<6} {:>10.2f} {:>10.2f} {:>7.2f}x {:>9.2f} {:>9.2f}".format(
+              name, speed['fp32_ms'], speed['int8_ms'], speed['fp32_ms'] / max(speed['int8_ms'], 1e-9),
+              speed['fp32_mb'], speed['int8_mb']))
+
+    print()
+    print("{:<6} {:>9} {:>11} {:>9} {:>7} {:>8} {:>8} {:>8}".format(
+          "", "accuracy", "robustness", "failures", "eao", "p50 ms", "mean ms", "fps"))
+    for name, summary in summaries.items():
+        latency = summary['latency_ms']
+        print("{:<6} {:>9.4f} {:>11.3f} {:>9d} {:>7.4f} {:>8.2f} {:>8.2f} {:>8.1f}".format(
+              name, summary['accuracy'], summary['robustness'], summary['failures'], summary['eao'],
+              latency.get('p50', 0.), latency.get('mean', 0.), 1000. / max(latency.get('mean', 0.), 1e-9)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX 모델 INT8 양자화 (dataset calibration, held-out 정확도 기준)")
+    parser.add_argument('--vot-path', required=True, help="calibration, 평가에 쓸 dataset 경로")
+    parser.add_argument('--format', default='vot', choices=['vot', 'otb', 'lasot'], help="dataset 형식")
+    parser.add_argument('--calib-sequences', nargs='*', default=None, help="calibration sequence 이름")
+    parser.add_argument('--eval-sequences', nargs='*', default=None, help="held-out 평가 sequence 이름")
+    parser.add_argument('--holdout', type=float, default=0.3, help="sequence를 지정하지 않았을 때 held-out 비율")
+    parser.add_argument('--engines', nargs=3, default=list(config.ENGINE_PATHS['onnx']),
+                        metavar=('EXAM', 'TEMP', 'HEAD'), help="FP32 onnx 경로")
+    parser.add_argument('--models', nargs='+', default=['head'], choices=list(MODELS), help="양자화할 모델")
+    parser.add_argument('--frame-stride', type=int, default=config.QUANT_FRAME_STRIDE, help="crop을 모을 frame 간격")
+    parser.add_argument('--max-samples', type=int, default=config.QUANT_MAX_SAMPLES, help="calibration crop 최대 수")
+    parser.add_argument('--method', default=config.QUANT_CALIBRATE_METHOD, choices=['minmax', 'entropy', 'percentile'],
+                        help="activation 범위 계산 방법")
+    parser.add_argument('--quant-format', default='qdq', choices=['qdq', 'qoperator'], help="양자화 모델 형식")
+    parser.add_argument('--no-per-channel', action='store_true', help="weight scale을 tensor 하나로")
+    parser.add_argument('--max-accuracy-drop', type=float, default=config.QUANT_MAX_ACCURACY_DROP,
+                        help="허용할 accuracy(평균 IoU) 하락")
+    parser.add_argument('--max-robustness-rise', type=float, default=config.QUANT_MAX_ROBUSTNESS_RISE,
+                        help="허용할 robustness(100 frame당 failure) 증가")
+    parser.add_argument('--max-slowdown', type=float, default=config.QUANT_MAX_SLOWDOWN,
+                        help="허용할 FP32 대비 실행 시간 증가 비율 (모델별, held-out 평균 latency)")
+    parser.add_argument('--out-dir', default=None, help="통과한 모델을 저장할 폴더 (기본은 원래 모델 옆)")
+    parser.add_argument('--bench-iters', type=int, default=50, help="모델별 실행 시간 측정 횟수")
+    parser.add_argument('--workers', type=int, default=1, help="평가 worker process 수")
+    parser.add_argument('--report', default=None, help="결과를 저장할 json 경로")
+    args = parser.parse_args()
+
+    calib, held_out = split_sequences(args)
+    print("calibration : {}".format(", ".join(calib)))
+    print("held-out    : {}".format(", ".join(held_out)))
+
+    # 1. calibration crop, 모델별 입력
+    crops = collect_crops(load_sequences(args.vot_path, args.format, calib), args.engines,
+                          args.frame_stride, args.max_samples)
+    samples = calibration_samples(crops, args.engines, config.ORT_NUM_THREADS)
+    print("calibration crops : {}".format(len(crops['x'])))
+
+    # 2. 양자화 (통과하기 전까지는 임시 폴더에만)
+    staging = tempfile.mkdtemp(prefix='int8-')
+    try:
+        staged, speeds = list(args.engines), {}
+        for name in args.models:
+            src = args.engines[MODELS[name]]
+            dst = os.path.join(staging, os.path.basename(int8_path(src)))
+            quantize_model(src, dst, samples[name], args.quant_format, args.method, not args.no_per_channel)
+            staged[MODELS[name]] = dst
+            speeds[name] = {
+                            'fp32_ms': benchmark_model(src, samples[name], args.bench_iters, config.ORT_NUM_THREADS),
+                            'int8_ms': benchmark_model(dst, samples[name], args.bench_iters, config.ORT_NUM_THREADS),
+                            'fp32_mb': os.path.getsize(src) / 2 ** 20,
+                            'int8_mb': os.path.getsize(dst) / 2 ** 20,
+                           }
+
+        # 3. FP32보다 느려진 모델은 FP32 그대로
+        selected, reasons = select_faster(speeds, args.max_slowdown)
+        for name in args.models:
+            if name not in selected:
+                staged[MODELS[name]] = args.engines[MODELS[name]]
+
+        # 4. held-out 평가
+        summaries = {}
+        if selected:
+            for name, paths in (('fp32', args.engines), ('int8', staged)):
+                print()
+                print("[{}]".format(name))
+                summaries[name] = evaluate(load_sequences(args.vot_path, args.format, held_out), paths,
+                                           backend='onnx', num_workers=args.workers)['summary']
+        print_table(speeds, summaries)
+
+        # 5. 정확도, 속도 기준을 통과한 경우에만 내보냄 (느려서 뺀 모델은 이유만 남김)
+        passed = False
+        if selected:
+            passed, gate_reasons = check_gate(summaries['fp32'], summaries['int8'], args.max_accuracy_drop,
+                                              args.max_robustness_rise, args.max_slowdown)
+            reasons += gate_reasons
+        published = []
+        if passed:
+            if args.out_dir:
+                os.makedirs(args.out_dir, exist_ok=True)
+            for name in selected:
+                dst = int8_path(args.engines[MODELS[name]])
+                if args.out_dir:
+                    dst = os.path.join(args.out_dir, os.path.basename(dst))
+                shutil.move(staged[MODELS[name]], dst)
+                published.append(dst)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    print()
+    if passed:
+        print("published : {}".format(", ".join(published)))
+        if reasons:
+            print("skipped : {}".format("; ".join(reasons)))
+    else:
+        print("rejected : {}".format("; ".join(reasons)))
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({
+                       'calibration': calib,
+                       'held_out': held_out,
+                       'models': args.models,
+                       'selected': selected,
+                       'samples': len(crops['x']),
+                       'method': args.method,
+                       'quant_format': args.quant_format,
+                       'speed': speeds,
+                       'summary': summaries,
+                       'passed': passed,
+                       'reasons': reasons,
+                       'published': published,
+                      }, f, indent=2)
+
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
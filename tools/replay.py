@@ -0,0 +1,99 @@
+# head 출력 기록/재생으로 후처리, tracking 로직 회귀 확인
+# 기록 : python -m tools.replay record --vot-path /path/to/VOT --backend trt --out records/vot
+#        (sequence마다 records/vot/<name>.ntrp, supervised 평가와 같은 순서로 init, track을 기록)
+# 재생 : python -m tools.replay replay records/vot [--lr 0.4] [--json]
+#        engine, dataset 없이 기록된 head 출력으로 tracking 로직만 다시 돌려서, 기록된 bbox와의 차이를 출력
+#        후처리를 바꾸지 않았으면 차이는 0, --penalty-k, --window-influence, --lr을 주면 그 parameter로 재생
+#        (context_amount는 search crop 자체가 달라지므로 기록된 head 출력으로는 재생할 수 없음)
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+from core.config import TrackConfig
+from tracker.replay import OutputRecorder
+from tracker.replay import replay
+
+
+def record(args):
+    from evaluation.runner import load_sequences
+    from evaluation.runner import run_sequence
+    from tracker.tracker import Tracker
+
+    os.makedirs(args.out, exist_ok=True)
+    tracker = Tracker(*args.engines, backend=args.backend)
+    for name, frames, gt in load_sequences(args.vot_path, args.format, args.sequences):
+        path = os.path.join(args.out, name + '.ntrp')
+        with OutputRecorder(path, tracker.track_config) as recorder:
+            tracker.recorder = recorder
+            summary = run_sequence(tracker, frames, gt)['summary']
+        tracker.recorder = None
+        print("{:<20} {:>6d} records  acc {:.3f}  fail {:>3d}".format(
+              name, recorder.num_records, summary['accuracy'], summary['failures']))
+
+
+def play(args):
+    paths = []
+    for path in args.paths:
+        paths += sorted(glob.glob(os.path.join(path, '*.ntrp'))) if os.path.isdir(path) else [path]
+    if not paths:
+        sys.exit("no record files : {}".format(args.paths))
+
+    # 후처리 parameter만 바꿀 수 있음 (context_amount는 crop이 달라져서 기록된 cls, loc와 맞지 않음)
+    overrides = {'penalty_k': args.penalty_k, 'window_influence': args.window_influence, 'lr': args.lr}
+
+    results = {}
+    for path in paths:
+        header, _ = OutputRecorder.read(path)
+        # 기록할 때의 parameter에서 지정한 것만 바꿈
+        track_config = TrackConfig(**header['track_config']).replace(**overrides)
+        name = os.path.splitext(os.path.basename(path))[0]
+        results[name] = replay(path, track_config, tolerance=args.tolerance)['summary']
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("{:<20} | {:>7} {:>10} {:>10} {:>10} {:>10} {:>9} {:>6}".format(
+              "sequence", "frames", "fps", "bbox max", "bbox mean", "score max", "diverged", "first"))
+        for name, summary in results.items():
+            print("{:<20} | {:>7d} {:>10.0f} {:>10.4f} {:>10.4f} {:>10.5f} {:>9d} {:>6}".format(
+                  name, summary['frames'], summary['fps'], summary['bbox_diff_max'], summary['bbox_diff_mean'],
+                  summary['score_diff_max'], summary['diverged'],
+                  '-' if summary['first_diverged'] is None else summary['first_diverged']))
+
+    # 달라진 frame이 있으면 실패 (CI에서 사용)
+    if args.check and any(summary['diverged'] for summary in results.values()):
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="head 출력 기록/재생")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rec = sub.add_parser('record', help="dataset을 추적하면서 head 출력 기록")
+    rec.add_argument('--vot-path', required=True, help="dataset 최상위 경로")
+    rec.add_argument('--format', default='vot', choices=['vot', 'otb', 'lasot'], help="dataset 형식")
+    rec.add_argument('--backend', default=None, help="'trt', 'onnx', 'stub' (기본 config.ENGINE_BACKEND)")
+    rec.add_argument('--engines', nargs=3, default=("", "", ""), metavar=('EXAM', 'TEMP', 'HEAD'))
+    rec.add_argument('--sequences', nargs='*', default=None, help="기록할 sequence 이름")
+    rec.add_argument('--out', default='records/vot', help="기록 경로 (sequence마다 <name>.ntrp)")
+    rec.set_defaults(func=record)
+
+    rep = sub.add_parser('replay', help="기록된 head 출력으로 tracking 로직 재실행, 기록과 비교")
+    rep.add_argument('paths', nargs='+', help="기록 파일 혹은 디렉토리")
+    rep.add_argument('--penalty-k', type=float, default=None)
+    rep.add_argument('--window-influence', type=float, default=None)
+    rep.add_argument('--lr', type=float, default=None)
+    rep.add_argument('--tolerance', type=float, default=1e-3, help="달라진 것으로 볼 bbox 차이(px)")
+    rep.add_argument('--check', action='store_true', help="달라진 frame이 있으면 exit code 1")
+    rep.add_argument('--json', action='store_true', help="표 대신 json 출력")
+    rep.set_defaults(func=play)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# 추적 parameter(penalty_k, window_influence, lr, context_amount) sweep
+# 사용법 (grid)   : python -m tools.sweep --vot-path /path/to/VOT --backend onnx --workers 4 \
+#                     --param penalty_k=0.1,0.16,0.22 --param lr=0.3,0.34,0.4 --out results/sweep
+# 사용법 (random) : python -m tools.sweep --vot-path /path/to/VOT --random 50 --param penalty_k=0.05:0.3 --param lr=0.2:0.5
+# 끝난 (조합, sequence)는 --out의 checkpoint.jsonl에 기록되므로, 중간에 멈춰도 같은 명령으로 다시 실행하면 이어서 돌림
+
+import argparse
+import os
+
+from evaluation.runner import load_sequences
+from evaluation.sweep import SORT_KEYS
+from evaluation.sweep import format_table
+from evaluation.sweep import grid_search
+from evaluation.sweep import random_search
+from evaluation.sweep import run_sweep
+from evaluation.sweep import write_sweep
+
+
+def parse_space(params, random):
+    """ 'name=v1,v2,...'(grid) 혹은 'name=low:high'(random) 목록을 search space로 변환 """
+    space = {}
+    for param in params:
+        name, _, values = param.partition('=')
+        if not values:
+            raise ValueError("parameter는 name=values 형식이어야 합니다 : {}".format(param))
+        if random:
+            low, _, high = values.partition(':')
+            space[name] = (float(low), float(high or low))
+        else:
+            space[name] = [ float(v) for v in values.split(',') ]
+    return space
+
+
+def main():
+    parser = argparse.ArgumentParser(description="추적 parameter sweep")
+    parser.add_argument('--vot-path', required=True, help="dataset 최상위 경로")
+    parser.add_argument('--format', default='vot', choices=['vot', 'otb', 'lasot'], help="dataset 형식")
+    parser.add_argument('--backend', default=None, help="'trt', 'onnx', 'stub' (기본 config.ENGINE_BACKEND)")
+    parser.add_argument('--engines', nargs=3, default=("", "", ""), metavar=('EXAM', 'TEMP', 'HEAD'))
+    parser.add_argument('--workers', type=int, default=1, help="worker process 수")
+    parser.add_argument('--sequences', nargs='*', default=None, help="평가할 sequence 이름")
+    parser.add_argument('--cache-dir', default=None, help="decode된 frame cache 경로")
+    parser.add_argument('--param', action='append', required=True,
+                        help="grid : name=v1,v2,...  random : name=low:high (여러번 지정)")
+    parser.add_argument('--random', type=int, default=0, help="random search 조합 수 (0이면 grid)")
+    parser.add_argument('--seed', type=int, default=0, help="random search seed")
+    parser.add_argument('--sort', default='eao', choices=SORT_KEYS, help="순위 기준")
+    parser.add_argument('--top', type=int, default=20, help="출력할 순위 수")
+    parser.add_argument('--out', default='results/sweep', help="결과, checkpoint 저장 경로")
+    args = parser.parse_args()
+
+    space = parse_space(args.param, args.random > 0)
+    trials = random_search(space, args.random, args.seed) if args.random > 0 else grid_search(space)
+
+    sequences = list(load_sequences(args.vot_path, args.format, args.sequences))
+    rows = run_sweep(sequences, trials, args.engines, args.backend, args.workers,
+                     checkpoint=os.path.join(args.out, 'checkpoint.jsonl'), cache_dir=args.cache_dir,
+                     sort=args.sort, meta={'dataset': os.path.abspath(args.vot_path), 'format': args.format})
+    write_sweep(rows, args.out)
+
+    print(format_table(rows, args.top))
+
+
+if __name__ == '__main__':
+    main()
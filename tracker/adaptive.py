@@ -0,0 +1,168 @@
+import numpy as np
+
+from concurrent.futures import Future
+
+from core.config import config
+
+from tracker.tracker import Tracker
+from tracker.motion import KalmanBoxFilter
+
+# 신뢰도가 높고 움직임이 작을 땐 추론을 건너뛰고 motion model로 예측한 bbox를 돌려주는 Tracker
+# 60fps 입력처럼 frame 사이 움직임이 작으면 매 frame backbone + head를 돌리는 것은 낭비이므로,
+# best_score, 예측된 움직임, 연속으로 건너뛴 frame 수가 모두 기준 안일 때만 건너뜀
+
+
+class AdaptiveTracker(Tracker):
+    """ confidence-gated frame skipping Tracker\n
+    center_pos, size를 Kalman filter(constant velocity)로 추적하면서, 조건이 맞으면 추론 없이 예측값을 반환 """
+
+    def __init__(self, *args, **kwargs):
+        """
+        args:
+            Tracker와 같음, 추가로 아래 keyword (None이면 config 값)
+            min_score(float): 마지막 추론의 best_score가 이 이상이어야 건너뜀 (config.SKIP_MIN_SCORE)
+            max_motion(float): 예측된 frame당 이동량이 target 크기 대비 이 이하여야 건너뜀 (config.SKIP_MAX_MOTION)
+            max_skips(int): 연속으로 건너뛸 수 있는 최대 frame 수, 넘으면 반드시 추론 (config.SKIP_MAX_CONSECUTIVE)
+            warmup(int): init 후 motion model이 자리잡을 때까지 반드시 추론할 frame 수 (config.SKIP_WARMUP)
+        """
+        self.min_score  = _pop(kwargs, 'min_score', config.SKIP_MIN_SCORE)
+        self.max_motion = _pop(kwargs, 'max_motion', config.SKIP_MAX_MOTION)
+        self.max_skips  = _pop(kwargs, 'max_skips', config.SKIP_MAX_CONSECUTIVE)
+        self.warmup     = _pop(kwargs, 'warmup', config.SKIP_WARMUP)
+        super(AdaptiveTracker, self).__init__(*args, **kwargs)
+
+        self.motion = KalmanBoxFilter()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.num_frames = 0
+        self.num_skipped = 0
+        # 추론을 강제한 이유별 횟수
+        self.forced = {'score': 0, 'motion': 0, 'max_skips': 0, 'warmup': 0, 'request': 0}
+
+    def get_stats(self):
+        """
+        return:
+            stats(dict): track한 frame 수, 건너뛴 frame 수, skip 비율, 추론을 강제한 이유별 횟수
+        """
+        return {
+                'frames': self.num_frames,
+                'skipped': self.num_skipped,
+                'skip_ratio': self.num_skipped / self.num_frames if self.num_frames else 0.0,
+                'forced': dict(self.forced),
+               }
+
+    def init(self, img, bbox, *args, **kwargs):
+        super(AdaptiveTracker, self).init(img, bbox, *args, **kwargs)
+        self._on_init()
+
+    def init_from_bank(self, *args, **kwargs):
+        super(AdaptiveTracker, self).init_from_bank(*args, **kwargs)
+        self._on_init()
+
+    def _on_init(self):
+        self.motion.initiate(self.center_pos, self.size)
+        self.best_score = 1.0
+        self.skips = 0
+
+    def track(self, img, force=False):
+        """
+        args:
+            img(np.ndarray): BGR image
+            force(bool): 조건과 상관없이 추론
+        return:
+            {'bbox': [x, y, width, height], 'best_score': 마지막 추론의 score, 'skipped': 추론을 건너뛰었는지}
+        """
+        # track_async로 걸어둔 추론이 있으면 motion model이 갱신된 뒤에 예측
+        self.wait()
+        reason, center, size = self._decide(force)
+        if reason is None:
+            return self._skip(center, size, img.shape[:2])
+
+        # 건너뛴 frame이 있었으면 예측 위치를 중심으로 search
+        return self._on_tracked(super(AdaptiveTracker, self).track(img))
+
+    def track_async(self, img, force=False):
+        """ 건너뛸지는 호출한 thread에서 바로 정하고, 추론할 frame만 Tracker.track_async로 worker thread에 걸어둠\n
+        motion model 갱신은 worker thread에서 후처리에 이어서 수행 (다음 호출은 그때까지 기다림)
+        args:
+            img(np.ndarray): BGR image
+            force(bool): 조건과 상관없이 추론
+        return:
+            future(concurrent.futures.Future): 결과는 track과 같음 (건너뛴 frame이면 이미 완료된 Future, timings는 빈 dict)
+        """
+        self.wait()
+        reason, center, size = self._decide(force)
+        if reason is None:
+            future = Future()
+            future.timings = {}
+            future.set_result(self._skip(center, size, img.shape[:2]))
+            return future
+
+        return super(AdaptiveTracker, self).track_async(img, post=self._on_tracked)
+
+    def _decide(self, force):
+        """ motion model로 이번 frame을 예측하고 추론해야 하는 이유를 정함 (건너뛰면 reason이 None)
+        return:
+            reason(str), center(np.ndarray), size(np.ndarray)
+        """
+        self.num_frames += 1
+        center, size = self.motion.predict()
+
+        reason = self._force_reason(size, force)
+        if reason is not None:
+            self.forced[reason] += 1
+            self.skips = 0
+        return reason, center, size
+
+    def _skip(self, center, size, boundary):
+        """ 추론 없이 예측값 사용 """
+        self.skips += 1
+        self.num_skipped += 1
+        self._set_predicted(center, size, boundary)
+        return {
+                'bbox': [self.center_pos[0] - self.size[0] / 2,
+                         self.center_pos[1] - self.size[1] / 2,
+                         self.size[0],
+                         self.size[1]],
+                'best_score': self.best_score,
+                'skipped': True,
+               }
+
+    def _on_tracked(self, outputs):
+        """ 추론한 frame의 state로 motion model 갱신 (track_async면 worker thread에서) """
+        self.motion.update(self.center_pos, self.size)
+        self.best_score = float(outputs['best_score'])
+        outputs['skipped'] = False
+        return outputs
+
+    def _force_reason(self, size, force):
+        """ 추론해야 하는 이유를 반환 (건너뛰어도 되면 None) """
+        if force:
+            return 'request'
+        if self.motion.num_updates < self.warmup:
+            return 'warmup'
+        if self.skips >= self.max_skips:
+            return 'max_skips'
+        if self.best_score < self.min_score:
+            return 'score'
+
+        # frame당 이동량 (target 크기 대비)
+        velocity = self.motion.velocity
+        scale = max(np.mean(size), 1.0)
+        if np.hypot(velocity[0], velocity[1]) / scale > self.max_motion or \
+           np.max(np.abs(velocity[2:4])) / scale > self.max_motion:
+            return 'motion'
+        return None
+
+    def _set_predicted(self, center, size, boundary):
+        """ 예측값을 frame 안으로 자르고 크기를 제한해서 state로 둠 (Tracker의 clip과 같은 범위) """
+        self.center_pos = np.array([np.clip(center[0], 0, boundary[1]),
+                                    np.clip(center[1], 0, boundary[0])])
+        self.size = np.array([np.clip(size[0], 10, boundary[1]),
+                              np.clip(size[1], 10, boundary[0])])
+
+
+def _pop(kwargs, key, default):
+    value = kwargs.pop(key, None)
+    return default if value is None else value
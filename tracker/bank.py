@@ -0,0 +1,167 @@
+import os
+import time
+import threading
+import numpy as np
+
+from collections import OrderedDict
+
+from core.config import config
+
+# target ID별 template feature(zf)를 보관하는 LRU bank
+# 가려졌다가 다시 나타난 target이나 operator가 다시 선택한 target은 같은 zf를 쓰면 되므로,
+# crop, template backbone 없이 bank에서 꺼내서 바로 재초기화함
+# 크기가 정해져 있어서 가장 오래 안 쓴 target부터 버리고, npz 파일 하나로 저장/복원할 수 있음
+
+BANK_VERSION = 1
+
+
+class TemplateEntry(object):
+    """ bank에 들어가는 target 하나 (zf와 crop 정보) """
+
+    __slots__ = ('zf', 'bbox', 'channel_average', 'created', 'hits')
+
+    def __init__(self, zf, bbox, channel_average, created=None, hits=0):
+        """
+        args:
+            zf(np.ndarray): template feature (1d array)
+            bbox(list): template을 만들 때의 [x, y, w, h]
+            channel_average(np.ndarray): template을 만들 때 frame의 channel 평균 (padding 값)
+            created(float): 생성 시각 (time.time)
+            hits(int): bank에서 꺼내 쓴 횟수
+        """
+        self.zf = np.array(zf, dtype=np.float32).ravel()
+        self.bbox = np.array(bbox, dtype=np.float64)
+        self.channel_average = np.array(channel_average, dtype=np.float64)
+        self.created = time.time() if created is None else created
+        self.hits = hits
+
+
+class TemplateBank(object):
+    """ target ID -> TemplateEntry, 크기가 정해진 LRU """
+
+    def __init__(self, capacity=None):
+        """
+        args:
+            capacity(int): 최대 target 수. None이면 config.TEMPLATE_BANK_SIZE
+        """
+        self.capacity = capacity or config.TEMPLATE_BANK_SIZE
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, target_id):
+        return target_id in self._entries
+
+    def keys(self):
+        """ 오래 안 쓴 순서대로 target ID """
+        with self._lock:
+            return list(self._entries.keys())
+
+    def put(self, target_id, zf, bbox, channel_average):
+        """ target의 template을 넣음 (이미 있으면 덮어씀). 넘치면 가장 오래 안 쓴 target을 버림
+        args:
+            target_id(str or int): target ID
+            zf(np.ndarray): template feature
+            bbox(list): [x, y, w, h]
+            channel_average(np.ndarray): frame의 channel 평균
+        return:
+            entry(TemplateEntry)
+        """
+        entry = TemplateEntry(zf, bbox, channel_average)
+        with self._lock:
+            self._entries[target_id] = entry
+            self._entries.move_to_end(target_id)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def get(self, target_id):
+        """ target의 template을 꺼냄 (가장 최근에 쓴 것으로 갱신)
+        return:
+            entry(TemplateEntry), 없으면 None
+        """
+        with self._lock:
+            entry = self._entries.get(target_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(target_id)
+            entry.hits += 1
+            self.hits += 1
+            return entry
+
+    def remove(self, target_id):
+        with self._lock:
+            self._entries.pop(target_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        return {
+                'size': len(self._entries),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+               }
+
+    def save(self, path):
+        """ bank를 npz 파일 하나로 저장 (LRU 순서 유지, 임시 파일에 쓰고 rename)
+        args:
+            path(str): 저장 경로 (.npz)
+        """
+        with self._lock:
+            ids = list(self._entries.keys())
+            entries = list(self._entries.values())
+
+        # 빈 bank도 저장할 수 있도록 shape은 -1 대신 entry 수로 (reshape(-1, 0)은 안 됨)
+        count = len(entries)
+        dim = entries[0].zf.size if entries else 0
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path,
+                 version=np.array(BANK_VERSION),
+                 ids=np.array([ str(target_id) for target_id in ids ], dtype=str),
+                 # 저장할 때 ID 타입을 기억해서 복원할 때 int ID가 str이 되지 않게 함
+                 int_ids=np.array([ isinstance(target_id, (int, np.integer)) for target_id in ids ], dtype=bool),
+                 zfs=np.array([ entry.zf for entry in entries ], dtype=np.float32).reshape(count, dim),
+                 bboxes=np.array([ entry.bbox for entry in entries ]).reshape(count, 4),
+                 channel_averages=np.array([ entry.channel_average for entry in entries ]).reshape(count, 3),
+                 created=np.array([ entry.created for entry in entries ], dtype=np.float64),
+                 hits=np.array([ entry.hits for entry in entries ], dtype=np.int64))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, capacity=None):
+        """ save로 저장한 bank를 읽어옴
+        args:
+            path(str): npz 파일 경로
+            capacity(int): 최대 target 수. None이면 config.TEMPLATE_BANK_SIZE (넘치는 오래된 target은 버림)
+        return:
+            bank(TemplateBank)
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError('Template bank file {} is not found'.format(path))
+
+        bank = cls(capacity)
+        with np.load(path) as data:
+            if int(data['version']) != BANK_VERSION:
+                raise ValueError("unsupported template bank version : {}".format(int(data['version'])))
+
+            for i, target_id in enumerate(data['ids']):
+                target_id = int(target_id) if data['int_ids'][i] else str(target_id)
+                bank._entries[target_id] = TemplateEntry(data['zfs'][i], data['bboxes'][i],
+                                                         data['channel_averages'][i],
+                                                         float(data['created'][i]), int(data['hits'][i]))
+
+        while len(bank._entries) > bank.capacity:
+            bank._entries.popitem(last=False)
+        return bank
@@ -86,4 +86,91 @@ class SiameseTracker(BaseTracker):
         # im_patch = torch.from_numpy(im_patch)
         # if cfg.CUDA:
             # im_patch = im_patch.cuda()
-        return im_patch
\ No newline at end of file
+        return im_patch
+
+    def get_subwindow_into(self, im, pos, model_sz, original_sz, avg_chans, out):
+        """ get_subwindow와 같은 crop을 out buffer에 바로 써넣음\n
+        전체 frame을 padding한 복사본 대신, frame 안에 걸친 ROI에만 padding을 붙이고\n
+        resize, HWC -> CHW, float32 변환 결과를 out에 직접 씀\n
+        중간 buffer는 재사용하므로 frame마다 새로 할당하지 않음 (결과는 get_subwindow와 동일)
+
+        im: BGR image
+        pos: center position
+        model_sz: exemplar size
+        original_sz: original size
+        avg_chans: channel average
+        out: float32 buffer, 3 * model_sz * model_sz 크기 (e.g. engine의 page-locked 입력 buffer)\n
+             uint8 buffer면 uint8 입력 모델(tools.onnx_uint8)용으로 HWC 그대로 씀 (transpose, float 변환 없음)
+
+        return: out을 (1, 3, model_sz, model_sz)로 본 view (uint8이면 (1, model_sz, model_sz, 3))
+        """
+        if isinstance(pos, float):
+            pos = [pos, pos]
+
+        sz = original_sz
+        im_sz = im.shape
+        c = (original_sz + 1) / 2
+        context_xmin = int(np.floor(pos[0] - c + 0.5))
+        context_xmax = context_xmin + int(sz) - 1
+        context_ymin = int(np.floor(pos[1] - c + 0.5))
+        context_ymax = context_ymin + int(sz) - 1
+        # frame 안에 걸친 영역 ([0, im 크기]로 자름. 음수 끝으로 slice하면 반대쪽으로 감기므로 먼저 자름)
+        roi_xmin = min(max(context_xmin, 0), im_sz[1])
+        roi_xmax = min(max(context_xmax + 1, 0), im_sz[1])
+        roi_ymin = min(max(context_ymin, 0), im_sz[0])
+        roi_ymax = min(max(context_ymax + 1, 0), im_sz[0])
+        empty = roi_xmax <= roi_xmin or roi_ymax <= roi_ymin
+
+        left_pad = roi_xmin - context_xmin
+        top_pad = roi_ymin - context_ymin
+        right_pad = context_xmax + 1 - roi_xmax
+        bottom_pad = context_ymax + 1 - roi_ymax
+
+        if empty or any([top_pad, bottom_pad, left_pad, right_pad]):
+            # ROI 크기만큼만 padding (get_subwindow처럼 uint8로 잘라낸 avg_chans로 채움)
+            value = tuple(int(v) for v in avg_chans)
+            im_patch = self._get_buffer('pad', (int(sz), int(sz), 3))
+            if not empty:
+                # frame 안에 걸친 ROI (view, 복사 없음)
+                roi = im[roi_ymin:roi_ymax, roi_xmin:roi_xmax, :]
+                cv2.copyMakeBorder(roi, top_pad, bottom_pad, left_pad, right_pad,
+                                   cv2.BORDER_CONSTANT, dst=im_patch, value=value)
+            else:
+                # crop이 frame 밖에 완전히 벗어난 경우
+                im_patch[:] = value
+        else:
+            im_patch = im[roi_ymin:roi_ymax, roi_xmin:roi_xmax, :]
+
+        if out.dtype == np.uint8:
+            # uint8 모델 : BGR HWC 그대로 out에 씀 (resize면 out에 바로)
+            out = out.reshape(1, model_sz, model_sz, 3)
+            if not np.array_equal(model_sz, original_sz):
+                cv2.resize(im_patch, (model_sz, model_sz), dst=out[0])
+            else:
+                out[0] = im_patch
+            return out
+
+        if not np.array_equal(model_sz, original_sz):
+            im_patch = cv2.resize(im_patch, (model_sz, model_sz),
+                                  dst=self._get_buffer('resize', (model_sz, model_sz, 3)))
+
+        # HWC -> CHW (uint8 plane으로 분리) -> float32, out에 바로 씀
+        planes = self._get_buffer('planes', (3, model_sz, model_sz))
+        for ch in range(3):
+            cv2.extractChannel(im_patch, ch, planes[ch])
+
+        out = out.reshape(1, 3, model_sz, model_sz)
+        out[0] = planes
+        return out
+
+
+    def _get_buffer(self, name, shape):
+        """ get_subwindow_into의 uint8 중간 buffer\n
+        이름별로 지금까지 가장 큰 크기만큼만 할당해두고, 앞부분을 shape에 맞춰 view로 씀 """
+        if not hasattr(self, '_crop_buffers'):
+            self._crop_buffers = {}
+
+        size = int(np.prod(shape))
+        if name not in self._crop_buffers or self._crop_buffers[name].size < size:
+            self._crop_buffers[name] = np.empty(size, np.uint8)
+        return self._crop_buffers[name][:size].reshape(shape)
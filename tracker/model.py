@@ -1,53 +1,404 @@
-from engine.engine import TRTEngine
+import queue
+import threading
+import numpy as np
+
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+
+from core.config import config
+
+from engine.factory import create_engine
+from engine.factory import get_engine_paths
+from engine.factory import get_fused_engine_path
+from engine.registry import registry
 
 from core.process import BackBoneProcessor
 from core.process import HeadProcessor
 
+from utils.profiler import profiler
+
 # base.py에서 구현한 Tracker 모델을 구체화 함
 # base.py의 BaseTracker와 SiameseTracker는 정확히는 트래킹을 위한 헬퍼 함수를 가지고 있는 상태임.
 # 실제 추론은 Engine에서 이뤄지며 Model은 Engine과 Tracker를 묶어주는 역할
 
 class Model(object):
-    """ TensorRT Engine을 통해 데이터를 추론하는 객체 """
+    """ 추론 Engine(TensorRT, ONNX Runtime, Stub)을 통해 데이터를 추론하는 객체 """
+
+    def __init__(self, exam_back_engine_path="", temp_back_engine_path="", head_engine_path="", backend=None,
+                 pipeline=False, fused=None, fused_engine_path=""):
+        """
+        args:
+            *_engine_path(str): engine 경로. 비어있으면 backend의 기본 경로 사용
+            backend(str): 'trt', 'onnx', 'stub'. None이면 config.ENGINE_BACKEND
+            pipeline(bool): True면 engine 호출을 전용 worker thread에서 수행하고,
+                            입력 buffer를 config.MODEL_PIPELINE_DEPTH벌 두고 번갈아 씀\n
+                            이 모드에서는 여러 thread(여러 Tracker)가 Model 하나를 같이 써도 됨
+            fused(bool): True면 exam backbone + head를 합친 engine(tools.fuse_head) 하나로 track하고,
+                         zf는 바뀔 때만 engine에 올려둠 (exam backbone, head 경로는 쓰지 않음). None이면 config.MODEL_FUSED
+            fused_engine_path(str): fused engine 경로. 비어있으면 backend의 기본 경로 (config.FUSED_ENGINE_PATHS)
+        """
+        default_paths = get_engine_paths(backend)
+        exam_back_engine_path = exam_back_engine_path or default_paths[0]
+        temp_back_engine_path = temp_back_engine_path or default_paths[1]
+        head_engine_path      = head_engine_path      or default_paths[2]
+
+        self.fused = config.MODEL_FUSED if fused is None else fused
+        if self.fused:
+            engine_paths = (temp_back_engine_path, fused_engine_path or get_fused_engine_path(backend))
+        else:
+            engine_paths = (exam_back_engine_path, temp_back_engine_path, head_engine_path)
 
-    def __init__(self, exam_back_engine_path="", temp_back_engine_path="", head_engine_path=""):
-        self.back_exam_engine = TRTEngine(exam_back_engine_path)
-        self.back_temp_engine = TRTEngine(temp_back_engine_path)
-        self.head_engine      = TRTEngine(head_engine_path)
+        # 같은 파일은 process에서 한번만 로딩하고 (engine.registry), Model마다 context, buffer만 새로 만듦
+        if config.ENGINE_SHARED:
+            engines = registry.create_engines(engine_paths, backend)
+        else:
+            engines = [ create_engine(path, backend) for path in engine_paths ]
 
         # 입력과 출력에 대한 차원 변환을 수행해주는 클래스
-        self.back_exam_processor = BackBoneProcessor(self.back_exam_engine.get_input_dtype())
+        if self.fused:
+            # fused engine 입력 : [zf, x crop], 출력 : [cls, loc]
+            self.back_temp_engine, self.fused_engine = engines
+            self.back_exam_engine = self.head_engine = None
+            dtypes = self.fused_engine.get_input_dtype()
+            self.back_exam_processor = BackBoneProcessor(dtypes[1])
+            self.head_processor      = HeadProcessor(dtypes[0])
+            # x crop을 써넣을 engine 입력
+            self._exam_input = (self.fused_engine, 1)
+        else:
+            self.back_exam_engine, self.back_temp_engine, self.head_engine = engines
+            self.fused_engine = None
+            self.back_exam_processor = BackBoneProcessor(self.back_exam_engine.get_input_dtype())
+            self.head_processor      = HeadProcessor(self.head_engine.get_input_dtype())
+            self._exam_input = (self.back_exam_engine, 0)
         self.back_temp_processor = BackBoneProcessor(self.back_temp_engine.get_input_dtype())
-        self.head_processor      = HeadProcessor(self.head_engine.get_input_dtype())
-        
+        self._engines = engines
+
+        # fused engine에 올려둔 zf (같은 객체면 다시 올리지 않음)
+        self._resident_zf = None
+
+        # pipeline 모드 : engine 호출은 모두 worker thread 하나에서 순서대로 수행됨
+        # 호출하는 쪽은 추론이 도는 동안 다음 buffer에 crop하거나 decode, 그리기 등을 할 수 있음
+        self._executor = None
+        self._slots = []
+        # 추론에 쓰이고 있지 않은 buffer 벌
+        self._free_slots = queue.Queue()
+        self._slot_lock = threading.Lock()
+        if pipeline:
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix='model',
+                                                initializer=self.attach_thread)
+            self._slots = [ {
+                              'temp': self.allocate_temp_buffer(),
+                              'exam': self.allocate_exam_buffer(),
+                              'busy': False,
+                            } for _ in range(config.MODEL_PIPELINE_DEPTH) ]
+            for slot in self._slots:
+                self._free_slots.put(slot)
+
+        # 첫 호출의 lazy 초기화(TRT context 준비, ORT 메모리 할당 등)를 미리 치름. registry를 쓰면 파일마다 처음 한번만
+        iters = config.ENGINE_WARMUP_ITERS
+        if iters and (not config.ENGINE_SHARED or registry.claim_warmup(engine_paths, backend)):
+            self.warmup(iters)
+
+    @property
+    def pipeline(self):
+        return self._executor is not None
+
+    @property
+    def zf_size(self):
+        """ target 하나의 template feature(zf) 크기 (config.TRACK_TEMPLATE_FEATURE) """
+        return int(np.prod(config.TRACK_TEMPLATE_FEATURE))
+
+    @property
+    def max_batch_size(self):
+        """ track_batch에서 engine 한번 호출에 넣는 최대 batch """
+        if self.fused:
+            return self.fused_engine.max_batch_size
+        return min(self.back_exam_engine.max_batch_size, self.head_engine.max_batch_size)
+
+
+    def allocate_temp_buffer(self, batch=1):
+        """ template crop용 host buffer를 새로 할당 (batch * 3 * 127 * 127, uint8 모델이면 NHWC) """
+        shape = self.back_temp_processor.input_shape(config.TRACK_EXEMPLAR_SIZE, batch)
+        return self.back_temp_engine.allocate_host_buffer(shape)
+
+
+    def allocate_exam_buffer(self, batch=1):
+        """ exampler crop용 host buffer를 새로 할당 (batch * 3 * 255 * 255, uint8 모델이면 NHWC) """
+        engine, index = self._exam_input
+        shape = self.back_exam_processor.input_shape(config.TRACK_INSTANCE_SIZE, batch)
+        return engine.allocate_host_buffer(shape, index)
+
+
+    def get_temp_buffer(self):
+        """ template backbone 입력 buffer (1 * 3 * 127 * 127, uint8 모델이면 1 * 127 * 127 * 3)\n
+        get_subwindow_into로 여기에 바로 crop하면 복사 없이 engine에 들어감 """
+        if self._slots:
+            return self._acquire_slot()['temp']
+        size = config.TRACK_EXEMPLAR_SIZE
+        return self.back_temp_engine.get_input_buffer(self.back_temp_processor.input_shape(size))
+
+
+    def get_exam_buffer(self):
+        """ exampler backbone 입력 buffer (1 * 3 * 255 * 255, uint8 모델이면 1 * 255 * 255 * 3)\n
+        get_subwindow_into로 여기에 바로 crop하면 복사 없이 engine에 들어감\n
+        pipeline 모드에서는 호출할 때마다 비어있는 buffer 벌을 반환하며, 모두 추론에 쓰이는 중이면 하나가 끝날 때까지 기다림\n
+        받은 buffer는 track_async(track)에 넘기면 추론이 끝난 뒤 반납되고, 넘기지 않을 땐 release_buffer로 반납해야 함 """
+        if self._slots:
+            return self._acquire_slot()['exam']
+        engine, index = self._exam_input
+        size = config.TRACK_INSTANCE_SIZE
+        return engine.get_input_buffer(self.back_exam_processor.input_shape(size), index)
+
+
+    def release_buffer(self, buf):
+        """ get_*_buffer로 받은 buffer 벌을 반납 (이미 반납됐거나 pipeline buffer가 아니면 무시)
+        args:
+            buf(np.ndarray): get_temp_buffer, get_exam_buffer로 받은 buffer (혹은 그 view)
+        """
+        slot = self._find_slot(buf)
+        if slot is not None:
+            self._release_slot(slot)
+
+
+    def _acquire_slot(self):
+        """ 비어있는 입력 buffer 벌을 하나 가져옴 (없으면 반납될 때까지 기다림) """
+        slot = self._free_slots.get()
+        slot['busy'] = True
+        return slot
+
+
+    def _release_slot(self, slot):
+        with self._slot_lock:
+            if not slot['busy']:
+                return
+            slot['busy'] = False
+        self._free_slots.put(slot)
+
+
+    def _find_slot(self, buf):
+        """ buf가 어느 buffer 벌에 속하는지 찾음 """
+        for slot in self._slots:
+            if np.may_share_memory(slot['exam'], buf) or np.may_share_memory(slot['temp'], buf):
+                return slot
+        return None
+
+
+    def attach_thread(self):
+        """ 현재 thread에서 engine들을 호출할 수 있게 준비 (worker thread 시작 시 호출) """
+        for engine in self._engines:
+            engine.attach_thread()
+
+
+    def _call(self, func, *args):
+        """ pipeline 모드면 worker thread에서 실행하고 결과를 기다림 (engine 호출 순서를 보장) """
+        if self._executor is None:
+            return func(*args)
+        return self._executor.submit(func, *args).result()
+
+
+    def warmup(self, iters=1):
+        """ 0으로 채운 입력으로 template, exam backbone, head를 iters번 호출 (결과, self.zf는 건드리지 않음)
+        args:
+            iters(int): 반복 횟수
+        """
+        temp_size = config.TRACK_EXEMPLAR_SIZE
+        exam_size = config.TRACK_INSTANCE_SIZE
+        z = np.zeros(self.back_temp_processor.input_shape(temp_size), self.back_temp_processor.in_dtype)
+        x = np.zeros(self.back_exam_processor.input_shape(exam_size), self.back_exam_processor.in_dtype)
+        self._call(self._warmup, z, x, iters)
+
+
+    def _warmup(self, z, x, iters):
+        for _ in range(iters):
+            zf = np.array(self.back_temp_processor.post(self.back_temp_engine(self.back_temp_processor.pre(z))))
+            self._infer(x, zf)
+
 
     def template(self, z):
         """
         args:
             z(ndarray): BGR image
         return:
-            void
+            zf(ndarray): template feature (1d array, self.zf에도 저장됨)
         """
-        zf = self.back_temp_engine(self.back_temp_processor.pre(z))
-        self.zf = self.back_temp_processor.post(zf)
+        if self._executor is None:
+            return self._template(z)
+
+        try:
+            return self._call(self._template, z)
+        finally:
+            self.release_buffer(z)
+
+
+    def _template(self, z):
+        with profiler.span('infer.backbone_temp'):
+            zf = self.back_temp_engine(self.back_temp_processor.pre(z))
+        # engine의 출력 buffer는 다음 호출에서 덮어써지므로 복사해서 보관
+        self.zf = np.array(self.back_temp_processor.post(zf))
+        return self.zf
 
 
-    def track(self, x):
+    def track(self, x, zf=None):
         """
         args:
             x(ndarray): BGR image
+            zf(ndarray): template feature. None이면 마지막으로 template한 self.zf
         return:
             {'cls': cls, 'loc': loc}
+
+            pipeline 모드면 worker thread에서 복사해서 반환 (engine 출력 buffer는 다른 thread의 다음 추론이 덮어씀)
+        """
+        if self._executor is None:
+            return self._track(x, zf)
+        copy = lambda outputs: { key: np.array(value) for key, value in outputs.items() }
+        return self.track_async(x, zf, post=copy).result()
+
+
+    def track_async(self, x, zf=None, post=None, timings=None):
+        """ track을 worker thread에 걸어두고 바로 Future를 반환\n
+        x가 get_exam_buffer로 받은 buffer면, 추론이 끝난 뒤 반납됨 (그 전까지는 다른 호출에 나눠주지 않음)\n
+        pipeline 모드가 아니면 그 자리에서 실행하고 완료된 Future를 반환
+        args:
+            x(ndarray): BGR image
+            zf(ndarray): template feature. None이면 실행 시점의 self.zf
+            post(callable): 추론 결과를 받아서 worker thread에서 이어서 처리할 함수 (Future의 결과가 됨)
+
+                            cls, loc는 engine 출력 buffer의 view일 수 있으므로 post 밖으로 넘길 땐 복사할 것
+            timings(dict): 주어지면 추론, post 동안 기록된 구간 시간(초)을 여기에도 남김 (profiler.collect)
+        return:
+            future(concurrent.futures.Future): {'cls': cls, 'loc': loc} 혹은 post의 반환값
         """
+        def job():
+            with profiler.collect(timings):
+                outputs = self._track(x, zf)
+                return post(outputs) if post is not None else outputs
+
+        if self._executor is None:
+            future = Future()
+            try:
+                future.set_result(job())
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        slot = self._find_slot(x)
+        try:
+            future = self._executor.submit(job)
+        except Exception:
+            if slot is not None:
+                self._release_slot(slot)
+            raise
+
+        if slot is not None:
+            future.add_done_callback(lambda _: self._release_slot(slot))
+        return future
+
+
+    def _track(self, x, zf=None):
+        if zf is None:
+            zf = self.zf
+
+        cls, loc = self._infer(x, zf)
+
+        # head망 후처리 진행
+        cls, loc = self.head_processor.post(cls, loc)
+
+        return {
+                'cls': cls,
+                'loc': loc,
+               }
+
+
+    def _infer(self, x, zf):
+        """ x crop, zf -> head 출력 (cls, loc, engine 출력 buffer의 1d array) """
+        if self.fused:
+            # zf가 바뀔 때만 engine에 올리고 (TRT는 device에 둔 채로), 매 frame은 x만 넘김
+            if zf is not self._resident_zf:
+                self.fused_engine.set_resident(0, zf)
+                self._resident_zf = zf
+            with profiler.span('infer.exam_head'):
+                return self.fused_engine([None, self.back_exam_processor.pre(x)])
+
         # x에 대해서 exam백본망 들어가기 전, 전처리
-        xf = self.back_exam_engine(self.back_exam_processor.pre(x))
-        
+        with profiler.span('infer.backbone_exam'):
+            xf = self.back_exam_engine(self.back_exam_processor.pre(x))
+
         # xf에 대해서 exam백본망 후처리 후,
         # head망 전처리를 함
-        cls, loc = self.head_engine(self.head_processor.pre(self.zf, self.back_exam_processor.post(xf)))
+        with profiler.span('infer.head'):
+            return self.head_engine(self.head_processor.pre(zf, self.back_exam_processor.post(xf)))
+
+
+    def close(self):
+        """ pipeline worker thread 종료 (걸어둔 추론은 끝까지 수행) """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            self._slots = []
+
+
+    def template_batch(self, zs):
+        """ 여러 target의 z crop을 한번에 template backbone에 넣음
+        args:
+            zs(ndarray): N * 3 * 127 * 127 crop
+        return:
+            zfs(ndarray): N * 3072 template feature
+        """
+        return self._call(self._template_batch, zs)
+
+
+    def _template_batch(self, zs):
+        step = self.back_temp_engine.max_batch_size
+        zfs = []
+        for s in range(0, len(zs), step):
+            batch = len(zs[s:s + step])
+            with profiler.span('infer.backbone_temp'):
+                zf = self.back_temp_engine(self.back_temp_processor.pre(zs[s:s + step]))
+            # engine의 출력 buffer는 다음 호출에서 덮어써지므로 복사 (concatenate가 복사함)
+            zfs.append(np.reshape(self.back_temp_processor.post(zf)[:batch * self.zf_size], (batch, -1)))
+
+        return np.concatenate(zfs)
+
+
+    def track_batch(self, xs, zfs):
+        """ 여러 target의 x crop을 한번에 exam backbone, head에 넣음\n
+        engine의 max_batch_size만큼씩 나눠서 호출하고 (batch 고정 엔진이면 1개씩), 결과는 다시 이어붙임
+        args:
+            xs(ndarray): N * 3 * 255 * 255 crop
+            zfs(ndarray): N * 3072 template feature (target 순서와 같아야 함)
+        return:
+            {'cls': N * 2 * 16 * 16, 'loc': N * 4 * 16 * 16}
+        """
+        if len(xs) != len(zfs):
+            raise ValueError("x crop과 template feature의 갯수가 다릅니다")
+
+        return self._call(self._track_batch, xs, zfs)
+
+
+    def _track_batch(self, xs, zfs):
+        step = self.max_batch_size
+        cls_list, loc_list = [], []
+        for s in range(0, len(xs), step):
+            batch = len(xs[s:s + step])
+            if self.fused:
+                # batch마다 zf가 다르므로 같이 넘김 (올려둔 zf는 덮어써짐)
+                self._resident_zf = None
+                with profiler.span('infer.exam_head'):
+                    cls, loc = self.fused_engine([np.ravel(zfs[s:s + step]),
+                                                  self.back_exam_processor.pre(xs[s:s + step])])
+            else:
+                with profiler.span('infer.backbone_exam'):
+                    xf = self.back_exam_engine(self.back_exam_processor.pre(xs[s:s + step]))
+                with profiler.span('infer.head'):
+                    cls, loc = self.head_engine(self.head_processor.pre(np.ravel(zfs[s:s + step]),
+                                                                        self.back_exam_processor.post(xf)))
+
+            # engine의 출력 buffer는 다음 호출에서 덮어써지므로 복사
+            cls_list.append(np.array(cls[:batch * 2 * 16 * 16]))
+            loc_list.append(np.array(loc[:batch * 4 * 16 * 16]))
 
         # head망 후처리 진행
-        cls, loc = self.head_processor.post(cls, loc)
+        cls, loc = self.head_processor.post(np.concatenate(cls_list), np.concatenate(loc_list), len(xs))
 
         return {
                 'cls': cls,
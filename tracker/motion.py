@@ -0,0 +1,84 @@
+import numpy as np
+
+# target의 중심, 크기에 대한 constant-velocity Kalman filter
+# state : [cx, cy, w, h, vx, vy, vw, vh], 측정 : [cx, cy, w, h]
+# 잡음은 target 크기에 비례하게 둠 (작은 target은 px 단위로 덜 움직인다고 봄)
+
+
+class KalmanBoxFilter(object):
+    """ bbox(중심, 크기)용 constant-velocity Kalman filter """
+
+    def __init__(self, std_position=1. / 20, std_velocity=1. / 160, std_measurement=1. / 20):
+        """
+        args:
+            std_position(float): 위치 process noise (target 크기 대비)
+            std_velocity(float): 속도 process noise (target 크기 대비)
+            std_measurement(float): 측정 noise (target 크기 대비)
+        """
+        self.std_position = std_position
+        self.std_velocity = std_velocity
+        self.std_measurement = std_measurement
+
+        # x(t+1) = x(t) + v(t)
+        self.F = np.eye(8)
+        self.F[:4, 4:] = np.eye(4)
+        self.H = np.eye(4, 8)
+
+        self.mean = None
+        self.covariance = None
+        # update(측정)된 횟수
+        self.num_updates = 0
+
+    def initiate(self, center, size):
+        """ 첫 측정으로 초기화 (속도는 0, 불확실성 크게)
+        args:
+            center(np.ndarray): [cx, cy]
+            size(np.ndarray): [w, h]
+        """
+        self.mean = np.r_[center, size, np.zeros(4)].astype(np.float64)
+
+        scale = np.mean(size)
+        std = np.r_[[2 * self.std_position * scale] * 4,
+                    [10 * self.std_velocity * scale] * 4]
+        self.covariance = np.diag(np.square(std))
+        self.num_updates = 1
+
+    def predict(self):
+        """ 한 frame 뒤의 state를 예측 (state를 갱신함)
+        return:
+            center(np.ndarray): [cx, cy], size(np.ndarray): [w, h]
+        """
+        scale = np.mean(self.mean[2:4])
+        std = np.r_[[self.std_position * scale] * 4,
+                    [self.std_velocity * scale] * 4]
+        Q = np.diag(np.square(std))
+
+        self.mean = self.F @ self.mean
+        self.covariance = self.F @ self.covariance @ self.F.T + Q
+        return self.mean[:2].copy(), self.mean[2:4].copy()
+
+    def update(self, center, size):
+        """ 측정으로 state를 보정
+        args:
+            center(np.ndarray): [cx, cy]
+            size(np.ndarray): [w, h]
+        """
+        measurement = np.r_[center, size]
+        scale = np.mean(self.mean[2:4])
+        R = np.diag(np.square([self.std_measurement * scale] * 4))
+
+        S = self.H @ self.covariance @ self.H.T + R
+        K = np.linalg.solve(S, self.H @ self.covariance).T
+        self.mean = self.mean + K @ (measurement - self.H @ self.mean)
+        self.covariance = (np.eye(8) - K @ self.H) @ self.covariance
+        self.num_updates += 1
+
+    @property
+    def velocity(self):
+        """ frame당 [vx, vy, vw, vh] """
+        return self.mean[4:].copy()
+
+    @property
+    def position_std(self):
+        """ 중심 위치의 표준편차 (px) """
+        return float(np.sqrt(self.covariance[0, 0] + self.covariance[1, 1]))
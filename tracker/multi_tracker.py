@@ -0,0 +1,108 @@
+import numpy as np
+
+from core.config import config
+
+from tracker.tracker import Tracker
+
+from utils.profiler import profiler
+
+# 한 카메라에서 여러 target을 동시에 추적하는 Tracker
+# target마다 Tracker를 따로 두면 target 수만큼 engine을 batch 1로 호출하게 되므로,
+# crop을 한 batch로 모아서 backbone, head를 한번에 돌리고 후처리만 target별로 수행함
+# Tracker의 crop, 후처리 로직은 그대로 쓰지만 target 하나를 가정하는 기능(track_async, template bank, recorder)은 지원하지 않음
+
+class MultiTracker(Tracker):
+    """ 한 frame에서 여러 target을 batch 추론으로 추적하는 객체\n
+    Model은 하나만 두고, target마다 state(center_pos, size)와 zf를 따로 가짐 """
+
+    def __init__(self, back_exam_engine_path="", temp_exam_engine_path="", head_engine_path="", backend=None,
+                 pipeline=False, model=None, track_config=None):
+        """
+        args:
+            Tracker와 같음. target 하나 기준인 bank, recorder는 받지 않음
+        """
+        super(MultiTracker, self).__init__(back_exam_engine_path, temp_exam_engine_path, head_engine_path, backend,
+                                           pipeline=pipeline, model=model, track_config=track_config)
+
+        # target마다 zf를 따로 가지므로 Tracker의 zf, template bank는 쓰지 않음
+        self.bank = None
+        self.zfs = None
+
+    def init(self, img, bboxes):
+        """
+        args:
+            img(np.ndarray): BGR image
+            bboxes(list): Bounding Box 목록 => [[x, y, w, h], ...]
+        return:
+            void
+        """
+        self.wait()
+        bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+
+        # center_pos = N * [center x of bbox, center y of bbox]
+        self.center_pos = np.stack([bboxes[:, 0] + (bboxes[:, 2] - 1) / 2,
+                                    bboxes[:, 1] + (bboxes[:, 3] - 1) / 2], axis=1)
+
+        # size = N * [w, h]
+        self.size = bboxes[:, 2:4].copy()
+
+        # img channel average (frame 하나이므로 모든 target이 공유)
+        self.channel_average = np.mean(img, axis=(0, 1))
+
+        # get z crops
+        z_size = config.TRACK_EXEMPLAR_SIZE
+        # crop layout, dtype은 backbone 입력을 따름 (uint8 모델이면 NHWC uint8)
+        temp_processor = self.model.back_temp_processor
+        z_crops = np.empty(temp_processor.input_shape(z_size, len(bboxes)), dtype=temp_processor.in_dtype)
+        for i in range(len(bboxes)):
+            s_z, _, _ = self._search_scale(self.size[i])
+            self.get_subwindow_into(img, self.center_pos[i], z_size,
+                                    s_z, self.channel_average, z_crops[i])
+
+        # forward only backbone, target마다 zf 하나씩
+        self.zfs = self.model.template_batch(z_crops)
+
+        # x crop은 매 frame 같은 크기이므로 미리 할당해두고 재사용
+        x_size = config.TRACK_INSTANCE_SIZE
+        exam_processor = self.model.back_exam_processor
+        self.x_crops = np.empty(exam_processor.input_shape(x_size, len(bboxes)), dtype=exam_processor.in_dtype)
+
+    def track(self, img):
+        """
+        args:
+            img(np.ndarray): BGR image
+        return:
+            outputs(list): target 순서대로 {'bbox': [x, y, width, height], 'best_score': score}
+        """
+        num_targets = len(self.zfs)
+        scales = np.empty(num_targets)
+
+        # get x crops
+        with profiler.span('crop'):
+            for i in range(num_targets):
+                _, scales[i], s_x = self._search_scale(self.size[i])
+                self.get_subwindow_into(img, self.center_pos[i],
+                                        config.TRACK_INSTANCE_SIZE,
+                                        round(s_x), self.channel_average, self.x_crops[i])
+
+        # forward all (backbone, head), 모든 target을 한 batch로
+        outputs = self.model.track_batch(self.x_crops, self.zfs)
+
+        # 후처리는 모든 target을 한번에 vectorize해서 처리
+        self.center_pos, self.size, bboxes, best_scores = self._postprocess(outputs, self.center_pos,
+                                                                            self.size, scales,
+                                                                            img.shape[:2])
+
+        return [ {
+                  'bbox': list(bbox),
+                  'best_score': best_score
+                 } for bbox, best_score in zip(bboxes, best_scores) ]
+
+    def track_async(self, img, post=None):
+        raise NotImplementedError("MultiTracker는 track_async를 지원하지 않습니다. track을 사용하세요")
+
+    def init_from_bank(self, target_id, bbox=None, img=None):
+        raise NotImplementedError("MultiTracker는 template bank를 지원하지 않습니다. init으로 target을 모두 다시 지정하세요")
+
+    def switch_template(self, target_id):
+        raise NotImplementedError("MultiTracker는 template bank를 지원하지 않습니다. init으로 target을 모두 다시 지정하세요")
@@ -0,0 +1,316 @@
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+from core.config import config
+from core.config import TrackConfig
+from utils.profiler import profiler
+
+# head 출력(cls, loc)과 crop parameter를 frame마다 기록해 두고, engine 없이 다시 재생하는 기능
+# 후처리, tracking 로직을 바꿨을 때 engine과 dataset 없이 CPU에서 빠르게 회귀 확인, 수치 차이 비교용
+# 파일 구조 : MAGIC(4 byte) + header 길이(uint32) + header(json) + record * N (utils.result_log와 같은 방식)
+#   header : {'version', 'score_size', 'track_config', 'dtype'}
+#   record : kind(init/track), bbox(init은 입력 bbox, track은 결과 bbox), center_pos, size(추론 전 state),
+#            scale_z, s_x(search crop), boundary(img.shape[:2]), best_score, cls, loc
+# 사용법 :
+#   with OutputRecorder('seq.ntrp') as recorder:
+#       tracker = Tracker(backend='onnx', recorder=recorder)
+#       ...                                        # init, track 호출이 모두 기록됨
+#   result = replay('seq.ntrp')                    # engine 없이 같은 tracking 로직 재실행, 기록과 비교
+#   result = replay('seq.ntrp', TrackConfig(lr=0.4))
+
+MAGIC = b'NTRP'
+RECORD_VERSION = 1
+_HEADER_LEN = struct.Struct('<I')
+
+KIND_INIT  = 0
+KIND_TRACK = 1
+
+
+def _record_dtype(score_size):
+    return np.dtype([('kind', 'u1'),
+                     ('bbox', '<f8', (4,)),
+                     ('center_pos', '<f8', (2,)),
+                     ('size', '<f8', (2,)),
+                     ('scale_z', '<f8'),
+                     ('s_x', '<f8'),
+                     ('boundary', '<i4', (2,)),
+                     ('best_score', '<f4'),
+                     ('cls', '<f4', (2, score_size, score_size)),
+                     ('loc', '<f4', (4, score_size, score_size))])
+
+
+class OutputRecorder(object):
+    """ Tracker의 init, track(head 출력, crop parameter)을 batch 단위로 파일에 기록\n
+    Tracker(recorder=...)로 넘기면 Tracker가 호출함 """
+
+    def __init__(self, path, track_config=None, score_size=None, flush_every=256):
+        """
+        args:
+            path(str): 기록할 파일 경로 (있으면 덮어씀)
+            track_config(TrackConfig): 기록할 때 쓴 추적 parameter (replay 기본값), None이면 config 값
+            score_size(int): cls, loc map 크기. None이면 config.TRACK_OUTPUT_SIZE
+            flush_every(int): 몇 record마다 파일에 쓸지
+        """
+        self.path = path
+        self.score_size = score_size or config.TRACK_OUTPUT_SIZE
+        self.dtype = _record_dtype(self.score_size)
+
+        self._buffer = np.zeros(flush_every, dtype=self.dtype)
+        self._size = 0
+        self.num_records = 0
+
+        self._file = open(path, 'wb')
+        self._write_header(track_config if track_config is not None else TrackConfig())
+
+    def _write_header(self, track_config):
+        header = json.dumps({'version': RECORD_VERSION,
+                             'score_size': self.score_size,
+                             'track_config': track_config.to_dict(),
+                             'dtype': self.dtype.descr}).encode('utf-8')
+        self._file.write(MAGIC + _HEADER_LEN.pack(len(header)) + header)
+
+    def set_track_config(self, track_config):
+        """ 기록 시작 전에 header의 추적 parameter를 바꿈 (Tracker가 recorder를 받을 때 호출) """
+        if self.num_records:
+            return
+        self._file.seek(0)
+        self._file.truncate()
+        self._write_header(track_config)
+
+    def record_init(self, bbox, boundary):
+        """
+        args:
+            bbox: init bbox [x, y, w, h]
+            boundary(tuple): img.shape[:2]
+        """
+        record = self._next()
+        record['kind'] = KIND_INIT
+        record['bbox'] = bbox
+        record['boundary'] = boundary
+        self._commit()
+
+    def record_track(self, center_pos, size, scale_z, boundary, outputs, result):
+        """
+        args:
+            center_pos, size(np.ndarray): 추론 전 state (search crop의 중심, target 크기)
+            scale_z(float): 원본 -> exemplar 비율
+            boundary(tuple): img.shape[:2]
+            outputs(dict): head 출력 {'cls': 1 * 2 * S * S, 'loc': 1 * 4 * S * S}
+            result(dict): 후처리 결과 {'bbox', 'best_score'}
+        """
+        record = self._next()
+        record['kind'] = KIND_TRACK
+        record['bbox'] = result['bbox']
+        record['center_pos'] = center_pos
+        record['size'] = size
+        record['scale_z'] = scale_z
+        record['s_x'] = config.TRACK_INSTANCE_SIZE / scale_z
+        record['boundary'] = boundary
+        record['best_score'] = result['best_score']
+        record['cls'] = np.reshape(outputs['cls'], record['cls'].shape)
+        record['loc'] = np.reshape(outputs['loc'], record['loc'].shape)
+        self._commit()
+
+    def _next(self):
+        record = self._buffer[self._size]
+        record.fill(0)
+        return record
+
+    def _commit(self):
+        self._size += 1
+        self.num_records += 1
+        if self._size == len(self._buffer):
+            self.flush()
+
+    def flush(self):
+        """ 모아둔 record를 파일에 씀 """
+        if self._size:
+            self._buffer[:self._size].tofile(self._file)
+            self._size = 0
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def read(path):
+        """ 기록을 memmap으로 읽음
+        return:
+            header(dict), records(np.ndarray): structured array (kind, bbox, ..., cls, loc)
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError('Record file {} is not found'.format(path))
+
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("not an output record : {}".format(path))
+            header_len, = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+            header = json.loads(f.read(header_len))
+
+        if header['version'] != RECORD_VERSION:
+            raise ValueError("unsupported output record version : {}".format(header['version']))
+
+        dtype = _record_dtype(header['score_size'])
+        offset = len(MAGIC) + _HEADER_LEN.size + header_len
+        # 마지막 불완전한 record는 버림
+        count = (os.path.getsize(path) - offset) // dtype.itemsize
+        if count == 0:
+            return header, np.zeros(0, dtype=dtype)
+        return header, np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+
+
+class ReplayModel(object):
+    """ 기록된 head 출력을 순서대로 돌려주는 Model\n
+    Tracker(model=ReplayModel(path))로 쓰면 engine 없이 (frame은 있어야 함) 같은 순서의 init, track을 재실행할 수 있음\n
+    frame 없이 재생하려면 replay() 사용 """
+
+    def __init__(self, path):
+        """
+        args:
+            path(str): OutputRecorder로 기록한 파일
+        """
+        self.header, self.records = OutputRecorder.read(path)
+        self.track_config = TrackConfig(**self.header['track_config'])
+        self.cursor = 0
+        self.zf = None
+
+        size = config.TRACK_EXEMPLAR_SIZE
+        self._temp_buffer = np.zeros((1, 3, size, size), np.float32)
+        size = config.TRACK_INSTANCE_SIZE
+        self._exam_buffer = np.zeros((1, 3, size, size), np.float32)
+
+    @property
+    def pipeline(self):
+        return False
+
+    def get_temp_buffer(self):
+        return self._temp_buffer
+
+    def get_exam_buffer(self):
+        return self._exam_buffer
+
+    def release_buffer(self, buf):
+        pass
+
+    def _next(self, kind):
+        """ 다음 kind record (bank로 template 없이 init한 경우 등 건너뛴 init record는 넘김) """
+        while self.cursor < len(self.records):
+            record = self.records[self.cursor]
+            self.cursor += 1
+            if record['kind'] == kind:
+                return record
+            if kind == KIND_INIT:
+                raise ValueError("replay out of sync : expected init at record {}".format(self.cursor - 1))
+        raise ValueError("replay has no more records ({} records)".format(len(self.records)))
+
+    def template(self, z):
+        """ template feature 대신 빈 zf (head 출력이 기록돼 있으므로 쓰이지 않음) """
+        self._next(KIND_INIT)
+        self.zf = np.zeros(1, np.float32)
+        return self.zf
+
+    def track(self, x, zf=None):
+        record = self._next(KIND_TRACK)
+        return {
+                'cls': record['cls'][np.newaxis],
+                'loc': record['loc'][np.newaxis],
+               }
+
+    def track_async(self, x, zf=None, post=None, timings=None):
+        from concurrent.futures import Future
+        future = Future()
+        try:
+            # 추론은 없으므로 post(후처리) 구간만 남음
+            with profiler.collect(timings):
+                outputs = self.track(x, zf)
+                outputs = post(outputs) if post is not None else outputs
+            future.set_result(outputs)
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def close(self):
+        pass
+
+
+def replay(path, track_config=None, tracker=None, tolerance=1e-3):
+    """ frame, engine 없이 기록된 head 출력으로 tracking 로직(crop 크기 계산, 후처리, state 갱신)만 재실행하고 기록과 비교
+    args:
+        path(str): OutputRecorder로 기록한 파일
+        track_config(TrackConfig): 재생할 때 쓸 추적 parameter. None이면 기록할 때의 값
+                                   (penalty_k, window_influence, lr만 바꿀 수 있음)
+        tracker(Tracker): 재생할 Tracker (subclass의 후처리를 확인할 때). None이면 Tracker
+        tolerance(float): 이보다 bbox(px) 차이가 크면 달라진 것으로 봄
+    return:
+        result(dict): {'bbox': 재생 bbox(track record마다), 'best_score', 'scale_z', 'summary'}
+            summary : frames, fps, bbox 차이(max, mean), score 차이(max), crop(center, scale) 차이(max), 처음 달라진 record
+    """
+    model = ReplayModel(path)
+    records = model.records
+
+    # 기록된 cls, loc는 기록할 때의 crop(context_amount로 정해짐)에 대한 출력이라 context_amount는 바꿀 수 없음
+    if track_config is not None and track_config.context_amount != model.track_config.context_amount:
+        raise ValueError("context_amount cannot be changed on replay (recorded {:g}, given {:g}) : "
+                         "the recorded head outputs belong to the recorded crop, record again instead".format(
+                         model.track_config.context_amount, track_config.context_amount))
+
+    if tracker is None:
+        from tracker.tracker import Tracker
+        tracker = Tracker(model=model)
+    tracker.track_config = track_config if track_config is not None else model.track_config
+
+    is_track = records['kind'] == KIND_TRACK
+    num_tracks = int(np.sum(is_track))
+    bbox       = np.full((num_tracks, 4), np.nan)
+    best_score = np.full(num_tracks, np.nan, np.float32)
+    scale_z    = np.full(num_tracks, np.nan)
+    center_pos = np.full((num_tracks, 2), np.nan)
+
+    start = time.perf_counter()
+    j = 0
+    for record in records:
+        if record['kind'] == KIND_INIT:
+            tracker._set_state(record['bbox'])
+            continue
+
+        center_pos[j] = tracker.center_pos
+        _, scale_z[j], _ = tracker._search_scale(tracker.size)
+        outputs = tracker._update({'cls': record['cls'][np.newaxis], 'loc': record['loc'][np.newaxis]},
+                                  scale_z[j], tuple(record['boundary']))
+        bbox[j] = outputs['bbox']
+        best_score[j] = outputs['best_score']
+        j += 1
+    elapsed = time.perf_counter() - start
+
+    tracks = records[is_track]
+    bbox_diff = np.max(np.abs(bbox - tracks['bbox']), axis=1) if num_tracks else np.zeros(0)
+    diverged = np.flatnonzero(bbox_diff > tolerance)
+
+    return {
+            'bbox': bbox,
+            'best_score': best_score,
+            'scale_z': scale_z,
+            'summary': {
+                        'frames': num_tracks,
+                        'fps': num_tracks / elapsed if elapsed > 0 else 0.,
+                        'bbox_diff_max': float(bbox_diff.max()) if num_tracks else 0.,
+                        'bbox_diff_mean': float(bbox_diff.mean()) if num_tracks else 0.,
+                        'score_diff_max': float(np.max(np.abs(best_score - tracks['best_score']))) if num_tracks else 0.,
+                        'center_diff_max': float(np.max(np.abs(center_pos - tracks['center_pos']))) if num_tracks else 0.,
+                        'scale_diff_max': float(np.max(np.abs(scale_z - tracks['scale_z']))) if num_tracks else 0.,
+                        'diverged': int(len(diverged)),
+                        'first_diverged': int(diverged[0]) if len(diverged) else None,
+                       },
+           }
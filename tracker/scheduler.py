@@ -0,0 +1,279 @@
+import queue
+import threading
+import time
+import numpy as np
+
+from concurrent.futures import Future
+
+from core.config import config
+
+from utils.profiler import Histogram
+from utils.profiler import profiler
+
+# 여러 Tracker(session)의 요청을 모아서 batch로 추론하는 dynamic batching scheduler
+# Tracker마다 Model.track을 부르면 항상 batch 1로 engine이 돌게 되므로,
+# 요청을 queue에 모았다가 max_batch_size가 차거나 가장 오래된 요청의 deadline이 되면 한번에 처리하고 결과를 나눠줌
+# Model과 같은 interface(get_*_buffer, template, track, track_async, release_buffer)를 가지므로
+# Tracker(model=BatchScheduler(Model(...)))처럼 Model 자리에 그대로 넣으면 됨
+#
+# 실제로 한번에 engine에 들어가는 batch는 engine의 max_batch_size에 따라 나뉨 (Model.track_batch 참고)
+# track_async에 timings를 넘기면 (profiler가 켜져 있을 때) 그 요청의 scheduler.queue(queue 대기), scheduler.batch(batch 처리),
+# batch 추론 중 기록된 infer.* 구간, post 구간을 남김
+
+
+class _Request(object):
+    """ queue에 들어가는 요청 하나 """
+
+    __slots__ = ('kind', 'x', 'zf', 'post', 'timings', 'future', 'arrival', 'deadline')
+
+    def __init__(self, kind, x, zf, post, timings, arrival, deadline):
+        self.kind = kind
+        self.x = x
+        self.zf = zf
+        self.post = post
+        self.timings = timings
+        self.future = Future()
+        self.arrival = arrival
+        self.deadline = deadline
+
+
+class BatchScheduler(object):
+    """ deadline 기반 dynamic batching scheduler\n
+    template(temp backbone), track(exam backbone + head) 요청을 종류별로 모아서 batch로 수행함 """
+
+    def __init__(self, model, max_batch_size=None, deadline_ms=None):
+        """
+        args:
+            model(Model): batch 추론에 사용할 Model
+            max_batch_size(int): 한번에 처리할 최대 요청 수. None이면 config.SCHEDULER_MAX_BATCH_SIZE
+            deadline_ms(float): 요청이 batch를 기다릴 수 있는 최대 시간. None이면 config.SCHEDULER_DEADLINE_MS
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size or config.SCHEDULER_MAX_BATCH_SIZE
+        self.deadline = (config.SCHEDULER_DEADLINE_MS if deadline_ms is None else deadline_ms) / 1000
+
+        # batch 입력 buffer (요청의 crop을 여기에 모아서 engine에 넣음)
+        temp_size = config.TRACK_EXEMPLAR_SIZE
+        exam_size = config.TRACK_INSTANCE_SIZE
+        # crop layout, dtype은 backbone 입력을 따름 (uint8 모델이면 NHWC uint8)
+        self._processors = {
+            'template': model.back_temp_processor,
+            'track':    model.back_exam_processor,
+        }
+        self._inputs = {
+            'template': model.allocate_temp_buffer(self.max_batch_size),
+            'track':    model.allocate_exam_buffer(self.max_batch_size),
+        }
+        self._zfs = np.empty((self.max_batch_size, model.zf_size), dtype=np.float32)
+        self._shapes = {
+            'template': model.back_temp_processor.input_shape(temp_size),
+            'track':    model.back_exam_processor.input_shape(exam_size),
+        }
+
+        # Tracker가 crop을 써넣을 buffer. batch 입력으로 복사한 뒤 바로 반납되며, 모자라면 새로 할당
+        self._free_buffers = { kind: [] for kind in self._shapes }
+        self._used_buffers = []
+        self._buffer_lock = threading.Lock()
+
+        self.reset_stats()
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+        self._thread.start()
+
+
+    def reset_stats(self):
+        """ 통계 초기화 """
+        self.num_requests = { kind: 0 for kind in self._shapes }
+        self.num_batches = { kind: 0 for kind in self._shapes }
+        # batch_sizes[n] : 크기 n으로 처리된 batch 수
+        self.batch_sizes = { kind: [0] * (self.max_batch_size + 1) for kind in self._shapes }
+        # 요청이 queue에서 기다린 시간, batch 하나를 처리한 시간 (초)
+        self.queue_delay = Histogram()
+        self.run_time = Histogram()
+
+
+    def get_stats(self):
+        """
+        return:
+            stats(dict): 종류별 요청 수, batch 수, 평균 batch 크기, batch 크기 분포, queue delay와 batch 처리 시간의 percentile(ms)
+        """
+        stats = {}
+        for kind in self._shapes:
+            batches = self.num_batches[kind]
+            stats[kind] = {
+                'requests': self.num_requests[kind],
+                'batches': batches,
+                'mean_batch_size': self.num_requests[kind] / batches if batches else 0.0,
+                'batch_sizes': { n: count for n, count in enumerate(self.batch_sizes[kind]) if count },
+            }
+        stats['queue_delay'] = self.queue_delay.to_dict()
+        stats['run_time'] = self.run_time.to_dict()
+        return stats
+
+
+    def get_temp_buffer(self):
+        """ template crop을 써넣을 buffer (1 * 3 * 127 * 127). template에 넘기면 반납됨 """
+        return self._get_buffer('template')
+
+
+    def get_exam_buffer(self):
+        """ exampler crop을 써넣을 buffer (1 * 3 * 255 * 255). track, track_async에 넘기면 반납됨 """
+        return self._get_buffer('track')
+
+
+    def release_buffer(self, buf):
+        """ get_*_buffer로 받은 buffer를 반납 (이미 반납됐거나 여기서 준 buffer가 아니면 무시) """
+        with self._buffer_lock:
+            for i, (kind, used) in enumerate(self._used_buffers):
+                if np.may_share_memory(used, buf):
+                    del self._used_buffers[i]
+                    self._free_buffers[kind].append(used)
+                    return
+
+
+    def _get_buffer(self, kind):
+        with self._buffer_lock:
+            free = self._free_buffers[kind]
+            buf = free.pop() if free else np.empty(self._shapes[kind], dtype=self._processors[kind].in_dtype)
+            self._used_buffers.append((kind, buf))
+        return buf
+
+
+    def template(self, z):
+        """
+        args:
+            z(ndarray): 1 * 3 * 127 * 127 crop
+        return:
+            zf(ndarray): template feature (1d array)
+        """
+        return self._submit('template', z, None, None, None).result()
+
+
+    def track(self, x, zf):
+        """
+        args:
+            x(ndarray): 1 * 3 * 255 * 255 crop
+            zf(ndarray): template feature
+        return:
+            {'cls': 1 * 2 * 16 * 16, 'loc': 1 * 4 * 16 * 16}
+        """
+        return self.track_async(x, zf).result()
+
+
+    def track_async(self, x, zf, post=None, timings=None):
+        """ 요청을 queue에 넣고 바로 Future를 반환 (Model.track_async와 같음)
+        args:
+            x(ndarray): 1 * 3 * 255 * 255 crop
+            zf(ndarray): template feature (session마다 다르므로 반드시 넘겨야 함)
+            post(callable): 추론 결과를 받아서 scheduler thread에서 이어서 처리할 함수
+            timings(dict): 주어지면 이 요청의 구간 시간(초)을 여기에도 남김 (scheduler.queue, scheduler.batch, infer.*, post)
+        return:
+            future(concurrent.futures.Future)
+        """
+        if zf is None:
+            raise ValueError("BatchScheduler에는 template feature(zf)를 넘겨야 합니다")
+        return self._submit('track', x, zf, post, timings)
+
+
+    def close(self):
+        """ 남은 요청을 모두 처리하고 scheduler thread를 멈춤 """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+    def _submit(self, kind, x, zf, post, timings):
+        if not self._thread.is_alive():
+            self.release_buffer(x)
+            raise ValueError("scheduler is closed")
+
+        now = time.perf_counter()
+        request = _Request(kind, x, zf, post, timings, now, now + self.deadline)
+        self._queue.put(request)
+        return request.future
+
+
+    def _loop(self):
+        """ scheduler thread : 요청을 모으다가 batch가 차거나 deadline이 되면 처리 """
+        self.model.attach_thread()
+
+        pending = { kind: [] for kind in self._shapes }
+        running = True
+        while running:
+            # 가장 빨리 deadline이 오는 요청까지만 기다림
+            deadlines = [ requests[0].deadline for requests in pending.values() if requests ]
+            timeout = max(0.0, min(deadlines) - time.perf_counter()) if deadlines else None
+
+            try:
+                request = self._queue.get(timeout=timeout)
+                while True:
+                    if request is None:
+                        running = False
+                        break
+                    pending[request.kind].append(request)
+                    if len(pending[request.kind]) >= self.max_batch_size:
+                        break
+                    # 이미 들어와 있는 요청은 기다리지 않고 같이 가져감
+                    request = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            now = time.perf_counter()
+            for kind, requests in pending.items():
+                while requests and (not running or len(requests) >= self.max_batch_size
+                                    or requests[0].deadline <= now):
+                    batch = requests[:self.max_batch_size]
+                    del requests[:self.max_batch_size]
+                    self._run_batch(kind, batch)
+
+
+    def _run_batch(self, kind, batch):
+        """ 요청을 batch 입력 buffer에 모아서 한번에 추론하고, 결과를 요청별로 나눠줌 """
+        size = len(batch)
+        start = time.perf_counter()
+
+        inputs = self._inputs[kind]
+        for i, request in enumerate(batch):
+            self.queue_delay.record(start - request.arrival)
+            x = self._processors[kind].to_input(request.x)
+            np.copyto(inputs[i], np.reshape(x, inputs.shape[1:]), casting='unsafe')
+            self.release_buffer(request.x)
+            if kind == 'track':
+                self._zfs[i] = np.ravel(request.zf)
+
+        # batch 추론 중 기록된 구간은 batch의 모든 요청이 공유
+        batch_timings = {}
+        try:
+            with profiler.collect(batch_timings):
+                if kind == 'template':
+                    zfs = self.model.template_batch(inputs[:size])
+                    results = [ zfs[i] for i in range(size) ]
+                else:
+                    outputs = self.model.track_batch(inputs[:size], self._zfs[:size])
+                    results = [ {'cls': outputs['cls'][i:i + 1], 'loc': outputs['loc'][i:i + 1]}
+                                for i in range(size) ]
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        finally:
+            run_time = time.perf_counter() - start
+            self.num_requests[kind] += size
+            self.num_batches[kind] += 1
+            self.batch_sizes[kind][size] += 1
+            self.run_time.record(run_time)
+
+        # 결과 나눠주기 (post가 있으면 이 thread에서 이어서 수행)
+        for request, result in zip(batch, results):
+            try:
+                if request.timings is not None and profiler.enabled:
+                    request.timings.update(batch_timings)
+                    request.timings['scheduler.queue'] = start - request.arrival
+                    request.timings['scheduler.batch'] = run_time
+                with profiler.collect(request.timings):
+                    if request.post is not None:
+                        result = request.post(result)
+                request.future.set_result(result)
+            except Exception as e:
+                request.future.set_exception(e)
@@ -1,172 +1,289 @@
-import tensorrt as trt
 import numpy as np
 
+from concurrent import futures
+
 from core.config import config
+from core.config import TrackConfig
+from core.process import TrackProcessor
 
 from tracker.model import Model
+from tracker.bank import TemplateBank
 from tracker.base import SiameseTracker
 
-from utils.bbox import corner2center
+from utils.profiler import profiler
 
 #  Tracker에서 추론을 제외한 모든 tracking 로직이 구현됨
 
 class Tracker(SiameseTracker):
-    """ TensorRT 엔진을 활용해, Tracking을 하는 객체 """
+    """ 추론 엔진(TensorRT, ONNX Runtime, Stub)을 활용해, Tracking을 하는 객체 """
 
-    def __init__(self, back_exam_engine_path="", temp_exam_engine_path="", head_engine_path=""):
-        self.score_size = config.TRACK_OUTPUT_SIZE
+    def __init__(self, back_exam_engine_path="", temp_exam_engine_path="", head_engine_path="", backend=None,
+                 pipeline=False, model=None, bank=None, track_config=None, recorder=None):
+        """
+        args:
+            *_engine_path(str): engine 경로. 비어있으면 backend의 기본 경로 사용
+            backend(str): 'trt', 'onnx', 'stub'. None이면 config.ENGINE_BACKEND
+            pipeline(bool): Model을 pipeline 모드로 생성 (track_async 참고)
+            model(Model): 여러 Tracker가 같이 쓸 Model. 주어지면 engine을 새로 만들지 않음
+                          (여러 thread에서 같이 쓰려면 pipeline 모드여야 함)
+            bank(TemplateBank): target ID별 template bank. None이면 Tracker마다 새로 만듦 (init, switch_template 참고)
+            track_config(TrackConfig): 이 Tracker의 penalty, window, lr, context amount. None이면 config 값
+            recorder(OutputRecorder): 주어지면 init, track마다 head 출력과 crop parameter를 기록 (tracker.replay 참고)
+        """
+        self.track_config = track_config if track_config is not None else TrackConfig()
 
-        hanning = np.hanning(self.score_size)
-        window  = np.outer(hanning, hanning)
+        self.recorder = recorder
+        if recorder is not None:
+            recorder.set_track_config(self.track_config)
+
+        self.score_size = config.TRACK_OUTPUT_SIZE
         self.cls_out_channels = 2
-        self.window = window.flatten()
-
-        self.points = self.generate_points(config.POINT_STRIDE, self.score_size)
-        self.model = Model(back_exam_engine_path, temp_exam_engine_path, head_engine_path) # TRT engine 모델 생성
-
-    def generate_points(self, stride, size):
-        ori = - (size // 2) * stride
-        x, y = np.meshgrid([ori + stride * dx for dx in np.arange(0, size)],
-                           [ori + stride * dy for dy in np.arange(0, size)])
-        points = np.zeros((size * size, 2), dtype=np.float32)
-        points[:, 0], points[:, 1] = x.astype(np.float32).flatten(), y.astype(np.float32).flatten()
-
-        return points
-
-    def _convert_bbox(self, delta, point):
-        delta = delta.permute(1, 2, 3, 0).contiguous().view(4, -1)
-        delta = delta.detach().cpu().numpy()
-
-        delta[0, :] = point[:, 0] - delta[0, :] #x1
-        delta[1, :] = point[:, 1] - delta[1, :] #y1
-        delta[2, :] = point[:, 0] + delta[2, :] #x2
-        delta[3, :] = point[:, 1] + delta[3, :] #y2
-        delta[0, :], delta[1, :], delta[2, :], delta[3, :] = corner2center(delta)
-        return delta
-
-    def _convert_score(self, score):
-        if self.cls_out_channels == 1:
-            score = score.permute(1, 2, 3, 0).contiguous().view(-1)
-            score = score.sigmoid().detach().cpu().numpy()
-        else:
-            score = score.permute(1, 2, 3, 0).contiguous().view(self.cls_out_channels, -1).permute(1, 0)
-            score = score.softmax(1).detach()[:, 1].cpu().numpy()
-        return score        
-
-    def _bbox_clip(self, cx, cy, width, height, boundary):
-        cx = max(0, min(cx, boundary[1]))
-        cy = max(0, min(cy, boundary[0]))
-        width = max(10, min(width, boundary[1]))
-        height = max(10, min(height, boundary[0]))
-        return cx, cy, width, height
-
-    def init(self, img, bbox):
+
+        # 후처리 상수(points, window)는 TrackProcessor에서 미리 계산해 둠
+        self.processor = TrackProcessor(self.score_size, config.POINT_STRIDE, self.cls_out_channels)
+        self.window = self.processor.window
+        self.points = self.processor.points
+
+        # engine 모델 생성 (pipeline이면 추론을 worker thread에서 수행, track_async 참고)
+        if model is None:
+            model = Model(back_exam_engine_path, temp_exam_engine_path, head_engine_path, backend, pipeline)
+        self.model = model
+
+        # template feature는 Tracker마다 따로 가짐 (Model을 공유할 수 있으므로)
+        self.zf = None
+
+        # target ID별 template feature, 현재 추적 중인 target ID
+        self.bank = bank if bank is not None else TemplateBank()
+        self.target_id = None
+
+        # track_async로 걸어둔, 아직 state에 반영되지 않았을 수 있는 추론
+        self._pending = None
+
+    def init(self, img, bbox, target_id=None, refresh=False):
         """
         args:
             img(np.ndarray): BGR image
             bbox: Bounding Box => [x, y, w, h]
+            target_id(str or int): target ID. bank에 있으면 template backbone 없이 bank의 zf로 초기화하고,
+                                   없으면 새로 만든 zf를 bank에 넣음
+            refresh(bool): bank에 있어도 zf를 새로 만들어서 덮어씀
         return:
             void
         """
-        # center_pos = [center x of bbox, center y of bbox]
-        self.center_pos = np.array([bbox[0] + (bbox[2]-1) / 2,
-                                    bbox[1] + (bbox[3]-1) / 2])
+        self.wait()
+        self._set_state(bbox)
+        self.target_id = target_id
 
-        # size = [w, h]
-        self.size = np.array([bbox[2], bbox[3]])
-
-        # z crop size 계산
-        w_z = self.size[0] + config.TRACK_CONTEXT_AMOUNT * np.sum(self.size)
-        h_z = self.size[1] + config.TRACK_CONTEXT_AMOUNT * np.sum(self.size)
-        s_z = round(np.sqrt(w_z * h_z))
+        if self.recorder is not None:
+            self.recorder.record_init(bbox, img.shape[:2])
 
         # img channel average
         self.channel_average = np.mean(img, axis=(0, 1))
 
+        # 다시 나타난 target : crop, backbone 없이 bank의 zf 사용
+        if target_id is not None and not refresh:
+            entry = self.bank.get(target_id)
+            if entry is not None:
+                self.zf = entry.zf
+                return
+
+        # z crop size 계산
+        s_z, _, _ = self._search_scale(self.size)
+
         # get z crop
-        z_crop = self.get_subwindow(img, self.center_pos,
-                                    config.TRACK_EXEMPLAR_SIZE,
-                                    s_z, self.channel_average)
+        z_crop = self._crop(img, config.TRACK_EXEMPLAR_SIZE, s_z, self.model.get_temp_buffer)
 
         # forward only backbone
-        self.model.template(z_crop)
+        self.zf = self.model.template(z_crop)
 
-    def track(self, img):
-        """
+        if target_id is not None:
+            self.bank.put(target_id, self.zf, bbox, self.channel_average)
+
+    def init_from_bank(self, target_id, bbox=None, img=None):
+        """ frame 없이도 bank에 있는 target으로 재초기화 (crop, backbone 호출 없음)
         args:
-            img(np.ndarray): BGR image
+            target_id(str or int): target ID
+            bbox: 새 위치 [x, y, w, h]. None이면 template을 만들 때의 bbox
+            img(np.ndarray): 주어지면 이 frame의 channel 평균을 padding 값으로 사용, 없으면 저장된 값
         return:
-            bbox(list): [x, y, width, height]
+            void
         """
-        w_z = self.size[0] + config.TRACK_CONTEXT_AMOUNT * np.sum(self.size)
-        h_z = self.size[1] + config.TRACK_CONTEXT_AMOUNT * np.sum(self.size)
-        s_z = round(np.sqrt(w_z * h_z))
-        scale_z = config.TRACK_EXEMPLAR_SIZE / s_z
-        s_x = s_z * (config.TRACK_INSTANCE_SIZE / config.TRACK_EXEMPLAR_SIZE)
-
-        # get x crop 
-        x_crop = self.get_subwindow(img, self.center_pos,
-                                    config.TRACK_INSTANCE_SIZE,
-                                    round(s_x), self.channel_average)
+        entry = self.bank.get(target_id)
+        if entry is None:
+            raise KeyError("target {} is not in the template bank".format(target_id))
+
+        self.wait()
+        bbox = entry.bbox if bbox is None else bbox
+        self._set_state(bbox)
+        self.channel_average = entry.channel_average if img is None else np.mean(img, axis=(0, 1))
+
+        if self.recorder is not None:
+            self.recorder.record_init(bbox, (0, 0) if img is None else img.shape[:2])
+        self.zf = entry.zf
+        self.target_id = target_id
+
+    def switch_template(self, target_id):
+        """ 현재 위치(state)는 그대로 두고 template만 bank의 target으로 바꿈
+        args:
+            target_id(str or int): target ID
+        """
+        entry = self.bank.get(target_id)
+        if entry is None:
+            raise KeyError("target {} is not in the template bank".format(target_id))
 
-        # forward all (backbone, head)
-        outputs = self.model.track(x_crop)
+        self.wait()
+        self.zf = entry.zf
+        self.target_id = target_id
 
-        score = self._convert_score(outputs['cls'])
-        bbox  = self._convert_bbox(outputs['loc'], self.points)
+    def _set_state(self, bbox):
+        """ bbox로 state(center_pos, size)를 정함 """
+        # center_pos = [center x of bbox, center y of bbox]
+        self.center_pos = np.array([bbox[0] + (bbox[2]-1) / 2,
+                                    bbox[1] + (bbox[3]-1) / 2])
 
+        # size = [w, h]
+        self.size = np.array([bbox[2], bbox[3]])
 
-        def change(r):
-            return np.maximum(r, 1. / r)
+    def track(self, img):
+        """
+        args:
+            img(np.ndarray): BGR image
+        return:
+            bbox(list): [x, y, width, height]
+        """
+        self.wait()
 
-        def sz(w, h):
-            pad = (w + h) * 0.5
-            return np.sqrt((w + pad) * (h + pad))
+        s_z, scale_z, s_x = self._search_scale(self.size)
 
-        # scale penalty
-        s_c = change(sz(bbox[2, :], bbox[3, :]) /
-                    (sz(self.size[0]*scale_z, self.size[1]*scale_z)))
+        # get x crop 
+        x_crop = self._crop(img, config.TRACK_INSTANCE_SIZE, round(s_x), self.model.get_exam_buffer)
+
+        # forward all (backbone, head) + update state
+        # pipeline 모드면 cls, loc는 engine 출력 buffer의 view이고 Model을 같이 쓰는 다른 thread의 다음 추론이 덮어쓰므로,
+        # 후처리도 track_async처럼 worker thread에서 (다음 추론 전에) 수행
+        boundary = img.shape[:2]
+        return self.model.track_async(x_crop, self.zf,
+                                      post=lambda outputs: self._update(outputs, scale_z, boundary)).result()
+
+    def track_async(self, img, post=None):
+        """ crop까지만 하고 추론, 후처리는 model의 worker thread에 걸어둔 뒤 바로 반환\n
+        다음 frame의 crop은 이번 결과(state)가 있어야 하므로, 다음 track/track_async/init은 이 추론이 끝날 때까지 기다림\n
+        그 사이 호출하는 쪽에서 이전 frame 그리기, 저장, 다음 frame decode 등을 하면 추론과 겹쳐서 수행됨\n
+        Model이 pipeline 모드가 아니면 그 자리에서 끝까지 수행하고 완료된 Future를 반환
+        args:
+            img(np.ndarray): BGR image
+            post(callable): 후처리 결과(dict)를 받아서 worker thread에서 이어서 처리할 함수 (AdaptiveTracker의 motion 갱신)
+        return:
+            future(concurrent.futures.Future): 결과는 track과 같음 {'bbox', 'best_score'}
 
-        # aspect ratio penalty
-        r_c = change((self.size[0] / self.size[1]) /
-                     (bbox[2, :] / bbox[3, :]))
+                future.timings : 이 frame의 구간 시간 {이름: 초} (crop, infer.*, post, profiler가 켜져 있을 때만, 완료 후 유효)
+        """
+        self.wait()
 
-        penalty = np.exp(-(r_c * s_c - 1) * config.TRACK_PENALTY_K)
+        s_z, scale_z, s_x = self._search_scale(self.size)
 
-        # score
-        pscore = penalty * score
+        # get x crop (pipeline이면 추론 중이 아닌 buffer 벌에 씀)
+        timings = {}
+        with profiler.collect(timings):
+            x_crop = self._crop(img, config.TRACK_INSTANCE_SIZE, round(s_x), self.model.get_exam_buffer)
 
-        # window penalty
-        pscore = pscore * (1 - config.TRACK_WINDOW_INFLUENCE) + \
-            self.window * config.TRACK_WINDOW_INFLUENCE
+        boundary = img.shape[:2]
+        def update(outputs):
+            outputs = self._update(outputs, scale_z, boundary)
+            return post(outputs) if post is not None else outputs
 
-        best_idx = np.argmax(pscore)
+        self._pending = self.model.track_async(x_crop, self.zf, post=update, timings=timings)
+        self._pending.timings = timings
+        return self._pending
 
-        bbox = bbox[:, best_idx] / scale_z
+    def wait(self):
+        """ track_async로 걸어둔 추론이 있으면 끝날 때까지 (state가 갱신될 때까지) 기다림\n
+        추론 중 난 예외는 track_async가 반환한 Future에서 받음 """
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            futures.wait([pending])
 
-        lr = penalty[best_idx] * score[best_idx] * config.TRACK_LR
-        cx = bbox[0] + self.center_pos[0]
-        cy = bbox[1] + self.center_pos[1]
+    def _update(self, outputs, scale_z, boundary):
+        """ head 출력으로 state를 갱신하고 결과를 반환
+        args:
+            outputs(dict): {'cls': 1 * 2 * 16 * 16, 'loc': 1 * 4 * 16 * 16}
+            scale_z(float): 원본 -> exemplar 비율
+            boundary(tuple): img.shape[:2]
+        return:
+            {'bbox': [x, y, width, height], 'best_score': score}
+        """
+        center_pos, size, bbox, best_score = self._postprocess(outputs, self.center_pos[np.newaxis],
+                                                               self.size[np.newaxis], [scale_z],
+                                                               boundary)
+        result = {
+                  'bbox': list(bbox[0]),
+                  'best_score': best_score[0]
+                 }
 
-        # smooth bbox
-        width  = self.size[0] * (1 - lr) + bbox[2] * lr
-        height = self.size[1] * (1 - lr) + bbox[3] * lr
+        if self.recorder is not None:
+            self.recorder.record_track(self.center_pos, self.size, scale_z, boundary, outputs, result)
 
-        # clip boundary
-        cx, cy, width, height = self._bbox_clip(cx, cy, width, height, img.shape[:2])
+        self.center_pos = center_pos[0]
+        self.size       = size[0]
 
-        # update state
-        self.center_pos = np.array([cx, cy])
-        self.size       = np.array([width, height])
+        return result
 
-        bbox = [cx - width / 2,
-                cy - height / 2,
-                width,
-                height]
+    def _crop(self, img, model_sz, original_sz, get_buffer):
+        """ 현재 state 기준으로 crop (config.TRACK_FUSED_CROP이면 engine 입력 buffer에 바로 씀)
+        args:
+            img(np.ndarray): BGR image
+            model_sz(int): crop 결과 크기
+            original_sz(int): 원본에서 잘라낼 크기
+            get_buffer(callable): engine 입력 buffer를 반환하는 함수
+        return:
+            crop(np.ndarray): 1 * 3 * model_sz * model_sz
+        """
+        with profiler.span('crop'):
+            if config.TRACK_FUSED_CROP:
+                buf = get_buffer()
+                try:
+                    return self.get_subwindow_into(img, self.center_pos, model_sz, original_sz,
+                                                   self.channel_average, buf)
+                except Exception:
+                    # pipeline buffer면 추론에 넘어가지 않으므로 여기서 반납
+                    self.model.release_buffer(buf)
+                    raise
+            return self.get_subwindow(img, self.center_pos, model_sz, original_sz,
+                                      self.channel_average)
+
+    def _search_scale(self, size):
+        """ target 크기로부터 crop 크기를 계산
+        args:
+            size(np.ndarray): [w, h]
+        return:
+            s_z(float): z crop 크기
+            scale_z(float): 원본 -> exemplar 비율
+            s_x(float): x crop 크기
+        """
+        context_amount = self.track_config.context_amount
+        w_z = size[0] + context_amount * np.sum(size)
+        h_z = size[1] + context_amount * np.sum(size)
+        s_z = round(np.sqrt(w_z * h_z))
+        scale_z = config.TRACK_EXEMPLAR_SIZE / s_z
+        s_x = s_z * (config.TRACK_INSTANCE_SIZE / config.TRACK_EXEMPLAR_SIZE)
 
-        best_score = score[best_idx]
+        return s_z, scale_z, s_x
 
-        return {
-                'bbox': bbox,
-                'best_score': best_score
-               }
\ No newline at end of file
+    def _postprocess(self, outputs, center_pos, size, scale_z, boundary):
+        """ head 출력(cls, loc)에 penalty를 적용해서 다음 state를 계산 (batch 단위)
+        args:
+            outputs(dict): {'cls': batch * 2 * 16 * 16, 'loc': batch * 4 * 16 * 16}
+            center_pos, size(np.ndarray): batch * 2, 현재 state
+            scale_z(list): batch, 원본 -> exemplar 비율
+            boundary(tuple): img.shape[:2]
+        return:
+            center_pos(batch * 2), size(batch * 2), bbox(batch * 4, [x, y, w, h]), best_score(batch)
+        """
+        with profiler.span('post'):
+            score = self.processor.convert_score(outputs['cls'])
+            bbox  = self.processor.convert_bbox(outputs['loc'])
+
+            return self.processor.select(score, bbox, center_pos, size, scale_z, boundary,
+                                         self.track_config.penalty_k,
+                                         self.track_config.window_influence,
+                                         self.track_config.lr)
@@ -0,0 +1,163 @@
+import queue
+import threading
+import time
+
+import cv2
+
+from utils.result_log import ResultLog
+
+# 추적 thread에서 그리기, video encoding, 결과 기록을 떼어내기 위한 output stage
+# 추적 쪽은 frame과 결과를 bounded queue에 넣기만 하고, background thread가 overlay를 그리고
+# cv2.VideoWriter로 저장하고 ResultLog에 기록함
+# 밀려있는 frame이 queue_size개면 drop=False일 땐 추적 쪽이 기다리고(lossless),
+# True면 그 frame은 저장하지 않음 (결과는 frame 없이 순서대로 넘겨서 log에는 항상 기록)
+
+_END = object() # stream 끝을 알리는 sentinel
+
+
+class OutputStage(object):
+    """ overlay 그리기 + video 저장 + 결과 log를 background thread에서 수행 """
+
+    def __init__(self, video_path=None, fps=30, result_path=None, stages=(),
+                 queue_size=8, drop=False, draw=True, fourcc='mp4v'):
+        """
+        args:
+            video_path(str): 저장할 video 경로. None이면 video는 저장하지 않음
+            fps(float): 저장할 video fps
+            result_path(str): frame별 결과 log(ResultLog) 경로. None이면 기록하지 않음
+            stages(list): 결과 log에 기록할 timing 이름
+            queue_size(int): 밀려있을 수 있는 최대 frame 수
+            drop(bool): queue가 찼을 때 frame을 버릴지 (결과 log에는 그대로 기록)
+            draw(bool): bbox, score, FPS overlay를 그릴지
+            fourcc(str): video codec
+        """
+        self.video_path = video_path
+        self.fps = fps
+        self.fourcc = fourcc
+        self.draw = draw
+        self.drop = drop
+
+        self.writer = None
+        self.log = ResultLog(result_path, stages) if result_path else None
+
+        # queue 자체는 크기 제한이 없고, 밀려있는 frame(image) 수를 queue_size로 제한함
+        self.queue = queue.Queue()
+        self.queue_size = queue_size
+        self.pending_frames = 0
+        self.lock = threading.Condition()
+        self.written = 0
+        self.dropped = 0
+        self.write_time = 0.0
+        self.error = None
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, frame, frame_idx, outputs=None, timings=None, timer=None):
+        """ frame과 결과를 output thread에 넘김 (frame은 넘긴 뒤 수정하면 안 됨)
+        args:
+            frame(np.ndarray): BGR image, overlay는 이 frame 위에 그려짐
+            frame_idx(int): frame 번호
+            outputs(dict): tracker 결과 {'bbox', 'best_score', ('skipped')}, 없으면 (init frame 등) 그리지 않음
+            timings(dict): {stage 이름: ms}
+            timer(int): frame을 받은 시점의 cv2.getTickCount() (FPS 표시용)
+        """
+        if self.error is not None:
+            raise self.error
+
+        with self.lock:
+            if self.drop and self.pending_frames >= self.queue_size:
+                # frame은 버리지만 결과는 기록
+                self.dropped += 1
+                frame = None
+            else:
+                while self.pending_frames >= self.queue_size and self.error is None:
+                    self.lock.wait()
+                if self.error is not None:
+                    raise self.error
+                self.pending_frames += 1
+
+        self.queue.put((frame, frame_idx, outputs, timings, timer))
+
+    def close(self):
+        """ 남은 frame을 모두 쓰고 종료 """
+        if self.thread.is_alive():
+            self.queue.put(_END)
+            self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                    'written': self.written,
+                    'dropped': self.dropped,
+                    'write_ms_mean': self.write_time / self.written * 1000 if self.written else 0.0,
+                    'queue_depth': self.pending_frames,
+                   }
+
+    def _run(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _END:
+                    break
+                self._write(*item)
+        except Exception as e:
+            # submit이 기다리지 않도록 깨움 (다음 submit에서 예외가 전달됨)
+            with self.lock:
+                self.error = e
+                self.lock.notify_all()
+        finally:
+            if self.writer is not None:
+                self.writer.release()
+            if self.log is not None:
+                self.log.close()
+
+    def _write(self, frame, frame_idx, outputs, timings, timer):
+        start = time.perf_counter()
+
+        if self.log is not None and outputs is not None:
+            self.log.append(frame_idx, outputs['bbox'], outputs['best_score'], timings,
+                            outputs.get('skipped', False))
+
+        if frame is None:
+            return
+
+        try:
+            self._write_frame(frame, outputs, timer)
+        finally:
+            with self.lock:
+                self.pending_frames -= 1
+                self.written += 1
+                self.write_time += time.perf_counter() - start
+                self.lock.notify()
+
+    def _write_frame(self, frame, outputs, timer):
+        if self.draw and outputs is not None:
+            self._draw(frame, outputs, timer)
+
+        if self.video_path:
+            if self.writer is None:
+                height, width = frame.shape[:2]
+                self.writer = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                              self.fps, (width, height))
+            self.writer.write(frame)
+
+    def _draw(self, frame, outputs, timer):
+        """ 추적 결과, score, FPS를 frame에 그림 (추론을 건너뛴 frame은 노란색) """
+        bbox = list(map(int, outputs['bbox']))
+        color = (0, 255, 255) if outputs.get('skipped') else (0, 255, 0)
+        cv2.rectangle(frame, (bbox[0], bbox[1]), (bbox[0] + bbox[2], bbox[1] + bbox[3]), color, 3)
+        cv2.putText(frame, "score : {:.2f}".format(outputs['best_score']), (100, 80),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.75, color, 2)
+
+        if timer is not None:
+            fps = cv2.getTickFrequency() / max(cv2.getTickCount() - timer, 1)
+            cv2.putText(frame, "FPS : " + str(int(fps)), (100, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.75, (255, 0, 0), 2)
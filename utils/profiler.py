@@ -0,0 +1,240 @@
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+
+# 구간(span)별 latency를 고정 크기 histogram에 기록하는 profiler
+# 꺼져 있을 때는 span()이 아무것도 하지 않는 객체를 돌려주므로 비용이 거의 없음
+# 사용법 :
+#   from utils.profiler import profiler
+#   with profiler.span('crop'):
+#       ...
+#   profiler.to_json(), profiler.to_prometheus()
+# frame 하나의 구간 시간은 profiler.collect(timings)로 그 thread에서 기록된 값만 따로 모음 (다른 frame, thread와 섞이지 않음)
+
+
+class Histogram(object):
+    """ 고정 메모리 log-scale histogram (1us ~ 100s, octave당 4 bucket)\n
+    값을 모두 저장하지 않고 bucket count만 저장하므로, 오래 돌려도 메모리가 늘지 않음 """
+
+    MIN_VALUE  = 1e-6
+    PER_OCTAVE = 4
+    NUM_BUCKETS = int(math.log2(100 / MIN_VALUE) * PER_OCTAVE) + 2
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * self.NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        # 마지막으로 기록된 값 (frame별 결과 기록용)
+        self.last = float('nan')
+
+    @classmethod
+    def bucket_bound(cls, index):
+        """ index번째 bucket의 상한 (초) """
+        return cls.MIN_VALUE * 2 ** (index / cls.PER_OCTAVE)
+
+    def record(self, value):
+        """
+        args:
+            value(float): 초 단위 시간
+        """
+        if value <= self.MIN_VALUE:
+            index = 0
+        else:
+            index = min(int(math.ceil(math.log2(value / self.MIN_VALUE) * self.PER_OCTAVE)), self.NUM_BUCKETS - 1)
+
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            self.last = value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, q):
+        """ q(0~100) 분위수, bucket 상한으로 근사 (최대값을 넘지 않음) """
+        if self.count == 0:
+            return 0.0
+
+        target = q / 100 * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target and count:
+                return min(self.bucket_bound(index), self.max)
+        return self.max
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                    'count': self.count,
+                    'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+                    'p50_ms': self.percentile(50) * 1000,
+                    'p95_ms': self.percentile(95) * 1000,
+                    'p99_ms': self.percentile(99) * 1000,
+                    'max_ms': self.max * 1000,
+                   }
+
+
+class _Span(object):
+    """ with 문으로 구간 시간을 재서 histogram에 기록 (collect 중이면 그 dict에도) """
+    __slots__ = ('histogram', 'name', 'timings', 'start')
+
+    def __init__(self, histogram, name, timings):
+        self.histogram = histogram
+        self.name = name
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        seconds = time.perf_counter() - self.start
+        self.histogram.record(seconds)
+        if self.timings is not None:
+            self.timings[self.name] = seconds
+
+
+class _NullSpan(object):
+    """ profiler가 꺼져 있을 때 쓰는, 아무것도 안 하는 span """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler(object):
+    """ 이름별 histogram 모음. 실행 중에 enable/disable 가능 """
+
+    def __init__(self, enabled=False, prefix='nanotrack'):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.histograms = {}
+        self.lock = threading.Lock()
+        # thread별 collect 대상 dict
+        self._local = threading.local()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            for histogram in self.histograms.values():
+                histogram.reset()
+
+    def _histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return histogram
+
+    def span(self, name):
+        """ with profiler.span('crop'): 형태로 구간 시간 기록 """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self._histogram(name), name, getattr(self._local, 'timings', None))
+
+    def record(self, name, seconds):
+        """ 이미 잰 시간(초)을 기록 (GPU event 시간 등) """
+        if self.enabled:
+            self._histogram(name).record(seconds)
+            timings = getattr(self._local, 'timings', None)
+            if timings is not None:
+                timings[name] = seconds
+
+    @contextlib.contextmanager
+    def collect(self, timings):
+        """ with 안에서 이 thread가 기록한 구간 시간(초)을 timings에도 {이름: 초}로 남김 (frame별 기록용)\n
+        다른 thread(pipeline worker)에서 기록되는 구간은 그 thread에서 같은 dict로 collect해야 함 """
+        previous = getattr(self._local, 'timings', None)
+        self._local.timings = timings
+        try:
+            yield timings
+        finally:
+            self._local.timings = previous
+
+    def last(self, name):
+        """ name 구간에 마지막으로 기록된 시간(초), 기록이 없으면 NaN """
+        histogram = self.histograms.get(name)
+        return histogram.last if histogram is not None else float('nan')
+
+    def to_json(self):
+        """ {span 이름: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}} """
+        return { name: self.histograms[name].to_dict() for name in sorted(self.histograms) }
+
+    def to_prometheus(self):
+        """ Prometheus text exposition format
+        {prefix}_span_seconds : histogram (bucket, sum, count)
+        {prefix}_span_quantile_seconds : p50, p95, p99 gauge
+        {prefix}_span_max_seconds : max gauge
+        """
+        metric = self.prefix + '_span_seconds'
+        lines = ['# HELP {} Latency of instrumented spans.'.format(metric),
+                 '# TYPE {} histogram'.format(metric)]
+        quantiles = []
+        maxes = []
+
+        for name in sorted(self.histograms):
+            histogram = self.histograms[name]
+            with histogram.lock:
+                counts = list(histogram.counts)
+                count, total, maximum = histogram.count, histogram.total, histogram.max
+                p = [ (q, histogram.percentile(q * 100)) for q in (0.5, 0.95, 0.99) ]
+
+            cumulative = 0
+            for index, bucket_count in enumerate(counts):
+                cumulative += bucket_count
+                # 빈 bucket은 생략 (누적값이므로 생략해도 정보 손실 없음)
+                if bucket_count:
+                    lines.append('{}_bucket{{span="{}",le="{:.9g}"}} {}'.format(
+                                 metric, name, Histogram.bucket_bound(index), cumulative))
+            lines.append('{}_bucket{{span="{}",le="+Inf"}} {}'.format(metric, name, count))
+            lines.append('{}_sum{{span="{}"}} {:.9g}'.format(metric, name, total))
+            lines.append('{}_count{{span="{}"}} {}'.format(metric, name, count))
+
+            quantiles += [ '{}_span_quantile_seconds{{span="{}",quantile="{}"}} {:.9g}'.format(self.prefix, name, q, v)
+                           for q, v in p ]
+            maxes.append('{}_span_max_seconds{{span="{}"}} {:.9g}'.format(self.prefix, name, maximum))
+
+        lines += ['# TYPE {}_span_quantile_seconds gauge'.format(self.prefix)] + quantiles
+        lines += ['# TYPE {}_span_max_seconds gauge'.format(self.prefix)] + maxes
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        """ 확장자에 따라 json(.json) 혹은 prometheus text(.prom 등)로 저장 """
+        text = json.dumps(self.to_json(), indent=2) if path.endswith('.json') else self.to_prometheus()
+
+        # node_exporter textfile collector가 쓰다 만 파일을 읽지 않도록 rename으로 교체
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def summary(self):
+        """ 사람이 보기 위한 표 """
+        lines = ['{:<24} {:>8} {:>9} {:>9} {:>9} {:>9}'.format('span', 'count', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms')]
+        for name, stats in self.to_json().items():
+            lines.append('{:<24} {:>8} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f}'.format(
+                         name, stats['count'], stats['p50_ms'], stats['p95_ms'], stats['p99_ms'], stats['max_ms']))
+        return '\n'.join(lines)
+
+
+# process 전역 profiler, 환경변수 NANOTRACK_PROFILE=1 이면 켜진 상태로 시작
+profiler = Profiler(enabled=os.environ.get('NANOTRACK_PROFILE', '0') == '1')
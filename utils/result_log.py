@@ -0,0 +1,143 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+# frame별 추적 결과를 고정 크기 binary record로 이어 쓰는 log
+# 파일 구조 : MAGIC(4 byte) + header 길이(uint32) + header(json) + record * N
+#   header : {'version', 'stages': timing 이름 목록, 'dtype': record의 numpy dtype}
+#   record : frame(int64), bbox(float32 * 4), best_score(float32), skipped(bool), timings(float32 * stage 수, ms)
+# record는 메모리에 모았다가 batch 단위로 한번에 씀. 중간에 죽어도 마지막 불완전한 record만 버리면 읽을 수 있음
+# 사용법 :
+#   with ResultLog('results.ntlog', stages=['track', 'latency']) as log:
+#       log.append(frame_idx, bbox, best_score, timings={'track': 3.1})
+#   columns = ResultLog.read('results.ntlog')   # {'frame': N, 'bbox': N * 4, ..., 'timings': {'track': N}}
+
+MAGIC = b'NTRL'
+LOG_VERSION = 1
+_HEADER_LEN = struct.Struct('<I')
+
+
+def _record_dtype(stages):
+    return np.dtype([('frame', '<i8'),
+                     ('bbox', '<f4', (4,)),
+                     ('best_score', '<f4'),
+                     ('skipped', '?'),
+                     ('timings', '<f4', (len(stages),))])
+
+
+class ResultLog(object):
+    """ frame별 결과를 batch 단위로 flush하는 binary log """
+
+    def __init__(self, path, stages=(), flush_every=256):
+        """
+        args:
+            path(str): log 파일 경로 (있으면 덮어씀)
+            stages(list): 기록할 timing 이름 (e.g. ['crop', 'infer', 'post'])
+            flush_every(int): 몇 record마다 파일에 쓸지
+        """
+        self.path = path
+        self.stages = list(stages)
+        self.dtype = _record_dtype(self.stages)
+        self._stage_index = { name: i for i, name in enumerate(self.stages) }
+
+        self._buffer = np.zeros(flush_every, dtype=self.dtype)
+        self._size = 0
+        self.num_records = 0
+
+        header = json.dumps({'version': LOG_VERSION,
+                             'stages': self.stages,
+                             'dtype': self.dtype.descr}).encode('utf-8')
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC + _HEADER_LEN.pack(len(header)) + header)
+
+    def append(self, frame, bbox, best_score, timings=None, skipped=False):
+        """ record 하나 추가 (buffer가 차면 파일에 씀)
+        args:
+            frame(int): frame 번호
+            bbox(list): [x, y, w, h]
+            best_score(float)
+            timings(dict): {stage 이름: ms}, 없는 stage는 NaN
+            skipped(bool): 추론을 건너뛴 frame인지 (AdaptiveTracker)
+        """
+        record = self._buffer[self._size]
+        record['frame'] = frame
+        record['bbox'] = bbox
+        record['best_score'] = best_score
+        record['skipped'] = skipped
+
+        values = record['timings']
+        values[:] = np.nan
+        if timings:
+            for name, value in timings.items():
+                index = self._stage_index.get(name)
+                if index is not None:
+                    values[index] = value
+
+        self._size += 1
+        self.num_records += 1
+        if self._size == len(self._buffer):
+            self.flush()
+
+    def flush(self):
+        """ 모아둔 record를 파일에 씀 """
+        if self._size:
+            self._buffer[:self._size].tofile(self._file)
+            self._size = 0
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def read(path, mmap=True):
+        """ log를 column별 array로 읽음
+        args:
+            path(str): log 파일 경로
+            mmap(bool): True면 memmap으로 읽음 (큰 log도 바로 열림)
+        return:
+            columns(dict): {'frame', 'bbox', 'best_score', 'skipped', 'timings': {stage: array}, 'stages'}
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError('Result log {} is not found'.format(path))
+
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("not a result log : {}".format(path))
+            header_len, = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+            header = json.loads(f.read(header_len))
+
+        if header['version'] != LOG_VERSION:
+            raise ValueError("unsupported result log version : {}".format(header['version']))
+
+        # json에서 shape가 list로 바뀌므로 tuple로 되돌림
+        dtype = np.dtype([ (field[0], field[1], tuple(field[2])) if len(field) == 3 else tuple(field)
+                           for field in header['dtype'] ])
+        offset = len(MAGIC) + _HEADER_LEN.size + header_len
+        # 마지막 불완전한 record는 버림
+        count = (os.path.getsize(path) - offset) // dtype.itemsize
+
+        if count == 0:
+            records = np.zeros(0, dtype=dtype)
+        elif mmap:
+            records = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+        else:
+            records = np.fromfile(path, dtype=dtype, count=count, offset=offset)
+
+        return {
+                'stages': header['stages'],
+                'frame': records['frame'],
+                'bbox': records['bbox'],
+                'best_score': records['best_score'],
+                'skipped': records['skipped'],
+                'timings': { name: records['timings'][:, i] for i, name in enumerate(header['stages']) },
+               }
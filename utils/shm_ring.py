@@ -0,0 +1,220 @@
+import time
+
+import numpy as np
+
+from multiprocessing import shared_memory
+
+# process 사이에 frame을 pickle 없이 넘기기 위한 shared memory ring buffer (producer 1, consumer 1)
+# slot마다 최대 크기(height * width * 3, uint8) frame 하나를 담고, slot 상태(metadata)도 같은 shared memory에 둠
+# metadata 변경만 process 공유 Condition으로 보호하고, frame 복사는 lock 밖에서 함
+#   producer : 비어있는 slot에 frame을 쓰고 READY로 표시 (latest-only면 밀린 frame을 덮어쓰고, lossless면 자리가 날 때까지 기다림)
+#   consumer : READY slot을 HELD로 가져가서 view로 그대로 사용 (복사 없음), 다 쓰면 release
+# 사용법 :
+#   ring = FrameRing.create(slots=4, max_shape=(1080, 1920, 3), cond=ctx.Condition())
+#   (producer process) ring = FrameRing.attach(spec); ring.write(frame)
+#   (consumer process) ring = FrameRing.attach(spec); frame, info = ring.acquire(); ...; ring.release()
+
+# slot 상태
+FREE    = 0
+WRITING = 1
+READY   = 2
+HELD    = 3
+
+# header (int64) : 쓴 frame 수, 덮어써서 버린 frame 수, 읽은 frame 수, producer 종료 여부, 마지막으로 쓴 시각(us)
+_H_WRITTEN, _H_DROPPED, _H_READ, _H_CLOSED, _H_LAST_WRITE = range(5)
+_HEADER_SIZE = 8
+# slot별 metadata (int64) : 상태, seq, 시각(us), height, width
+_M_STATE, _M_SEQ, _M_TIME, _M_HEIGHT, _M_WIDTH = range(5)
+_META_SIZE = 5
+
+
+class FrameRing(object):
+    """ shared memory frame ring buffer\n
+    create로 만든 쪽(부모 process)이 unlink하고, 다른 process는 spec으로 attach함 """
+
+    def __init__(self, shm, slots, max_shape, cond, drop_oldest, owner):
+        self.shm = shm
+        self.slots = slots
+        self.max_shape = tuple(max_shape)
+        self.cond = cond
+        self.drop_oldest = drop_oldest
+        self.owner = owner
+
+        slot_size = int(np.prod(self.max_shape))
+        offset = 0
+        self.header = np.ndarray(_HEADER_SIZE, np.int64, shm.buf, offset)
+        offset += self.header.nbytes
+        self.meta = np.ndarray((slots, _META_SIZE), np.int64, shm.buf, offset)
+        offset += self.meta.nbytes
+        self.data = np.ndarray((slots, slot_size), np.uint8, shm.buf, offset)
+
+        # 이 process에서 가지고 있는 slot (consumer)
+        self._held = None
+
+    @classmethod
+    def create(cls, slots, max_shape, cond, drop_oldest=True):
+        """ 새 ring을 만듦
+        args:
+            slots(int): slot 수 (2 이상)
+            max_shape(tuple): frame 최대 shape (height, width, 3)
+            cond(multiprocessing.Condition): process 공유 Condition (multiprocessing context에서 생성)
+            drop_oldest(bool): True면 slot이 모자랄 때 가장 오래된 READY frame을 덮어씀 (live),
+                               False면 자리가 날 때까지 producer가 기다림 (lossless)
+        """
+        if slots < 2:
+            raise ValueError("ring needs at least 2 slots : {}".format(slots))
+        size = (_HEADER_SIZE + slots * _META_SIZE) * 8 + slots * int(np.prod(max_shape))
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        ring = cls(shm, slots, max_shape, cond, drop_oldest, owner=True)
+        ring.header[:] = 0
+        ring.meta[:] = 0
+        return ring
+
+    @property
+    def spec(self):
+        """ 다른 process에서 attach할 때 넘길 정보 (pickle 가능) """
+        return {'name': self.shm.name, 'slots': self.slots, 'max_shape': self.max_shape,
+                'cond': self.cond, 'drop_oldest': self.drop_oldest}
+
+    @classmethod
+    def attach(cls, spec):
+        shm = shared_memory.SharedMemory(name=spec['name'])
+        return cls(shm, spec['slots'], spec['max_shape'], spec['cond'], spec['drop_oldest'], owner=False)
+
+    def write(self, frame, timeout=None):
+        """ frame을 slot에 복사해서 넘김 (producer)
+        args:
+            frame(np.ndarray): uint8 (height, width, 3), max_shape 이하
+            timeout(float): lossless일 때 자리가 날 때까지 기다릴 최대 시간(초), None이면 계속
+        return:
+            seq(int): frame 번호, 기다리다 timeout이면 None
+        """
+        height, width = frame.shape[:2]
+        if frame.dtype != np.uint8 or frame.ndim != 3 or frame.shape[2] != self.max_shape[2] or \
+           height > self.max_shape[0] or width > self.max_shape[1]:
+            raise ValueError("frame {} {} does not fit the ring slot {}".format(frame.shape, frame.dtype,
+                                                                              self.max_shape))
+
+        with self.cond:
+            slot = self._free_slot(timeout)
+            if slot is None:
+                return None
+            seq = int(self.header[_H_WRITTEN])
+            self.header[_H_WRITTEN] += 1
+            self.meta[slot, _M_STATE] = WRITING
+
+        # 복사는 lock 밖에서 (이 slot은 WRITING이라 consumer가 가져가지 않음)
+        size = frame.size
+        np.copyto(self.data[slot, :size].reshape(frame.shape), frame)
+
+        with self.cond:
+            now = int(time.time() * 1e6)
+            self.meta[slot] = (READY, seq, now, height, width)
+            self.header[_H_LAST_WRITE] = now
+            self.cond.notify_all()
+        return seq
+
+    def _free_slot(self, timeout):
+        """ 쓸 slot을 고름 (lock 안에서 호출) """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            states = self.meta[:, _M_STATE]
+            free = np.flatnonzero(states == FREE)
+            if len(free):
+                return int(free[0])
+
+            ready = np.flatnonzero(states == READY)
+            if self.drop_oldest and len(ready):
+                # 가장 오래된 READY frame을 덮어씀
+                slot = int(ready[np.argmin(self.meta[ready, _M_SEQ])])
+                self.header[_H_DROPPED] += 1
+                return slot
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            self.cond.wait(remaining if remaining is not None else 0.1)
+
+    def acquire(self, timeout=None, latest=None):
+        """ READY frame을 가져옴 (consumer), 다음 acquire 전에 release해야 함
+        args:
+            timeout(float): frame이 없을 때 기다릴 최대 시간(초). None이면 계속, 0이면 바로 반환
+            latest(bool): True면 가장 최근 frame을 가져오고 그보다 오래된 READY frame은 버림.
+                          None이면 drop_oldest와 같음 (live는 latest, lossless는 순서대로)
+        return:
+            frame(np.ndarray): slot의 view (release 전까지 유효), info(dict): {'seq', 'time'}
+            frame이 없으면 (None, None), producer가 끝났으면 (None, {'closed': True})
+        """
+        if self._held is not None:
+            raise ValueError("release the held frame before acquiring another")
+        latest = self.drop_oldest if latest is None else latest
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while True:
+                ready = np.flatnonzero(self.meta[:, _M_STATE] == READY)
+                if len(ready):
+                    break
+                if self.header[_H_CLOSED]:
+                    return None, {'closed': True}
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None, None
+                self.cond.wait(remaining if remaining is not None else 0.1)
+
+            seqs = self.meta[ready, _M_SEQ]
+            slot = int(ready[np.argmax(seqs) if latest else np.argmin(seqs)])
+            if latest:
+                # 가져가는 frame보다 오래된 frame은 버림
+                stale = ready[seqs < self.meta[slot, _M_SEQ]]
+                self.meta[stale, _M_STATE] = FREE
+                self.header[_H_DROPPED] += len(stale)
+            self.meta[slot, _M_STATE] = HELD
+            self.header[_H_READ] += 1
+            _, seq, stamp, height, width = (int(v) for v in self.meta[slot])
+            if len(ready) > 1 and latest:
+                self.cond.notify_all()
+
+        self._held = slot
+        frame = self.data[slot, :height * width * self.max_shape[2]].reshape(height, width, self.max_shape[2])
+        return frame, {'seq': seq, 'time': stamp / 1e6}
+
+    def release(self):
+        """ acquire로 가져온 slot을 반납 """
+        if self._held is None:
+            return
+        with self.cond:
+            self.meta[self._held, _M_STATE] = FREE
+            self.cond.notify_all()
+        self._held = None
+
+    def close_writer(self):
+        """ producer가 끝났음을 알림 (남은 READY frame은 계속 읽을 수 있음) """
+        with self.cond:
+            self.header[_H_CLOSED] = 1
+            self.cond.notify_all()
+
+    def get_stats(self):
+        """
+        return:
+            stats(dict): 쓴 frame 수, 버린 frame 수, 읽은 frame 수, 마지막으로 쓴 시각, producer 종료 여부, READY slot 수
+        """
+        with self.cond:
+            header = self.header.copy()
+            ready = int(np.sum(self.meta[:, _M_STATE] == READY))
+        return {
+                'written': int(header[_H_WRITTEN]),
+                'dropped': int(header[_H_DROPPED]),
+                'read': int(header[_H_READ]),
+                'last_write': float(header[_H_LAST_WRITE]) / 1e6 if header[_H_LAST_WRITE] else None,
+                'closed': bool(header[_H_CLOSED]),
+                'ready': ready,
+               }
+
+    def close(self):
+        """ shared memory 연결을 끊음 (create한 쪽이면 삭제까지) """
+        # view가 남아있으면 close가 실패하므로 먼저 놓음
+        self.header = self.meta = self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()